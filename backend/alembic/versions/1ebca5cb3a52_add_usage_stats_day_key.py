@@ -0,0 +1,66 @@
+"""add_usage_stats_day_key
+
+Revision ID: 1ebca5cb3a52
+Revises: a477681e9095
+Create Date: 2026-10-16 14:41:07.553120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1ebca5cb3a52'
+down_revision: Union[str, Sequence[str], None] = 'a477681e9095'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+KEY = "coalesce(user_id, '00000000-0000-0000-0000-000000000000'::uuid), day, coalesce(model_name, '')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Gün anahtarı her zaman UTC (CURRENT_DATE DB session'ının saat dilimini kullanırdı)
+    op.add_column('usage_stats', sa.Column(
+        'day', sa.Date(), server_default=sa.text("(timezone('UTC', now()))::date"), nullable=True,
+    ))
+    op.execute("UPDATE usage_stats SET day = (date AT TIME ZONE 'UTC')::date")
+    op.alter_column('usage_stats', 'day', nullable=False)
+
+    # Eski StatsService günlük toplam satırına son üretimin model_name'ini yazıyordu;
+    # bu satırlar model kırılımına değil toplama aittir. Ayırt edici: toplam satırı
+    # date'i istemci saatiyle (datetime.now()) yazardı, usage_tracker'ın model
+    # satırlarında date ve created_at aynı INSERT'in now()'ıdır. Gruplamadan önce
+    # toplam satırlarının model_name'i temizlenir → model satırlarına eklenmezler.
+    op.execute("UPDATE usage_stats SET model_name = NULL WHERE model_name IS NOT NULL AND date <> created_at")
+
+    # Eski select-or-create yarışlarından kalan çift satırları tek satırda topla
+    op.execute(f"""
+        CREATE TEMP TABLE usage_stats_merged AS
+        SELECT (array_agg(id ORDER BY created_at))[1] AS id,
+               sum(api_calls) AS api_calls,
+               sum(images_generated) AS images_generated,
+               sum(videos_generated) AS videos_generated,
+               sum(tokens_used) AS tokens_used
+        FROM usage_stats
+        GROUP BY {KEY}
+    """)
+    op.execute("DELETE FROM usage_stats WHERE id NOT IN (SELECT id FROM usage_stats_merged)")
+    op.execute("""
+        UPDATE usage_stats u
+        SET api_calls = m.api_calls, images_generated = m.images_generated,
+            videos_generated = m.videos_generated, tokens_used = m.tokens_used
+        FROM usage_stats_merged m
+        WHERE u.id = m.id
+    """)
+    op.execute("DROP TABLE usage_stats_merged")
+
+    op.execute(f"CREATE UNIQUE INDEX uq_usage_stats_user_day_model ON usage_stats ({KEY})")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_usage_stats_user_day_model', table_name='usage_stats')
+    op.drop_column('usage_stats', 'day')
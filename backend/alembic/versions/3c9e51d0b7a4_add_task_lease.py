@@ -0,0 +1,30 @@
+"""add_task_lease
+
+Revision ID: 3c9e51d0b7a4
+Revises: 7721b8f828c1
+Create Date: 2026-10-17 10:12:40.551903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e51d0b7a4'
+down_revision: Union[str, Sequence[str], None] = '7721b8f828c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tasks', sa.Column('owner', sa.String(length=100), nullable=True))
+    op.add_column('tasks', sa.Column('lease_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('tasks', 'lease_until')
+    op.drop_column('tasks', 'owner')
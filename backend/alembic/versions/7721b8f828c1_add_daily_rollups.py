@@ -0,0 +1,64 @@
+"""add_daily_rollups
+
+Revision ID: 7721b8f828c1
+Revises: 1ebca5cb3a52
+Create Date: 2026-10-16 16:05:22.418337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7721b8f828c1'
+down_revision: Union[str, Sequence[str], None] = '1ebca5cb3a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('generated_assets', sa.Column('model_canonical', sa.String(length=100), nullable=True))
+    op.create_index('ix_generated_assets_created_at', 'generated_assets', ['created_at'])
+    op.create_index('ix_messages_created_at', 'messages', ['created_at'])
+    op.create_table(
+        'daily_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('metric', sa.String(length=32), nullable=False),
+        sa.Column('key', sa.String(length=100), server_default='', nullable=False),
+        sa.Column('value', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'metric', 'key'),
+    )
+
+    # Geçmişin tamamını özet tabloya doldur (sonrası: yazma anı + zamanlanmış yenileme).
+    # "models" metriği kanonik adlar doldurulduktan sonra ilk tam yenilemede oluşur:
+    #   celery -A app.core.celery_app call app.tasks.cleanup_tasks.refresh_daily_rollups --kwargs '{"full": true}'
+    op.execute("""
+        INSERT INTO daily_rollups (day, metric, key, value)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, 'users', '', count(*) FROM users GROUP BY 1
+        UNION ALL
+        SELECT (created_at AT TIME ZONE 'UTC')::date, 'sessions', '', count(*) FROM sessions GROUP BY 1
+        UNION ALL
+        SELECT (created_at AT TIME ZONE 'UTC')::date, 'messages', '', count(*) FROM messages GROUP BY 1
+        UNION ALL
+        SELECT (created_at AT TIME ZONE 'UTC')::date, 'assets', coalesce(asset_type, ''), count(*)
+        FROM generated_assets GROUP BY 1, 3
+        UNION ALL
+        SELECT day, 'usage', m.key, sum(m.value)
+        FROM usage_stats,
+             LATERAL (VALUES ('api_calls', api_calls), ('images_generated', images_generated),
+                             ('videos_generated', videos_generated), ('tokens_used', tokens_used)) AS m(key, value)
+        WHERE model_name IS NULL
+        GROUP BY 1, 3
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_rollups')
+    op.drop_index('ix_messages_created_at', table_name='messages')
+    op.drop_index('ix_generated_assets_created_at', table_name='generated_assets')
+    op.drop_column('generated_assets', 'model_canonical')
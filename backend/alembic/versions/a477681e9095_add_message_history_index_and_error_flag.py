@@ -0,0 +1,43 @@
+"""add_message_history_index_and_error_flag
+
+Revision ID: a477681e9095
+Revises: 2d0bf7624035
+Create Date: 2026-10-16 10:12:41.208733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a477681e9095'
+down_revision: Union[str, Sequence[str], None] = '2d0bf7624035'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# app/services/message_history.py ERROR_PATTERNS ile aynı
+ERROR_PATTERNS = (
+    "kredi", "credit", "yetersiz", "insufficient",
+    "hata", "error", "başarısız", "failed",
+    "oluşturulamadı", "üretilemedi", "yapılamadı",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('messages', sa.Column('is_error', sa.Boolean(), server_default=sa.false(), nullable=False))
+    # Mevcut asistan mesajlarını okumada kullanılan kalıplarla işaretle
+    patterns = ", ".join(f"'%{pattern}%'" for pattern in ERROR_PATTERNS)
+    op.execute(
+        "UPDATE messages SET is_error = true "
+        f"WHERE role = 'assistant' AND lower(content) LIKE ANY (ARRAY[{patterns}])"
+    )
+    op.create_index('ix_messages_session_created_id', 'messages', ['session_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_session_created_id', table_name='messages')
+    op.drop_column('messages', 'is_error')
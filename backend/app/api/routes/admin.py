@@ -1,22 +1,32 @@
 """
 Admin API Routes - Sistem yönetimi, istatistikler, modeller.
 """
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy import select, func, case, literal
+from sqlalchemy import select, func, case, literal, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.attributes import flag_modified
 
 from app.core.database import get_db
+from app.core.loop_monitor import loop_monitor
+from app.core.monitoring import request_metrics
+from app.core.rate_limit import rate_limiter
 from app.core.auth import get_current_user as get_current_user_optional
+from app.services.agent.context_pipeline import context_cache
+from app.services.prompt_cache import prompt_cache
+from app.services.media_cache import media_cache
+from app.services.derived_asset_cache import derived_asset_cache
+from app.services.progress_service import progress_service
+from app.services.plugins.model_hedger import model_hedger
+from app.services.model_names import model_display
 from app.models.models import (
-    AIModel, InstalledPlugin, UsageStats, UserSettings, 
-    Preset, TrashItem, Session, GeneratedAsset, Message, User
+    AIModel, InstalledPlugin, UserSettings, 
+    Preset, TrashItem, Session, GeneratedAsset, Message, User, DailyRollup
 )
 
 
@@ -111,6 +121,7 @@ class OverviewStats(BaseModel):
     active_models: int
     total_images: int = 0
     total_videos: int = 0
+    total_users: int = 0
 
 
 # ============== AI MODELS ==============
@@ -189,6 +200,7 @@ async def list_ai_models(db: AsyncSession = Depends(get_db)):
     
     if added > 0 or removed > 0:
         await db.commit()
+        await context_cache.invalidate_ai_models()
     
     # Tümünü model_type sırasına göre getir
     result = await db.execute(
@@ -224,6 +236,7 @@ async def toggle_ai_model(
     model.is_enabled = data.is_enabled
     await db.commit()
     await db.refresh(model)
+    await context_cache.invalidate_ai_models()
     
     # Smart router cache'ini invalidate et
     try:
@@ -382,23 +395,71 @@ async def update_user_settings(
     )
 
 
+# ============== EVENT LOOP DIAGNOSTICS ==============
+
+@router.get("/loop-stats")
+async def get_loop_stats():
+    """Event loop gecikme histogramı + son stall'ların stack'leri (LOOP_MONITOR_ENABLED)."""
+    return loop_monitor.get_stats()
+
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """Prompt, agent context, lokal medya ve türetilmiş varlık cache isabet oranları."""
+    return {
+        "prompt_cache": prompt_cache.get_stats(),
+        "context_cache": context_cache.get_stats(),
+        "media_cache": media_cache.get_stats(),
+        "derived_asset_cache": derived_asset_cache.get_stats(),
+    }
+
+
+@router.get("/progress-stats")
+async def get_progress_stats():
+    """WebSocket ilerleme fan-out sayaçları (bu process): teslim, birleştirme, atılan mesajlar."""
+    return progress_service.get_stats()
+
+
+@router.get("/model-latency")
+async def get_model_latency():
+    """Model başına EWMA gecikme / p90 / hata oranı ve hedge sayaçları (bu process)."""
+    return model_hedger.get_stats()
+
+
+@router.get("/request-stats")
+async def get_request_stats():
+    """Route şablonu başına istek sayısı ve p50/p95/p99; SSE için TTFB ve toplam süre (bu process)."""
+    return request_metrics.get_stats()
+
+
+@router.get("/rate-limit-stats")
+async def get_rate_limit_stats():
+    """Rate limiter sayaçları (bu process): Redis turu, yerel kira isabeti, ret."""
+    return rate_limiter.get_stats()
+
+
 # ============== USAGE STATS ==============
 
 @router.get("/stats/usage", response_model=list[UsageStatsResponse])
 async def get_usage_stats(days: int = 7, db: AsyncSession = Depends(get_db)):
-    """Son N günün kullanım istatistiklerini getir."""
-    start_date = datetime.now() - timedelta(days=days)
+    """Son N günün kullanım istatistiklerini getir (günlük özet tablosundan)."""
+    start_day = (datetime.now(timezone.utc) - timedelta(days=days)).date()
     
     result = await db.execute(
-        select(UsageStats)
-        .where(UsageStats.date >= start_date)
-        .order_by(UsageStats.date)
+        select(DailyRollup.day, DailyRollup.key, DailyRollup.value)
+        .where(
+            DailyRollup.metric == "usage",
+            DailyRollup.key.in_(("api_calls", "images_generated", "videos_generated")),
+            DailyRollup.day >= start_day,
+        )
+        .order_by(DailyRollup.day)
     )
-    stats = result.scalars().all()
+    rows = result.all()
+    
+    day_names_tr = {0: "Pzt", 1: "Sal", 2: "Çar", 3: "Per", 4: "Cum", 5: "Cmt", 6: "Paz"}
     
     # Eğer veritabanında veri yoksa, son 7 gün için sıfır değerlerle döndür
-    if not stats:
-        day_names_tr = {0: "Pzt", 1: "Sal", 2: "Çar", 3: "Per", 4: "Cum", 5: "Cmt", 6: "Paz"}
+    if not rows:
         today = datetime.now()
         return [
             UsageStatsResponse(
@@ -410,45 +471,35 @@ async def get_usage_stats(days: int = 7, db: AsyncSession = Depends(get_db)):
             for i in range(7)
         ]
     
-    # Aynı güne ait kayıtları grupla ve topla (çift kayıt önle)
-    day_names_tr = {0: "Pzt", 1: "Sal", 2: "Çar", 3: "Per", 4: "Cum", 5: "Cmt", 6: "Paz"}
-    from collections import OrderedDict
-    daily: OrderedDict[str, dict] = OrderedDict()
-    for s in stats:
-        date_key = s.date.strftime("%Y-%m-%d")
-        day_label = day_names_tr[s.date.weekday()]
-        if date_key not in daily:
-            daily[date_key] = {"date": day_label, "api_calls": 0, "images_generated": 0, "videos_generated": 0}
-        daily[date_key]["api_calls"] += s.api_calls
-        daily[date_key]["images_generated"] += s.images_generated
-        daily[date_key]["videos_generated"] += s.videos_generated
+    daily: dict[date, dict] = {}
+    for day, metric, value in rows:
+        if day not in daily:
+            daily[day] = {"date": day_names_tr[day.weekday()], "api_calls": 0, "images_generated": 0, "videos_generated": 0}
+        daily[day][metric] = int(value)
     
     return [UsageStatsResponse(**d) for d in daily.values()]
 
 
 @router.get("/stats/overview", response_model=OverviewStats)
 async def get_overview_stats(db: AsyncSession = Depends(get_db)):
-    """Genel sistem istatistikleri."""
-    sessions_count = await db.execute(select(func.count(Session.id)))
-    assets_count = await db.execute(select(func.count(GeneratedAsset.id)))
-    messages_count = await db.execute(select(func.count(Message.id)))
-    models_count = await db.execute(select(func.count(AIModel.id)).where(AIModel.is_enabled == True))
-    
-    # Görsel ve video sayılarını ayrı ayrı hesapla
-    images_count = await db.execute(
-        select(func.count(GeneratedAsset.id)).where(GeneratedAsset.asset_type == "image")
-    )
-    videos_count = await db.execute(
-        select(func.count(GeneratedAsset.id)).where(GeneratedAsset.asset_type == "video")
+    """Genel sistem istatistikleri — günlük özetlerin toplamı + aktif model sayısı, tek sorgu."""
+    totals = (
+        select(DailyRollup.metric, DailyRollup.key, func.sum(DailyRollup.value))
+        .where(DailyRollup.metric.in_(("users", "sessions", "messages", "assets")))
+        .group_by(DailyRollup.metric, DailyRollup.key)
     )
+    active_models = select(literal("active_models"), literal(""), func.count(AIModel.id)).where(AIModel.is_enabled == True)
+    result = await db.execute(union_all(totals, active_models))
     
+    counts: dict[tuple[str, str], int] = {(metric, key): int(value or 0) for metric, key, value in result.all()}
     return OverviewStats(
-        total_sessions=sessions_count.scalar() or 0,
-        total_assets=assets_count.scalar() or 0,
-        total_messages=messages_count.scalar() or 0,
-        active_models=models_count.scalar() or 0,
-        total_images=images_count.scalar() or 0,
-        total_videos=videos_count.scalar() or 0
+        total_sessions=counts.get(("sessions", ""), 0),
+        total_assets=sum(value for (metric, _), value in counts.items() if metric == "assets"),
+        total_messages=counts.get(("messages", ""), 0),
+        active_models=counts.get(("active_models", ""), 0),
+        total_images=counts.get(("assets", "image"), 0),
+        total_videos=counts.get(("assets", "video"), 0),
+        total_users=counts.get(("users", ""), 0),
     )
 
 
@@ -460,142 +511,31 @@ class ModelDistributionItem(BaseModel):
 
 @router.get("/stats/model-distribution", response_model=list[ModelDistributionItem])
 async def get_model_distribution(db: AsyncSession = Depends(get_db)):
-    """Model kullanım dağılımı - Hangi model ne kadar kullanılmış."""
+    """Model kullanım dağılımı - Hangi model ne kadar kullanılmış.
     
+    Model adları yazarken kanonik id'ye çevrildiği için (model_names) burada
+    yalnızca id → görünen ad/renk eşlemesi yapılır.
+    """
     result = await db.execute(
-        select(
-            GeneratedAsset.model_name,
-            func.count(GeneratedAsset.id).label("count")
-        )
-        .where(GeneratedAsset.model_name.isnot(None))
-        .group_by(GeneratedAsset.model_name)
+        select(DailyRollup.key, func.sum(DailyRollup.value).label("count"))
+        .where(DailyRollup.metric == "models")
+        .group_by(DailyRollup.key)
     )
     
-    model_counts = result.all()
-    
-    # Model adı → display name normalize mapping
-    name_normalize: dict[str, str] = {}
-    for raw_name in [
-        "nano-banana-pro", "nano_banana_pro", "nano-banana", "nano_banana_with_face_swap"
-    ]:
-        name_normalize[raw_name] = "Nano Banana Pro"
-    for raw_name in ["nano-banana-2", "nano_banana_2"]:
-        name_normalize[raw_name] = "Nano Banana 2"
-    for raw_name in ["flux-dev", "flux-dev-img2img", "flux", "flux2"]:
-        name_normalize[raw_name] = "Flux"
-    for raw_name in ["flux-kontext", "flux_kontext", "flux_kontext_pro"]:
-        name_normalize[raw_name] = "Flux Kontext"
-    for raw_name in ["gpt-image-1-mini", "gpt_image"]:
-        name_normalize[raw_name] = "GPT Image"
-    for raw_name in ["gpt_image_1_edit"]:
-        name_normalize[raw_name] = "GPT Image Edit"
-    for raw_name in ["nano_banana_pro_edit", "nano-banana-2-edit", "nano_banana_2_edit"]:
-        name_normalize[raw_name] = "Nano Edit"
-    for raw_name in ["gemini-inpainting", "gemini-2.5-flash"]:
-        name_normalize[raw_name] = "Gemini Edit"
-    for raw_name in ["kling-3.0-pro", "kling-2.5-turbo", "kling"]:
-        name_normalize[raw_name] = "Kling Video"
-    for raw_name in ["veo", "veo-3.1", "veo_fast", "veo_quality"]:
-        name_normalize[raw_name] = "Veo 3.1"
-    for raw_name in ["face-swap", "face_swap"]:
-        name_normalize[raw_name] = "Face Swap"
-    for raw_name in ["birefnet-v2", "rembg"]:
-        name_normalize[raw_name] = "Arka Plan Kaldırma"
-    name_normalize.update({
-        "reve": "Reve", "seedream": "Seedream", "recraft": "Recraft",
-        "omnigen": "OmniGen", "object-removal": "Object Removal",
-        "sora2": "Sora 2", "seedance": "Seedance", "hailuo": "Hailuo",
-        "ltx-video": "LTX Video", "topaz": "Topaz Upscale",
-        "elevenlabs": "ElevenLabs", "stable_audio": "Stable Audio",
-        "whisper": "Whisper", "mmaudio": "MMAudio", "ffmpeg-local": "FFmpeg",
-        "style_transfer": "Stil Aktarımı",
-        # Edge case model adları
-        "nano_banana_faceswap": "Nano Banana Pro",
-        "nano banana faceswap": "Nano Banana Pro",
-        "nano_banana_regen": "Nano Banana Pro",
-        "nano banana regen": "Nano Banana Pro",
-        "nano_banana+face_swap": "Nano Banana Pro",
-        "nano banana+face swap": "Nano Banana Pro",
-        "veo_fallback_kling": "Kling Video",
-        "veo fallback kling": "Kling Video",
-        "flux_kontext_native": "Flux Kontext",
-        "flux kontext native": "Flux Kontext",
-        "grok_imagine": "Grok Imagine",
-        "grok-imagine-image": "Grok Imagine",
-        "grok_imagine_video": "Grok Imagine Video",
-        "grok-imagine-video": "Grok Imagine Video",
-    })
-    
-    # Gizlenen iç model adları
-    hidden = {"user_upload", "unknown", ""}
-    
-    # Renk haritası (kategori bazlı)
-    color_map = {
-        "Nano Banana Pro": "#22c55e", "Nano Banana 2": "#16a34a",
-        "Flux": "#f59e0b", "Flux Kontext": "#d97706",
-        "GPT Image": "#8b5cf6", "GPT Image Edit": "#7c3aed",
-        "Reve": "#06b6d4", "Seedream": "#14b8a6", "Recraft": "#ec4899",
-        "Nano Edit": "#10b981", "Gemini Edit": "#a855f7",
-        "OmniGen": "#6366f1", "Object Removal": "#64748b",
-        "Kling Video": "#3b82f6", "Sora 2": "#2563eb",
-        "Veo 3.1": "#1d4ed8", "Seedance": "#0ea5e9",
-        "Hailuo": "#0284c7", "LTX Video": "#0369a1",
-        "Face Swap": "#e11d48", "Topaz Upscale": "#be185d",
-        "Arka Plan Kaldırma": "#64748b", "FFmpeg": "#475569",
-        "ElevenLabs": "#f97316", "Stable Audio": "#ea580c",
-        "Whisper": "#c2410c", "MMAudio": "#9a3412",
-        "Stil Aktarımı": "#db2777",
-        "Grok Imagine": "#4a4a4a",
-        "Grok Imagine Video": "#2d2d2d",
-    }
-    
-    # Normalize et, grupla, topla
-    grouped: dict[str, int] = {}
-    for model_name, count in model_counts:
-        if not model_name or model_name.lower() in hidden:
+    # Görünen ada göre grupla (bilinmeyen slug'lar da başlık hâline gelir)
+    grouped: dict[str, tuple[int, str]] = {}
+    for canonical, count in result.all():
+        if not count or count <= 0:
             continue
-        
-        display_name = name_normalize.get(model_name.lower())
-        if display_name is None:
-            display_name = name_normalize.get(model_name)
-        if display_name is None:
-            # Contains-based fallback (tam endpoint path'leri için)
-            ml = model_name.lower()
-            if "nano" in ml and "banana" in ml:
-                display_name = "Nano Banana Pro"
-            elif "kling" in ml:
-                display_name = "Kling Video"
-            elif "veo" in ml:
-                display_name = "Veo 3.1"
-            elif "sora" in ml:
-                display_name = "Sora 2"
-            elif "flux" in ml and "kontext" in ml:
-                display_name = "Flux Kontext"
-            elif "flux" in ml:
-                display_name = "Flux"
-            elif "seedance" in ml:
-                display_name = "Seedance"
-            elif "hailuo" in ml:
-                display_name = "Hailuo"
-            elif "gemini" in ml:
-                display_name = "Gemini Edit"
-            elif "face" in ml and "swap" in ml:
-                display_name = "Face Swap"
-            elif "topaz" in ml:
-                display_name = "Topaz Upscale"
-            else:
-                display_name = model_name.replace("-", " ").replace("_", " ").title()
-        
-        grouped[display_name] = grouped.get(display_name, 0) + count
+        display_name, color = model_display(canonical)
+        previous = grouped.get(display_name, (0, color))[0]
+        grouped[display_name] = (previous + int(count), color)
     
     # Sırala (en çok kullanılan üstte)
-    distribution = []
-    for name, count in sorted(grouped.items(), key=lambda x: -x[1]):
-        distribution.append(ModelDistributionItem(
-            name=name,
-            value=count,
-            color=color_map.get(name, "#6b7280")
-        ))
+    distribution = [
+        ModelDistributionItem(name=name, value=count, color=color)
+        for name, (count, color) in sorted(grouped.items(), key=lambda x: -x[1][0])
+    ]
     
     if not distribution:
         distribution = [
@@ -662,6 +602,7 @@ async def create_preset(
     db.add(plugin)
     await db.commit()
     await db.refresh(plugin)
+    await context_cache.invalidate_presets(plugin.session_id)
     
     return PresetResponse(
         id=str(plugin.id),
@@ -701,6 +642,7 @@ async def update_preset(plugin_id: UUID, data: PresetUpdate, db: AsyncSession =
         flag_modified(plugin, "config")
     
     await db.commit()
+    await context_cache.invalidate_presets(plugin.session_id)
     return {"success": True, "message": f"'{plugin.name}' güncellendi"}
 
 @router.delete("/presets/{plugin_id}")
@@ -734,6 +676,7 @@ async def delete_preset(plugin_id: UUID, db: AsyncSession = Depends(get_db)):
     
     await db.delete(plugin)
     await db.commit()
+    await context_cache.invalidate_presets(plugin.session_id)
     
     return {"success": True, "message": "Preset çöp kutusuna taşındı"}
 
@@ -914,6 +857,7 @@ async def install_marketplace_plugin(
     db.add(installed_plugin)
     await db.commit()
     await db.refresh(installed_plugin)
+    await context_cache.invalidate_presets(target_uuid)
     
     return {"success": True, "plugin_id": str(installed_plugin.id), "installed_name": source_name}
 
@@ -1034,6 +978,11 @@ async def restore_trash_item(item_id: UUID, db: AsyncSession = Depends(get_db)):
         await db.delete(item)
         await db.commit()
         
+        if item_type in ["character", "location", "brand"] and item.user_id:
+            await context_cache.invalidate_entities(item.user_id)
+        elif item_type == "preset":
+            await context_cache.invalidate_presets(item.session_id)
+        
         return {"success": True, "message": f"{item_type} başarıyla geri yüklendi!", "restored": restored_item}
         
     except Exception as e:
@@ -23,6 +23,8 @@ from app.core.auth import get_current_user, get_current_user_required
 from app.models.models import Session, Message, User
 from app.schemas.schemas import ChatRequest, ChatResponse, MessageResponse, AssetResponse, EntityResponse
 from app.services.agent.orchestrator import agent
+from app.services.message_history import is_error_message, message_history
+from app.services.stream_persister import stream_persister
 from app.services.user_error_formatter import format_user_error_message
 
 router = APIRouter(prefix="/chat", tags=["Sohbet"])
@@ -134,74 +136,12 @@ async def _process_chat(
     await db.refresh(user_message)
     
     # ÖNCEKİ MESAJLARI ÇEK - conversation_history oluştur
-    # ChatGPT gibi tüm sohbet geçmişini hatırlaması için gerekli!
-    from sqlalchemy import asc
-    previous_messages_result = await db.execute(
-        select(Message)
-        .where(Message.session_id == session.id)
-        .where(Message.id != user_message.id)  # Yeni mesaj hariç
-        .order_by(asc(Message.created_at))  # Kronolojik sıra
+    # Son 20 mesaj (hata yanıtları hariç) DESC LIMIT ile indeksten okunur.
+    # Referans olarak yalnızca kullanıcının yüklediği görseller taşınır;
+    # asistanın ürettiği asset'ler "yüz referansı" gibi geri beslenmez.
+    conversation_history, last_reference_urls_from_history = await message_history.build_context(
+        db, session.id, exclude_id=user_message.id
     )
-    previous_messages = previous_messages_result.scalars().all()
-    
-    # Hata pattern'leri - bunları içeren asistan mesajlarını atla
-    ERROR_PATTERNS = [
-        "kredi", "credit", "yetersiz", "insufficient", 
-        "hata", "error", "başarısız", "failed",
-        "oluşturulamadı", "üretilemedi", "yapılamadı"
-    ]
-    
-    # OpenAI formatına çevir - HATA MESAJLARINI FİLTRELE
-    conversation_history = []
-    # Yalnızca kullanıcı tarafından yüklenen referansları taşı.
-    # Asistanın ürettiği asset'leri "yüz referansı" gibi geri besleme.
-    last_reference_urls_from_history = []
-    
-    for msg in previous_messages:
-        content = msg.content.lower() if msg.content else ""
-        
-        # Asistan mesajlarında hata pattern'i varsa atla
-        if msg.role == "assistant":
-            has_error = any(pattern in content for pattern in ERROR_PATTERNS)
-            if has_error:
-                continue  # Bu mesajı geçmişe ekleme
-        
-        # Mesaj içeriğini hazırla
-        msg_content = msg.content or ""
-        
-        # Assistant mesajlarında metadata'dan image/video URL'lerini ekle
-        # (content'ten kaldırıldı ama GPT-4o'nun bunları bilmesi gerekiyor)
-        if msg.role == "assistant" and msg.metadata_:
-            meta = msg.metadata_ if isinstance(msg.metadata_, dict) else {}
-            images = meta.get("images", [])
-            videos = meta.get("videos", [])
-            if images:
-                urls = [img.get("url", "") for img in images if isinstance(img, dict) and img.get("url")]
-                if urls:
-                    msg_content += "\n\n[Bu mesajda üretilen görseller: " + ", ".join(urls) + "]"
-            if videos:
-                urls = [vid.get("url", "") for vid in videos if isinstance(vid, dict) and vid.get("url")]
-                if urls:
-                    msg_content += "\n\n[Bu mesajda üretilen videolar: " + ", ".join(urls) + "]"
-        
-        # User mesajlarında referans görsel URL'si varsa çıkar
-        if msg.role == "user" and msg.metadata_:
-            meta = msg.metadata_ if isinstance(msg.metadata_, dict) else {}
-            # Eski tekil yapı
-            if meta.get("has_reference_image") and meta.get("reference_url"):
-                last_reference_urls_from_history = [meta["reference_url"]]
-            # Yeni çoklu yapı
-            elif meta.get("reference_urls") and isinstance(meta.get("reference_urls"), list):
-                last_reference_urls_from_history = meta["reference_urls"]
-        
-        conversation_history.append({
-            "role": msg.role,
-            "content": msg_content
-        })
-    
-    # Max 20 mesaj (son mesajlar)
-    if len(conversation_history) > 20:
-        conversation_history = conversation_history[-20:]
     
     print(f"📜 Conversation history: {len(conversation_history)} mesaj yüklendi (session: {session.id})")
     
@@ -489,7 +429,6 @@ async def chat_stream(
 ):
     """Kullanıcı mesajını işle ve SSE ile stream et (ChatGPT tarzı)."""
     print(f"🔴 STREAM ENDPOINT HIT! message={request.message[:50]} user={current_user.id}")
-    from sqlalchemy import asc
     import json
     
     actual_session_id = str(request.session_id) if request.session_id else None
@@ -528,51 +467,10 @@ async def chat_stream(
     await db.commit()
     await db.refresh(user_msg)
     
-    # Geçmiş mesajları çek
-    prev_result = await db.execute(
-        select(Message)
-        .where(Message.session_id == session.id)
-        .where(Message.id != user_msg.id)
-        .order_by(asc(Message.created_at))
+    # Geçmiş mesajları çek (son 20, hata yanıtları hariç)
+    conversation_history, last_reference_urls_from_history = await message_history.build_context(
+        db, session.id, exclude_id=user_msg.id
     )
-    previous_messages = prev_result.scalars().all()
-    
-    ERROR_PATTERNS = ["kredi", "credit", "yetersiz", "insufficient", "hata", "error", "başarısız", "failed"]
-    conversation_history = []
-    last_reference_urls_from_history = []
-    
-    for msg in previous_messages:
-        content = msg.content.lower() if msg.content else ""
-        if msg.role == "assistant" and any(p in content for p in ERROR_PATTERNS):
-            continue
-        
-        msg_content = msg.content or ""
-        
-        # Assistant mesajlarında metadata'dan image/video URL'lerini ekle
-        if msg.role == "assistant" and msg.metadata_:
-            meta = msg.metadata_ if isinstance(msg.metadata_, dict) else {}
-            images = meta.get("images", [])
-            videos = meta.get("videos", [])
-            if images:
-                urls = [img.get("url", "") for img in images if isinstance(img, dict) and img.get("url")]
-                if urls:
-                    msg_content += "\n\n[Bu mesajda üretilen görseller: " + ", ".join(urls) + "]"
-            if videos:
-                urls = [vid.get("url", "") for vid in videos if isinstance(vid, dict) and vid.get("url")]
-                if urls:
-                    msg_content += "\n\n[Bu mesajda üretilen videolar: " + ", ".join(urls) + "]"
-        
-        if msg.role == "user" and msg.metadata_:
-            meta = msg.metadata_ if isinstance(msg.metadata_, dict) else {}
-            if meta.get("has_reference_image") and meta.get("reference_url"):
-                last_reference_urls_from_history = [meta["reference_url"]]
-            elif meta.get("reference_urls") and isinstance(meta.get("reference_urls"), list):
-                last_reference_urls_from_history = meta["reference_urls"]
-        
-        conversation_history.append({"role": msg.role, "content": msg_content})
-    
-    if len(conversation_history) > 20:
-        conversation_history = conversation_history[-20:]
 
     # Stream kesilse bile chat mesajı tamamen kaybolmasın diye
     # assistant mesajını baştan placeholder olarak oluştur.
@@ -589,6 +487,8 @@ async def chat_stream(
     # event_generator() içinde bu session kullanılamaz.
     # Bu yüzden assistant_msg.id'yi saklayıp kendi session'ımızı oluşturacağız.
     assistant_msg_id = assistant_msg.id
+    # Kurtarma işareti: process ölürse mesaj restart sonrası finalize edilir
+    await stream_persister.begin(assistant_msg_id)
     
     async def event_generator():
         full_response = ""
@@ -596,46 +496,27 @@ async def chat_stream(
         all_videos = []
         all_entities = []
         stream_error_text = None
-        last_persisted_len = 0
-        last_image_count = 0
-        last_video_count = 0
-
-        async def persist_stream_message(force: bool = False):
-            nonlocal last_persisted_len, last_image_count, last_video_count
-
-            should_persist_text = bool(full_response) and (
-                force or last_persisted_len == 0 or len(full_response) - last_persisted_len >= 80
-            )
-            should_persist_media = (
-                force or len(all_images) != last_image_count or len(all_videos) != last_video_count
-            )
-            should_persist_error = force and bool(stream_error_text)
-
-            if not (should_persist_text or should_persist_media or should_persist_error):
-                return
 
+        def stream_state(final: bool):
             content = full_response or stream_error_text or ""
-            meta = {"streamed": True, "pending": not force and not stream_error_text}
+            meta = {"streamed": True, "pending": not final and not stream_error_text}
             if all_images:
                 meta["images"] = all_images
             if all_videos:
                 meta["videos"] = all_videos
             if stream_error_text:
                 meta["stream_error"] = True
+            return content, meta, bool(stream_error_text) or is_error_message("assistant", content)
 
-            # Bağımsız session — get_db session'ı kapalı olabilir
-            async with async_session_maker() as persist_db:
-                from sqlalchemy import update
-                await persist_db.execute(
-                    update(Message)
-                    .where(Message.id == assistant_msg_id)
-                    .values(content=content, metadata_=meta)
-                )
-                await persist_db.commit()
-
-            last_persisted_len = len(full_response)
-            last_image_count = len(all_images)
-            last_video_count = len(all_videos)
+        async def persist_stream_message(force: bool = False):
+            # Write-behind: ara durumlar yalnızca tamponu günceller, flusher tüm
+            # stream'leri toplu yazar; force (finalize) hemen ve iptale dayanıklı yazar.
+            if not (full_response or all_images or all_videos or (force and stream_error_text)):
+                return
+            if force:
+                await stream_persister.finalize(assistant_msg_id, *stream_state(final=True))
+            else:
+                stream_persister.update(assistant_msg_id, *stream_state(final=False))
         
         try:
             async for event in agent.process_message_stream(
@@ -657,11 +538,10 @@ async def chat_stream(
                         full_response += token
                     except Exception as parse_err:
                         print(f"⚠️ Token parse hatası: {parse_err}")
-                    if full_response and (not last_persisted_len or len(full_response) - last_persisted_len >= 80):
-                        try:
-                            await persist_stream_message()
-                        except Exception as persist_err:
-                            print(f"⚠️ Token persist hatası: {persist_err}")
+                    try:
+                        await persist_stream_message()
+                    except Exception as persist_err:
+                        print(f"⚠️ Token persist hatası: {persist_err}")
                 elif event.startswith("event: assets"):
                     data_line = event.split("data: ", 1)[1].strip()
                     try:
@@ -690,6 +570,7 @@ async def chat_stream(
                 if full_response or all_images or all_videos:
                     await persist_stream_message(force=True)
                 else:
+                    await stream_persister.discard(assistant_msg_id)
                     async with async_session_maker() as cleanup_db:
                         from sqlalchemy import delete
                         await cleanup_db.execute(delete(Message).where(Message.id == assistant_msg_id))
@@ -698,6 +579,13 @@ async def chat_stream(
             except Exception as cancel_err:
                 print(f"⚠️ Stream disconnect cleanup hatası: {cancel_err}")
             raise
+        except GeneratorExit:
+            # aclose() sırasında await güvenli değil — son durumu flusher yazar
+            if full_response or all_images or all_videos:
+                stream_persister.close(assistant_msg_id, *stream_state(final=True))
+            else:
+                stream_persister.forget(assistant_msg_id)
+            raise
         except Exception as e:
             stream_error_text = str(e)
             yield f"event: error\ndata: {json.dumps(format_user_error_message(stream_error_text, 'chat'))}\n\n"
@@ -732,6 +620,7 @@ async def chat_stream(
                     except Exception as sum_err:
                         print(f"⚠️ Stream auto-summary hatası: {sum_err}")
             else:
+                await stream_persister.discard(assistant_msg_id)
                 async with async_session_maker() as cleanup_db:
                     from sqlalchemy import delete
                     await cleanup_db.execute(delete(Message).where(Message.id == assistant_msg_id))
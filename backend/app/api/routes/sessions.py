@@ -4,7 +4,7 @@ Oturum API endpoint'leri.
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -12,6 +12,7 @@ from app.core.database import get_db
 from app.core.auth import get_current_user, get_current_user_required
 from app.models.models import Session, Message, Entity, GeneratedAsset, TrashItem, User
 from app.schemas.schemas import SessionCreate, SessionResponse, MessageResponse, EntityResponse, AssetResponse
+from app.services.message_history import MessageHistory, message_history
 
 router = APIRouter(prefix="/sessions", tags=["Oturumlar"])
 
@@ -82,23 +83,33 @@ async def get_session(
 @router.get("/{session_id}/messages", response_model=list[MessageResponse])
 async def get_session_messages(
     session_id: UUID,
+    response: Response,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(MessageHistory.PAGE_SIZE, ge=1, le=MessageHistory.PAGE_MAX),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user_required)
 ):
-    """Oturumdaki mesajları getir."""
+    """
+    Oturumdaki mesajları getir (keyset sayfalı, kronolojik sıra).
+    Cursor yoksa en yeni `limit` mesaj döner; daha eskiler için X-Next-Before,
+    daha yeniler için X-Next-After header'ındaki cursor kullanılır.
+    """
     # Session sahipliği doğrula
     sess = await db.execute(select(Session).where(Session.id == session_id, Session.user_id == current_user.id))
     if not sess.scalar_one_or_none():
         raise HTTPException(status_code=404, detail="Oturum bulunamadı")
-    result = await db.execute(
-        select(Message)
-        .where(Message.session_id == session_id)
-        .order_by(Message.created_at.asc())
-    )
-    messages = result.scalars().all()
+    try:
+        page = await message_history.page(db, session_id, before=before, after=after, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page.next_before:
+        response.headers["X-Next-Before"] = page.next_before
+    if page.next_after:
+        response.headers["X-Next-After"] = page.next_after
 
     filtered_messages = []
-    for msg in messages:
+    for msg in page.messages:
         meta = msg.metadata_ if isinstance(msg.metadata_, dict) else {}
         has_media = bool(meta.get("images") or meta.get("videos") or meta.get("audio_url"))
         is_blank_pending_assistant = (
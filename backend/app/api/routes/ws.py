@@ -22,13 +22,8 @@ async def websocket_progress(websocket: WebSocket, session_id: str):
     """
     await websocket.accept()
     progress_service.register(session_id, websocket)
-    cached_progress = await progress_service.get_cached_progress(session_id)
-    if cached_progress:
-        try:
-            await websocket.send_json(cached_progress)
-        except Exception:
-            progress_service.unregister(session_id, websocket)
-            return
+    # Son bilinen ilerleme soketin gönderim kuyruğu üzerinden gider (sıra korunur)
+    await progress_service.replay_latest(session_id, websocket)
     
     try:
         while True:
@@ -51,6 +51,11 @@ class RedisCache:
     def is_connected(self) -> bool:
         return self._client is not None
     
+    @property
+    def client(self) -> Optional[redis.Redis]:
+        """Ham Redis client (pub/sub gibi özel kullanımlar için)."""
+        return self._client
+    
     # ============== BASIC OPERATIONS ==============
     
     async def get(self, key: str) -> Optional[str]:
@@ -183,25 +188,13 @@ class RedisCache:
         limit: int = 100, 
         window: int = 3600
     ) -> tuple[bool, int]:
-        """Check if user is within rate limit. Returns (allowed, remaining)."""
-        if not self._client:
-            return True, limit
+        """Check if user is within rate limit. Returns (allowed, remaining).
         
-        key = f"rate_limit:{user_id}"
-        try:
-            current = await self._client.get(key)
-            if current is None:
-                await self._client.setex(key, window, "1")
-                return True, limit - 1
-            
-            count = int(current)
-            if count >= limit:
-                return False, 0
-            
-            await self._client.incr(key)
-            return True, limit - count - 1
-        except Exception:
-            return True, limit
+        Atomik GCRA limiter'a (app.core.rate_limit) delege eder.
+        """
+        from app.core.rate_limit import rate_limiter
+        result = await rate_limiter.hit(f"user:{user_id}", limit, window)
+        return result.allowed, result.remaining
     
     # ============== CONVERSATION MEMORY ==============
     
@@ -230,24 +223,60 @@ class RedisCache:
         ttl: int = 3600  # 1 saat
     ) -> bool:
         """
-        Session context'ini cache'le.
+        Session context'ini cache'le (tamamen değiştirir).
         Mevcut entity'ler, tercihler, son işlemler vb.
+        Hash olarak tutulur: alan başına JSON değer.
         """
-        key = f"context:{session_id}"
-        return await self.set_json(key, context, ttl)
+        if not self._client:
+            return False
+        key = f"context:h:{session_id}"
+        try:
+            async with self._client.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if context:
+                    pipe.hset(key, mapping={k: json.dumps(v, default=str) for k, v in context.items()})
+                    pipe.expire(key, ttl)
+                await pipe.execute()
+            return True
+        except Exception:
+            return False
     
     async def get_context(self, session_id: str) -> Optional[dict]:
         """Session context'ini al."""
-        key = f"context:{session_id}"
-        return await self.get_json(key)
+        if not self._client:
+            return None
+        try:
+            raw = await self._client.hgetall(f"context:h:{session_id}")
+        except Exception:
+            return None
+        if not raw:
+            return None
+        context = {}
+        for field, value in raw.items():
+            try:
+                context[field] = json.loads(value)
+            except json.JSONDecodeError:
+                context[field] = value
+        return context
     
-    async def update_context(self, session_id: str, updates: dict) -> bool:
+    async def update_context(self, session_id: str, updates: dict, ttl: int = 3600) -> bool:
         """
         Context'i güncelle (mevcut değerleri koruyarak).
+        Tek HSET — oku-değiştir-yaz yok, eşzamanlı güncellemeler birbirini ezmez.
         """
-        current = await self.get_context(session_id) or {}
-        current.update(updates)
-        return await self.cache_context(session_id, current)
+        if not self._client:
+            return False
+        if not updates:
+            return True
+        key = f"context:h:{session_id}"
+        try:
+            async with self._client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping={k: json.dumps(v, default=str) for k, v in updates.items()})
+                pipe.expire(key, ttl)
+                await pipe.execute()
+            return True
+        except Exception:
+            return False
     
     # ============== WORKING MEMORY (Kısa Vadeli) ==============
     
@@ -296,20 +325,18 @@ class RedisCache:
         """
         Son işlemleri kaydet (LIFO stack).
         Undo/redo ve context için kullanılır.
+        LPUSH + LTRIM tek transaction'da — eşzamanlı push'lar kaybolmaz.
         """
-        key = f"actions:{session_id}"
+        if not self._client:
+            return False
+        key = f"actions:l:{session_id}"
         try:
-            # Mevcut aksiyonları al
-            actions = await self.get_json(key) or []
-            
-            # Yeni aksiyonu başa ekle
-            actions.insert(0, action)
-            
-            # Max limit aş
-            if len(actions) > max_actions:
-                actions = actions[:max_actions]
-            
-            return await self.set_json(key, actions, ttl=86400)  # 24 saat
+            async with self._client.pipeline(transaction=True) as pipe:
+                pipe.lpush(key, json.dumps(action, default=str))
+                pipe.ltrim(key, 0, max_actions - 1)
+                pipe.expire(key, 86400)  # 24 saat
+                await pipe.execute()
+            return True
         except Exception:
             return False
     
@@ -319,20 +346,23 @@ class RedisCache:
         count: int = 5
     ) -> list:
         """Son N aksiyonu al."""
-        key = f"actions:{session_id}"
-        actions = await self.get_json(key) or []
-        return actions[:count]
+        if not self._client:
+            return []
+        try:
+            items = await self._client.lrange(f"actions:l:{session_id}", 0, count - 1)
+        except Exception:
+            return []
+        return [json.loads(item) for item in items]
     
     async def pop_last_action(self, session_id: str) -> Optional[dict]:
-        """Son aksiyonu al ve listeden çıkar (undo için)."""
-        key = f"actions:{session_id}"
-        actions = await self.get_json(key) or []
-        if not actions:
+        """Son aksiyonu al ve listeden çıkar (undo için). Atomik LPOP."""
+        if not self._client:
             return None
-        
-        last_action = actions.pop(0)
-        await self.set_json(key, actions, ttl=86400)
-        return last_action
+        try:
+            item = await self._client.lpop(f"actions:l:{session_id}")
+        except Exception:
+            return None
+        return json.loads(item) if item else None
 
 
 # Singleton instance
@@ -10,6 +10,7 @@ Enterprise-grade job queue with:
 - Scheduled tasks (beat)
 """
 from celery import Celery
+from celery.schedules import crontab
 from kombu import Queue, Exchange
 import os
 
@@ -44,6 +45,10 @@ celery_app.conf.update(
     # Task execution
     task_acks_late=True,  # Acknowledge after task completes (safer)
     task_reject_on_worker_lost=True,
+    # Redis broker: ack'lenmemiş mesaj visibility_timeout sonra başka worker'a
+    # yeniden teslim edilir (varsayılan 3600s). En uzun time_limit'in (7500s,
+    # generate_long_video) üstünde olmalı, yoksa çalışan iş ikinci kez başlar.
+    broker_transport_options={"visibility_timeout": 8000},
     worker_prefetch_multiplier=1,  # Fair task distribution
     
     # Task result storage
@@ -126,6 +131,19 @@ celery_app.conf.beat_schedule = {
         "schedule": 21600.0,  # Every 6 hours
     },
     
+    # Refresh today's/yesterday's admin rollups every 10 minutes
+    "refresh-daily-rollups": {
+        "task": "app.tasks.cleanup_tasks.refresh_daily_rollups",
+        "schedule": 600.0,  # Every 10 minutes
+    },
+    
+    # Rebuild all admin rollups from source tables every day at 4 AM
+    "rebuild-daily-rollups": {
+        "task": "app.tasks.cleanup_tasks.refresh_daily_rollups",
+        "schedule": crontab(hour=4, minute=0),
+        "kwargs": {"full": True},
+    },
+    
     # Update Pinecone indexes every day at 3 AM
     "reindex-pinecone": {
         "task": "app.tasks.cleanup_tasks.reindex_pinecone",
@@ -166,3 +184,6 @@ class BaseTask(Task):
 
 # Set as default base
 celery_app.Task = BaseTask
+
+# Worker process başına kalıcı event loop + paylaşılan client'lar (worker_process_init)
+import app.tasks.runtime  # noqa: E402,F401
@@ -2,7 +2,7 @@
 Uygulama konfigürasyonu.
 """
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -47,6 +47,20 @@ class Settings(BaseSettings):
     STORAGE_TYPE: str = "local"
     STORAGE_PATH: str = "./uploads"
     
+    # Lokal medya cache'i (ffmpeg servisleri için kaynak videolar)
+    MEDIA_CACHE_DIR: Optional[str] = None  # Varsayılan: <tmp>/pepper_media_cache
+    MEDIA_CACHE_MAX_MB: int = 2048
+    
+    # Model fallback zincirlerinde hedge (p90 sonrası yedek modeli paralel başlat)
+    MODEL_HEDGING_ENABLED: bool = True
+    
+    # Ağır medya işleri (video / uzun video / video düzenleme) nerede çalışır:
+    # "inline" (web process'inde asyncio.Task) | "celery" (video kuyruğu, ilerleme Redis pub/sub ile döner)
+    MEDIA_JOB_BACKEND: str = "inline"
+    
+    # Başarılı prompt hatırlama: "tokens" (kelime örtüşmesi) | "hashed" (trigram vektör benzerliği)
+    PROMPT_RECALL_MODE: str = "tokens"
+    
     # Redis — REDIS_URL varsa otomatik aktif olur
     REDIS_URL: Optional[str] = None
     USE_REDIS: bool = False  # REDIS_URL set edilirse otomatik True olur
@@ -56,6 +70,25 @@ class Settings(BaseSettings):
         """Redis aktif mi? REDIS_URL varsa veya USE_REDIS=true ise aktif."""
         return self.USE_REDIS or bool(self.REDIS_URL)
     
+    # Rate limit (Redis GCRA + yerel kira ön filtresi) — dakika başına istek
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_GENERAL: int = 60
+    RATE_LIMIT_AI: int = 10
+    RATE_LIMIT_AUTH: int = 20
+    
+    # Model bazlı harcama kotası: model → pencere başına birim (görsel adedi / video saniyesi).
+    # Örn. MODEL_SPEND_QUOTAS='{"veo": 120, "kling": 600}'. Listede olmayan model sınırsız.
+    MODEL_SPEND_QUOTAS: Dict[str, int] = {}
+    MODEL_SPEND_QUOTA_WINDOW: int = 86400
+    
+    # İstek metrikleri (saf ASGI histogramlar) + Prometheus /metrics
+    METRICS_ENABLED: bool = True
+    SLOW_REQUEST_THRESHOLD_MS: int = 5000
+    
+    # Event loop stall monitor (opt-in) — /admin/loop-stats
+    LOOP_MONITOR_ENABLED: bool = False
+    LOOP_STALL_THRESHOLD_MS: int = 100
+    
     # Pinecone Semantic Search
     PINECONE_API_KEY: Optional[str] = None
     PINECONE_INDEX_NAME: str = "pepperroot"
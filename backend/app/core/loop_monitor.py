@@ -0,0 +1,173 @@
+"""
+Event Loop Stall Monitor - Bloklayan çağrıları görünür kılar.
+
+Async yollara karışmış senkron çağrılar (subprocess.run, sync upload, DDGS
+araması vb.) tüm event loop'u dondurur; SSE ilerleme çubukları donar.
+Bu modül (opt-in, LOOP_MONITOR_ENABLED):
+1. Heartbeat task'ı ile loop gecikmesini (lag) ölçer ve histograma yazar
+2. Ayrı bir watchdog thread'i, heartbeat eşiği aştığında loop thread'inin
+   o anki stack'ini ve çalışan task'ı yakalar (suçlu coroutine)
+3. Sayaçları /admin/loop-stats üzerinden sunar
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LoopStallMonitor:
+    """Heartbeat + watchdog thread ile event loop stall dedektörü."""
+
+    HEARTBEAT_INTERVAL = 0.05  # saniye
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+    MAX_STALL_RECORDS = 20
+    MAX_STACK_FRAMES = 25
+
+    def __init__(self, threshold_ms: float = 100.0):
+        self.threshold_ms = threshold_ms
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._pending_capture: Optional[dict] = None
+        self._stalls: deque = deque(maxlen=self.MAX_STALL_RECORDS)
+        self._histogram = {bucket: 0 for bucket in self.BUCKETS_MS}
+        self._histogram_overflow = 0
+        self._stats = {"samples": 0, "stalls": 0, "captures": 0, "max_lag_ms": 0.0, "total_lag_ms": 0.0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Çalışan loop üzerinde heartbeat + watchdog başlat."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._heartbeat(), name="loop-stall-heartbeat")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog:
+            self._watchdog.join(timeout=1.0)
+        self._task = None
+        self._watchdog = None
+
+    # ===============================
+    # HEARTBEAT (loop thread)
+    # ===============================
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.perf_counter() + self.HEARTBEAT_INTERVAL
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            lag_ms = max(0.0, (time.perf_counter() - expected) * 1000)
+            self._last_beat = time.monotonic()
+            self._record(lag_ms)
+
+    def _record(self, lag_ms: float):
+        self._stats["samples"] += 1
+        self._stats["total_lag_ms"] += lag_ms
+        self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], lag_ms)
+        for bucket in self.BUCKETS_MS:
+            if lag_ms <= bucket:
+                self._histogram[bucket] += 1
+                break
+        else:
+            self._histogram_overflow += 1
+
+        with self._lock:
+            capture, self._pending_capture = self._pending_capture, None
+
+        if lag_ms < self.threshold_ms:
+            return
+
+        self._stats["stalls"] += 1
+        stall = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "lag_ms": round(lag_ms, 1),
+            "task": capture["task"] if capture else None,
+            "stack": capture["stack"] if capture else [],
+        }
+        self._stalls.append(stall)
+        logger.warning(
+            f"🐢 Event loop {lag_ms:.0f}ms bloklandı"
+            + (f" — task: {stall['task']}" if stall["task"] else "")
+        )
+
+    # ===============================
+    # WATCHDOG (ayrı thread)
+    # ===============================
+
+    def _watch(self):
+        check_every = max(0.005, self.threshold_ms / 2000)
+        while not self._stop.wait(check_every):
+            blocked_ms = (time.monotonic() - self._last_beat - self.HEARTBEAT_INTERVAL) * 1000
+            if blocked_ms < self.threshold_ms:
+                continue
+            with self._lock:
+                if self._pending_capture is not None:
+                    continue
+                self._pending_capture = self._capture()
+            self._stats["captures"] += 1
+
+    def _capture(self) -> dict:
+        """Loop thread'inin şu anki stack'i + çalışan task."""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=self.MAX_STACK_FRAMES) if frame else []
+        task_name = None
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                coro = task.get_coro()
+                task_name = f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+        except Exception:
+            pass
+        return {"task": task_name, "stack": [line.rstrip() for line in stack]}
+
+    # ===============================
+    # STATS
+    # ===============================
+
+    def get_stats(self) -> dict:
+        samples = self._stats["samples"]
+        histogram = {f"le_{bucket}ms": count for bucket, count in self._histogram.items()}
+        histogram["gt_5000ms"] = self._histogram_overflow
+        return {
+            "running": self.running,
+            "threshold_ms": self.threshold_ms,
+            "samples": samples,
+            "stalls": self._stats["stalls"],
+            "captures": self._stats["captures"],
+            "max_lag_ms": round(self._stats["max_lag_ms"], 1),
+            "avg_lag_ms": round(self._stats["total_lag_ms"] / samples, 2) if samples else 0.0,
+            "histogram": histogram,
+            "recent_stalls": list(self._stalls),
+        }
+
+
+# Singleton instance
+loop_monitor = LoopStallMonitor(threshold_ms=settings.LOOP_STALL_THRESHOLD_MS)
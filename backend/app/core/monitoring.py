@@ -1,17 +1,22 @@
 """
-Monitoring & Error Tracking Middleware.
-Yapılandırılmış hata loglama + API performans izleme.
-Sentry gibi harici servise gerek kalmadan çalışır.
+Monitoring — Saf ASGI istek metrikleri + Prometheus export.
+
+Eski MonitoringMiddleware BaseHTTPMiddleware'den türüyordu (istek başına ek
+task/kuyruk maliyeti, /chat/stream gibi SSE yanıtlarını bozuyordu) ve
+istatistikleri ham path ile sınırsız bir dict'te tutuyordu — her session
+UUID'si yeni bir anahtar açıyordu. Bu modül:
+1. Saf ASGI: yanıt gövdesine dokunmaz, streaming akışı olduğu gibi geçer
+2. Path yerine eşleşen route şablonu (/sessions/{session_id}) kullanılır;
+   eşleşmeyen istekler tek "<unmatched>" serisinde toplanır
+3. (method, route, status) başına sabit kovalı gecikme histogramı → p50/p95/p99
+4. SSE yanıtlarında ilk byte süresi (TTFB) ve toplam akış süresi ayrı histogramlarda
+5. Seri sayısı MAX_SERIES ile sınırlı — bellek trafikten bağımsız sabit
+6. /metrics: Prometheus text formatı (process başına; her worker kendi sayaçlarını sunar)
 """
-import time
-import traceback
+import bisect
 import logging
-from collections import defaultdict
-from datetime import datetime, timezone
-
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import JSONResponse
+import time
+from typing import Dict, List, Optional, Tuple
 
 # Yapılandırılmış logger
 logger = logging.getLogger("pepper_monitor")
@@ -25,97 +30,216 @@ handler.setFormatter(logging.Formatter(
 ))
 logger.addHandler(handler)
 
+# Saniye cinsinden üst sınırlar (Prometheus "le"); sonuncusundan büyükler +Inf kovasında
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+OVERFLOW_ROUTE = "<other>"
+
+
+class Histogram:
+    """Sabit kovalı histogram (kova başına sayaç, kümülatif değil)."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Kova içinde doğrusal interpolasyonla yaklaşık yüzdelik (saniye)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return BUCKETS[-1]
+
+
+SeriesKey = Tuple[str, str, str]   # (method, route, status)
+
 
-class MonitoringMiddleware(BaseHTTPMiddleware):
+class RequestMetrics:
+    """Route şablonu + status başına histogramlar; seri sayısı sınırlı."""
+
+    MAX_SERIES = 1000
+
+    def __init__(self):
+        self.latency: Dict[SeriesKey, Histogram] = {}
+        self.stream_ttfb: Dict[SeriesKey, Histogram] = {}
+        self.stream_duration: Dict[SeriesKey, Histogram] = {}
+        self.in_flight = 0
+        self.dropped_series = 0
+
+    def _series(self, table: Dict[SeriesKey, Histogram], key: SeriesKey) -> Histogram:
+        histogram = table.get(key)
+        if histogram is None:
+            if len(table) >= self.MAX_SERIES:
+                self.dropped_series += 1
+                key = (key[0], OVERFLOW_ROUTE, key[2])
+                histogram = table.get(key)
+            if histogram is None:
+                histogram = table[key] = Histogram()
+        return histogram
+
+    def observe(self, key: SeriesKey, seconds: float):
+        self._series(self.latency, key).observe(seconds)
+
+    def observe_stream(self, key: SeriesKey, ttfb: float, seconds: float):
+        self._series(self.stream_ttfb, key).observe(ttfb)
+        self._series(self.stream_duration, key).observe(seconds)
+
+    def reset(self):
+        self.__init__()
+
+    # ===============================
+    # EXPORT
+    # ===============================
+
+    def get_stats(self) -> dict:
+        """Admin için özet: seri başına istek sayısı ve p50/p95/p99 (ms)."""
+        def summarize(table):
+            rows = {}
+            for (method, route, status), histogram in table.items():
+                rows[f"{method} {route} {status}"] = {
+                    "requests": histogram.count,
+                    "avg_ms": round(histogram.total / histogram.count * 1000, 1) if histogram.count else 0,
+                    "p50_ms": round(histogram.quantile(0.50) * 1000, 1),
+                    "p95_ms": round(histogram.quantile(0.95) * 1000, 1),
+                    "p99_ms": round(histogram.quantile(0.99) * 1000, 1),
+                }
+            return dict(sorted(rows.items(), key=lambda item: item[1]["p95_ms"], reverse=True))
+
+        return {
+            "in_flight": self.in_flight,
+            "series": len(self.latency) + len(self.stream_ttfb),
+            "dropped_series": self.dropped_series,
+            "requests": summarize(self.latency),
+            "streams_ttfb": summarize(self.stream_ttfb),
+            "streams_total": summarize(self.stream_duration),
+        }
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def _render_histogram(self, lines: List[str], name: str, help_text: str, table: Dict[SeriesKey, Histogram]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, route, status), histogram in sorted(table.items()):
+            labels = f'method="{method}",route="{self._escape(route)}",status="{status}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        self._render_histogram(
+            lines, "http_request_duration_seconds",
+            "HTTP istek süresi (SSE hariç), route şablonu ve status başına.", self.latency,
+        )
+        self._render_histogram(
+            lines, "http_stream_ttfb_seconds",
+            "SSE yanıtlarında ilk gövde byte'ına kadar geçen süre.", self.stream_ttfb,
+        )
+        self._render_histogram(
+            lines, "http_stream_duration_seconds",
+            "SSE yanıtlarının toplam akış süresi.", self.stream_duration,
+        )
+        lines.append("# HELP http_requests_in_flight İşlenmekte olan HTTP istekleri.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        lines.append(f"http_requests_in_flight {self.in_flight}")
+        lines.append("# HELP http_metrics_dropped_series_total Seri limiti nedeniyle <other> altında toplanan gözlemler.")
+        lines.append("# TYPE http_metrics_dropped_series_total counter")
+        lines.append(f"http_metrics_dropped_series_total {self.dropped_series}")
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+request_metrics = RequestMetrics()
+
+
+def _route_template(scope) -> str:
+    """Router'ın scope'a yazdığı eşleşen route'un path şablonu."""
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    return path or UNMATCHED_ROUTE
+
+
+class MonitoringMiddleware:
     """
-    API Monitoring:
-    - İstek süresi ölçme
-    - Hata yakalama ve loglama
-    - Yavaş endpoint uyarıları
-    - Endpoint bazlı istatistikler
+    API Monitoring (saf ASGI):
+    - Route şablonu + status başına gecikme histogramı
+    - SSE için TTFB ve toplam akış süresi
+    - Yavaş endpoint uyarıları ve yakalanmamış hata logu
     """
 
-    def __init__(self, app, slow_threshold_ms: int = 5000):
-        super().__init__(app)
-        self.slow_threshold_ms = slow_threshold_ms
-        # Endpoint istatistikleri (in-memory, restart'ta sıfırlanır)
-        self._stats: dict = defaultdict(lambda: {
-            "count": 0,
-            "errors": 0,
-            "total_ms": 0,
-            "max_ms": 0,
-            "last_error": None,
-        })
-
-    async def dispatch(self, request: Request, call_next):
-        # Static/health endpoint'leri izleme
-        path = request.url.path
-        if path in ("/health", "/", "/docs", "/openapi.json") or path.startswith("/_next"):
-            return await call_next(request)
-
-        start = time.time()
-        method = request.method
+    SKIP_PATHS = ("/health", "/", "/docs", "/openapi.json", "/metrics")
 
+    def __init__(self, app, slow_threshold_ms: int = 5000, metrics: Optional[RequestMetrics] = None):
+        self.app = app
+        self.slow_threshold_ms = slow_threshold_ms
+        self.metrics = metrics or request_metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        if path in self.SKIP_PATHS or path.startswith("/_next"):
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        state = {"status": 500, "streaming": False, "first_byte": None, "raised": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type" and value.startswith(b"text/event-stream"):
+                        state["streaming"] = True
+                        break
+            elif message["type"] == "http.response.body" and state["first_byte"] is None and message.get("body"):
+                state["first_byte"] = time.perf_counter()
+            await send(message)
+
+        self.metrics.in_flight += 1
         try:
-            response = await call_next(request)
-            duration_ms = (time.time() - start) * 1000
-
-            # İstatistik güncelle
-            key = f"{method} {path}"
-            self._stats[key]["count"] += 1
-            self._stats[key]["total_ms"] += duration_ms
-            self._stats[key]["max_ms"] = max(self._stats[key]["max_ms"], duration_ms)
-
-            # Yavaş endpoint uyarısı
-            if duration_ms > self.slow_threshold_ms:
-                logger.warning(
-                    f"🐌 YAVAŞ {method} {path} — {duration_ms:.0f}ms (eşik: {self.slow_threshold_ms}ms)"
-                )
-
-            # 5xx hataları logla
-            if response.status_code >= 500:
-                self._stats[key]["errors"] += 1
-                self._stats[key]["last_error"] = datetime.now(timezone.utc).isoformat()
-                logger.error(
-                    f"❌ {response.status_code} {method} {path} — {duration_ms:.0f}ms"
-                )
-
-            # Response header'a süreyi ekle
-            response.headers["X-Response-Time"] = f"{duration_ms:.0f}ms"
-
-            return response
-
+            await self.app(scope, receive, send_wrapper)
         except Exception as exc:
-            duration_ms = (time.time() - start) * 1000
-            key = f"{method} {path}"
-            self._stats[key]["count"] += 1
-            self._stats[key]["errors"] += 1
-            self._stats[key]["last_error"] = datetime.now(timezone.utc).isoformat()
-
-            # Detaylı hata logu
-            logger.error(
-                f"💥 HATA {method} {path} — {duration_ms:.0f}ms\n"
-                f"   Hata: {type(exc).__name__}: {exc}\n"
-                f"   Traceback:\n{traceback.format_exc()}"
-            )
-
-            return JSONResponse(
-                status_code=500,
-                content={"detail": "Sunucu hatası. Lütfen tekrar deneyin."},
-            )
+            state["raised"] = True
+            logger.error(f"💥 HATA {scope['method']} {_route_template(scope)} — {type(exc).__name__}: {exc}")
+            raise
+        finally:
+            self.metrics.in_flight -= 1
+            elapsed = time.perf_counter() - start
+            key = (scope["method"], _route_template(scope), str(state["status"]))
+            if state["streaming"]:
+                ttfb = (state["first_byte"] or time.perf_counter()) - start
+                self.metrics.observe_stream(key, ttfb, elapsed)
+            else:
+                self.metrics.observe(key, elapsed)
+                if elapsed * 1000 > self.slow_threshold_ms:
+                    logger.warning(
+                        f"🐌 YAVAŞ {key[0]} {key[1]} — {elapsed * 1000:.0f}ms (eşik: {self.slow_threshold_ms}ms)"
+                    )
+            if state["status"] >= 500 and not state["raised"]:
+                logger.error(f"❌ {state['status']} {key[0]} {key[1]} — {elapsed * 1000:.0f}ms")
 
     def get_stats(self) -> dict:
         """Monitoring istatistiklerini döndür (admin endpoint için)."""
-        stats = {}
-        for key, data in self._stats.items():
-            avg_ms = data["total_ms"] / data["count"] if data["count"] else 0
-            stats[key] = {
-                "requests": data["count"],
-                "errors": data["errors"],
-                "avg_ms": round(avg_ms, 1),
-                "max_ms": round(data["max_ms"], 1),
-                "error_rate": f"{(data['errors'] / data['count'] * 100):.1f}%" if data["count"] else "0%",
-                "last_error": data["last_error"],
-            }
-        # En çok hata veren endpoint'leri üste koy
-        return dict(sorted(stats.items(), key=lambda x: x[1]["errors"], reverse=True))
+        return self.metrics.get_stats()
@@ -1,76 +1,313 @@
 """
-Rate Limiting Middleware — In-Memory (Redis opsiyonel).
-IP bazlı istek hız sınırlama.
+Rate Limiting — Redis GCRA (tek Lua script) + yerel kira (lease) ön filtresi.
+
+Eski middleware IP başına sınırsız büyüyen bir defaultdict(list) tutuyor ve her
+istekte listeyi yeniden kuruyordu; replikalar arasında da paylaşılmıyordu.
+Bu modül:
+1. GCRA (Generic Cell Rate Algorithm): anahtar başına TEK sayı (TAT) saklanır,
+   kontrol + güncelleme tek Lua script'inde atomik çalışır, saat Redis TIME'dan gelir
+2. Yerel ön filtre: process Redis'ten birkaç token'ı tek seferde kiralar ve
+   sonraki istekleri yerelde harcar; reddedilen anahtar retry_after dolana kadar
+   Redis'e hiç gitmeden reddedilir. Kira süresi = token'ların yeniden dolma süresi,
+   kullanılmayan kira kotadan fazladan yemez
+3. Anahtarlar kullanıcı (JWT sub) veya IP + endpoint kategorisi (ai/auth/general)
+4. Model bazlı harcama kotası: aynı script, maliyet birimi kadar token ister;
+   üretim başarısız olursa GCRA_REFUND_SCRIPT harcanan birimleri geri verir
+5. Redis yoksa aynı algoritma process içinde çalışır (LRU ile sınırlı)
 """
+import math
 import time
-from collections import defaultdict
-from typing import Dict, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
 from starlette.responses import JSONResponse
 
+from app.core.cache import cache
+from app.core.config import settings
+
+# KEYS[1] = anahtar; ARGV = period_ms, limit, requested, min_grant
+# İstenen token'lardan verilebilen kadarını verir (en az min_grant); dönüş: {grant, remaining, retry_after_ms}
+GCRA_SCRIPT = """
+local period = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local min_grant = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+local tat = tonumber(redis.call('GET', KEYS[1]) or 0)
+if tat < now then tat = now end
+local dvt = period * limit
+local available = math.floor((now + dvt - tat) / period)
+local grant = math.min(requested, available)
+if grant < min_grant then
+  return {0, math.max(available, 0), math.ceil(tat + min_grant * period - dvt - now)}
+end
+local new_tat = tat + grant * period
+redis.call('SET', KEYS[1], string.format('%.0f', new_tat), 'PX', math.ceil(new_tat - now))
+return {grant, available - grant, 0}
+"""
+
+# KEYS[1] = anahtar; ARGV = period_ms, units — TAT'ı units * period geri çeker (now'ın altına inmez)
+GCRA_REFUND_SCRIPT = """
+local period = tonumber(ARGV[1])
+local units = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+local tat = tonumber(redis.call('GET', KEYS[1]) or 0)
+local new_tat = tat - units * period
+if new_tat <= now then
+  redis.call('DEL', KEYS[1])
+  return 0
+end
+redis.call('SET', KEYS[1], string.format('%.0f', new_tat), 'PX', math.ceil(new_tat - now))
+return 1
+"""
+
+
+def gcra_take(
+    tat: float, now: float, period: float, limit: int, requested: int, min_grant: int,
+) -> Tuple[int, int, float, float]:
+    """GCRA_SCRIPT'in Python karşılığı → (grant, remaining, retry_after_ms, new_tat)."""
+    tat = max(tat, now)
+    dvt = period * limit
+    available = math.floor((now + dvt - tat) / period)
+    grant = min(requested, available)
+    if grant < min_grant:
+        return 0, max(available, 0), math.ceil(tat + min_grant * period - dvt - now), tat
+    return grant, available - grant, 0.0, tat + grant * period
+
+
+def gcra_refund(tat: float, now: float, period: float, units: int) -> float:
+    """GCRA_REFUND_SCRIPT'in Python karşılığı → yeni TAT (≤ now: anahtar boş)."""
+    return max(tat - units * period, now)
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float = 0.0   # saniye
+
+
+@dataclass
+class _Lease:
+    tokens: int = 0
+    expires_at: float = 0.0
+    remaining: int = 0          # Kira alındığında Redis'te kalan
+    blocked_until: float = 0.0
+
+
+class RateLimiter:
+    """Dağıtık GCRA limiter + yerel kira ön filtresi."""
+
+    KEY_PREFIX = "rl:"
+    LEASE_DIVISOR = 10      # Kira boyutu = limit / 10 (60/dk → 6 token, ~6 istekte bir Redis turu)
+    LEASE_MAX = 20
+    MAX_LOCAL_KEYS = 10000  # Yerel kira/fallback tablosu (LRU)
+
+    def __init__(self):
+        self._leases: "OrderedDict[str, _Lease]" = OrderedDict()
+        self._local_tat: "OrderedDict[str, float]" = OrderedDict()
+        self._scripts: Dict[Tuple[int, str], object] = {}
+        self._stats = {"checks": 0, "redis_calls": 0, "local_hits": 0, "local_blocks": 0, "denied": 0}
+
+    # ===============================
+    # ÇEKİRDEK
+    # ===============================
+
+    async def _take(self, key: str, limit: int, window: float, requested: int, min_grant: int) -> Tuple[int, int, float]:
+        """Redis'te (yoksa process içinde) GCRA ile token al → (grant, remaining, retry_after_ms)."""
+        period = window * 1000.0 / limit
+        client = cache.client
+        if client is not None:
+            try:
+                script = self._scripts.get((id(client), "take"))
+                if script is None:
+                    script = client.register_script(GCRA_SCRIPT)  # EVALSHA, NOSCRIPT'te EVAL
+                    self._scripts[(id(client), "take")] = script
+                self._stats["redis_calls"] += 1
+                grant, remaining, retry_after = await script(
+                    keys=[f"{self.KEY_PREFIX}{key}"], args=[period, limit, requested, min_grant],
+                )
+                return int(grant), int(remaining), float(retry_after)
+            except Exception as e:
+                # Limiter arızası istekleri düşürmesin — yerel moda geç
+                print(f"⚠️ Rate limit Redis hatası, yerel moda geçiliyor: {e}")
+
+        now = time.time() * 1000.0
+        tat = self._local_tat.pop(key, 0.0)
+        grant, remaining, retry_after, new_tat = gcra_take(tat, now, period, limit, requested, min_grant)
+        self._local_tat[key] = new_tat
+        while len(self._local_tat) > self.MAX_LOCAL_KEYS:
+            self._local_tat.popitem(last=False)
+        return grant, remaining, retry_after
+
+    async def _give_back(self, key: str, limit: int, window: float, units: int):
+        """_take ile alınan `units` token'ı iade et (Redis yoksa yerel TAT'tan)."""
+        period = window * 1000.0 / limit
+        client = cache.client
+        if client is not None:
+            try:
+                script = self._scripts.get((id(client), "refund"))
+                if script is None:
+                    script = client.register_script(GCRA_REFUND_SCRIPT)
+                    self._scripts[(id(client), "refund")] = script
+                self._stats["redis_calls"] += 1
+                await script(keys=[f"{self.KEY_PREFIX}{key}"], args=[period, units])
+                return
+            except Exception as e:
+                print(f"⚠️ Rate limit Redis hatası, iade yerelde yapılıyor: {e}")
+
+        if key in self._local_tat:
+            self._local_tat[key] = gcra_refund(self._local_tat[key], time.time() * 1000.0, period, units)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+    def _lease_size(self, limit: int) -> int:
+        return max(1, min(self.LEASE_MAX, limit // self.LEASE_DIVISOR))
+
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        """Bir istek harca. Çoğu istek yerel kiradan karşılanır (Redis turu yok)."""
+        self._stats["checks"] += 1
+        now = time.monotonic()
+        lease = self._leases.pop(key, None) or _Lease()
+        self._leases[key] = lease
+        while len(self._leases) > self.MAX_LOCAL_KEYS:
+            self._leases.popitem(last=False)
+
+        if lease.blocked_until > now:
+            self._stats["local_blocks"] += 1
+            self._stats["denied"] += 1
+            return RateLimitResult(False, limit, 0, lease.blocked_until - now)
+
+        if lease.tokens > 0 and lease.expires_at > now:
+            lease.tokens -= 1
+            self._stats["local_hits"] += 1
+            return RateLimitResult(True, limit, lease.remaining + lease.tokens)
+
+        size = self._lease_size(limit)
+        grant, remaining, retry_after_ms = await self._take(key, limit, window, size, 1)
+        if not grant:
+            lease.tokens = 0
+            lease.blocked_until = now + retry_after_ms / 1000.0
+            self._stats["denied"] += 1
+            return RateLimitResult(False, limit, 0, retry_after_ms / 1000.0)
+
+        lease.tokens = grant - 1
+        lease.remaining = remaining
+        # Kiralanan token'lar bu sürede zaten yeniden dolardı — bayat kira kotayı yemez
+        lease.expires_at = now + grant * window / limit
+        return RateLimitResult(True, limit, remaining + lease.tokens)
+
+    # ===============================
+    # MODEL HARCAMA KOTASI
+    # ===============================
+
+    async def consume_quota(self, user_id: str, model: str, units: int = 1) -> RateLimitResult:
+        """Model bazlı günlük harcama kotasından `units` düş. Kota tanımlı değilse hep izin."""
+        budget = settings.MODEL_SPEND_QUOTAS.get(model)
+        if not budget:
+            return RateLimitResult(True, 0, 0)
+        units = max(1, min(int(units), budget))
+        grant, remaining, retry_after_ms = await self._take(
+            f"quota:{model}:{user_id}", budget, settings.MODEL_SPEND_QUOTA_WINDOW, units, units,
+        )
+        if not grant:
+            self._stats["denied"] += 1
+        return RateLimitResult(bool(grant), budget, remaining, retry_after_ms / 1000.0)
+
+    async def refund_quota(self, user_id: str, model: str, units: int = 1):
+        """consume_quota ile düşülen birimleri geri ver (başarısız üretim faturalanmasın)."""
+        budget = settings.MODEL_SPEND_QUOTAS.get(model)
+        if not budget:
+            return
+        units = max(1, min(int(units), budget))
+        await self._give_back(f"quota:{model}:{user_id}", budget, settings.MODEL_SPEND_QUOTA_WINDOW, units)
+
+    def get_stats(self) -> dict:
+        checks = self._stats["checks"] or 1
+        return {
+            **self._stats,
+            "local_ratio": round((self._stats["local_hits"] + self._stats["local_blocks"]) / checks, 3),
+            "tracked_keys": len(self._leases),
+        }
+
+
+# Singleton instance
+rate_limiter = RateLimiter()
+
+
+@lru_cache(maxsize=4096)
+def _token_subject(token: str) -> Optional[str]:
+    """JWT'den kullanıcı id'si (yalnızca kova seçimi için — yetkilendirme değil)."""
+    from app.core.auth import decode_token
+    payload = decode_token(token)
+    return str(payload.get("sub")) if payload and payload.get("sub") else None
+
+
+class RateLimitMiddleware:
     """
-    Basit sliding-window rate limiter.
+    Saf ASGI rate limit middleware'i (BaseHTTPMiddleware yok — streaming'e dokunmaz).
     - Genel API: 60 istek / dakika
-    - AI üretim endpoint'leri: 10 istek / dakika
+    - AI üretim endpoint'leri (POST): 10 istek / dakika
     - Auth endpoint'leri: 20 istek / dakika
     """
 
-    def __init__(self, app, general_limit: int = 60, ai_limit: int = 10, auth_limit: int = 20, window: int = 60):
-        super().__init__(app)
+    SKIP_PATHS = ("/health", "/", "/docs", "/openapi.json", "/metrics")
+
+    def __init__(self, app, general_limit: int = 60, ai_limit: int = 10, auth_limit: int = 20, window: int = 60,
+                 limiter: Optional[RateLimiter] = None):
+        self.app = app
         self.general_limit = general_limit
         self.ai_limit = ai_limit
         self.auth_limit = auth_limit
         self.window = window  # saniye
-        # IP → [(timestamp, count)] şeklinde takip
-        self._requests: Dict[str, list] = defaultdict(list)
+        self.limiter = limiter or rate_limiter
 
-    def _get_client_ip(self, request: Request) -> str:
-        """İstemci IP adresini al (proxy arkasında da çalışır)."""
-        forwarded = request.headers.get("x-forwarded-for")
+    @staticmethod
+    def _header(scope, name: bytes) -> Optional[str]:
+        for key, value in scope.get("headers") or ():
+            if key == name:
+                return value.decode("latin-1")
+        return None
+
+    def _identity(self, scope) -> str:
+        """Giriş yapmış kullanıcı → u:{id}, değilse ip:{adres} (proxy arkasında da)."""
+        auth = self._header(scope, b"authorization")
+        if auth and auth[:7].lower() == "bearer ":
+            subject = _token_subject(auth[7:].strip())
+            if subject:
+                return f"u:{subject}"
+        forwarded = self._header(scope, b"x-forwarded-for")
         if forwarded:
-            return forwarded.split(",")[0].strip()
-        return request.client.host if request.client else "unknown"
+            return f"ip:{forwarded.split(',')[0].strip()}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
 
-    def _get_limit_for_path(self, path: str) -> Tuple[int, str]:
-        """Endpoint'e göre limit belirle."""
-        if "/chat/" in path or "/generate" in path:
+    def _get_limit_for_path(self, method: str, path: str) -> Tuple[int, str]:
+        """Endpoint'e göre limit belirle (AI: yalnızca üretim yapan POST'lar)."""
+        if method == "POST" and ("/chat/" in path or "/generate" in path):
             return self.ai_limit, "ai"
         elif "/auth/" in path:
             return self.auth_limit, "auth"
         return self.general_limit, "general"
 
-    def _clean_old_requests(self, ip: str, now: float):
-        """Zaman penceresi dışına çıkmış istekleri temizle."""
-        cutoff = now - self.window
-        self._requests[ip] = [t for t in self._requests[ip] if t > cutoff]
-
-    async def dispatch(self, request: Request, call_next):
-        # Health check ve static dosyalar limitlenmez
-        path = request.url.path
-        if path in ("/health", "/", "/docs", "/openapi.json") or path.startswith("/_next"):
-            return await call_next(request)
-
-        # WebSocket ve SSE streaming limitlenmez (uzun bağlantılar)
-        if path.startswith("/ws/") or path.endswith("/stream"):
-            return await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
-        ip = self._get_client_ip(request)
-        now = time.time()
-        limit, category = self._get_limit_for_path(path)
+        # Health check, static dosyalar ve SSE streaming limitlenmez
+        path = scope["path"]
+        if path in self.SKIP_PATHS or path.startswith("/_next") or path.endswith("/stream"):
+            return await self.app(scope, receive, send)
 
-        # Kategori bazlı key
-        key = f"{ip}:{category}"
-        self._clean_old_requests(key, now)
+        limit, category = self._get_limit_for_path(scope["method"], path)
+        result = await self.limiter.hit(f"{category}:{self._identity(scope)}", limit, self.window)
 
-        current_count = len(self._requests[key])
-
-        if current_count >= limit:
-            retry_after = int(self.window - (now - self._requests[key][0])) + 1
-            return JSONResponse(
+        if not result.allowed:
+            retry_after = int(math.ceil(result.retry_after)) or 1
+            response = JSONResponse(
                 status_code=429,
                 content={
                     "detail": f"Çok fazla istek. Lütfen {retry_after} saniye sonra tekrar deneyin.",
@@ -78,14 +315,16 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 },
                 headers={"Retry-After": str(retry_after)},
             )
+            return await response(scope, receive, send)
 
-        self._requests[key].append(now)
-
-        response = await call_next(request)
+        rate_headers = [
+            (b"x-ratelimit-limit", str(limit).encode()),
+            (b"x-ratelimit-remaining", str(result.remaining).encode()),
+        ]
 
-        # Rate limit bilgisini header'lara ekle
-        response.headers["X-RateLimit-Limit"] = str(limit)
-        response.headers["X-RateLimit-Remaining"] = str(max(0, limit - current_count - 1))
-        response.headers["X-RateLimit-Reset"] = str(int(now + self.window))
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), *rate_headers]}
+            await send(message)
 
-        return response
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,62 @@
+"""
+Single Flight - Anahtar başına tek eşzamanlı hesaplama.
+
+Aynı anahtar için aynı anda gelen çağrılar tek compute() sonucunu paylaşır.
+- compute() hata fırlatırsa bekleyenlere aynı hata geçer
+- Sahibi olan çağrı iptal edilirse (ör. istemci bağlantıyı kopardı) bekleyenler
+  bu iptali miras almaz: sonucu kendileri yeniden hesaplar (biri yeni sahip olur)
+- Bekleyenin kendi iptali yalnızca onu etkiler (shield)
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+class _OwnerCancelled(Exception):
+    """Sahip çağrı iptal edildi — bekleyenler için "cache miss" işareti."""
+
+
+class SingleFlight:
+    """Anahtar → devam eden hesaplamanın future'ı."""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        on_shared: Optional[Callable[[], None]] = None,
+    ) -> Any:
+        """Devam eden hesaplama varsa onun sonucunu bekle, yoksa compute()'u çalıştır."""
+        while True:
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            if on_shared:
+                on_shared()
+            try:
+                return await asyncio.shield(pending)
+            except _OwnerCancelled:
+                continue  # Sahip iptal edildi → yeniden dene
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.set_exception(_OwnerCancelled())
+            future.exception()  # Bekleyen yoksa "exception never retrieved" uyarısı basılmasın
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                self._inflight.pop(key)
@@ -19,6 +19,9 @@ async def lifespan(app: FastAPI):
     # Pluginleri yükle
     initialize_plugins()
     
+    # Admin günlük özetleri: commit'lerdeki rollup deltası hook'ları (worker'da tasks/runtime.py)
+    import app.services.daily_rollups  # noqa: F401
+    
     # Redis bağlantısı (REDIS_URL varsa otomatik aktif)
     if settings.redis_enabled:
         redis_connected = await cache.connect()
@@ -29,6 +32,12 @@ async def lifespan(app: FastAPI):
     else:
         print("   ℹ️ Redis cache devre dışı (USE_REDIS=false)")
     
+    # İlerleme bildirimleri için worker'lar arası pub/sub fan-out
+    if cache.is_connected:
+        from app.services.progress_service import progress_service
+        await progress_service.start()
+        print("   📡 Progress pub/sub aktif")
+    
     # Warm-up: API key kontrolü
     api_status = []
     if settings.ANTHROPIC_API_KEY:
@@ -75,6 +84,30 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"   ⚠️ Çöp temizleme hatası: {e}")
     
+    # Restart öncesi yarım kalan uzun video işlerini devam ettir
+    try:
+        from app.services.agent.orchestrator import agent
+        resumed = await agent.resume_long_video_jobs()
+        if resumed:
+            print(f"   ♻️ {resumed} yarım kalan uzun video işi devam ettiriliyor")
+    except Exception as e:
+        print(f"   ⚠️ Uzun video resume hatası: {e}")
+    
+    # Önceki process ölürken yarım kalan stream mesajlarını finalize et
+    try:
+        from app.services.stream_persister import stream_persister
+        recovered = await stream_persister.recover_interrupted()
+        if recovered:
+            print(f"   ♻️ {recovered} yarım kalan stream mesajı finalize edildi")
+    except Exception as e:
+        print(f"   ⚠️ Stream mesaj kurtarma hatası: {e}")
+    
+    # Event loop stall monitor (opt-in)
+    if settings.LOOP_MONITOR_ENABLED:
+        from app.core.loop_monitor import loop_monitor
+        loop_monitor.start()
+        print(f"   🩺 Event loop monitor aktif (eşik: {settings.LOOP_STALL_THRESHOLD_MS}ms)")
+    
     print(f"✅ {settings.APP_NAME} hazır!")
     
     # ⚠️ SECRET_KEY güvenlik uyarısı
@@ -111,6 +144,72 @@ async def lifespan(app: FastAPI):
          print(f"   ⚠️ Kapanış sırasında arka plan görev hatası (gözardı ediliyor): {e}")
     # ==========================================
 
+    # Tamponda kalan stream mesajlarını, kullanım sayaçlarını ve günlük özetleri yaz
+    try:
+        from app.services.stream_persister import stream_persister
+        await stream_persister.shutdown()
+    except Exception as e:
+        print(f"   ⚠️ Stream persister kapatma hatası: {e}")
+    try:
+        from app.services.usage_counters import usage_counters
+        await usage_counters.shutdown()
+    except Exception as e:
+        print(f"   ⚠️ Kullanım sayaçları kapatma hatası: {e}")
+    try:
+        from app.services.daily_rollups import daily_rollups
+        await daily_rollups.shutdown()
+    except Exception as e:
+        print(f"   ⚠️ Günlük özet kapatma hatası: {e}")
+
+    # Event loop monitor'ü durdur
+    if settings.LOOP_MONITOR_ENABLED:
+        from app.core.loop_monitor import loop_monitor
+        await loop_monitor.stop()
+
+    # fal.ai job poller'ını durdur
+    try:
+        from app.services.plugins.fal_job_engine import fal_job_engine
+        await fal_job_engine.shutdown()
+    except Exception as e:
+        print(f"   ⚠️ fal job engine kapatma hatası: {e}")
+
+    # Veo operasyon poller'ını ve SDK thread havuzunu durdur
+    try:
+        from app.services.veo_operation_tracker import veo_operation_tracker
+        await veo_operation_tracker.shutdown()
+    except Exception as e:
+        print(f"   ⚠️ Veo tracker kapatma hatası: {e}")
+
+    # Paylaşılan OpenAI HTTP havuzunu kapat
+    try:
+        from app.services.llm.llm_gateway import llm_gateway
+        await llm_gateway.close()
+    except Exception as e:
+        print(f"   ⚠️ LLM gateway kapatma hatası: {e}")
+
+    # Bekleyen referans ısıtma işlerini iptal et (medya havuzu kapanmadan önce)
+    try:
+        from app.services.derived_asset_cache import derived_asset_cache
+        await derived_asset_cache.shutdown()
+    except Exception as e:
+        print(f"   ⚠️ Derived asset cache kapatma hatası: {e}")
+
+    # Paylaşılan medya HTTP havuzunu kapat
+    try:
+        from app.services.media_io import media_io
+        await media_io.close()
+        from app.services.media_cache import media_cache
+        media_cache.clear()
+    except Exception as e:
+        print(f"   ⚠️ Media I/O kapatma hatası: {e}")
+
+    # Progress pub/sub dinleyicisini durdur
+    try:
+        from app.services.progress_service import progress_service
+        await progress_service.stop()
+    except Exception as e:
+        print(f"   ⚠️ Progress pub/sub kapatma hatası: {e}")
+
     # Cleanup
     if cache.is_connected:
         await cache.disconnect()
@@ -124,6 +223,17 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Rate Limiting — Redis GCRA + yerel kira (saf ASGI, çoğu istekte Redis turu yok).
+# CORS'tan önce eklenir: CORS en dışta kalır, 429 yanıtları da CORS header'ı taşır.
+if settings.RATE_LIMIT_ENABLED:
+    from app.core.rate_limit import RateLimitMiddleware
+    app.add_middleware(
+        RateLimitMiddleware,
+        general_limit=settings.RATE_LIMIT_GENERAL,
+        ai_limit=settings.RATE_LIMIT_AI,
+        auth_limit=settings.RATE_LIMIT_AUTH,
+    )
+
 # CORS — origins from env
 allowed_origins = [o.strip() for o in settings.ALLOWED_ORIGINS.split(",") if o.strip()]
 app.add_middleware(
@@ -132,15 +242,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Before", "X-Next-After"],  # Mesaj geçmişi cursor'ları
 )
 
-# Rate Limiting — DEVRE DIŞI (production sorunlarına neden oldu)
-# from app.core.rate_limit import RateLimitMiddleware
-# app.add_middleware(RateLimitMiddleware, general_limit=60, ai_limit=10, auth_limit=20)
-
-# Monitoring — DEVRE DIŞI (production sorunlarına neden oldu)
-# from app.core.monitoring import MonitoringMiddleware
-# app.add_middleware(MonitoringMiddleware, slow_threshold_ms=5000)
+# Monitoring — saf ASGI histogramlar (en dışta: 429'lar ve CORS yanıtları da ölçülür)
+if settings.METRICS_ENABLED:
+    from app.core.monitoring import MonitoringMiddleware
+    app.add_middleware(MonitoringMiddleware, slow_threshold_ms=settings.SLOW_REQUEST_THRESHOLD_MS)
 
 # API Route'ları
 app.include_router(auth.router, prefix=settings.API_PREFIX)  # Auth first
@@ -166,6 +274,14 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text formatında istek metrikleri (bu process)."""
+    from fastapi.responses import PlainTextResponse
+    from app.core.monitoring import request_metrics
+    return PlainTextResponse(request_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     return {
@@ -2,10 +2,10 @@
 Veritabanı modelleri.
 """
 import uuid
-from datetime import datetime
+from datetime import date as dt_date, datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, ForeignKey, Index, Integer, String, Text, false, func, text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -75,9 +75,18 @@ class Message(Base):
     role: Mapped[str] = mapped_column(String(50))
     content: Mapped[str] = mapped_column(Text)
     metadata_: Mapped[Optional[dict]] = mapped_column("metadata", JSONB, default=dict)
+    # Hata/kredi yanıtı mı? Yazarken hesaplanır (message_history), agent bağlamı SQL'de filtreler
+    is_error: Mapped[bool] = mapped_column(Boolean, default=False, server_default=false())
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
     session: Mapped["Session"] = relationship(back_populates="messages")
+    
+    __table_args__ = (
+        # 📈 Keyset sayfalama: (session_id, created_at, id) — hem ASC hem DESC taramada kullanılır
+        Index("ix_messages_session_created_id", "session_id", "created_at", "id"),
+        # 📈 Günlük rollup yenilemesi son N günü tarar
+        Index("ix_messages_created_at", "created_at"),
+    )
 
 
 # ============== VARLIK (ENTITY) ==============
@@ -125,8 +134,10 @@ class GeneratedAsset(Base):
     thumbnail_url: Mapped[Optional[str]] = mapped_column(String(1024), nullable=True)
     prompt: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     model_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # Yazarken model_names.canonical_model_name ile doldurulur (admin dağılımı için)
+    model_canonical: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     model_params: Mapped[Optional[dict]] = mapped_column(JSONB, default=dict)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)  # 📈 INDEX (rollup yenileme)
     
     # Akıllı Agent özellikleri
     is_favorite: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -183,6 +194,8 @@ class Task(Base):
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    owner: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)  # İşi yürüten process (lease sahibi)
+    lease_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
     session: Mapped["Session"] = relationship(back_populates="tasks")
@@ -294,9 +307,35 @@ class UsageStats(Base):
     videos_generated: Mapped[int] = mapped_column(Integer, default=0)
     tokens_used: Mapped[int] = mapped_column(Integer, default=0)
     model_name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    # Sayaç satırının günü (UTC) — (kullanıcı, gün, model) başına tek satır
+    day: Mapped[dt_date] = mapped_column(Date, server_default=text("(timezone('UTC', now()))::date"))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+# NULL user/model da tekil olsun diye coalesce'li ifade indeksi;
+# usage_counters INSERT ... ON CONFLICT hedefi olarak aynı ifadeleri kullanır
+usage_stats_day_key = Index(
+    "uq_usage_stats_user_day_model",
+    func.coalesce(UsageStats.user_id, text("'00000000-0000-0000-0000-000000000000'::uuid")),
+    UsageStats.day,
+    func.coalesce(UsageStats.model_name, text("''")),
+    unique=True,
+)
+
+
+# ============== GÜNLÜK ÖZETLER (ADMIN) ==============
+
+class DailyRollup(Base):
+    """Gün bazlı admin özet sayaçları — (gün, metrik, anahtar) başına tek satır."""
+    __tablename__ = "daily_rollups"
+    
+    day: Mapped[dt_date] = mapped_column(Date, primary_key=True)
+    metric: Mapped[str] = mapped_column(String(32), primary_key=True)    # users, sessions, messages, assets, models, usage
+    key: Mapped[str] = mapped_column(String(100), primary_key=True, default="", server_default="")  # asset tipi, kanonik model id...
+    value: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 # ============== PRESETLER (Kullanıcı Tanımlı) ==============
 
 class Preset(Base):
@@ -0,0 +1,170 @@
+"""
+Context Pipeline - Agent bağlamının paralel montajı.
+
+_build_enriched_context'teki bağımsız lookup'lar (kullanıcı, proje, asset,
+tercihler, hafıza, entity/preset/model listeleri) sırayla değil eşzamanlı
+alt görevler olarak çalışır. Her bölüm kendi DB oturumunu açar ve süresi ölçülür.
+
+Yavaş değişen bölümler (AI model listesi, preset'ler, entity listesi)
+ContextCache ile process içi + Redis'te tutulur; yazma anında invalidate edilir.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.cache import cache
+from app.core.database import async_session_maker
+
+# Tek bir chat turunun aynı anda açabileceği DB oturumu sayısı (pool'u korur).
+# Semaphore her assemble_sections çağrısında yeniden oluşturulur: eşzamanlı turlar
+# birbirini beklemez, yalnızca kendi bölümlerini sınırlar.
+CONTEXT_DB_CONCURRENCY = 4
+_turn_db_slots: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("context_db_slots", default=None)
+
+
+@asynccontextmanager
+async def context_db_session():
+    """Context bölümü için ayrı DB oturumu (tur içinde CONTEXT_DB_CONCURRENCY ile sınırlı)."""
+    slots = _turn_db_slots.get()
+    if slots is None:
+        async with async_session_maker() as db:
+            yield db
+        return
+    async with slots:
+        async with async_session_maker() as db:
+            yield db
+
+
+@dataclass
+class ContextAssembly:
+    """Paralel montaj sonucu: bölüm metinleri + bölüm bazlı süreler."""
+    order: list[str] = field(default_factory=list)
+    sections: dict[str, str] = field(default_factory=dict)
+    timings_ms: dict[str, float] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+    total_ms: float = 0.0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.sections.get(name) or "" for name in self.order)
+
+    def timing_summary(self) -> str:
+        slowest = sorted(self.timings_ms.items(), key=lambda x: x[1], reverse=True)[:3]
+        parts = ", ".join(f"{name}={ms:.0f}ms" for name, ms in slowest)
+        return f"{self.total_ms:.0f}ms toplam (en yavaş: {parts})"
+
+
+async def assemble_sections(
+    sections: list[tuple[str, Callable[[], Awaitable[Optional[str]]]]],
+) -> ContextAssembly:
+    """
+    Bölümleri eşzamanlı çalıştır, sırayı koruyarak birleştir.
+    Bir bölümün hatası diğerlerini etkilemez (bölüm boş kalır).
+    """
+    assembly = ContextAssembly(order=[name for name, _ in sections])
+    started = time.perf_counter()
+
+    async def _timed(name: str, factory: Callable[[], Awaitable[Optional[str]]]):
+        section_start = time.perf_counter()
+        try:
+            assembly.sections[name] = await factory() or ""
+        except Exception as e:
+            assembly.sections[name] = ""
+            assembly.errors[name] = str(e)
+            print(f"⚠️ Context bölümü '{name}' hatası: {e}")
+        finally:
+            assembly.timings_ms[name] = round((time.perf_counter() - section_start) * 1000, 1)
+
+    # gather'ın açtığı görevler context'i kopyalar → bu turun semaphore'unu görür
+    token = _turn_db_slots.set(asyncio.Semaphore(CONTEXT_DB_CONCURRENCY))
+    try:
+        await asyncio.gather(*(_timed(name, factory) for name, factory in sections))
+    finally:
+        _turn_db_slots.reset(token)
+    assembly.total_ms = round((time.perf_counter() - started) * 1000, 1)
+    return assembly
+
+
+class ContextCache:
+    """
+    Yavaş değişen context verileri için iki katmanlı cache.
+
+    - Process içi: kısa TTL (diğer worker'lardaki invalidation'ı yakalamak için)
+    - Redis: uzun TTL, yazma anında silinir
+    Değerler JSON-serializable olmalı (ORM nesnesi değil, düz dict/list).
+    """
+
+    LOCAL_TTL = 30.0
+    REDIS_TTL = 600
+    MAX_LOCAL_ENTRIES = 2048
+    AI_MODELS_KEY = "ctx:ai_models"
+
+    def __init__(self):
+        self._local: dict[str, tuple[float, Any]] = {}
+        self._stats = {"hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def entities_key(user_id) -> str:
+        return f"ctx:entities:{user_id}"
+
+    @staticmethod
+    def entity_names_key(user_id) -> str:
+        return f"ctx:entity_names:{user_id}"
+
+    @staticmethod
+    def presets_key(session_id) -> str:
+        return f"ctx:presets:{session_id}"
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int = None) -> Any:
+        now = time.monotonic()
+        local = self._local.get(key)
+        if local and local[0] > now:
+            self._stats["hits"] += 1
+            return local[1]
+
+        if cache.is_connected:
+            cached = await cache.get_json(key)
+            if cached is not None:
+                self._stats["redis_hits"] += 1
+                self._store_local(key, cached, now)
+                return cached
+
+        self._stats["misses"] += 1
+        value = await loader()
+        self._store_local(key, value, now)
+        if cache.is_connected:
+            await cache.set_json(key, value, ttl=ttl or self.REDIS_TTL)
+        return value
+
+    def _store_local(self, key: str, value: Any, now: float):
+        if len(self._local) >= self.MAX_LOCAL_ENTRIES:
+            expired = [k for k, (expires, _) in self._local.items() if expires <= now]
+            for k in expired or list(self._local)[: self.MAX_LOCAL_ENTRIES // 4]:
+                self._local.pop(k, None)
+        self._local[key] = (now + self.LOCAL_TTL, value)
+
+    async def invalidate(self, *keys: str):
+        for key in keys:
+            self._local.pop(key, None)
+            self._stats["invalidations"] += 1
+            if cache.is_connected:
+                await cache.delete(key)
+
+    async def invalidate_entities(self, user_id):
+        await self.invalidate(self.entities_key(user_id), self.entity_names_key(user_id))
+
+    async def invalidate_presets(self, session_id):
+        await self.invalidate(self.presets_key(session_id))
+
+    async def invalidate_ai_models(self):
+        await self.invalidate(self.AI_MODELS_KEY)
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "local_entries": len(self._local)}
+
+
+# Singleton instance
+context_cache = ContextCache()
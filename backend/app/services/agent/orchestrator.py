@@ -2,16 +2,21 @@
 Agent Orchestrator - Agent'ın beyni.
 Kullanıcı mesajını alır, LLM'e gönderir, araç çağrılarını yönetir.
 """
+import asyncio
 import json
 import re
 import uuid
 from typing import Optional
-from openai import OpenAI, AsyncOpenAI
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.services.agent.tools import AGENT_TOOLS
+from app.services.agent.context_pipeline import ContextAssembly, assemble_sections, context_cache, context_db_session
+from app.services.llm.llm_gateway import llm_gateway
+from app.services.prompt_cache import prompt_cache
+from app.services.media_cache import media_cache
+from app.services.media_io import media_io
 from app.services.plugins.fal_plugin_v2 import FalPluginV2
 from app.services.google_video_service import GoogleVideoService
 from app.services.entity_service import entity_service
@@ -24,6 +29,8 @@ from app.services.episodic_memory_service import episodic_memory
 from app.services.memory_hygiene import is_stable_memory_fact
 from app.services.user_error_formatter import format_user_error_message
 from app.models.models import Session as SessionModel, Preset
+# Arka plan görevlerinin (worker dahil) yazdığı mesajlarda is_error listener'ı kayıtlı olsun
+import app.services.message_history  # noqa: F401
 
 # Global referans tutucu (FastAPI arka plan görevlerinin Garbage Collector tarafından silinmesini önler)
 _GLOBAL_BG_TASKS = set()
@@ -43,8 +50,6 @@ class AgentOrchestrator:
     """Agent'ı yöneten ana sınıf."""
     
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.fal_plugin = FalPluginV2()
         self.google_video = GoogleVideoService()
         self.model = "gpt-4o"
@@ -233,6 +238,11 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
 - generate_image çağrıyorsan "Görsel oluşturuluyor" de, generate_video çağrıyorsan "Video oluşturuluyor" de. İKİSİNİ KARIŞTIRMA!
 """
 
+    @property
+    def client(self):
+        """Tek, havuzlu AsyncOpenAI client — her çağrıda gateway'den okunur (kapatılıp yeniden kurulsa da bayat kalmaz)."""
+        return llm_gateway.client
+
     def _is_direct_image_to_video_request(self, user_message: str) -> bool:
         """Basit referanslı i2v dönüşüm isteklerini tespit et."""
         lower_msg = (user_message or "").lower()
@@ -246,6 +256,24 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
             and not any(keyword in lower_msg for keyword in question_keywords)
         )
 
+    async def _start_media_job(self, kind: str, payload: dict):
+        """Ağır medya işini başlat: MEDIA_JOB_BACKEND=celery ise video kuyruğuna, değilse bu process'te."""
+        if settings.MEDIA_JOB_BACKEND == "celery":
+            from app.services.media_job_queue import media_job_queue
+            if await media_job_queue.enqueue(kind, payload) is not None:
+                return
+            # Broker'a ulaşılamadı — kullanıcıyı bekletme, işi burada çalıştır
+        self._run_media_job_inline(kind, payload)
+
+    def _run_media_job_inline(self, kind: str, payload: dict):
+        from app.services.media_job_queue import MEDIA_JOBS
+        runner = getattr(self, MEDIA_JOBS[kind][1])
+        task = asyncio.create_task(runner(**payload))
+        # Prevent Python Garbage Collector from silently destroying the task
+        _GLOBAL_BG_TASKS.add(task)
+        task.add_done_callback(_GLOBAL_BG_TASKS.discard)
+        self._register_bg_task(payload["session_id"], task)
+
     def _register_bg_task(self, session_id: str, task: asyncio.Task):
         """Arka plan görevini session bazlı kaydet (iptal mekanizması için)."""
         # Önceki task varsa ve hâlâ çalışıyorsa, yenisiyle değiştir
@@ -268,12 +296,16 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
             True = görev iptal edildi, False = iptal edilecek görev yok
         """
         task = self._active_bg_tasks.get(session_id)
-        if not task or task.done():
-            print(f"⚠️ İptal edilecek aktif görev yok: {session_id[:8]}")
-            return False
-        
-        print(f"🛑 Session {session_id[:8]} arka plan görevi iptal ediliyor...")
-        task.cancel()
+        if task and not task.done():
+            print(f"🛑 Session {session_id[:8]} arka plan görevi iptal ediliyor...")
+            task.cancel()
+        else:
+            # Celery worker'da çalışan iş olabilir
+            from app.services.media_job_queue import media_job_queue
+            if not await media_job_queue.request_cancel(session_id):
+                print(f"⚠️ İptal edilecek aktif görev yok: {session_id[:8]}")
+                return False
+            print(f"🛑 Session {session_id[:8]} worker görevi için iptal istendi...")
         
         # WebSocket ile kullanıcıya bildir
         try:
@@ -856,7 +888,7 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
             ]
         
         # GPT-4o'ya gönder
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model=self.model,
             max_tokens=4096,
             messages=[{"role": "system", "content": full_system_prompt}] + messages,
@@ -1159,7 +1191,7 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
         if resolved:
             print(f"🎭 Entity çözümlendi: {[getattr(e, 'tag', '?') for e in resolved]}")
         
-        stream = await self.async_client.chat.completions.create(
+        stream = await self.client.chat.completions.create(
             model=self.model,
             max_tokens=4096,
             messages=[{"role": "system", "content": full_system_prompt}] + messages,
@@ -1286,7 +1318,7 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
                     if streamed_text:
                         yield f"event: token\ndata: {json.dumps(streamed_text, ensure_ascii=False)}\n\n"
                 else:
-                    final_stream = await self.async_client.chat.completions.create(
+                    final_stream = await self.client.chat.completions.create(
                         model=self.model,
                         max_tokens=4096,
                         messages=[{"role": "system", "content": full_system_prompt}] + messages,
@@ -1621,7 +1653,7 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
             print(f"❌ MAX RETRY ({MAX_RETRIES}) reached, giving up")
         
         # Devam yanıtı kontrol et (nested tool calls)
-        continue_response = await self.async_client.chat.completions.create(
+        continue_response = await self.client.chat.completions.create(
             model=self.model,
             max_tokens=4096,
             messages=[{"role": "system", "content": system_prompt}] + messages,
@@ -1652,10 +1684,12 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
         self, 
         db: AsyncSession, 
         session_id: uuid.UUID, 
-        message: str
+        message: str,
+        user_id: uuid.UUID = None,
     ) -> str:
         """Mesajdaki @tag'leri çözümle ve context string oluştur."""
-        user_id = await get_user_id_from_session(db, session_id)
+        if user_id is None:
+            user_id = await get_user_id_from_session(db, session_id)
         entities = await entity_service.resolve_tags(db, user_id, message)
         
         if not entities:
@@ -1692,270 +1726,323 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
         Tüm bağlam bileşenlerini tek seferde oluştur.
         Hem process_message hem process_message_stream tarafından çağrılır.
         
-        Bileşenler:
+        Bileşenler (eşzamanlı çalışır, çıktı sırası sabittir):
         1. Entity @tag çözümleme (mesajdaki @tag'ler)
         2. Proje bağlamı (aktif proje adı, kategori)
         3. Working Memory (son 5 asset)
         4. Kullanıcı tercihleri (aspect ratio, model, stil)
         5. Episodic memory (önemli olaylar)
         6. Core memory (projeler arası hafıza)
-        7. Tüm entity listesi (karakter, lokasyon, marka)
-        8. Plugin listesi (projede yüklü eklentiler)
+        7. Tüm entity listesi (karakter, lokasyon, marka) — cache'li
+        8. Preset listesi (projede kayıtlı preset'ler) — cache'li
+        9. Geçmiş başarılı prompt'lar
+        10. Model başarı istatistikleri
+        11. Aktif AI modelleri — cache'li
         """
-        extra_context = ""
+        assembly = await self._assemble_context(
+            session_id,
+            user_id,
+            user_message,
+            suppress_working_memory=suppress_working_memory,
+            current_reference_video_url=current_reference_video_url,
+        )
+        print(f"⏱️ Context montajı: {assembly.timing_summary()}")
+        return assembly.text
+
+    async def _assemble_context(
+        self,
+        session_id: uuid.UUID,
+        user_id: uuid.UUID,
+        user_message: str,
+        suppress_working_memory: bool = False,
+        current_reference_video_url: str = None,
+    ) -> ContextAssembly:
+        """Context bölümlerini paralel çalıştır, bölüm bazlı süreleri döndür."""
+        sections = []
 
         if current_reference_video_url:
-            extra_context += (
-                "\n\n--- 🎬 AKTİF REFERANS VİDEO ---\n"
-                f"Bu mesajda kullanıcı şu videoyu referans verdi: {current_reference_video_url}\n"
-                "Bu istekte eski görsel/video asset'lerini varsayılan referans olarak kullanma. "
-                "Kullanıcı açıkça önceki bir asset'i istemedikçe aktif referans bu videodur.\n"
-            )
-        
-        # 0. Kullanıcı adı — agent kullanıcıyı ismiyle tanısın
-        try:
-            from app.models.models import User as UserModel
+            async def _reference_video() -> str:
+                return (
+                    "\n\n--- 🎬 AKTİF REFERANS VİDEO ---\n"
+                    f"Bu mesajda kullanıcı şu videoyu referans verdi: {current_reference_video_url}\n"
+                    "Bu istekte eski görsel/video asset'lerini varsayılan referans olarak kullanma. "
+                    "Kullanıcı açıkça önceki bir asset'i istemedikçe aktif referans bu videodur.\n"
+                )
+            sections.append(("reference_video", _reference_video))
+
+        sections += [
+            ("user", lambda: self._ctx_user(user_id)),
+            ("entity_tags", lambda: self._ctx_entity_tags(session_id, user_id, user_message)),
+            ("project", lambda: self._ctx_project(session_id)),
+        ]
+        if not suppress_working_memory:
+            sections.append(("working_memory", lambda: self._ctx_working_memory(session_id)))
+        else:
+            print("🧠 Working Memory bu istekte baskı kurmaması için atlandı")
+        sections += [
+            ("preferences", lambda: self._ctx_preferences(user_id)),
+            ("episodic_memory", lambda: self._ctx_episodic_memory(user_id)),
+            ("core_memory", lambda: self._ctx_core_memory(user_id)),
+            ("entity_list", lambda: self._ctx_entity_list(user_id)),
+            ("presets", lambda: self._ctx_presets(session_id)),
+            ("similar_prompts", lambda: self._ctx_similar_prompts(user_id, user_message)),
+            ("model_stats", lambda: self._ctx_model_stats(user_id)),
+            ("ai_models", lambda: self._ctx_ai_models()),
+        ]
+
+        return await assemble_sections(sections)
+
+    async def _ctx_user(self, user_id: uuid.UUID) -> str:
+        """0. Kullanıcı adı — agent kullanıcıyı ismiyle tanısın."""
+        from app.models.models import User as UserModel
+        async with context_db_session() as db:
             user_result = await db.execute(
                 select(UserModel).where(UserModel.id == user_id)
             )
             current_user = user_result.scalar_one_or_none()
-            if current_user and current_user.full_name:
-                from datetime import datetime
-                now = datetime.now()
-                extra_context += f"\n\n--- 👤 KULLANICI ---\n"
-                extra_context += f"Kullanıcının adı: {current_user.full_name}\n"
-                extra_context += f"Email: {current_user.email}\n"
-                extra_context += f"📅 Bugünün tarihi: {now.strftime('%d %B %Y, %A')} (saat {now.strftime('%H:%M')})\n"
-                extra_context += f"ÖNEMLİ DAVRANIŞ KURALI: Kullanıcıya ismiyle hitap et, samimi ol. "
-                extra_context += f"Ama 'seni tanıyor musun' gibi sorularda DÜRÜST ol — "
-                extra_context += f"ismini ve hesabını biliyorsun ama kişisel tercihlerini/tarzını ancak birlikte çalıştıkça öğreneceksin. "
-                extra_context += f"Eğer aşağıda episodic memory veya user preferences varsa O BİLGİLERİ de kullan — "
-                extra_context += f"o zaman gerçekten tanıyorsun demektir."
-        except Exception as e:
-            print(f"⚠️ Kullanıcı adı hatası: {e}")
-        
-        # 1. @tag çözümleme (mevcut _build_entity_context)
-        entity_context = await self._build_entity_context(db, session_id, user_message)
-        if entity_context:
-            extra_context += f"\n\n--- Mevcut Entity Bilgileri ---\n{entity_context}"
-        
-        # 2. Proje bağlamı
-        try:
+        if not current_user or not current_user.full_name:
+            return ""
+
+        from datetime import datetime
+        now = datetime.now()
+        ctx = f"\n\n--- 👤 KULLANICI ---\n"
+        ctx += f"Kullanıcının adı: {current_user.full_name}\n"
+        ctx += f"Email: {current_user.email}\n"
+        ctx += f"📅 Bugünün tarihi: {now.strftime('%d %B %Y, %A')} (saat {now.strftime('%H:%M')})\n"
+        ctx += f"ÖNEMLİ DAVRANIŞ KURALI: Kullanıcıya ismiyle hitap et, samimi ol. "
+        ctx += f"Ama 'seni tanıyor musun' gibi sorularda DÜRÜST ol — "
+        ctx += f"ismini ve hesabını biliyorsun ama kişisel tercihlerini/tarzını ancak birlikte çalıştıkça öğreneceksin. "
+        ctx += f"Eğer aşağıda episodic memory veya user preferences varsa O BİLGİLERİ de kullan — "
+        ctx += f"o zaman gerçekten tanıyorsun demektir."
+        return ctx
+
+    async def _ctx_entity_tags(self, session_id: uuid.UUID, user_id: uuid.UUID, user_message: str) -> str:
+        """1. @tag çözümleme."""
+        async with context_db_session() as db:
+            entity_context = await self._build_entity_context(db, session_id, user_message, user_id=user_id)
+        if not entity_context:
+            return ""
+        return f"\n\n--- Mevcut Entity Bilgileri ---\n{entity_context}"
+
+    async def _ctx_project(self, session_id: uuid.UUID) -> str:
+        """2. Proje bağlamı."""
+        async with context_db_session() as db:
             session_result = await db.execute(
                 select(SessionModel).where(SessionModel.id == session_id)
             )
             active_session = session_result.scalar_one_or_none()
-            if active_session:
-                project_context = f"\n\n--- 📂 AKTİF PROJE ---\nProje Adı: {active_session.title}"
-                if active_session.description:
-                    project_context += f"\nAçıklama: {active_session.description}"
-                if active_session.category:
-                    project_context += f"\nKategori: {active_session.category}"
-                if active_session.project_data:
-                    project_context += f"\nProje Verileri: {active_session.project_data}"
-                extra_context += project_context
-        except Exception as e:
-            print(f"⚠️ Proje context hatası: {e}")
-        
-        # 3. Working Memory (son üretilen asset'ler)
-        if not suppress_working_memory:
-            try:
-                recent_assets = await asset_service.get_recent_assets(db, session_id, limit=5)
-                if recent_assets:
-                    memory_ctx = "\n\n--- 🕒 SON ÜRETİLENLER (Working Memory) ---\n"
-                    memory_ctx += "Kullanıcı 'bunu düzenle', 'son görseli değiştir' gibi AÇIKÇA bir asset'e atıf yapıyorsa BURADAKİ URL'leri kullan.\n"
-                    memory_ctx += "⚠️ UYARI: 'tekrar dene', 'beğenmedim', 'yeniden yap' gibi mesajlarda bu URL'leri image_url olarak VERME! Bu durumda sıfırdan üret (text-to-image/video).\n"
-                    for idx, asset in enumerate(recent_assets, 1):
-                        icon = "🎬" if asset.asset_type == "video" else "🖼️"
-                        thumb = f" (Thumbnail: {asset.thumbnail_url})" if asset.thumbnail_url else ""
-                        prompt_text = f"'{asset.prompt[:50]}...'" if asset.prompt else "'—'"
-                        memory_ctx += f"{idx}. [{asset.asset_type.upper()}] {icon} {prompt_text}\n   👉 URL: {asset.url}{thumb}\n"
-                    extra_context += memory_ctx
-                    print(f"🧠 Working Memory eklendi: {len(recent_assets)} asset")
-            except Exception as e:
-                print(f"⚠️ Working memory hatası: {e}")
-        else:
-            print("🧠 Working Memory bu istekte baskı kurmaması için atlandı")
-        
-        # 4. Kullanıcı tercihleri
-        try:
+        if not active_session:
+            return ""
+        project_context = f"\n\n--- 📂 AKTİF PROJE ---\nProje Adı: {active_session.title}"
+        if active_session.description:
+            project_context += f"\nAçıklama: {active_session.description}"
+        if active_session.category:
+            project_context += f"\nKategori: {active_session.category}"
+        if active_session.project_data:
+            project_context += f"\nProje Verileri: {active_session.project_data}"
+        return project_context
+
+    async def _ctx_working_memory(self, session_id: uuid.UUID) -> str:
+        """3. Working Memory (son üretilen asset'ler)."""
+        async with context_db_session() as db:
+            recent_assets = await asset_service.get_recent_assets(db, session_id, limit=5)
+        if not recent_assets:
+            return ""
+        memory_ctx = "\n\n--- 🕒 SON ÜRETİLENLER (Working Memory) ---\n"
+        memory_ctx += "Kullanıcı 'bunu düzenle', 'son görseli değiştir' gibi AÇIKÇA bir asset'e atıf yapıyorsa BURADAKİ URL'leri kullan.\n"
+        memory_ctx += "⚠️ UYARI: 'tekrar dene', 'beğenmedim', 'yeniden yap' gibi mesajlarda bu URL'leri image_url olarak VERME! Bu durumda sıfırdan üret (text-to-image/video).\n"
+        for idx, asset in enumerate(recent_assets, 1):
+            icon = "🎬" if asset.asset_type == "video" else "🖼️"
+            thumb = f" (Thumbnail: {asset.thumbnail_url})" if asset.thumbnail_url else ""
+            prompt_text = f"'{asset.prompt[:50]}...'" if asset.prompt else "'—'"
+            memory_ctx += f"{idx}. [{asset.asset_type.upper()}] {icon} {prompt_text}\n   👉 URL: {asset.url}{thumb}\n"
+        print(f"🧠 Working Memory eklendi: {len(recent_assets)} asset")
+        return memory_ctx
+
+    async def _ctx_preferences(self, user_id: uuid.UUID) -> str:
+        """4. Kullanıcı tercihleri."""
+        async with context_db_session() as db:
             prefs_prompt = await preferences_service.get_preferences_for_prompt(db, user_id)
-            if prefs_prompt:
-                extra_context += prefs_prompt
-                print(f"📋 Kullanıcı tercihleri eklendi")
-        except Exception as e:
-            print(f"⚠️ Tercih yükleme hatası: {e}")
-        
-        # 5. Episodic memory
-        try:
-            memory_prompt = await episodic_memory.get_context_for_prompt(str(user_id))
-            if memory_prompt:
-                extra_context += memory_prompt
-                print(f"🧠 Episodic memory eklendi")
-        except Exception as e:
-            print(f"⚠️ Episodic memory hatası: {e}")
-        
-        # 6. Core memory (projeler arası hafıza)
-        try:
-            from app.services.conversation_memory_service import conversation_memory
-            core_memory = await conversation_memory.build_memory_context(user_id)
-            if core_memory:
-                extra_context += f"\n\n--- 🧠 KULLANICI HAFIZASI (Projeler Arası) ---\nBu kullanıcıyı tanıyorsun. Geçmiş projelerden bildiklerin:\n{core_memory}"
-                print(f"🧠 Cross-project memory eklendi")
-        except Exception as e:
-            print(f"⚠️ Conversation memory hatası: {e}")
-        
-        # 7. Tüm entity listesi (projeler arası — kullanıcının tüm entity'leri)
-        try:
-            all_entities = await entity_service.list_entities(db, user_id)
-            if all_entities:
-                entity_list_ctx = "\n\n--- 🎭 KULLANICININ ENTITY'LERİ ---\n"
-                entity_list_ctx += "Bu kullanıcının kayıtlı karakterleri, lokasyonları ve markaları. @tag kullanmadan da isimle eşleştir:\n"
-                for e in all_entities[:15]:  # Max 15 entity
-                    ref_info = " 📸" if e.reference_image_url else ""
-                    entity_list_ctx += f"- @{e.tag}: {e.name} ({e.entity_type}){ref_info}\n"
-                extra_context += entity_list_ctx
-                print(f"🎭 Entity context eklendi: {len(all_entities)} entity")
-        except Exception as e:
-            print(f"⚠️ Entity list hatası: {e}")
-        
-        # 8. Plugin listesi (aktif projedeki eklentiler)
-        try:
-            plugin_result = await db.execute(
-                select(Preset).where(Preset.session_id == session_id)
-            )
-            plugins = list(plugin_result.scalars().all())
-            if plugins:
-                plugin_ctx = "\n\n--- 🔌 PROJEDEKİ PRESET'LER ---\n"
-                plugin_ctx += "Bu projede kayıtlı preset'ler. 'Preset: X' mesajı geldiğinde ilgili preset'in TÜM config bilgilerini kullanarak generate_image çağır:\n"
-                for p in plugins[:10]:  # Max 10 plugin
-                    config = p.config or {}
-                    style = config.get("style", "—")
-                    time_of_day = config.get("timeOfDay", "")
-                    camera_angles = config.get("cameraAngles", [])
-                    prompt_template = config.get("promptTemplate", "")
-                    char_tag = config.get("character_tag", "")
-                    loc_tag = config.get("location_tag", "")
-                    
-                    plugin_ctx += f"- {p.icon} **{p.name}**: {p.description or '—'}\n"
-                    plugin_ctx += f"  Stil: {style}"
-                    if time_of_day:
-                        plugin_ctx += f" | Zaman: {time_of_day}"
-                    if camera_angles:
-                        plugin_ctx += f" | Açılar: {', '.join(camera_angles)}"
-                    if char_tag:
-                        plugin_ctx += f" | Karakter: @{char_tag}"
-                    if loc_tag:
-                        plugin_ctx += f" | Lokasyon: @{loc_tag}"
-                    if prompt_template:
-                        plugin_ctx += f"\n  Prompt: {prompt_template}"
-                    plugin_ctx += "\n"
-                extra_context += plugin_ctx
-                print(f"🔌 Plugin context eklendi: {len(plugins)} plugin")
-        except Exception as e:
-            print(f"⚠️ Plugin context hatası: {e}")
-        
-        # 9. Prompt öğrenme (geçmiş başarılı prompt'lar)
-        try:
-            from app.services.conversation_memory_service import conversation_memory
-            similar = await conversation_memory.find_similar_prompts(user_id, user_message, limit=3)
-            if similar:
-                prompt_ctx = "\n\n--- 💡 GEÇMİŞ BAŞARILI PROMPT'LAR ---\n"
-                prompt_ctx += "Bu örnekleri sadece stil/ton ilhamı için kullan. Süre, adet, model ve referans seçimlerinde mevcut kullanıcı mesajı her zaman baskındır:\n"
-                for idx, p in enumerate(similar, 1):
-                    memory_prompt = p.get("memory_prompt") or p.get("prompt", "")
-                    prompt_ctx += f"{idx}. \"{memory_prompt[:100]}\" (skor: {p.get('score', '?')}, tip: {p.get('asset_type', '?')})\n"
-                extra_context += prompt_ctx
-                print(f"💡 Prompt learning eklendi: {len(similar)} referans")
-        except Exception as e:
-            print(f"⚠️ Prompt learning hatası: {e}")
-        
-        # 10. Model başarı istatistikleri (hangi model en iyi sonuç veriyor)
-        try:
-            model_events = await episodic_memory.recall(str(user_id), event_type="model_success", limit=50)
-            if model_events:
-                # Model başarı sayılarını hesapla
-                model_counts = {}
-                for event in model_events:
-                    meta = event.metadata or {}
-                    model = meta.get("model", "unknown")
-                    if model != "unknown":
-                        model_counts[model] = model_counts.get(model, 0) + 1
-                
-                if model_counts:
-                    # En başarılı 5 model
-                    top_models = sorted(model_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-                    model_ctx = "\n\n--- 🏆 MODEL BAŞARI GEÇMİŞİ ---\n"
-                    model_ctx += "Bu kullanıcı bu modellerle en iyi sonuçları aldı (👍 sayısına göre):\n"
-                    for model, count in top_models:
-                        model_ctx += f"- {model}: {count} başarılı üretim\n"
-                    extra_context += model_ctx
-                    print(f"🏆 Model başarı istatistikleri eklendi: {len(top_models)} model")
-        except Exception as e:
-            print(f"⚠️ Model stats hatası: {e}")
-        
-        # 11. Aktif AI Modelleri — agent hangi modellerin açık/kapalı olduğunu bilsin
-        try:
-            from app.models.models import AIModel
-            models_result = await db.execute(select(AIModel.name, AIModel.is_enabled, AIModel.model_type))
-            all_models = models_result.all()
-            if all_models:
-                # İnsan dostu isim mapping
-                display_names = {
-                    "nano_banana_pro": "Nano Banana Pro", "nano_banana_2": "Nano Banana 2",
-                    "flux2": "Flux 2", "flux2_max": "Flux 2 Max",
-                    "gpt_image": "GPT Image 1", "reve": "Reve",
-                    "seedream": "Seedream 4.5", "recraft": "Recraft V3",
-                    "grok_imagine": "Grok Imagine",
-                    "kling": "Kling 3.0 Pro", "sora2": "Sora 2 Pro",
-                    "veo_fast": "Veo 3.1 Fast", "veo_quality": "Veo 3.1 Quality",
-                    "seedance": "Seedance 1.5", "hailuo": "Hailuo 02",
-                    "grok_imagine_video": "Grok Imagine Video",
-                }
-                # Shortcode mapping (agent tool parametresi için)
-                shortcode_map = {
-                    "nano_banana_pro": "nano_banana", "nano_banana_2": "nano_banana_2",
-                    "flux2": "flux2", "flux2_max": "flux2_max",
-                    "gpt_image": "gpt_image", "reve": "reve",
-                    "seedream": "seedream", "recraft": "recraft",
-                    "grok_imagine": "grok_imagine",
-                    "kling": "kling", "sora2": "sora2",
-                    "veo_fast": "veo", "veo_quality": "veo_quality",
-                    "seedance": "seedance", "hailuo": "hailuo",
-                    "grok_imagine_video": "grok_imagine_video",
+        if prefs_prompt:
+            print(f"📋 Kullanıcı tercihleri eklendi")
+        return prefs_prompt or ""
+
+    async def _ctx_episodic_memory(self, user_id: uuid.UUID) -> str:
+        """5. Episodic memory."""
+        memory_prompt = await episodic_memory.get_context_for_prompt(str(user_id))
+        if memory_prompt:
+            print(f"🧠 Episodic memory eklendi")
+        return memory_prompt or ""
+
+    async def _ctx_core_memory(self, user_id: uuid.UUID) -> str:
+        """6. Core memory (projeler arası hafıza)."""
+        from app.services.conversation_memory_service import conversation_memory
+        core_memory = await conversation_memory.build_memory_context(user_id)
+        if not core_memory:
+            return ""
+        print(f"🧠 Cross-project memory eklendi")
+        return f"\n\n--- 🧠 KULLANICI HAFIZASI (Projeler Arası) ---\nBu kullanıcıyı tanıyorsun. Geçmiş projelerden bildiklerin:\n{core_memory}"
+
+    async def _ctx_entity_list(self, user_id: uuid.UUID) -> str:
+        """7. Tüm entity listesi (projeler arası — kullanıcının tüm entity'leri)."""
+        async def _load():
+            async with context_db_session() as db:
+                all_entities = await entity_service.list_entities(db, user_id)
+            return [
+                {
+                    "tag": e.tag,
+                    "name": e.name,
+                    "entity_type": e.entity_type,
+                    "has_reference": bool(e.reference_image_url),
                 }
-                
-                image_models = []
-                video_models = []
-                for name, enabled, model_type in all_models:
-                    if name not in display_names:
-                        continue
-                    status = "✅" if enabled else "❌"
-                    sc = shortcode_map.get(name, name)
-                    label = f"{display_names[name]}({sc}) {status}"
-                    cat = (model_type or "").lower()
-                    if cat in ("image", "görsel", "image_generation"):
-                        image_models.append(label)
-                    elif cat in ("video", "video_generation"):
-                        video_models.append(label)
-                    elif name in ("nano_banana_pro", "nano_banana_2", "flux2", "flux2_max", "gpt_image", "reve", "seedream", "recraft", "grok_imagine"):
-                        image_models.append(label)
-                    elif name in ("kling", "sora2", "veo_fast", "veo_quality", "seedance", "hailuo", "grok_imagine_video"):
-                        video_models.append(label)
-                
-                if image_models or video_models:
-                    model_ctx = "\n\n--- 🎨 AKTİF AI MODELLERİ ---\n"
-                    if image_models:
-                        model_ctx += f"GÖRSEL: {', '.join(image_models)}\n"
-                    if video_models:
-                        model_ctx += f"VİDEO: {', '.join(video_models)}\n"
-                    model_ctx += "Kullanıcı kapalı (❌) model isterse → aktif alternatifleri öner.\n"
-                    extra_context += model_ctx
-                    print(f"🎨 Aktif model listesi enjekte edildi: {len(image_models)} görsel, {len(video_models)} video")
-        except Exception as e:
-            print(f"⚠️ Aktif model listesi hatası: {e}")
+                for e in all_entities
+            ]
+
+        all_entities = await context_cache.get_or_load(context_cache.entities_key(user_id), _load)
+        if not all_entities:
+            return ""
+        entity_list_ctx = "\n\n--- 🎭 KULLANICININ ENTITY'LERİ ---\n"
+        entity_list_ctx += "Bu kullanıcının kayıtlı karakterleri, lokasyonları ve markaları. @tag kullanmadan da isimle eşleştir:\n"
+        for e in all_entities[:15]:  # Max 15 entity
+            ref_info = " 📸" if e["has_reference"] else ""
+            entity_list_ctx += f"- @{e['tag']}: {e['name']} ({e['entity_type']}){ref_info}\n"
+        print(f"🎭 Entity context eklendi: {len(all_entities)} entity")
+        return entity_list_ctx
+
+    async def _ctx_presets(self, session_id: uuid.UUID) -> str:
+        """8. Preset listesi (aktif projedeki preset'ler)."""
+        async def _load():
+            async with context_db_session() as db:
+                plugin_result = await db.execute(
+                    select(Preset).where(Preset.session_id == session_id)
+                )
+                presets = list(plugin_result.scalars().all())
+            return [
+                {"icon": p.icon, "name": p.name, "description": p.description, "config": p.config or {}}
+                for p in presets
+            ]
+
+        plugins = await context_cache.get_or_load(context_cache.presets_key(session_id), _load)
+        if not plugins:
+            return ""
+        plugin_ctx = "\n\n--- 🔌 PROJEDEKİ PRESET'LER ---\n"
+        plugin_ctx += "Bu projede kayıtlı preset'ler. 'Preset: X' mesajı geldiğinde ilgili preset'in TÜM config bilgilerini kullanarak generate_image çağır:\n"
+        for p in plugins[:10]:  # Max 10 plugin
+            config = p["config"]
+            style = config.get("style", "—")
+            time_of_day = config.get("timeOfDay", "")
+            camera_angles = config.get("cameraAngles", [])
+            prompt_template = config.get("promptTemplate", "")
+            char_tag = config.get("character_tag", "")
+            loc_tag = config.get("location_tag", "")
+            
+            plugin_ctx += f"- {p['icon']} **{p['name']}**: {p['description'] or '—'}\n"
+            plugin_ctx += f"  Stil: {style}"
+            if time_of_day:
+                plugin_ctx += f" | Zaman: {time_of_day}"
+            if camera_angles:
+                plugin_ctx += f" | Açılar: {', '.join(camera_angles)}"
+            if char_tag:
+                plugin_ctx += f" | Karakter: @{char_tag}"
+            if loc_tag:
+                plugin_ctx += f" | Lokasyon: @{loc_tag}"
+            if prompt_template:
+                plugin_ctx += f"\n  Prompt: {prompt_template}"
+            plugin_ctx += "\n"
+        print(f"🔌 Plugin context eklendi: {len(plugins)} plugin")
+        return plugin_ctx
+
+    async def _ctx_similar_prompts(self, user_id: uuid.UUID, user_message: str) -> str:
+        """9. Prompt öğrenme (geçmiş başarılı prompt'lar)."""
+        from app.services.conversation_memory_service import conversation_memory
+        similar = await conversation_memory.find_similar_prompts(user_id, user_message, limit=3)
+        if not similar:
+            return ""
+        prompt_ctx = "\n\n--- 💡 GEÇMİŞ BAŞARILI PROMPT'LAR ---\n"
+        prompt_ctx += "Bu örnekleri sadece stil/ton ilhamı için kullan. Süre, adet, model ve referans seçimlerinde mevcut kullanıcı mesajı her zaman baskındır:\n"
+        for idx, p in enumerate(similar, 1):
+            memory_prompt = p.get("memory_prompt") or p.get("prompt", "")
+            prompt_ctx += f"{idx}. \"{memory_prompt[:100]}\" (skor: {p.get('score', '?')}, tip: {p.get('asset_type', '?')})\n"
+        print(f"💡 Prompt learning eklendi: {len(similar)} referans")
+        return prompt_ctx
+
+    async def _ctx_model_stats(self, user_id: uuid.UUID) -> str:
+        """10. Model başarı istatistikleri (hangi model en iyi sonuç veriyor)."""
+        # Model başarı sayıları her 👍'da artımlı güncellenir — burada tek okuma
+        top_models = await episodic_memory.get_model_success_counts(str(user_id), top=5)
+        if not top_models:
+            return ""
+        model_ctx = "\n\n--- 🏆 MODEL BAŞARI GEÇMİŞİ ---\n"
+        model_ctx += "Bu kullanıcı bu modellerle en iyi sonuçları aldı (👍 sayısına göre):\n"
+        for model, count in top_models:
+            model_ctx += f"- {model}: {count} başarılı üretim\n"
+        print(f"🏆 Model başarı istatistikleri eklendi: {len(top_models)} model")
+        return model_ctx
+
+    async def _ctx_ai_models(self) -> str:
+        """11. Aktif AI Modelleri — agent hangi modellerin açık/kapalı olduğunu bilsin."""
+        async def _load():
+            from app.models.models import AIModel
+            async with context_db_session() as db:
+                models_result = await db.execute(select(AIModel.name, AIModel.is_enabled, AIModel.model_type))
+                return [list(row) for row in models_result.all()]
+
+        all_models = await context_cache.get_or_load(context_cache.AI_MODELS_KEY, _load)
+        if not all_models:
+            return ""
+        # İnsan dostu isim mapping
+        display_names = {
+            "nano_banana_pro": "Nano Banana Pro", "nano_banana_2": "Nano Banana 2",
+            "flux2": "Flux 2", "flux2_max": "Flux 2 Max",
+            "gpt_image": "GPT Image 1", "reve": "Reve",
+            "seedream": "Seedream 4.5", "recraft": "Recraft V3",
+            "grok_imagine": "Grok Imagine",
+            "kling": "Kling 3.0 Pro", "sora2": "Sora 2 Pro",
+            "veo_fast": "Veo 3.1 Fast", "veo_quality": "Veo 3.1 Quality",
+            "seedance": "Seedance 1.5", "hailuo": "Hailuo 02",
+            "grok_imagine_video": "Grok Imagine Video",
+        }
+        # Shortcode mapping (agent tool parametresi için)
+        shortcode_map = {
+            "nano_banana_pro": "nano_banana", "nano_banana_2": "nano_banana_2",
+            "flux2": "flux2", "flux2_max": "flux2_max",
+            "gpt_image": "gpt_image", "reve": "reve",
+            "seedream": "seedream", "recraft": "recraft",
+            "grok_imagine": "grok_imagine",
+            "kling": "kling", "sora2": "sora2",
+            "veo_fast": "veo", "veo_quality": "veo_quality",
+            "seedance": "seedance", "hailuo": "hailuo",
+            "grok_imagine_video": "grok_imagine_video",
+        }
         
-        return extra_context
+        image_models = []
+        video_models = []
+        for name, enabled, model_type in all_models:
+            if name not in display_names:
+                continue
+            status = "✅" if enabled else "❌"
+            sc = shortcode_map.get(name, name)
+            label = f"{display_names[name]}({sc}) {status}"
+            cat = (model_type or "").lower()
+            if cat in ("image", "görsel", "image_generation"):
+                image_models.append(label)
+            elif cat in ("video", "video_generation"):
+                video_models.append(label)
+            elif name in ("nano_banana_pro", "nano_banana_2", "flux2", "flux2_max", "gpt_image", "reve", "seedream", "recraft", "grok_imagine"):
+                image_models.append(label)
+            elif name in ("kling", "sora2", "veo_fast", "veo_quality", "seedance", "hailuo", "grok_imagine_video"):
+                video_models.append(label)
+        
+        if not image_models and not video_models:
+            return ""
+        model_ctx = "\n\n--- 🎨 AKTİF AI MODELLERİ ---\n"
+        if image_models:
+            model_ctx += f"GÖRSEL: {', '.join(image_models)}\n"
+        if video_models:
+            model_ctx += f"VİDEO: {', '.join(video_models)}\n"
+        model_ctx += "Kullanıcı kapalı (❌) model isterse → aktif alternatifleri öner.\n"
+        print(f"🎨 Aktif model listesi enjekte edildi: {len(image_models)} görsel, {len(video_models)} video")
+        return model_ctx
     
     async def _process_response(
         self, 
@@ -2137,7 +2224,7 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
                 print(f"❌ MAX RETRY ({MAX_RETRIES}) reached (non-stream), giving up")
             
             # Devam yanıtı al
-            continue_response = self.client.chat.completions.create(
+            continue_response = await self.client.chat.completions.create(
                 model=self.model,
                 max_tokens=4096,
                 messages=[{"role": "system", "content": self.system_prompt}] + messages,
@@ -2155,6 +2242,50 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
                 retry_count + 1
             )
     
+    async def _check_spend_quota(self, db: AsyncSession, session_id: uuid.UUID, tool_name: str, tool_input: dict) -> tuple[Optional[str], Optional[dict]]:
+        """
+        Model harcama kotasından (MODEL_SPEND_QUOTAS) düş → (hata, charge).
+        Kota doluysa hata kullanıcıya gösterilir; charge, üretim başarısız olursa
+        _refund_spend_quota ile iade edilecek kaydı tutar. Model override'larından
+        SONRA çağrılmalı: kota gerçekten kullanılacak modelden düşer.
+        """
+        if tool_name == "generate_image":
+            model, units = tool_input.get("model") or "auto", 1
+        elif tool_name == "generate_video":
+            model, units = tool_input.get("model") or "hailuo", tool_input.get("duration") or 5  # _generate_video varsayılanı
+        elif tool_name == "generate_long_video":
+            model, units = "hailuo", tool_input.get("total_duration") or 60  # Uzun video sahneleri hailuo ile
+        else:
+            return None, None
+        if model not in settings.MODEL_SPEND_QUOTAS:
+            return None, None
+        try:
+            units = int(str(units).rstrip("s"))
+        except ValueError:
+            units = 1
+
+        from app.core.rate_limit import rate_limiter
+        user_id = await get_user_id_from_session(db, session_id)
+        result = await rate_limiter.consume_quota(str(user_id), model, units)
+        if result.allowed:
+            return None, {"user_id": str(user_id), "model": model, "units": units}
+        minutes = max(1, int(result.retry_after // 60))
+        return (
+            f"⛔ {model.upper()} için kullanım kotan doldu (kalan: {result.remaining}). "
+            f"Yaklaşık {minutes} dakika sonra tekrar deneyebilir ya da başka bir model seçebilirsin."
+        ), None
+
+    async def _refund_spend_quota(self, charge: Optional[dict]):
+        """Başarısız üretimin kotadan düşülen birimlerini geri ver (charge başına bir kez)."""
+        if not charge or charge.get("refunded"):
+            return
+        charge["refunded"] = True   # Hata yolları iç içe: ikinci iade kotayı şişirmesin
+        from app.core.rate_limit import rate_limiter
+        try:
+            await rate_limiter.refund_quota(charge["user_id"], charge["model"], charge["units"])
+        except Exception as e:
+            print(f"⚠️ Kota iadesi yapılamadı ({charge.get('model')}): {e}")
+
     async def _handle_tool_call(
         self, 
         tool_name: str, 
@@ -2220,34 +2351,44 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
                         print(f"   🖼️ REUSED stored video reference image into {tool_name}")
                 print(f"   📎 AUTO-RESOLVED session video reference into {tool_name}")
         
-        if tool_name == "generate_image":
+        if tool_name == "generate_image" and user_message:
             # 🔍 KULLANICI MESAJINDAN MODEL TESPİTİ — LLM'in hatalı seçimini override et
-            if user_message:
-                msg_lower = user_message.lower()
-                # Sıralama ÖNEMLİ: daha spesifik isimler önce kontrol edilmeli
-                user_model_overrides = [
-                    (["nano banana 2", "nanobana 2", "nano-banana-2", "nb2"], "nano_banana_2"),
-                    (["flux 2 max", "flux2 max", "flux-2-max"], "flux2_max"),
-                    (["flux 2", "flux2", "flux-2"], "flux2"),
-                    (["gpt image", "gpt-image", "chatgpt"], "gpt_image"),
-                    (["recraft", "logo modeli"], "recraft"),
-                    (["reve", "rêve"], "reve"),
-                    (["seedream"], "seedream"),
-                    (["grok"], "grok_imagine"),
-                    (["nano banana pro", "nano banana", "nanobana"], "nano_banana"),
-                ]
-                for keywords, shortcode in user_model_overrides:
-                    if any(kw in msg_lower for kw in keywords):
-                        current = tool_input.get("model", "auto")
-                        if current != shortcode:
-                            print(f"   🔄 MODEL OVERRIDE: Kullanıcı mesajından '{shortcode}' tespit edildi (LLM seçimi: '{current}')")
-                            tool_input["model"] = shortcode
-                        break
-            
-            return await self._generate_image(
+            msg_lower = user_message.lower()
+            # Sıralama ÖNEMLİ: daha spesifik isimler önce kontrol edilmeli
+            user_model_overrides = [
+                (["nano banana 2", "nanobana 2", "nano-banana-2", "nb2"], "nano_banana_2"),
+                (["flux 2 max", "flux2 max", "flux-2-max"], "flux2_max"),
+                (["flux 2", "flux2", "flux-2"], "flux2"),
+                (["gpt image", "gpt-image", "chatgpt"], "gpt_image"),
+                (["recraft", "logo modeli"], "recraft"),
+                (["reve", "rêve"], "reve"),
+                (["seedream"], "seedream"),
+                (["grok"], "grok_imagine"),
+                (["nano banana pro", "nano banana", "nanobana"], "nano_banana"),
+            ]
+            for keywords, shortcode in user_model_overrides:
+                if any(kw in msg_lower for kw in keywords):
+                    current = tool_input.get("model", "auto")
+                    if current != shortcode:
+                        print(f"   🔄 MODEL OVERRIDE: Kullanıcı mesajından '{shortcode}' tespit edildi (LLM seçimi: '{current}')")
+                        tool_input["model"] = shortcode
+                    break
+        
+        # Kota, override'lardan sonra gerçekten kullanılacak modelden düşülür
+        quota_charge = None
+        if settings.MODEL_SPEND_QUOTAS:
+            quota_error, quota_charge = await self._check_spend_quota(db, session_id, tool_name, tool_input)
+            if quota_error:
+                return {"success": False, "error": quota_error}
+        
+        if tool_name == "generate_image":
+            result = await self._generate_image(
                 db, session_id, tool_input, resolved_entities or [],
                 uploaded_reference_url=uploaded_reference_url
             )
+            if not result.get("success"):
+                await self._refund_spend_quota(quota_charge)
+            return result
         
         elif tool_name == "create_character":
             return await self._create_entity(
@@ -2321,6 +2462,8 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
                     "prompt": tool_input.get("prompt") or user_message,
                     "image_url": tool_input.get("image_url"),
                 }
+                # Video üretilmeyecek — üretim için düşülen kota iade
+                await self._refund_spend_quota(quota_charge)
                 preflight = await self._ensure_video_edit_reference_image(edit_tool_input)
                 if not preflight.get("success"):
                     return {"success": False, "error": preflight.get("error")}
@@ -2341,7 +2484,10 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
                     tool_input["image_url"] = resolved_reference_url
                     print(f"   📎 AUTO-RESOLVED session image reference into generate_video")
             
-            result = await self._generate_video(db, session_id, tool_input, resolved_entities or [])
+            # Arka plan işi başladıysa iadeyi (başarısızlıkta) _run_video_bg yapar
+            result = await self._generate_video(db, session_id, tool_input, resolved_entities or [], quota_charge=quota_charge)
+            if not result.get("success"):
+                await self._refund_spend_quota(quota_charge)
             return result
         
         elif tool_name == "edit_video":
@@ -2365,7 +2511,10 @@ Kullanıcı reklam, afiş, kutlama, tebrik, kampanya görseli istediğinde:
                 if resolved_reference_url:
                     tool_input["image_url"] = resolved_reference_url
                     print(f"   📎 AUTO-RESOLVED session image reference into generate_long_video")
-            return await self._generate_long_video(db, session_id, tool_input, resolved_entities or [])
+            result = await self._generate_long_video(db, session_id, tool_input, resolved_entities or [], quota_charge=quota_charge)
+            if not result.get("success"):
+                await self._refund_spend_quota(quota_charge)
+            return result
         
         elif tool_name == "edit_image":
             # Orijinal yüz referansını ekle (face swap için)
@@ -2621,7 +2770,7 @@ Konuşma:
                 summary_prompt += f"\n{role}: {content[:500]}..."
             
             # GPT-4o-mini ile özetle
-            summary_response = self.client.chat.completions.create(
+            summary_response = await llm_gateway.chat(
                 model="gpt-4o-mini",
                 max_tokens=600,
                 messages=[
@@ -3357,20 +3506,13 @@ Konuşma:
 
             user_id = await get_user_id_from_session(db, session_id)
 
-            task = asyncio.create_task(
-                self._run_edit_video_bg(
-                    user_id=str(user_id),
-                    session_id=str(session_id),
-                    prompt=prompt,
-                    video_url=video_url,
-                    image_url=image_url,
-                )
-            )
-
-            global _GLOBAL_BG_TASKS
-            _GLOBAL_BG_TASKS.add(task)
-            task.add_done_callback(_GLOBAL_BG_TASKS.discard)
-            self._register_bg_task(str(session_id), task)
+            await self._start_media_job("edit_video", {
+                "user_id": str(user_id),
+                "session_id": str(session_id),
+                "prompt": prompt,
+                "video_url": video_url,
+                "image_url": image_url,
+            })
 
             return {
                 "success": True,
@@ -3381,7 +3523,7 @@ Konuşma:
         except Exception as e:
             return {"success": False, "error": format_user_error_message(str(e), "video")}
 
-    async def _run_video_bg(self, user_id: str, session_id: str, prompt: str, image_url: str, duration: str, aspect_ratio: str, model: str, entity_ids: list = None):
+    async def _run_video_bg(self, user_id: str, session_id: str, prompt: str, image_url: str, duration: str, aspect_ratio: str, model: str, entity_ids: list = None, quota_charge: dict = None):
         """Asenkron kısa video üretimi ve bildirimi. session_id = proje."""
         asset_sid = session_id
         try:
@@ -3542,6 +3684,7 @@ Konuşma:
                         }
                     )
                 else:
+                    await self._refund_spend_quota(quota_charge)
                     error_msg = result.get("error", "Video üretilemedi")
                     await progress_service.send_error(
                         session_id=session_id,
@@ -3560,6 +3703,7 @@ Konuşma:
                     await db.commit()
         except Exception as e:
             print(f"❌ Background video error: {e}")
+            await self._refund_spend_quota(quota_charge)
             try:
                 from app.services.progress_service import progress_service
                 await progress_service.send_error(
@@ -3584,7 +3728,7 @@ Konuşma:
             except Exception as inner_e:
                 print(f"❌ Could not save background crash error to DB: {inner_e}")
 
-    async def _generate_video(self, db: AsyncSession, session_id: uuid.UUID, params: dict, resolved_entities: list = None) -> dict:
+    async def _generate_video(self, db: AsyncSession, session_id: uuid.UUID, params: dict, resolved_entities: list = None, quota_charge: dict = None) -> dict:
         """Video üret (3-10 sn) - Arka plana atar."""
         try:
             prompt = params.get("prompt", "")
@@ -3629,27 +3773,17 @@ Konuşma:
             # Hayır, her şey BG'ye gidebilir. Ama user'a hemen bir şey döndürmemiz lazım.
             
             
-            import asyncio
-            task = asyncio.create_task(
-                self._run_video_bg(
-                    user_id=str(user_id),
-                    session_id=str(session_id),
-                    prompt=enriched_prompt,
-                    image_url=image_url,
-                    duration=duration,
-                    aspect_ratio=aspect_ratio,
-                    model=model,
-                    entity_ids=entity_ids
-                )
-            )
-            
-            # Prevent Python Garbage Collector from silently destroying the task
-            global _GLOBAL_BG_TASKS
-            if "_GLOBAL_BG_TASKS" not in globals():
-                _GLOBAL_BG_TASKS = set()
-            _GLOBAL_BG_TASKS.add(task)
-            task.add_done_callback(_GLOBAL_BG_TASKS.discard)
-            self._register_bg_task(str(session_id), task)
+            await self._start_media_job("video", {
+                "user_id": str(user_id),
+                "session_id": str(session_id),
+                "prompt": enriched_prompt,
+                "image_url": image_url,
+                "duration": duration,
+                "aspect_ratio": aspect_ratio,
+                "model": model,
+                "entity_ids": entity_ids,
+                "quota_charge": quota_charge,
+            })
             
             decision = "Görselden video (i2v)" if image_url else "Metinden video (t2v)"
             
@@ -3673,7 +3807,7 @@ Konuşma:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    async def _run_long_video_bg(self, user_id: str, session_id: str, prompt: str, total_duration: int, aspect_ratio: str, scene_descriptions: list):
+    async def _run_long_video_bg(self, user_id: str, session_id: str, prompt: str, total_duration: int, aspect_ratio: str, scene_descriptions: list, quota_charge: dict = None):
         """Asenkron arka plan görevi: Video üret, DB'ye asset kaydet, yeni mesaj yarat ve Push at."""
         try:
             from app.core.database import async_session_maker
@@ -3800,71 +3934,17 @@ Konuşma:
                     total_duration=total_duration,
                     aspect_ratio=aspect_ratio,
                     scene_descriptions=translated_scenes,
-                    progress_callback=_on_progress
+                    progress_callback=_on_progress,
+                    request={"prompt": prompt, "quota_charge": quota_charge},  # Resume sonrası teslim/iade için
                 )
             finally:
                 long_video_done.set()
                 reassurance_task.cancel()
             
-            async with async_session_maker() as db:
-                if result.get("success") and result.get("video_url"):
-                    try:
-                        await asset_service.save_asset(
-                            db=db,
-                            session_id=uuid.UUID(session_id),
-                            url=result["video_url"],
-                            asset_type="video",
-                            prompt=prompt,
-                            model_name="kling-3.0-pro-long",
-                            model_params={
-                                "total_duration": total_duration,
-                                "segments": result.get("segments", 0),
-                                "aspect_ratio": aspect_ratio,
-                            },
-                        )
-                    except Exception as save_err:
-                        print(f"⚠️ Long video asset kayıt hatası: {save_err}")
-                    
-                    from app.models.models import Message
-                    new_msg_content = f"Videonuz hazır! {result.get('duration', total_duration)} saniyelik film {result.get('segments', 0)} sahneden birleştirildi."
-                    bg_message = Message(
-                        session_id=uuid.UUID(session_id),
-                        role="assistant",
-                        content=new_msg_content,
-                        metadata_={"videos": [{"url": result["video_url"]}]}
-                    )
-                    db.add(bg_message)
-                    await db.commit()
-                    await db.refresh(bg_message)
-                    
-                    await progress_service.send_complete(
-                        session_id=session_id,
-                        task_type="long_video",
-                        result={
-                            "video_url": result["video_url"],
-                            "message": new_msg_content,
-                            "message_id": str(bg_message.id)
-                        }
-                    )
-                else:
-                    error_msg = result.get("error", "Uzun video üretilemedi")
-                    await progress_service.send_error(
-                        session_id=session_id,
-                        task_type="long_video",
-                        error=error_msg
-                    )
-                    
-                    # ❌ Hatayı Mesaj Geçmişine Kaydet (User görsün)
-                    from app.models.models import Message
-                    fail_msg = Message(
-                        session_id=uuid.UUID(session_id),
-                        role="assistant",
-                        content=format_user_error_message(error_msg, "long_video")
-                    )
-                    db.add(fail_msg)
-                    await db.commit()
+            await self._deliver_long_video_result(session_id, prompt, total_duration, aspect_ratio, result, quota_charge)
         except Exception as e:
             print(f"❌ Background long video error: {e}")
+            await self._refund_spend_quota(quota_charge)
             try:
                 from app.services.progress_service import progress_service
                 await progress_service.send_error(
@@ -3889,7 +3969,91 @@ Konuşma:
             except Exception as inner_e:
                 print(f"❌ Could not save background crash error to DB: {inner_e}")
 
-    async def _generate_long_video(self, db: AsyncSession, session_id: uuid.UUID, params: dict, resolved_entities: list = None) -> dict:
+    async def _deliver_long_video_result(self, session_id: str, prompt: str, total_duration: int, aspect_ratio: str, result: dict, quota_charge: dict = None):
+        """Uzun video sonucunu teslim et: asset + mesaj kaydet, WS bildirimi gönder (resume de kullanır)."""
+        from app.core.database import async_session_maker
+        from app.services.progress_service import progress_service
+        
+        async with async_session_maker() as db:
+            if result.get("success") and result.get("video_url"):
+                try:
+                    await asset_service.save_asset(
+                        db=db,
+                        session_id=uuid.UUID(session_id),
+                        url=result["video_url"],
+                        asset_type="video",
+                        prompt=prompt,
+                        model_name="kling-3.0-pro-long",
+                        model_params={
+                            "total_duration": total_duration,
+                            "segments": result.get("segments", 0),
+                            "aspect_ratio": aspect_ratio,
+                        },
+                    )
+                except Exception as save_err:
+                    print(f"⚠️ Long video asset kayıt hatası: {save_err}")
+                
+                from app.models.models import Message
+                new_msg_content = f"Videonuz hazır! {result.get('duration', total_duration)} saniyelik film {result.get('segments', 0)} sahneden birleştirildi."
+                bg_message = Message(
+                    session_id=uuid.UUID(session_id),
+                    role="assistant",
+                    content=new_msg_content,
+                    metadata_={"videos": [{"url": result["video_url"]}]}
+                )
+                db.add(bg_message)
+                await db.commit()
+                await db.refresh(bg_message)
+                
+                await progress_service.send_complete(
+                    session_id=session_id,
+                    task_type="long_video",
+                    result={
+                        "video_url": result["video_url"],
+                        "message": new_msg_content,
+                        "message_id": str(bg_message.id)
+                    }
+                )
+            else:
+                await self._refund_spend_quota(quota_charge)
+                error_msg = result.get("error", "Uzun video üretilemedi")
+                await progress_service.send_error(
+                    session_id=session_id,
+                    task_type="long_video",
+                    error=error_msg
+                )
+                
+                # ❌ Hatayı Mesaj Geçmişine Kaydet (User görsün)
+                from app.models.models import Message
+                fail_msg = Message(
+                    session_id=uuid.UUID(session_id),
+                    role="assistant",
+                    content=format_user_error_message(error_msg, "long_video")
+                )
+                db.add(fail_msg)
+                await db.commit()
+
+    async def resume_long_video_jobs(self) -> int:
+        """Restart öncesi yarım kalan uzun video işlerini devam ettir (lifespan çağırır)."""
+        from app.services.long_video_service import long_video_service
+        
+        async def _on_result(job, result):
+            await self._deliver_long_video_result(
+                job.session_id,
+                job.request.get("prompt", ""),
+                job.total_duration,
+                job.aspect_ratio,
+                result,
+                job.request.get("quota_charge"),
+            )
+        
+        tasks = await long_video_service.resume_unfinished(on_result=_on_result)
+        for task in tasks:
+            _GLOBAL_BG_TASKS.add(task)
+            task.add_done_callback(_GLOBAL_BG_TASKS.discard)
+        return len(tasks)
+
+    async def _generate_long_video(self, db: AsyncSession, session_id: uuid.UUID, params: dict, resolved_entities: list = None, quota_charge: dict = None) -> dict:
         """Uzun video üret (30s - 3 dakika) - Arka plana atar."""
         # ⛔ Guard 1: scene_descriptions zorunlu ve en az 2 sahne
         scene_descriptions = params.get("scene_descriptions")
@@ -3927,24 +4091,15 @@ Konuşma:
             prompt = f"{prompt} | BRAND BOOK STRICT GUIDELINES: {brand_guidelines}"
             print(f"📖 Uzun Video Brand Book Kuralları Uygulandı: {brand_guidelines}")
         
-        import asyncio
-        task = asyncio.create_task(
-            self._run_long_video_bg(
-                user_id=str(user_id),
-                session_id=str(session_id),
-                prompt=prompt,
-                total_duration=total_duration,
-                aspect_ratio=aspect_ratio,
-                scene_descriptions=scene_descriptions
-            )
-        )
-        
-        global _GLOBAL_BG_TASKS
-        if "_GLOBAL_BG_TASKS" not in globals():
-            _GLOBAL_BG_TASKS = set()
-        _GLOBAL_BG_TASKS.add(task)
-        task.add_done_callback(_GLOBAL_BG_TASKS.discard)
-        self._register_bg_task(str(session_id), task)
+        await self._start_media_job("long_video", {
+            "user_id": str(user_id),
+            "session_id": str(session_id),
+            "prompt": prompt,
+            "total_duration": total_duration,
+            "aspect_ratio": aspect_ratio,
+            "scene_descriptions": scene_descriptions,
+            "quota_charge": quota_charge,
+        })
         
         return {
             "success": True,
@@ -4884,7 +5039,7 @@ Konuşma:
                     "image_url": {"url": url}
                 })
                 
-            response = await self._client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model="gpt-4o",
                 messages=[{"role": "user", "content": content}],
                 max_tokens=200
@@ -5224,16 +5379,21 @@ Konuşma:
                     "Cevabın SADECE zenginleştirilmiş İngilizce prompt olsun, başka açıklama yazma. Max 2 cümle."
                 )
             
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200
+            # Aynı prompt + medya tipi + mod için sonuç prompt_cache'ten gelir
+            enriched = await prompt_cache.get_or_compute(
+                "agent_enrich",
+                prompt,
+                lambda: llm_gateway.chat_text(
+                    [
+                        {"role": "system", "content": system_msg},
+                        {"role": "user", "content": prompt}
+                    ],
+                    model="gpt-4o-mini",
+                    max_tokens=200,
+                ),
+                media_type=media_type,
+                extra=system_msg,
             )
-            
-            enriched = response.choices[0].message.content.strip()
             if enriched and len(enriched) > len(prompt):
                 print(f"✨ Prompt zenginleştirildi: '{prompt[:40]}...' → '{enriched[:60]}...'")
                 return enriched
@@ -5251,7 +5411,7 @@ Konuşma:
             return None
         
         try:
-            response = self.client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model="gpt-4o-mini",  # Hız için mini
                 messages=[
                     {
@@ -5295,7 +5455,7 @@ Konuşma:
                 return {"success": False, "error": "Görsel URL'si gerekli."}
             
             # GPT-4o Vision çağrısı — detaylı analiz için yüksek token limiti
-            response = self.client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model="gpt-4o",
                 messages=[
                     {
@@ -5337,10 +5497,8 @@ Konuşma:
         """
         try:
             import tempfile
-            import subprocess
             import base64
             import os
-            import httpx
             
             video_url = params.get("video_url", "")
             question = params.get("question", "Bu videodaki her sahneyi detaylıca analiz et: kişiler, hareketler, arka plan, yazılar, renkler, geçişler ve varsa hatalar.")
@@ -5355,24 +5513,13 @@ Konuşma:
             with tempfile.TemporaryDirectory() as tmpdir:
                 video_path = os.path.join(tmpdir, "video.mp4")
                 
-                async with httpx.AsyncClient(timeout=60) as client:
-                    resp = await client.get(video_url)
-                    if resp.status_code != 200:
-                        return {"success": False, "error": f"Video indirilemedi (HTTP {resp.status_code})"}
-                    with open(video_path, "wb") as f:
-                        f.write(resp.content)
+                try:
+                    await media_cache.materialize(video_url, dest=video_path)
+                except Exception as e:
+                    return {"success": False, "error": f"Video indirilemedi ({e})"}
                 
                 # 2. Video süresini öğren
-                probe = subprocess.run(
-                    ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", video_path],
-                    capture_output=True, text=True
-                )
-                import json as json_module
-                try:
-                    probe_data = json_module.loads(probe.stdout)
-                    duration = float(probe_data.get("format", {}).get("duration", 10))
-                except:
-                    duration = 10.0
+                duration = await media_io.probe_duration(video_path) or 10.0
                 
                 print(f"   Video süresi: {duration:.1f}s")
                 
@@ -5383,13 +5530,13 @@ Konuşma:
                 for i in range(num_frames):
                     timestamp = interval * (i + 1)
                     frame_path = os.path.join(tmpdir, f"frame_{i:02d}.jpg")
-                    subprocess.run(
+                    await media_io.run_ffmpeg(
                         [
                             "ffmpeg", "-y", "-ss", str(timestamp),
                             "-i", video_path, "-vframes", "1",
                             "-q:v", "2", frame_path
                         ],
-                        capture_output=True
+                        timeout=30.0,
                     )
                     if os.path.exists(frame_path) and os.path.getsize(frame_path) > 0:
                         frame_paths.append((frame_path, timestamp))
@@ -5424,7 +5571,7 @@ Konuşma:
                     })
                 
                 # 5. GPT-4o Vision ile analiz
-                response = self.client.chat.completions.create(
+                response = await llm_gateway.chat(
                     model="gpt-4o",
                     messages=[
                         {
@@ -5599,10 +5746,7 @@ Konuşma:
     async def _add_audio_to_video(self, db, session_id, params: dict) -> dict:
         """Videoya müzik/ses ekle — LOKAL FFmpeg ile birleştir, fal storage'a yükle."""
         try:
-            import fal_client
-            import httpx
             import tempfile
-            import subprocess
             import os
             from app.services.asset_service import asset_service
             
@@ -5624,18 +5768,14 @@ Konuşma:
                 
                 # 1. Video ve audio dosyalarını indir
                 print("   ⬇️ Dosyalar indiriliyor...")
-                async with httpx.AsyncClient(timeout=120.0, follow_redirects=True) as client:
-                    video_resp = await client.get(video_url)
-                    if video_resp.status_code != 200:
-                        return {"success": False, "error": f"Video indirilemedi (HTTP {video_resp.status_code})"}
-                    with open(video_path, "wb") as f:
-                        f.write(video_resp.content)
-                    
-                    audio_resp = await client.get(audio_url)
-                    if audio_resp.status_code != 200:
-                        return {"success": False, "error": f"Audio indirilemedi (HTTP {audio_resp.status_code})"}
-                    with open(audio_path, "wb") as f:
-                        f.write(audio_resp.content)
+                try:
+                    await media_cache.materialize(video_url, dest=video_path)
+                except Exception as e:
+                    return {"success": False, "error": f"Video indirilemedi ({e})"}
+                try:
+                    await media_cache.materialize(audio_url, dest=audio_path, suffix=".wav")
+                except Exception as e:
+                    return {"success": False, "error": f"Audio indirilemedi ({e})"}
                 
                 print(f"   ✅ Video: {os.path.getsize(video_path)} bytes, Audio: {os.path.getsize(audio_path)} bytes")
                 
@@ -5664,11 +5804,12 @@ Konuşma:
                     ]
                 
                 print(f"   🔧 FFmpeg çalıştırılıyor...")
-                proc = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+                returncode, _, stderr = await media_io.run_ffmpeg(cmd, timeout=120)
                 
-                if proc.returncode != 0:
-                    print(f"   ❌ FFmpeg hatası: {proc.stderr[:500]}")
-                    return {"success": False, "error": f"FFmpeg birleştirme hatası: {proc.stderr[:200]}"}
+                if returncode != 0:
+                    stderr_text = stderr.decode(errors="replace")
+                    print(f"   ❌ FFmpeg hatası: {stderr_text[:500]}")
+                    return {"success": False, "error": f"FFmpeg birleştirme hatası: {stderr_text[:200]}"}
                 
                 if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
                     return {"success": False, "error": "FFmpeg çıktı dosyası oluşturulamadı."}
@@ -5677,7 +5818,7 @@ Konuşma:
                 
                 # 3. fal storage'a yükle
                 print("   ⬆️ fal.ai storage'a yükleniyor...")
-                final_url = fal_client.upload_file(output_path)
+                final_url = await media_io.upload_file(output_path)
                 print(f"   ✅ Yüklendi: {final_url[:60]}...")
             
             # 4. Asset olarak kaydet
@@ -6153,6 +6294,7 @@ Konuşma:
                 db.add(plugin)
                 await db.commit()
                 await db.refresh(plugin)
+                await context_cache.invalidate_presets(session_id)
                 
                 # Deterministik başarı mesajı
                 filled = []
@@ -6191,6 +6333,7 @@ Konuşma:
                 if plugin:
                     await db.delete(plugin)
                     await db.commit()
+                    await context_cache.invalidate_presets(plugin.session_id)
                     return {"success": True, "message": f"'{plugin.name}' plugin'i silindi."}
                 return {"success": False, "error": "Plugin bulunamadı."}
             
@@ -7059,7 +7202,7 @@ CRITICAL: Same character throughout. Cinematic storyboard quality."""
                                         # 3. 🧠 GPT-4o VISION İLE RENK ANALİZİ!
                                         print(f"   🎨 Logo analiz ediliyor (GPT-4o Vision)...")
                                         
-                                        analysis_response = self.client.chat.completions.create(
+                                        analysis_response = await llm_gateway.chat(
                                             model="gpt-4o",
                                             max_tokens=500,
                                             messages=[
@@ -20,7 +20,9 @@ import json
 import tempfile
 import asyncio
 from typing import Optional, Dict, Any, List
-import httpx
+
+from app.services.media_cache import media_cache
+from app.services.media_io import media_io
 
 
 class AudioSyncService:
@@ -29,18 +31,13 @@ class AudioSyncService:
     # ── helpers ──────────────────────────────────────────────
     @staticmethod
     async def _download(url: str, suffix: str = ".mp4") -> str:
-        async with httpx.AsyncClient(timeout=120) as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-            tmp.write(resp.content)
-            tmp.close()
-            return tmp.name
+        return await media_cache.materialize(url, suffix=suffix)
 
     @staticmethod
     async def _upload_to_fal(path: str) -> str:
-        import fal_client
-        return await fal_client.upload_file_async(path)
+        url = await media_io.upload_file(path)
+        await media_cache.store_file(url, path)
+        return url
 
     @staticmethod
     async def _run(args: list[str]) -> tuple[str, str]:
@@ -347,10 +344,9 @@ class AudioSyncService:
         Videoya TTS seslendirme ekle — mevcut sesi düşür, TTS'i üste koy.
         """
         try:
-            from openai import AsyncOpenAI
-            from app.core.config import settings
+            from app.services.llm.llm_gateway import llm_gateway
 
-            client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            client = llm_gateway.client
 
             # TTS oluştur
             tts_response = await client.audio.speech.create(
@@ -13,8 +13,7 @@ import json
 import asyncio
 import uuid
 from typing import Optional
-from openai import AsyncOpenAI
-from app.core.config import settings
+from app.services.llm.llm_gateway import llm_gateway
 
 
 PLAN_SYSTEM_PROMPT = """Sen profesyonel bir yaratıcı direktörsün. Kullanıcının üst düzey hedefini alıp detaylı bir üretim planı oluşturuyorsun.
@@ -55,8 +54,10 @@ class CampaignPlannerService:
     GPT-4o ile otonom kampanya planlama ve yürütme servisi.
     """
     
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    @property
+    def client(self):
+        """Plan çağrıları her seferinde gateway'in o anki client'ını kullanır."""
+        return llm_gateway.client
     
     async def plan_campaign(
         self,
@@ -6,27 +6,237 @@ Tek asistan, farklı projeler modeli:
 - Yeni sohbette geçmiş özetleri context'e ekle
 - Başarılı prompt'ları hatırla (Self-Learning)
 - Kullanıcı tercihlerini öğren
+
+Depolama: Redis'te tek JSON blob yerine native yapılar (kullanıcı başına):
+- user_memory:{id}:summaries  → list (RPUSH + LTRIM, son 20)
+- user_memory:{id}:prompts    → list (RPUSH + LTRIM, son 10k; token/kısıt izi kayıtla birlikte)
+- user_memory:{id}:prompts:seq → ekleme sayacı (process içi prompt indeksinin artımlı senkronu)
+- user_memory:{id}:core       → list (RPUSH)
+- user_memory:{id}:prefs      → hash
+- user_memory:{id}:style      → hash
+Her yazma tek bir MULTI/EXEC pipeline'ıdır (oku-değiştir-yaz yok, yarışan
+istekler birbirinin güncellemesini ezmez). Eski `user_memory:{id}` blob'u
+ilk okumada yeni yapılara taşınır (yazma + silme tek atomik Lua script'i).
 """
+import json
 import uuid
-from typing import Dict, Any, List
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-from openai import AsyncOpenAI
+from app.services.llm.llm_gateway import llm_gateway
 from app.core.config import settings
 from app.services.memory_hygiene import (
     ALLOWED_STYLE_PREFERENCE_KEYS,
-    has_conflicting_request_constraints,
     is_stable_memory_fact,
     sanitize_memory_text,
-    tokenize_memory_text,
 )
+from app.services.prompt_index import PromptIndex, prompt_fingerprint
+
+
+# Eski blob hâlâ ARGV[1] ise: listeleri başa ekle, hash alanlarını HSETNX ile yaz
+# (taşıma sırasında yazılmış daha yeni değerleri ezme), TTL'leri yenile, blob'u sil.
+# ARGV: blob, ttl, [n, öğeler...] × 3 liste (summaries, prompts, core), [n, alan, değer...] × 2 hash
+MIGRATE_LEGACY_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+local i = 3
+for list = 2, 4 do
+    local n = tonumber(ARGV[i]); i = i + 1
+    for j = i + n - 1, i, -1 do redis.call('LPUSH', KEYS[list], ARGV[j]) end
+    if list == 3 and n > 0 then redis.call('INCRBY', KEYS[7], n) end
+    i = i + n
+end
+for hash = 5, 6 do
+    local n = tonumber(ARGV[i]); i = i + 1
+    for j = i, i + 2 * n - 1, 2 do redis.call('HSETNX', KEYS[hash], ARGV[j], ARGV[j + 1]) end
+    i = i + 2 * n
+end
+for k = 2, 7 do redis.call('EXPIRE', KEYS[k], ARGV[2]) end
+redis.call('DEL', KEYS[1])
+return 1
+"""
 
 
 class ConversationMemoryService:
     """Kullanıcı seviyesinde hafıza — projeler arası hatırlama."""
     
+    MEMORY_TTL = 604800        # 7 gün
+    MAX_SUMMARIES = 20
+    MAX_PROMPTS = 10000        # find_similar_prompts ters indeksle çalışır, tur maliyeti büyümez
+    MAX_INDEXED_USERS = 256    # Process içinde indeksi tutulan kullanıcı sayısı (LRU)
+    CONTEXT_CORE_LIMIT = 10    # build_memory_context'in kullandığı dilimler
+    CONTEXT_SUMMARY_LIMIT = 5
+    
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self._prompt_indexes: "OrderedDict[str, PromptIndex]" = OrderedDict()
+        self._scripts: Dict[int, Any] = {}
+
+    @property
+    def client(self):
+        """Gateway'in güncel client'ı (kapatılıp yeniden kurulsa da bayat kalmaz)."""
+        return llm_gateway.client
+    
+    # ===============================
+    # REDIS YAPILARI
+    # ===============================
+    
+    @staticmethod
+    def _keys(user_id) -> Dict[str, str]:
+        base = f"user_memory:{user_id}"
+        return {
+            "legacy": base,
+            "summaries": f"{base}:summaries",
+            "prompts": f"{base}:prompts",
+            "prompt_seq": f"{base}:prompts:seq",
+            "core": f"{base}:core",
+            "prefs": f"{base}:prefs",
+            "style": f"{base}:style",
+        }
+    
+    @staticmethod
+    def _redis():
+        from app.core.cache import cache
+        return cache.client
+    
+    def _touch(self, pipe, keys: Dict[str, str]):
+        """Tüm yapıların TTL'ini birlikte yenile (blob'daki tek TTL davranışı)."""
+        for name in ("summaries", "prompts", "prompt_seq", "core", "prefs", "style"):
+            pipe.expire(keys[name], self.MEMORY_TTL)
+    
+    async def _append(
+        self, user_id, name: str, item: dict, max_len: Optional[int] = None, seq_key: Optional[str] = None
+    ) -> Optional[int]:
+        """Listeye atomik ekle (+ kırp, + sayaç). seq_key verilirse yeni sayaç değerini döndürür."""
+        client = self._redis()
+        if client is None:
+            return None
+        keys = self._keys(user_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.rpush(keys[name], json.dumps(item, ensure_ascii=False, default=str))
+                if max_len:
+                    pipe.ltrim(keys[name], -max_len, -1)
+                if seq_key:
+                    pipe.incr(keys[seq_key])
+                self._touch(pipe, keys)
+                results = await pipe.execute()
+            return results[2 if max_len else 1] if seq_key else None
+        except Exception as e:
+            print(f"⚠️ Hafıza yazma hatası ({name}): {e}")
+            return None
+    
+    async def _set_field(self, user_id, name: str, field: str, value: str):
+        """Hash alanını atomik güncelle."""
+        client = self._redis()
+        if client is None:
+            return
+        keys = self._keys(user_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(keys[name], field, value)
+                self._touch(pipe, keys)
+                await pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Hafıza yazma hatası ({name}): {e}")
+    
+    async def _load(
+        self,
+        user_id,
+        summary_limit: Optional[int] = 0,
+        prompt_limit: Optional[int] = 0,
+        core_limit: Optional[int] = 0,
+    ) -> Dict[str, Any]:
+        """
+        İstenen dilimleri tek pipeline round-trip'inde oku.
+        Limit: 0 → hepsi, N → son N kayıt, None → hiç okuma.
+        Eski blob varsa önce yeni yapılara taşınır.
+        """
+        memory = {
+            "summaries": [],
+            "preferences": {},
+            "successful_prompts": [],
+            "style_preferences": {},
+            "core_memories": []
+        }
+        client = self._redis()
+        if client is None:
+            return memory
+        keys = self._keys(user_id)
+        slices = [
+            (field, name, limit)
+            for field, name, limit in (
+                ("summaries", "summaries", summary_limit),
+                ("successful_prompts", "prompts", prompt_limit),
+                ("core_memories", "core", core_limit),
+            )
+            if limit is not None
+        ]
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.get(keys["legacy"])
+                for _, name, limit in slices:
+                    pipe.lrange(keys[name], -limit if limit else 0, -1)
+                pipe.hgetall(keys["prefs"])
+                pipe.hgetall(keys["style"])
+                legacy, *lists, prefs, style = await pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Hafıza okuma hatası: {e}")
+            return memory
+        
+        if legacy:
+            try:
+                await self._migrate_legacy(user_id)
+            except Exception as e:
+                # Blob yerinde kalır, sonraki okumada yeniden denenir; bu tur native yapılarla devam
+                print(f"⚠️ Hafıza taşıma hatası: {e}")
+            else:
+                return await self._load(user_id, summary_limit, prompt_limit, core_limit)
+        
+        for (field, _, _), items in zip(slices, lists):
+            memory[field] = [json.loads(item) for item in items]
+        memory["preferences"] = dict(prefs or {})
+        memory["style_preferences"] = dict(style or {})
+        return memory
+    
+    async def _migrate_legacy(self, user_id) -> bool:
+        """
+        Eski tek-blob hafızayı native yapılara taşı (bir kez).
+        Blob Python'da dönüştürülür; yazma + blob silme tek Lua script'inde ve
+        yalnızca blob hâlâ aynıysa yapılır → hata olursa blob yerinde kalır,
+        eşzamanlı okuyuculardan yalnızca biri taşır (çift kayıt olmaz).
+        """
+        client = self._redis()
+        keys = self._keys(user_id)
+        raw = await client.get(keys["legacy"])
+        if not raw:
+            return False
+        try:
+            blob = json.loads(raw)
+        except (TypeError, ValueError):
+            blob = {}
+        dump = lambda item: json.dumps(item, ensure_ascii=False, default=str)
+        args: List[Any] = [raw, self.MEMORY_TTL]
+        for items in (
+            (blob.get("summaries") or [])[-self.MAX_SUMMARIES:],
+            (blob.get("successful_prompts") or [])[-self.MAX_PROMPTS:],
+            blob.get("core_memories") or [],
+        ):
+            args += [len(items), *[dump(item) for item in items]]
+        for fields in (blob.get("preferences") or {}, blob.get("style_preferences") or {}):
+            args.append(len(fields))
+            for field, value in fields.items():
+                args += [field, str(value)]
+        script = self._scripts.get(id(client))
+        if script is None:
+            script = client.register_script(MIGRATE_LEGACY_SCRIPT)
+            self._scripts = {id(client): script}
+        migrated = await script(
+            keys=[keys[name] for name in ("legacy", "summaries", "prompts", "core", "prefs", "style", "prompt_seq")],
+            args=args,
+        )
+        if migrated:
+            print(f"🔀 Hafıza yeni yapıya taşındı: user={str(user_id)[:8]}...")
+        return bool(migrated)
     
     # ===============================
     # SOHBET ÖZETLEMESİ
@@ -90,28 +300,12 @@ Türkçe yaz. Sadece özet, başka bir şey yazma."""
         summary: str
     ):
         """Özeti Redis + DB'ye kaydet."""
-        from app.core.cache import cache
-        
-        # Redis'e kaydet (hızlı erişim)
-        memory_key = f"user_memory:{user_id}"
-        existing = await cache.get_json(memory_key) or {
-            "summaries": [],
-            "preferences": {},
-            "successful_prompts": [],
-            "style_preferences": {}
-        }
-        
-        existing["summaries"].append({
+        # Redis'e kaydet (hızlı erişim) — RPUSH + LTRIM (son 20 özet)
+        await self._append(user_id, "summaries", {
             "session_id": str(session_id),
             "summary": summary,
             "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # Son 20 özeti tut
-        if len(existing["summaries"]) > 20:
-            existing["summaries"] = existing["summaries"][-20:]
-        
-        await cache.set_json(memory_key, existing, ttl=604800)  # 7 gün
+        }, max_len=self.MAX_SUMMARIES)
         print(f"💾 Hafıza kaydedildi: user={str(user_id)[:8]}...")
     
     # ===============================
@@ -120,28 +314,23 @@ Türkçe yaz. Sadece özet, başka bir şey yazma."""
     
     async def get_user_memory(self, user_id: uuid.UUID) -> Dict[str, Any]:
         """Kullanıcının tüm hafızasını getir."""
-        from app.core.cache import cache
-        
-        memory_key = f"user_memory:{user_id}"
-        memory = await cache.get_json(memory_key)
-        
-        if not memory:
-            return {
-                "summaries": [],
-                "preferences": {},
-                "successful_prompts": [],
-                "style_preferences": {},
-                "core_memories": []
-            }
-        
-        return memory
+        return await self._load(user_id)
+    
+    async def get_context_memory(self, user_id: uuid.UUID) -> Dict[str, Any]:
+        """build_memory_context'in ihtiyaç duyduğu dilimler (tek round-trip, prompt listesi hariç)."""
+        return await self._load(
+            user_id,
+            summary_limit=self.CONTEXT_SUMMARY_LIMIT,
+            prompt_limit=None,
+            core_limit=self.CONTEXT_CORE_LIMIT,
+        )
     
     async def build_memory_context(self, user_id: uuid.UUID) -> str:
         """
         Geçmiş hafızayı system prompt'a eklenecek context'e dönüştür.
         Agent bu bilgiyle kullanıcıyı "tanır".
         """
-        memory = await self.get_user_memory(user_id)
+        memory = await self.get_context_memory(user_id)
         
         parts = []
         
@@ -218,30 +407,23 @@ Türkçe yaz. Sadece özet, başka bir şey yazma."""
         asset_type: str = "image"
     ):
         """Kullanıcı beğendiğinde prompt'u hafızaya kaydet."""
-        from app.core.cache import cache
-        
-        memory_key = f"user_memory:{user_id}"
-        memory = await cache.get_json(memory_key) or {
-            "summaries": [],
-            "preferences": {},
-            "successful_prompts": [],
-            "style_preferences": {}
-        }
-        
-        memory["successful_prompts"].append({
+        # Token seti + kısıt izi kayıt anında bir kez hesaplanır (sorguda yeniden tokenize yok)
+        record = {
             "prompt": prompt,
-            "memory_prompt": sanitize_memory_text(prompt),
+            **prompt_fingerprint(prompt),
             "result_url": result_url,
             "score": score,
             "asset_type": asset_type,
             "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # Son 50 başarılı prompt
-        if len(memory["successful_prompts"]) > 50:
-            memory["successful_prompts"] = memory["successful_prompts"][-50:]
-        
-        await cache.set_json(memory_key, memory, ttl=604800)
+        }
+        # Son 10k başarılı prompt — RPUSH + LTRIM + INCR seq
+        seq = await self._append(user_id, "prompts", record, max_len=self.MAX_PROMPTS, seq_key="prompt_seq")
+        
+        # Bu process'in indeksi güncelse artımlı ekle (yoksa sonraki sorgu senkronlar)
+        index = self._prompt_indexes.get(str(user_id))
+        if index is not None and seq is not None and index.seq == seq - 1:
+            index.add(record)
+            index.seq = seq
         print(f"⭐ Başarılı prompt kaydedildi: '{prompt[:50]}...' (skor: {score})")
     
     async def find_similar_prompts(
@@ -250,37 +432,53 @@ Türkçe yaz. Sadece özet, başka bir şey yazma."""
         query: str,
         limit: int = 3
     ) -> List[Dict[str, Any]]:
-        """Geçmiş başarılı prompt'lardan benzerleri bul."""
-        memory = await self.get_user_memory(user_id)
-        prompts = memory.get("successful_prompts", [])
-        
-        if not prompts:
+        """Geçmiş başarılı prompt'lardan benzerleri bul (kullanıcı başına ters indeks)."""
+        index = await self._prompt_index(user_id)
+        if index is None or not len(index):
             return []
-        
-        query_words = tokenize_memory_text(query)
-        if not query_words:
-            return []
-
-        scored = []
-        
-        for p in prompts:
-            raw_prompt = p.get("prompt", "")
-            if has_conflicting_request_constraints(query, raw_prompt):
-                continue
-
-            memory_prompt = p.get("memory_prompt") or sanitize_memory_text(raw_prompt)
-            if not memory_prompt:
-                continue
-
-            prompt_words = tokenize_memory_text(memory_prompt)
-            overlap = len(query_words & prompt_words)
-            if overlap > 0:
-                enriched = dict(p)
-                enriched["memory_prompt"] = memory_prompt
-                scored.append((overlap, p.get("score", 0), enriched))
-        
-        scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
-        return [item[2] for item in scored[:limit]]
+        return index.search(query, limit=limit)
+    
+    async def _prompt_index(self, user_id: uuid.UUID) -> Optional[PromptIndex]:
+        """
+        Kullanıcının prompt indeksini Redis ile senkronla.
+        Değişiklik yoksa tek GET; yeni kayıt varsa yalnızca kuyruk okunur.
+        """
+        client = self._redis()
+        if client is None:
+            return None
+        keys = self._keys(user_id)
+        cache_key = str(user_id)
+        index = self._prompt_indexes.get(cache_key)
+        
+        for _ in range(3):
+            try:
+                seq = int(await client.get(keys["prompt_seq"]) or 0)
+                if index is not None and seq == index.seq:
+                    break
+                incremental = index is not None and 0 < seq - index.seq <= self.MAX_PROMPTS
+                start = -(seq - index.seq) if incremental else 0
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.get(keys["prompt_seq"])
+                    pipe.lrange(keys["prompts"], start, -1)
+                    current, items = await pipe.execute()
+            except Exception as e:
+                print(f"⚠️ Prompt indeksi senkron hatası: {e}")
+                return index
+            if int(current or 0) != seq:
+                continue  # Arada yeni kayıt geldi, tekrar dene
+            if not incremental:
+                index = PromptIndex(max_entries=self.MAX_PROMPTS, mode=settings.PROMPT_RECALL_MODE)
+            for item in items:
+                index.add(json.loads(item))
+            index.seq = seq
+            break
+        
+        if index is not None:
+            self._prompt_indexes[cache_key] = index
+            self._prompt_indexes.move_to_end(cache_key)
+            while len(self._prompt_indexes) > self.MAX_INDEXED_USERS:
+                self._prompt_indexes.popitem(last=False)
+        return index
     
     # ===============================
     # TERCİH ÖĞRENME
@@ -293,22 +491,11 @@ Türkçe yaz. Sadece özet, başka bir şey yazma."""
         value: str
     ):
         """Kullanıcı tercihini güncelle."""
-        from app.core.cache import cache
-        
-        memory_key = f"user_memory:{user_id}"
-        memory = await cache.get_json(memory_key) or {
-            "summaries": [],
-            "preferences": {},
-            "successful_prompts": [],
-            "style_preferences": {}
-        }
-        
         fact = f"{key}: {value}"
         if not is_stable_memory_fact("general", fact):
             return
 
-        memory["preferences"][key] = sanitize_memory_text(str(value))
-        await cache.set_json(memory_key, memory, ttl=604800)
+        await self._set_field(user_id, "prefs", key, sanitize_memory_text(str(value)))
     
     async def update_style_preference(
         self,
@@ -317,16 +504,6 @@ Türkçe yaz. Sadece özet, başka bir şey yazma."""
         style_value: str
     ):
         """Stil tercihini kaydet."""
-        from app.core.cache import cache
-        
-        memory_key = f"user_memory:{user_id}"
-        memory = await cache.get_json(memory_key) or {
-            "summaries": [],
-            "preferences": {},
-            "successful_prompts": [],
-            "style_preferences": {}
-        }
-        
         if style_key not in ALLOWED_STYLE_PREFERENCE_KEYS:
             return
 
@@ -334,8 +511,7 @@ Türkçe yaz. Sadece özet, başka bir şey yazma."""
         if not sanitized_value:
             return
 
-        memory["style_preferences"][style_key] = sanitized_value
-        await cache.set_json(memory_key, memory, ttl=604800)
+        await self._set_field(user_id, "style", style_key, sanitized_value)
 
     # ===============================
     # CORE MEMORY (ÇEKİRDEK HAFIZA)
@@ -348,71 +524,51 @@ Türkçe yaz. Sadece özet, başka bir şey yazma."""
         fact: str
     ):
         """Kullanıcının temel bir özelliğini veya kuralını kalıcı hafızaya kaydet."""
-        from app.core.cache import cache
-        
-        memory_key = f"user_memory:{user_id}"
-        memory = await cache.get_json(memory_key) or {
-            "summaries": [],
-            "preferences": {},
-            "successful_prompts": [],
-            "style_preferences": {},
-            "core_memories": []
-        }
-        
         if not is_stable_memory_fact(category, fact):
             return
 
-        if "core_memories" not in memory:
-            memory["core_memories"] = []
-
         sanitized_fact = sanitize_memory_text(fact)
         if not sanitized_fact:
             return
 
-        memory["core_memories"].append({
+        await self._append(user_id, "core", {
             "category": category,
             "fact": sanitized_fact,
             "timestamp": datetime.utcnow().isoformat()
         })
-        
-        await cache.set_json(memory_key, memory, ttl=604800)
         print(f"🧠 Core memory eklendi ({category}): {fact[:50]}...")
 
     async def delete_core_memory(self, user_id: uuid.UUID, fact_query: str) -> bool:
         """Belirli bir cümleye veya içeriğe uyan hafızayı sil."""
-        from app.core.cache import cache
-        
-        memory_key = f"user_memory:{user_id}"
-        memory = await cache.get_json(memory_key)
-        
-        if not memory or "core_memories" not in memory:
+        client = self._redis()
+        if client is None:
             return False
-            
-        initial_length = len(memory["core_memories"])
+        
+        key = self._keys(user_id)["core"]
+        await self._load(user_id, summary_limit=None, prompt_limit=None, core_limit=None)  # Eski blob varsa önce taşı
+        items = await client.lrange(key, 0, -1)
         
         # Eğer fact_query tam eşleşiyorsa veya içeriyorsa sil (case-insensitive)
-        memory["core_memories"] = [
-            m for m in memory["core_memories"]
-            if fact_query.lower() not in m["fact"].lower()
-        ]
+        # LREM değer bazlı — bu arada eklenen diğer kayıtlara dokunmaz
+        matches = [item for item in items if fact_query.lower() in json.loads(item)["fact"].lower()]
+        if not matches:
+            return False
         
-        if len(memory["core_memories"]) < initial_length:
-            await cache.set_json(memory_key, memory, ttl=604800)
-            print(f"🗑️ Core memory silindi: '{fact_query}'")
-            return True
-            
-        return False
+        async with client.pipeline(transaction=True) as pipe:
+            for item in matches:
+                pipe.lrem(key, 0, item)
+            await pipe.execute()
+        print(f"🗑️ Core memory silindi: '{fact_query}'")
+        return True
         
     async def clear_core_memories(self, user_id: uuid.UUID):
         """Kullanıcının tüm çekirdek hafızasını temizle."""
-        from app.core.cache import cache
-        
-        memory_key = f"user_memory:{user_id}"
-        memory = await cache.get_json(memory_key)
+        client = self._redis()
+        if client is None:
+            return
         
-        if memory and "core_memories" in memory:
-            memory["core_memories"] = []
-            await cache.set_json(memory_key, memory, ttl=604800)
+        await self._load(user_id, summary_limit=None, prompt_limit=None, core_limit=None)  # Eski blob varsa önce taşı
+        if await client.delete(self._keys(user_id)["core"]):
             print("🧹 Tüm core memory temizlendi.")
 
 # Singleton
@@ -0,0 +1,363 @@
+"""
+Daily Rollups — admin paneli için gün bazlı özet tablo (daily_rollups).
+
+Eskiden /admin/stats/* her istekte sessions, messages, generated_assets
+üzerinde art arda count() çalıştırıyor ve model adlarını her seferinde büyük
+bir Python haritasıyla normalize ediyordu; gecikme tablolarla birlikte büyüyordu.
+Burada:
+1. Yazarken: commit edilen ORM insert/delete'ler (gün, metrik, anahtar) deltası
+   olarak bellekte toplanır, flusher FLUSH_INTERVAL'da bir tek upsert ile yazar
+   (rollback olan transaction'ın deltası atılır)
+2. Model adı yazarken kanonik id'ye çevrilir (GeneratedAsset.model_canonical)
+3. Zamanlanmış görev son REFRESH_DAYS günü kaynaktan yeniden hesaplar; gece tam
+   yeniden kurulum (eksik kanonik adları da doldurur) — toplu DELETE / CASCADE
+   gibi ORM dışı değişiklikler düzelir
+4. Yenileme, kapsadığı her gün için "refreshed_at" işareti (epoch ms) yazar.
+   Deltalar commit saniyesiyle tamponlanır; flush, işaretten önce commit
+   edilmiş (yani yenilemenin zaten kaynaktan saydığı) deltaları atar →
+   yenileme + geç flush aynı yazımı iki kez saymaz. Kalan sapma sınırlı
+   (≤ 1 sn + saat farkı) ve bir sonraki yenilemede düzelir
+5. Admin uçları O(gün) satırı tek sorguda okur
+"""
+import asyncio
+import time as clock
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Mapping, Optional, Tuple
+
+from sqlalchemy import (
+    BigInteger, Date, String, and_, cast, column, delete, event, func, inspect, literal, literal_column, or_,
+    select, union, union_all, update, values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session as OrmSession
+
+from app.core.database import async_session_maker
+from app.models.models import DailyRollup, GeneratedAsset, Message, Session, UsageStats, User
+from app.services.model_names import canonical_model_name  # model_canonical listener'ını da kaydeder
+
+RollupKey = Tuple[date, str, str]   # (gün, metrik, anahtar)
+PendingKey = Tuple[date, str, str, int]   # + commit saniyesi (epoch)
+
+# Kaynak tablodan yeniden hesaplanan metrikler
+COUNT_METRICS = ("users", "sessions", "messages", "assets", "models")
+USAGE_METRICS = ("api_calls", "images_generated", "videos_generated", "tokens_used")
+
+_SESSION_INFO_KEY = "daily_rollup_deltas"
+REFRESH_MARKER = "refreshed_at"   # (gün, REFRESH_MARKER, "") → son yenilemenin epoch ms'i
+REFRESH_LOCK_ID = 0x524F4C4C   # "ROLL" — üst üste binen yenilemeleri engeller
+FLUSH_LOCK_ID = 0x524F4C46     # "ROLF" — flush (shared) ↔ yenileme (exclusive)
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _utc_day(column):
+    """timestamptz → UTC günü (GROUP BY'da aynı ifade olsun diye bind parametresiz)."""
+    return cast(func.timezone(literal_column("'UTC'"), column), Date)
+
+
+def rollup_keys(obj, values: Mapping) -> list:
+    """Bir ORM nesnesinin etkilediği (metrik, anahtar) çiftleri."""
+    if isinstance(obj, User):
+        return [("users", "")]
+    if isinstance(obj, Session):
+        return [("sessions", "")]
+    if isinstance(obj, Message):
+        return [("messages", "")]
+    if isinstance(obj, GeneratedAsset):
+        keys = [("assets", values.get("asset_type") or "")]
+        if values.get("model_canonical"):
+            keys.append(("models", values["model_canonical"]))
+        return keys
+    return []
+
+
+class DailyRollups:
+    """Günlük özet sayaçlarını yazma anında toplar, periyodik olarak yazar ve yeniden hesaplar."""
+
+    FLUSH_INTERVAL = 5.0        # saniye
+    MAX_PENDING_KEYS = 500      # Bu kadar farklı anahtar birikince beklemeden flush
+    REFRESH_DAYS = 2            # Zamanlanmış yenilemenin baktığı pencere (bugün + dün)
+
+    def __init__(self):
+        self._pending: Dict[PendingKey, int] = {}
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle = True
+        self._stats = {"deltas": 0, "flushes": 0, "rows_written": 0, "flush_errors": 0, "refreshes": 0}
+
+    # ===============================
+    # PUBLIC API
+    # ===============================
+
+    def add(self, deltas: Mapping[RollupKey, int], committed_at: Optional[float] = None):
+        """Commit edilmiş deltaları commit saniyesiyle tampona ekle (IO yok)."""
+        second = int(committed_at if committed_at is not None else clock.time())
+        for key, value in deltas.items():
+            if value:
+                pending_key = (*key, second)
+                self._pending[pending_key] = self._pending.get(pending_key, 0) + value
+                self._stats["deltas"] += 1
+        if not self._pending:
+            return
+        try:
+            self._ensure_flusher()
+        except RuntimeError:
+            return  # Loop dışı (senkron) commit: bir sonraki flush/yenileme yazar
+        if self._idle or len(self._pending) >= self.MAX_PENDING_KEYS:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Bekleyen deltaları tek upsert ile yaz → gönderilen delta satırı sayısı."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        rows = [
+            {"day": day, "metric": metric, "key": key, "value": value, "committed_at": second}
+            for (day, metric, key, second), value in batch.items()
+        ]
+        try:
+            async with async_session_maker() as db:
+                # Devam eden yenileme varsa bitmesini bekle → işaretin son halini görürüz
+                await db.execute(select(func.pg_advisory_xact_lock_shared(FLUSH_LOCK_ID)))
+                await db.execute(self.build_delta_upsert(rows))
+                await db.commit()
+        except BaseException as e:
+            # Deltalar kaybolmasın: bu arada gelenlerle birleştir
+            for key, value in batch.items():
+                self._pending[key] = self._pending.get(key, 0) + value
+            if not isinstance(e, Exception):
+                raise
+            self._stats["flush_errors"] += 1
+            print(f"⚠️ Günlük özetler yazılamadı ({len(rows)} satır): {e}")
+            return 0
+        self._stats["flushes"] += 1
+        self._stats["rows_written"] += len(rows)
+        return len(rows)
+
+    @staticmethod
+    def build_upsert(rows: list):
+        """INSERT ... ON CONFLICT (gün, metrik, anahtar) DO UPDATE SET value = value + EXCLUDED.value"""
+        statement = insert(DailyRollup).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=[DailyRollup.day, DailyRollup.metric, DailyRollup.key],
+            set_={"value": DailyRollup.value + statement.excluded.value, "updated_at": func.now()},
+        )
+
+    @staticmethod
+    def build_delta_upsert(rows: list):
+        """
+        Tamponlanmış deltaları, günün yenileme işaretinden SONRA commit edilmiş
+        olanlarla sınırlayıp (gün, metrik, anahtar) başına toplayarak upsert et.
+        """
+        deltas = values(
+            column("day", Date), column("metric", String), column("key", String),
+            column("value", BigInteger), column("committed_at", BigInteger),
+            name="deltas",
+        ).data([(r["day"], r["metric"], r["key"], r["value"], r["committed_at"]) for r in rows])
+        marker = DailyRollup.__table__.alias("marker")
+        fresh = (
+            select(deltas.c.day, deltas.c.metric, deltas.c.key, func.sum(deltas.c.value))
+            .select_from(deltas.outerjoin(marker, and_(
+                marker.c.day == deltas.c.day, marker.c.metric == REFRESH_MARKER, marker.c.key == "",
+            )))
+            .where(or_(marker.c.value.is_(None), deltas.c.committed_at * 1000 >= marker.c.value))
+            .group_by(deltas.c.day, deltas.c.metric, deltas.c.key)
+        )
+        statement = insert(DailyRollup).from_select(["day", "metric", "key", "value"], fresh)
+        return statement.on_conflict_do_update(
+            index_elements=[DailyRollup.day, DailyRollup.metric, DailyRollup.key],
+            set_={"value": DailyRollup.value + statement.excluded.value, "updated_at": func.now()},
+        )
+
+    @staticmethod
+    def build_refresh_marker(since: Optional[date], marked_at_ms: int):
+        """Yenilenen günlere (since → bugün; tam yenilemede özet tablodaki tüm günler) işaret yaz."""
+        days = select(DailyRollup.day).where(DailyRollup.metric != REFRESH_MARKER)
+        if since is not None:
+            days = days.where(DailyRollup.day >= since)
+        first = since or utc_today()
+        explicit = [select(cast(literal(first + timedelta(days=i)), Date)) for i in range((utc_today() - first).days + 1)]
+        refreshed = union(days, *explicit).subquery("refreshed")
+        statement = insert(DailyRollup).from_select(
+            ["day", "metric", "key", "value"],
+            select(refreshed.c.day, literal(REFRESH_MARKER), literal(""), literal(marked_at_ms, BigInteger)),
+        )
+        return statement.on_conflict_do_update(
+            index_elements=[DailyRollup.day, DailyRollup.metric, DailyRollup.key],
+            set_={"value": statement.excluded.value, "updated_at": func.now()},
+        )
+
+    @staticmethod
+    def build_refresh(since: Optional[date]) -> list:
+        """since'ten (None → tüm geçmiş) itibaren kaynak tablolardan yeniden hesaplayan ifadeler."""
+        since_ts = datetime.combine(since, time.min, tzinfo=timezone.utc) if since else None
+
+        def counted(metric: str, model, key=None, *where):
+            day = _utc_day(model.created_at)
+            key_column = func.coalesce(key, literal_column("''")) if key is not None else literal("")
+            query = select(day, literal(metric), key_column, func.count()).group_by(day)
+            if key is not None:
+                query = query.group_by(key_column)
+            if since_ts is not None:
+                query = query.where(model.created_at >= since_ts)
+            return query.where(*where)
+
+        sources = [
+            counted("users", User),
+            counted("sessions", Session),
+            counted("messages", Message),
+            counted("assets", GeneratedAsset, GeneratedAsset.asset_type),
+            counted("models", GeneratedAsset, GeneratedAsset.model_canonical, GeneratedAsset.model_canonical.isnot(None)),
+        ]
+        for metric in USAGE_METRICS:
+            # Yalnızca kullanıcı toplamı satırları (model_name NULL); model kırılımı çift sayılmasın
+            query = (
+                select(UsageStats.day, literal("usage"), literal(metric), func.sum(getattr(UsageStats, metric)))
+                .where(UsageStats.model_name.is_(None))
+                .group_by(UsageStats.day)
+            )
+            if since is not None:
+                query = query.where(UsageStats.day >= since)
+            sources.append(query)
+
+        clear = delete(DailyRollup).where(DailyRollup.metric.in_(COUNT_METRICS + ("usage",)))
+        if since is not None:
+            clear = clear.where(DailyRollup.day >= since)
+        statement = insert(DailyRollup).from_select(["day", "metric", "key", "value"], union_all(*sources))
+        rebuild = statement.on_conflict_do_update(
+            index_elements=[DailyRollup.day, DailyRollup.metric, DailyRollup.key],
+            set_={"value": statement.excluded.value, "updated_at": func.now()},
+        )
+        return [clear, rebuild]
+
+    async def refresh(self, days: Optional[int] = REFRESH_DAYS) -> int:
+        """Son `days` günü (None → tümü) kaynaktan yeniden hesapla → yazılan satır sayısı."""
+        since = utc_today() - timedelta(days=days - 1) if days else None
+        clear, rebuild = self.build_refresh(since)
+        async with async_session_maker() as db:
+            # Üst üste binen beat tetiklemeleri aynı satırları birlikte silip yazmasın
+            locked = await db.execute(select(func.pg_try_advisory_xact_lock(REFRESH_LOCK_ID)))
+            if not locked.scalar():
+                return 0
+            if since is None:
+                await self.backfill_canonical_names(db)
+            # Flush'lar yenileme boyunca beklesin; işaret, kaynağın okunduğu andan hemen önce
+            await db.execute(select(func.pg_advisory_xact_lock(FLUSH_LOCK_ID)))
+            marked_at = await db.execute(
+                select(cast(func.extract("epoch", func.clock_timestamp()) * 1000, BigInteger))
+            )
+            marked_at_ms = int(marked_at.scalar())
+            await db.execute(clear)
+            result = await db.execute(rebuild)
+            await db.execute(self.build_refresh_marker(since, marked_at_ms))
+            await db.commit()
+        self._stats["refreshes"] += 1
+        return result.rowcount or 0
+
+    @staticmethod
+    async def backfill_canonical_names(db) -> int:
+        """model_canonical'ı boş kalan asset'leri (eski satırlar, ORM dışı insert'ler) doldur."""
+        result = await db.execute(
+            select(GeneratedAsset.model_name)
+            .where(GeneratedAsset.model_canonical.is_(None), GeneratedAsset.model_name.isnot(None))
+            .distinct()
+        )
+        updated = 0
+        for (model_name,) in result.all():
+            canonical = canonical_model_name(model_name)
+            if canonical:
+                await db.execute(
+                    update(GeneratedAsset)
+                    .where(GeneratedAsset.model_name == model_name, GeneratedAsset.model_canonical.is_(None))
+                    .values(model_canonical=canonical)
+                )
+                updated += 1
+        return updated
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "pending_keys": len(self._pending)}
+
+    async def shutdown(self):
+        """Flusher'ı durdur ve bekleyenleri yaz."""
+        if self._flusher_task and not self._flusher_task.done():
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._flusher_task = None
+        self._wakeup = None
+        self._loop = None
+        await self.flush()
+
+    # ===============================
+    # FLUSHER
+    # ===============================
+
+    def _ensure_flusher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._flusher_task is None or self._flusher_task.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._flusher_task = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            if not self._pending:
+                self._idle = True
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                self._idle = False
+                if len(self._pending) < self.MAX_PENDING_KEYS:
+                    self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+# Singleton instance
+daily_rollups = DailyRollups()
+
+
+# ===============================
+# ORM HOOK'LARI (yazma anında artırım)
+# ===============================
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_rollup_deltas(session, flush_context):
+    """Flush edilen insert/delete'leri transaction commit olana kadar session.info'da tut."""
+    deltas = None
+    today = utc_today()
+    for obj in session.new:
+        values = inspect(obj).dict
+        for metric, key in rollup_keys(obj, values):
+            deltas = deltas if deltas is not None else session.info.setdefault(_SESSION_INFO_KEY, Counter())
+            deltas[(today, metric, key)] += 1
+    for obj in session.deleted:
+        values = inspect(obj).dict
+        created_at = values.get("created_at")
+        if created_at is None:
+            continue  # Yüklenmemiş satır: zamanlanmış yenileme düzeltir
+        day = created_at.astimezone(timezone.utc).date() if created_at.tzinfo else created_at.date()
+        for metric, key in rollup_keys(obj, values):
+            deltas = deltas if deltas is not None else session.info.setdefault(_SESSION_INFO_KEY, Counter())
+            deltas[(day, metric, key)] -= 1
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _publish_rollup_deltas(session):
+    deltas = session.info.pop(_SESSION_INFO_KEY, None)
+    if deltas:
+        daily_rollups.add(deltas, committed_at=clock.time())
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _drop_rollup_deltas(session):
+    session.info.pop(_SESSION_INFO_KEY, None)
@@ -0,0 +1,244 @@
+"""
+Derived Asset Cache - Referans görsellerden türetilen varlıklar için cache.
+
+Aynı karakter referans fotoğrafı her üretimde yeniden işleniyordu:
+- _smart_generate_with_face → her seferinde BiRefNet arka plan kaldırma
+- Video üretimi (fal + Veo) → her seferinde indir + 1280px küçült + yeniden yükle
+- _extract_frame → aynı videodan her seferinde fal ffmpeg-api çağrısı
+
+Entity.reference_image_url nadiren değişir; sonuç (fal URL'i) deterministiktir.
+- Anahtar: kaynak URL + işlem + parametreler → sha256
+- Katman 1: process içi LRU
+- Katman 2: Redis (uzun TTL, tüm worker'lar paylaşır)
+- Aynı anda gelen özdeş istekler tek fal çağrısını paylaşır
+- EntityService, entity oluşturulunca / referansı değişince cache'i arka planda ısıtır
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import fal_client
+
+from app.core.cache import cache
+from app.core.single_flight import SingleFlight
+from app.services.media_io import media_io
+
+logger = logging.getLogger(__name__)
+
+
+class DerivedAssetCache:
+    """(kaynak, işlem, parametreler) → türetilmiş varlık URL'i."""
+
+    MAX_LOCAL_ENTRIES = 2048
+    LOCAL_TTL = 6 * 3600       # 6 saat
+    REDIS_TTL = 30 * 86400     # 30 gün (fal CDN URL'leri bundan uzun yaşar)
+    VIDEO_MAX_DIM = 1280       # Video modelleri (Kling, Veo) için referans üst sınırı
+
+    def __init__(self):
+        self._local: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._flights = SingleFlight()
+        self._warm_tasks: set[asyncio.Task] = set()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "shared": 0, "warmed": 0}
+
+    @staticmethod
+    def make_key(source_url: str, operation: str, params: Optional[dict] = None) -> str:
+        raw = "\x1f".join([operation, source_url.strip(), json.dumps(params or {}, sort_keys=True)])
+        return f"derived:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    async def get_or_create(
+        self,
+        source_url: str,
+        operation: str,
+        compute: Callable[[], Awaitable[Optional[str]]],
+        params: Optional[dict] = None,
+    ) -> Optional[str]:
+        """
+        Cache'ten döndür, yoksa compute() çalıştır ve sakla.
+        compute() None döner veya hata fırlatırsa sonuç cache'lenmez.
+        """
+        key = self.make_key(source_url, operation, params)
+
+        local = self._get_local(key)
+        if local is not None:
+            self._stats["local_hits"] += 1
+            return local
+
+        async def _load() -> Optional[str]:
+            value = await cache.get(key) if cache.is_connected else None
+            if value is not None:
+                self._stats["redis_hits"] += 1
+            else:
+                self._stats["misses"] += 1
+                value = await compute()
+                if value and cache.is_connected:
+                    await cache.set(key, value, ttl=self.REDIS_TTL)
+            if value:
+                self._set_local(key, value)
+            return value
+
+        return await self._flights.do(key, _load, on_shared=self._count_shared)
+
+    def _count_shared(self):
+        self._stats["shared"] += 1
+
+    # ===============================
+    # İŞLEMLER
+    # ===============================
+
+    async def remove_background(self, image_url: str, timeout: float = 15) -> Optional[str]:
+        """BiRefNet ile arka planı kaldırılmış PNG'nin URL'i (başarısızsa None)."""
+        params = {"model": "General Use (Heavy)", "operating_resolution": "1024x1024", "output_format": "png"}
+
+        async def _compute() -> Optional[str]:
+            result = await asyncio.wait_for(
+                fal_client.subscribe_async(
+                    "fal-ai/birefnet",
+                    arguments={"image_url": image_url, **params},
+                    with_logs=True,
+                ),
+                timeout=timeout,
+            )
+            return result["image"]["url"] if result and "image" in result else None
+
+        return await self.get_or_create(image_url, "birefnet", _compute, params)
+
+    async def downscale(self, image_url: str, max_dim: int = VIDEO_MAX_DIM) -> str:
+        """
+        Uzun kenarı max_dim'i aşan görseli küçültüp yükler, URL'ini döndürür.
+        Zaten küçükse kaynak URL'in kendisi cache'lenir (bir dahaki sefere indirme de yok).
+        """
+        async def _compute() -> Optional[str]:
+            tmp_path = await media_io.download_to_file(
+                image_url, suffix=".jpg", max_bytes=media_io.MAX_IMAGE_BYTES
+            )
+            try:
+                resized = await asyncio.to_thread(self._resize_in_place, tmp_path, max_dim)
+                if not resized:
+                    return image_url
+                new_url = await media_io.upload_file(tmp_path)
+                logger.info(f"📐 Referans görsel küçültüldü ve yüklendi: {new_url}")
+                return new_url
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        return await self.get_or_create(image_url, "downscale", _compute, {"max_dim": max_dim}) or image_url
+
+    async def extract_frame(self, video_url: str) -> Optional[str]:
+        """fal ffmpeg-api ile videonun 1. saniyesinden tek kare (başarısızsa None)."""
+        async def _compute() -> Optional[str]:
+            # -ss 00:00:01 : 1. saniyeden al (başlangıç bazen siyah olabilir)
+            command = f"ffmpeg -i {video_url} -ss 00:00:01 -vframes 1 output.png"
+            result = await fal_client.subscribe_async(
+                "fal-ai/ffmpeg-api",
+                arguments={"command": command},
+                with_logs=True,
+            )
+            if result and "outputs" in result and len(result["outputs"]) > 0:
+                return result["outputs"][0]["url"]
+            return None
+
+        return await self.get_or_create(video_url, "extract_frame", _compute)
+
+    @staticmethod
+    def _resize_in_place(path: str, max_dim: int) -> bool:
+        """Görseli yerinde küçült (boyutlar 8'in katı). Küçültme yapıldıysa True."""
+        from PIL import Image
+
+        with Image.open(path) as img:
+            orig_w, orig_h = img.size
+            if orig_w <= max_dim and orig_h <= max_dim:
+                return False
+            if orig_w > orig_h:
+                new_w = max_dim
+                new_h = int(orig_h * (max_dim / orig_w))
+            else:
+                new_h = max_dim
+                new_w = int(orig_w * (max_dim / orig_h))
+            new_w = new_w - (new_w % 8)
+            new_h = new_h - (new_h % 8)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+            img.save(path, format="JPEG", quality=95)
+        logger.info(f"📐 Görsel küçültüldü: {orig_w}x{orig_h} → {new_w}x{new_h}")
+        return True
+
+    # ===============================
+    # ISITMA
+    # ===============================
+
+    def warm_reference(self, image_url: Optional[str]):
+        """
+        Referans görselin türevlerini arka planda hazırla (arka plan kaldırma + video boyutu).
+        Çağıranı bekletmez, hata fırlatmaz.
+        """
+        if not image_url or not image_url.startswith("http"):
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._warm(image_url))
+        except RuntimeError:
+            return
+        self._warm_tasks.add(task)
+        task.add_done_callback(self._warm_tasks.discard)
+
+    async def _warm(self, image_url: str):
+        results = await asyncio.gather(
+            self.remove_background(image_url),
+            self.downscale(image_url),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Referans ısıtma hatası ({image_url[:60]}): {result}")
+        self._stats["warmed"] += 1
+
+    async def shutdown(self):
+        for task in list(self._warm_tasks):
+            task.cancel()
+        if self._warm_tasks:
+            await asyncio.gather(*self._warm_tasks, return_exceptions=True)
+        self._warm_tasks.clear()
+
+    # ===============================
+    # LRU
+    # ===============================
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            self._local.pop(key, None)
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: str):
+        self._local[key] = (time.monotonic() + self.LOCAL_TTL, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.MAX_LOCAL_ENTRIES:
+            self._local.popitem(last=False)
+
+    def clear(self):
+        self._local.clear()
+
+    def get_stats(self) -> dict:
+        hits = self._stats["local_hits"] + self._stats["redis_hits"] + self._stats["shared"]
+        total = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "local_entries": len(self._local),
+            "warming": len(self._warm_tasks),
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+# Singleton instance
+derived_asset_cache = DerivedAssetCache()
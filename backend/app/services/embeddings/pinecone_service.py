@@ -4,9 +4,8 @@ Entity ve Asset'ler için vektör tabanlı semantik arama.
 """
 import hashlib
 from typing import Optional, List, Dict, Any
-from openai import OpenAI
-
 from app.core.config import settings
+from app.services.llm.llm_gateway import llm_gateway
 
 
 class PineconeService:
@@ -14,7 +13,7 @@ class PineconeService:
     
     def __init__(self):
         self._index = None
-        self._openai_client = None
+        self._embeddings_ready = False
         self._initialized = False
     
     async def initialize(self) -> bool:
@@ -55,9 +54,9 @@ class PineconeService:
             
             self._index = pc.Index(index_name)
             
-            # OpenAI client (embedding için)
+            # Embedding'ler paylaşılan async LLM gateway üzerinden
             if settings.OPENAI_API_KEY:
-                self._openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+                self._embeddings_ready = True
             else:
                 print("⚠️ OPENAI_API_KEY eksik - embedding oluşturulamayacak")
                 return False
@@ -80,15 +79,11 @@ class PineconeService:
         Returns:
             1536 boyutlu float listesi veya None
         """
-        if not self._openai_client:
+        if not self._embeddings_ready:
             return None
             
         try:
-            response = self._openai_client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text
-            )
-            return response.data[0].embedding
+            return await llm_gateway.embed(text, model="text-embedding-ada-002")
         except Exception as e:
             print(f"❌ Embedding oluşturma hatası: {e}")
             return None
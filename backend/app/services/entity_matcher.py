@@ -0,0 +1,90 @@
+"""
+Entity Matcher - Mesajdaki entity isimlerini tek derlenmiş regex ile bulur.
+
+Eskiden resolve_by_name her chat turunda kullanıcının TÜM entity'lerini yükleyip
+her biri için ayrı regex derleyip mesajı tekrar tarıyordu (maliyet entity
+sayısıyla doğrusal). Burada:
+1. Kullanıcının isimleri tek bir trie-regex'e derlenir (ortak önekler
+   birleşir → tarama maliyeti isim sayısından neredeyse bağımsız)
+2. Türkçe ekler: "emreyi", "ormanda", "nike'ın" gibi ekli yazımlar da eşleşir;
+   kelime sınırı kontrolü korunur ("gem" → "gemini" içinde eşleşmez)
+3. Aynı konumda en uzun isim kazanır ("Emre Yılmaz" > "Emre")
+4. Derlenen matcher isim kümesine göre process içinde LRU ile tutulur;
+   isim listesi ContextCache'te (process + Redis) ve entity yazımında silinir
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+# Apostrofsuz yazılan yaygın Türkçe ekler (tek harfliler yanlış pozitif üretir, alınmaz)
+TURKISH_SUFFIXES = (
+    "yi", "yı", "yu", "yü", "ye", "ya",
+    "nin", "nın", "nun", "nün", "in", "ın", "un", "ün",
+    "de", "da", "te", "ta", "den", "dan", "ten", "tan",
+    "nde", "nda", "nden", "ndan",
+    "le", "la", "yle", "yla", "ler", "lar", "leri", "ları",
+)
+
+MIN_NAME_LENGTH = 2   # Tek harf false positive verir
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Kelimeleri ortak önekleri birleşmiş bir regex alternasyonuna çevir."""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Kelime burada da bitebiliyorsa devamı opsiyonel (greedy → uzun olan önce denenir)
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class EntityNameMatcher:
+    """Bir kullanıcının entity isimleri için derlenmiş eşleştirici."""
+
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        # entries: (entity_id, name)
+        self._ids_by_name: Dict[str, List[str]] = {}
+        for entity_id, name in entries:
+            key = (name or "").strip().lower()
+            if len(key) >= MIN_NAME_LENGTH:
+                self._ids_by_name.setdefault(key, []).append(entity_id)
+
+        self._pattern = None
+        if self._ids_by_name:
+            suffixes = "|".join(sorted(TURKISH_SUFFIXES, key=len, reverse=True))
+            self._pattern = re.compile(
+                r"(?<!\w)(" + _trie_pattern(self._ids_by_name) + r")(?:" + suffixes + r")?(?!\w)"
+            )
+
+    def __len__(self) -> int:
+        return len(self._ids_by_name)
+
+    def match(self, text: str) -> List[str]:
+        """Metinde geçen entity id'leri (ilk geçiş sırasıyla, tekrarsız)."""
+        if self._pattern is None or not text:
+            return []
+        found: Dict[str, None] = {}
+        for match in self._pattern.finditer(text.lower()):
+            for entity_id in self._ids_by_name.get(match.group(1), ()):
+                found.setdefault(entity_id, None)
+        return list(found)
+
+
+@lru_cache(maxsize=1024)
+def _compile(entries: Tuple[Tuple[str, str], ...]) -> EntityNameMatcher:
+    return EntityNameMatcher(entries)
+
+
+def get_name_matcher(entries: Iterable[Iterable[str]]) -> EntityNameMatcher:
+    """İsim listesi aynı kaldıkça aynı derlenmiş matcher'ı döndür."""
+    return _compile(tuple(sorted((str(entity_id), name) for entity_id, name in entries)))
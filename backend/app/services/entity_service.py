@@ -4,11 +4,15 @@ Entity Service - Karakter, mekan, nesne yönetimi.
 import re
 import uuid
 from typing import Optional
-from sqlalchemy import select
+from sqlalchemy import String, any_, bindparam, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.models import Entity
 from app.core.config import settings
+from app.services.agent.context_pipeline import context_cache
+from app.services.entity_matcher import EntityNameMatcher, get_name_matcher
+from app.services.derived_asset_cache import derived_asset_cache
 
 
 def slugify(text: str) -> str:
@@ -88,6 +92,9 @@ class EntityService:
         db.add(entity)
         await db.commit()
         await db.refresh(entity)
+        await context_cache.invalidate_entities(user_id)
+        # Referansın türevlerini (arka plan kaldırma, video boyutu) ilk üretimden önce hazırla
+        derived_asset_cache.warm_reference(reference_image_url)
         
         # 🔍 Pinecone'a ekle (arka planda, hata durumunda sessizce devam et)
         if settings.USE_PINECONE:
@@ -245,6 +252,9 @@ class EntityService:
         
         await db.commit()
         await db.refresh(entity)
+        await context_cache.invalidate_entities(entity.user_id)
+        if updates.get("reference_image_url"):
+            derived_asset_cache.warm_reference(entity.reference_image_url)
         
         return entity
     
@@ -293,6 +303,7 @@ class EntityService:
         # Entity'yi sil
         await db.delete(entity)
         await db.commit()
+        await context_cache.invalidate_entities(entity.user_id)
         
         # 🔍 Pinecone'dan sil
         if settings.USE_PINECONE:
@@ -317,6 +328,51 @@ class EntityService:
         pattern = r'@[a-zA-Z0-9_]+'
         return re.findall(pattern, text)
     
+    async def get_by_tags(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        tags: list[str]
+    ) -> list[Entity]:
+        """
+        Birden fazla tag'i tek sorguda çöz (WHERE tag = ANY(:tags)).
+        
+        Returns:
+            Bulunan Entity listesi (tags sırasıyla)
+        """
+        tags = list(dict.fromkeys(t if t.startswith('@') else f"@{t}" for t in tags))
+        if not tags:
+            return []
+        result = await db.execute(
+            select(Entity).where(
+                Entity.user_id == user_id,
+                Entity.tag == any_(bindparam("tags", tags, type_=ARRAY(String)))
+            )
+        )
+        by_tag = {entity.tag: entity for entity in result.scalars().all()}
+        return [by_tag[tag] for tag in tags if tag in by_tag]
+    
+    async def get_name_matcher(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID
+    ) -> EntityNameMatcher:
+        """
+        Kullanıcının derlenmiş isim eşleştiricisi.
+        
+        İsim listesi (yalnızca id + name) ContextCache'te tutulur ve entity
+        oluşturma/güncelleme/silmede invalidate edilir; derlenmiş regex isim
+        kümesi değişmedikçe yeniden kullanılır.
+        """
+        async def _load():
+            result = await db.execute(
+                select(Entity.id, Entity.name).where(Entity.user_id == user_id)
+            )
+            return [[str(entity_id), name] for entity_id, name in result.all()]
+        
+        entries = await context_cache.get_or_load(context_cache.entity_names_key(user_id), _load)
+        return get_name_matcher(entries)
+    
     async def resolve_by_name(
         self,
         db: AsyncSession,
@@ -327,7 +383,7 @@ class EntityService:
         Mesaj içindeki entity isimlerini tanı (@ olmadan).
         
         Kullanıcı "emre'yi ormanda çiz" dediğinde @emre entity'sini bulur.
-        Büyük/küçük harf duyarsız arama yapar.
+        Büyük/küçük harf duyarsız, Türkçe ekleri tanır ("emreyi", "ormanda").
         
         Args:
             db: Database session
@@ -337,70 +393,63 @@ class EntityService:
         Returns:
             Bulunan Entity listesi
         """
-        # Kullanıcının tüm entity'lerini al
-        all_entities = await self.list_entities(db, user_id)
-        
-        if not all_entities:
-            return []
-        
-        text_lower = text.lower()
-        found = []
-        
-        for entity in all_entities:
-            name_lower = entity.name.lower()
-            # İsim en az 2 karakter olsun (tek harf false positive verir)
-            if len(name_lower) >= 2 and name_lower in text_lower:
-                # Kelime sınırı kontrolü (parçalı eşleşmeyi önle)
-                # Örn: "gem" kelimesi "gemini" içinde bulunmasın
-                import re as re_module
-                # Türkçe karakterleri de destekle
-                pattern = r'(?<!\w)' + re_module.escape(name_lower) + r'(?!\w)'
-                if re_module.search(pattern, text_lower):
-                    found.append(entity)
-                    print(f"🔍 Entity BULUNDU (isim eşleştirme): '{entity.name}' → {entity.tag}")
-        
-        return found
+        return await self.resolve_tags(db, user_id, text, include_tags=False)
     
     async def resolve_tags(
         self,
         db: AsyncSession,
         user_id: uuid.UUID,
-        text: str
+        text: str,
+        include_tags: bool = True
     ) -> list[Entity]:
         """
         Metindeki @tag'leri VE entity isimlerini çözümle.
         
-        Önce @tag formatını dener, sonra isim eşleştirmesi yapar.
+        @tag'ler ve isim eşleşmeleri TEK sorguda çekilir; @tag'ler önce gelir.
         Aynı entity iki kez eklenmez.
         
         Args:
             db: Database session
             user_id: Kullanıcı ID
             text: Kullanıcı mesajı
+            include_tags: False ise yalnızca isim eşleştirmesi
         
         Returns:
             Bulunan Entity listesi (deduplicated)
         """
-        seen_ids = set()
-        entities = []
+        if not text:
+            return []
+        tags = list(dict.fromkeys(self.extract_tags(text))) if include_tags else []
+        matcher = await self.get_name_matcher(db, user_id)
+        name_ids = [uuid.UUID(entity_id) for entity_id in matcher.match(text)]
+        if not tags and not name_ids:
+            return []
         
-        # 1. @tag formatıyla eşleştir (öncelikli)
-        tags = self.extract_tags(text)
+        result = await db.execute(
+            select(Entity).where(
+                Entity.user_id == user_id,
+                or_(
+                    Entity.tag == any_(bindparam("tags", tags, type_=ARRAY(String))),
+                    Entity.id == any_(bindparam("ids", name_ids, type_=ARRAY(UUID(as_uuid=True)))),
+                )
+            )
+        )
+        rows = list(result.scalars().all())
+        by_tag = {entity.tag: entity for entity in rows}
+        by_id = {entity.id: entity for entity in rows}
+        
+        entities = {}
         for tag in tags:
-            entity = await self.get_by_tag(db, user_id, tag)
-            if entity and entity.id not in seen_ids:
-                entities.append(entity)
-                seen_ids.add(entity.id)
+            entity = by_tag.get(tag)
+            if entity and entity.id not in entities:
+                entities[entity.id] = entity
                 print(f"🏷️ Entity BULUNDU (@tag): {entity.tag}")
-        
-        # 2. İsim eşleştirmesi (@ olmadan)
-        name_matches = await self.resolve_by_name(db, user_id, text)
-        for entity in name_matches:
-            if entity.id not in seen_ids:
-                entities.append(entity)
-                seen_ids.add(entity.id)
-        
-        return entities
+        for entity_id in name_ids:
+            entity = by_id.get(entity_id)
+            if entity and entity.id not in entities:
+                entities[entity.id] = entity
+                print(f"🔍 Entity BULUNDU (isim eşleştirme): '{entity.name}' → {entity.tag}")
+        return list(entities.values())
 
 
 # Singleton instance
@@ -7,17 +7,23 @@ Episodic Memory Service - Agent'ın önemli olayları hatırlaması.
 - "16:9 aspect ratio tercih ediliyor"
 
 Bu bilgiler uzun vadeli hafızada saklanır ve context olarak kullanılır.
+
+Depolama (Redis varsa tüm worker'lar paylaşır, restart'ta kaybolmaz):
+- episodic:{user}:ev:{event_type} → sorted set, skor = (önem, zaman); üye = kayıt JSON'u
+  Ekleme + en düşük önemli/eski kaydı atma: ZADD + ZREMRANGEBYRANK, O(log n)
+- episodic:{user}:types           → kullanıcının olay tipleri (set)
+- episodic:{user}:model_counts    → model → başarı sayısı (hash, HINCRBY ile artımlı)
+Redis yoksa aynı yapı process içinde (tip başına sıralı liste) tutulur.
 """
+import bisect
+import heapq
+import json
 import uuid
 from datetime import datetime
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from app.services.memory_hygiene import is_stable_memory_fact, sanitize_memory_text
 
-
-# Not: Bu model henüz migration'a eklenmedi
-# Şimdilik Redis ile çalışacak, daha sonra DB'ye migrate edilecek
-
 class EpisodicMemoryEntry:
     """Episodic memory entry (in-memory representation)."""
     
@@ -63,6 +69,11 @@ class EpisodicMemoryEntry:
         entry.created_at = datetime.fromisoformat(data["created_at"])
         entry.access_count = data.get("access_count", 0)
         return entry
+    
+    @property
+    def rank(self) -> float:
+        """Sıralama skoru: önce önem, sonra zaman (ms). Redis ZSET skoru olarak da kullanılır."""
+        return self.importance * 1e13 + self.created_at.timestamp() * 1000
 
 
 class EpisodicMemoryService:
@@ -90,9 +101,87 @@ class EpisodicMemoryService:
 
     PROMPT_SAFE_EVENT_TYPES = {"preference", "feedback", "error"}
     
+    MAX_PER_EVENT_TYPE = 100  # Kullanıcı × olay tipi başına halka boyutu
+    MEMORY_TTL = 90 * 86400   # 90 gün (her yazmada yenilenir)
+    
     def __init__(self):
-        self.memories: dict[str, List[EpisodicMemoryEntry]] = {}  # user_id -> memories
-        self.max_memories_per_user = 100  # Max hafıza
+        # Redis yoksa: user_id -> event_type -> (rank, entry) artan sıralı liste
+        self.memories: Dict[str, Dict[str, List[Tuple[float, EpisodicMemoryEntry]]]] = {}
+        self.model_counts: Dict[str, Dict[str, int]] = {}
+    
+    # ===============================
+    # DEPOLAMA
+    # ===============================
+    
+    @staticmethod
+    def _redis():
+        from app.core.cache import cache
+        return cache.client
+    
+    @staticmethod
+    def _key(user_id: str, suffix: str) -> str:
+        return f"episodic:{user_id}:{suffix}"
+    
+    async def _store(self, entry: EpisodicMemoryEntry, model: Optional[str] = None):
+        client = self._redis()
+        if client is None:
+            ring = self.memories.setdefault(entry.user_id, {}).setdefault(entry.event_type, [])
+            bisect.insort(ring, (entry.rank, entry), key=lambda item: item[0])
+            if len(ring) > self.MAX_PER_EVENT_TYPE:
+                del ring[0]  # En düşük önemli + en eski
+            if model:
+                counts = self.model_counts.setdefault(entry.user_id, {})
+                counts[model] = counts.get(model, 0) + 1
+            return
+        
+        ring_key = self._key(entry.user_id, f"ev:{entry.event_type}")
+        types_key = self._key(entry.user_id, "types")
+        counts_key = self._key(entry.user_id, "model_counts")
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.zadd(ring_key, {json.dumps(entry.to_dict(), ensure_ascii=False, default=str): entry.rank})
+                pipe.zremrangebyrank(ring_key, 0, -(self.MAX_PER_EVENT_TYPE + 1))
+                pipe.sadd(types_key, entry.event_type)
+                if model:
+                    pipe.hincrby(counts_key, model, 1)
+                for key in (ring_key, types_key, counts_key):
+                    pipe.expire(key, self.MEMORY_TTL)
+                await pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Episodic memory yazma hatası: {e}")
+    
+    async def _top(self, user_id: str, event_types: Optional[Iterable[str]], limit: Optional[int]) -> List[EpisodicMemoryEntry]:
+        """Tiplerin her birinden en üst `limit` kaydı al, (önem, zaman) sırasıyla birleştir."""
+        client = self._redis()
+        if client is None:
+            rings = self.memories.get(user_id, {})
+            types = list(rings) if event_types is None else [t for t in event_types if t in rings]
+            per_type = [
+                [entry for _, entry in reversed(rings[t][-limit:] if limit else rings[t])]
+                for t in types
+            ]
+        else:
+            try:
+                types = list(event_types) if event_types is not None else sorted(
+                    await client.smembers(self._key(user_id, "types"))
+                )
+                if not types:
+                    return []
+                async with client.pipeline(transaction=False) as pipe:
+                    for t in types:
+                        pipe.zrevrange(self._key(user_id, f"ev:{t}"), 0, (limit - 1) if limit else -1)
+                    results = await pipe.execute()
+            except Exception as e:
+                print(f"⚠️ Episodic memory okuma hatası: {e}")
+                return []
+            per_type = [[EpisodicMemoryEntry.from_dict(json.loads(raw)) for raw in members] for members in results]
+        
+        merged = heapq.merge(*per_type, key=lambda m: m.rank, reverse=True)
+        return list(merged)
+    
+    # ===============================
+    # PUBLIC API
+    # ===============================
     
     async def remember(
         self,
@@ -120,73 +209,52 @@ class EpisodicMemoryService:
             importance=importance
         )
         
-        if user_id not in self.memories:
-            self.memories[user_id] = []
-        
-        self.memories[user_id].append(entry)
-        
-        # Max limit aşıldıysa en düşük önemli olanları sil
-        if len(self.memories[user_id]) > self.max_memories_per_user:
-            self._prune_memories(user_id)
+        # Model başarı sayacı kayıtla aynı transaction'da artımlı güncellenir
+        model = (metadata or {}).get("model") if event_type == "model_success" else None
+        await self._store(entry, model=model if model and model != "unknown" else None)
         
         print(f"🧠 Remembered: [{event_type}] {content[:50]}...")
         return entry
     
-    def _prune_memories(self, user_id: str):
-        """En az önemli ve en eski hafızaları sil."""
-        memories = self.memories[user_id]
-        
-        # Önce önem, sonra tarih sırasına göre sırala
-        sorted_memories = sorted(
-            memories,
-            key=lambda m: (m.importance, m.created_at.timestamp()),
-            reverse=True
-        )
-        
-        # En önemli max_memories_per_user kadarını sakla
-        self.memories[user_id] = sorted_memories[:self.max_memories_per_user]
-    
     async def recall(
         self,
         user_id: str,
         event_type: str = None,
         query: str = None,
-        limit: int = 10
+        limit: int = 10,
+        event_types: Optional[Iterable[str]] = None,
     ) -> List[EpisodicMemoryEntry]:
         """
-        Hafızadan olayları hatırla.
+        Hafızadan olayları hatırla (önem, sonra tarih sırasıyla).
         
         Args:
             user_id: Kullanıcı ID
             event_type: Filtrelenecek olay tipi (opsiyonel)
             query: Arama sorgusu (opsiyonel, basit string matching)
             limit: Max sonuç sayısı
+            event_types: Birden fazla olay tipiyle filtre (opsiyonel)
         """
-        if user_id not in self.memories:
-            return []
-        
-        memories = self.memories[user_id]
-        
-        # Filtrele
-        if event_type:
-            memories = [m for m in memories if m.event_type == event_type]
+        types = [event_type] if event_type else event_types
+        if not query:
+            return (await self._top(user_id, types, limit))[:limit]
         
-        if query:
-            query_lower = query.lower()
-            memories = [m for m in memories if query_lower in m.content.lower()]
-        
-        # Önem ve tarihe göre sırala
-        sorted_memories = sorted(
-            memories,
-            key=lambda m: (m.importance, m.created_at.timestamp()),
-            reverse=True
-        )
-        
-        # Erişim sayısını artır
-        for m in sorted_memories[:limit]:
-            m.access_count += 1
-        
-        return sorted_memories[:limit]
+        # Metin araması: filtre sonrası sıra korunur, tipin tüm halkası taranır
+        query_lower = query.lower()
+        matches = [m for m in await self._top(user_id, types, None) if query_lower in m.content.lower()]
+        return matches[:limit]
+    
+    async def get_model_success_counts(self, user_id: str, top: int = 5) -> List[Tuple[str, int]]:
+        """Önceden toplanmış model başarı sayıları (en çoktan aza). Tek HGETALL."""
+        client = self._redis()
+        if client is None:
+            counts = self.model_counts.get(user_id, {})
+        else:
+            try:
+                counts = {model: int(count) for model, count in (await client.hgetall(self._key(user_id, "model_counts"))).items()}
+            except Exception as e:
+                print(f"⚠️ Model başarı sayacı okuma hatası: {e}")
+                return []
+        return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:top]
     
     async def get_context_for_prompt(
         self,
@@ -196,7 +264,7 @@ class EpisodicMemoryService:
         """
         System prompt'a eklenecek hafıza özeti oluştur.
         """
-        memories = await self.recall(user_id, limit=max_entries * 3)
+        memories = await self.recall(user_id, limit=max_entries * 3, event_types=sorted(self.PROMPT_SAFE_EVENT_TYPES))
         
         if not memories:
             return ""
@@ -231,20 +299,37 @@ class EpisodicMemoryService:
     
     async def forget(self, user_id: str, memory_id: str) -> bool:
         """Belirli bir hafızayı unut."""
-        if user_id not in self.memories:
-            return False
+        client = self._redis()
+        if client is None:
+            for ring in self.memories.get(user_id, {}).values():
+                ring[:] = [item for item in ring if item[1].id != memory_id]
+            return True
         
-        self.memories[user_id] = [
-            m for m in self.memories[user_id] if m.id != memory_id
-        ]
+        for event_type in await client.smembers(self._key(user_id, "types")):
+            ring_key = self._key(user_id, f"ev:{event_type}")
+            for raw in await client.zrange(ring_key, 0, -1):
+                if json.loads(raw).get("id") == memory_id:
+                    await client.zrem(ring_key, raw)
+                    return True
         return True
     
     async def clear_user_memories(self, user_id: str) -> int:
         """Kullanıcının tüm hafızasını temizle."""
-        if user_id not in self.memories:
-            return 0
-        count = len(self.memories[user_id])
-        self.memories[user_id] = []
+        client = self._redis()
+        if client is None:
+            count = sum(len(ring) for ring in self.memories.pop(user_id, {}).values())
+            self.model_counts.pop(user_id, None)
+            return count
+        
+        types = await client.smembers(self._key(user_id, "types"))
+        keys = [self._key(user_id, f"ev:{t}") for t in types]
+        count = 0
+        if keys:
+            async with client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.zcard(key)
+                count = sum(await pipe.execute())
+        await client.delete(*keys, self._key(user_id, "types"), self._key(user_id, "model_counts"))
         return count
     
     # Convenience methods for common events
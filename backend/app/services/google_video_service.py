@@ -3,11 +3,14 @@ Google Video Service - Veo 3.1 Entegrasyonu
 Google GenAI SDK üzerinden Veo 3.1 modeline istek atar.
 Fallback: Kling V1.5 Pro (fal.ai üzerinden)
 """
-import httpx
-import time
+import os
 import asyncio
 from typing import Optional
 from app.core.config import settings
+from app.services.media_cache import media_cache
+from app.services.media_io import media_io
+from app.services.derived_asset_cache import derived_asset_cache
+from app.services.veo_operation_tracker import veo_operation_tracker
 import logging
 
 logger = logging.getLogger(__name__)
@@ -65,54 +68,23 @@ class GoogleVideoService:
             source_image = None
             if image_url:
                 try:
-                    # Görseli indir
-                    async with httpx.AsyncClient(timeout=30) as http:
-                        logger.info(f"📥 Veo için referans resim indiriliyor: {image_url[:50]}...")
-                        resp = await http.get(image_url)
-                        resp.raise_for_status()
-                        image_data = resp.content
-                        mime = resp.headers.get("content-type", "image/jpeg")
-                        if "png" in mime:
-                            mime = "image/png"
-                        elif "webp" in mime:
-                            mime = "image/webp"
-                        else:
-                            mime = "image/jpeg"
-                    
-                    # Pillow ile boyutlandır (Veo max ~1280 önerilir)
+                    # Veo max ~1280 önerilir — küçültülmüş kopya türetilmiş varlık cache'inden
+                    # gelir (aynı referans için PIL + yeniden yükleme tekrar yapılmaz)
                     try:
-                        from PIL import Image as PILImage
-                        import tempfile
-                        import os
-                        
-                        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
-                            tmp.write(image_data)
-                            tmp_path = tmp.name
-                        
-                        with PILImage.open(tmp_path) as img:
-                            orig_w, orig_h = img.size
-                            max_dim = 1280
-                            if orig_w > max_dim or orig_h > max_dim:
-                                if orig_w > orig_h:
-                                    new_w = max_dim
-                                    new_h = int(orig_h * (max_dim / orig_w))
-                                else:
-                                    new_h = max_dim
-                                    new_w = int(orig_w * (max_dim / orig_h))
-                                new_w = new_w - (new_w % 8)
-                                new_h = new_h - (new_h % 8)
-                                if img.mode != 'RGB':
-                                    img = img.convert('RGB')
-                                img = img.resize((new_w, new_h), PILImage.Resampling.LANCZOS)
-                                img.save(tmp_path, format="JPEG", quality=95)
-                                logger.info(f"📐 Veo için görsel küçültüldü: {orig_w}x{orig_h} → {new_w}x{new_h}")
-                        
-                        with open(tmp_path, "rb") as f:
-                            image_data = f.read()
-                            mime = "image/jpeg"
-                        os.remove(tmp_path)
+                        prepared_url = await derived_asset_cache.downscale(image_url, max_dim=1280)
                     except ImportError:
                         logger.warning("Pillow yüklü değil, görsel olduğu gibi gönderiliyor.")
+                        prepared_url = image_url
+                    
+                    # Görseli indir (paylaşılan havuz, boyut limitli)
+                    logger.info(f"📥 Veo için referans resim indiriliyor: {prepared_url[:50]}...")
+                    image_data = await media_io.download_bytes(prepared_url)
+                    if image_data.startswith(b"\x89PNG"):
+                        mime = "image/png"
+                    elif image_data[:4] == b"RIFF" and image_data[8:12] == b"WEBP":
+                        mime = "image/webp"
+                    else:
+                        mime = "image/jpeg"
                     
                     source_image = types.Image(image_bytes=image_data, mime_type=mime)
                     logger.info("✅ Referans resim Veo için hazırlandı.")
@@ -123,72 +95,23 @@ class GoogleVideoService:
             client = self.client
             
             try:
-                def run_veo_sync():
-                    """Senkron thread'de Veo SDK çağrısı."""
-                    if source_image:
-                        # Image-to-video
-                        op = client.models.generate_videos(
-                            model=self.veo_model,
-                            image=source_image,
-                            prompt=prompt,
-                            config=config,
-                        )
-                    else:
-                        # Text-to-video
-                        op = client.models.generate_videos(
-                            model=self.veo_model,
-                            prompt=prompt,
-                            config=config,
-                        )
-                    
-                    logger.info(f"⏳ Veo işlemi bekleniyor... (op name: {op.name})")
-                    
-                    # Poll using operations.get(op) — positional arg, returns updated op
-                    max_polls = 60  # Max 10 min
-                    for i in range(max_polls):
-                        time.sleep(10)
-                        op = client.operations.get(op)
-                        logger.info(f"   ... Veo poll #{i+1}: done={op.done}")
-                        if op.done:
-                            if op.error:
-                                raise Exception(f"Veo API Hatası: {op.error}")
-                            # Extract video
-                            result = op.result
-                            if result and result.generated_videos:
-                                video = result.generated_videos[0]
-                                return video.video.uri
-                            else:
-                                raise Exception("Veo boş sonuç döndürdü")
-                    
-                    raise Exception("Veo zaman aşımı (10 dakika)")
+                # Operasyonu başlat + paylaşılan async poller ile bekle
+                # (bloklayan SDK çağrıları ayrılmış küçük havuzda, polling event loop'ta)
+                generate_kwargs = {"model": self.veo_model, "prompt": prompt, "config": config}
+                if source_image:
+                    generate_kwargs["image"] = source_image  # Image-to-video
                 
-                loop = asyncio.get_event_loop()
-                google_video_url = await loop.run_in_executor(None, run_veo_sync)
+                result = await veo_operation_tracker.run(client, **generate_kwargs)
+                if not (result and result.generated_videos):
+                    raise Exception("Veo boş sonuç döndürdü")
+                google_video_url = result.generated_videos[0].video.uri
                 
                 logger.info(f"✅ Veo ile video üretildi (Google URL): {google_video_url[:80]}...")
                 
                 # Google API URL'si tarayıcıda doğrudan açılamıyor — fal.ai'ya yükle
                 try:
-                    import tempfile
-                    import os
-                    import fal_client
-                    
-                    # API key ile Google'dan indir
-                    download_url = f"{google_video_url}&key={self.api_key}" if "?" in google_video_url else f"{google_video_url}?key={self.api_key}"
-                    async with httpx.AsyncClient(timeout=120, follow_redirects=True) as client:
-                        resp = await client.get(download_url)
-                        resp.raise_for_status()
-                    
-                    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
-                        tmp.write(resp.content)
-                        tmp_path = tmp.name
-                    
-                    # fal.ai storage'a yükle (public URL)
-                    public_url = fal_client.upload_file(tmp_path)
-                    os.remove(tmp_path)
-                    
-                    logger.info(f"✅ Veo video fal.ai'ya yüklendi: {public_url[:80]}...")
-                    video_url = public_url
+                    video_url = await self._rehost_video(google_video_url)
+                    logger.info(f"✅ Veo video fal.ai'ya yüklendi: {video_url[:80]}...")
                 except Exception as upload_err:
                     logger.warning(f"⚠️ fal.ai yükleme hatası: {upload_err}. Google URL döndürülüyor.")
                     video_url = google_video_url
@@ -231,3 +154,21 @@ class GoogleVideoService:
         except Exception as e:
             logger.error(f"❌ Google Video Service hatası: {str(e)}")
             return {"success": False, "error": str(e)}
+    
+    async def _rehost_video(self, google_video_url: str) -> str:
+        """
+        Google'dan API key ile diske stream et (bellekte tamponlamadan),
+        fal.ai storage'a async yükle ve public URL döndür.
+        """
+        separator = "&" if "?" in google_video_url else "?"
+        download_url = f"{google_video_url}{separator}key={self.api_key}"
+        tmp_path = await media_io.download_to_file(download_url, suffix=".mp4")
+        try:
+            public_url = await media_io.upload_file(tmp_path)
+            await media_cache.store_file(public_url, tmp_path)  # Sonraki düzenlemeler tekrar indirmesin
+            return public_url
+        finally:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -0,0 +1,187 @@
+"""
+LLM Gateway - Paylaşılan, non-blocking OpenAI erişim katmanı.
+
+Senkron `OpenAI` client'ı async fonksiyon içinde çağırmak uvicorn event loop'unu
+model çağrısı boyunca dondurur (diğer kullanıcıların SSE/WebSocket akışları dahil).
+Bu modül:
+1. Tek, bağlantı havuzlu bir `AsyncOpenAI` client'ı sahiplenir
+2. Model başına eşzamanlılık limiti (semaphore) ve timeout uygular
+3. chat / embedding / vision yardımcıları sunar
+
+Tüm servisler OpenAI'ye bu gateway üzerinden erişir.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMGateway:
+    """Havuzlu AsyncOpenAI client + model bazlı limit/timeout."""
+
+    # Model başına aynı anda uçuşta olabilecek istek sayısı
+    MODEL_CONCURRENCY = {
+        "gpt-4o": 8,
+        "gpt-4o-mini": 16,
+        "text-embedding-ada-002": 32,
+    }
+    DEFAULT_CONCURRENCY = 8
+
+    # Model başına istek timeout'u (saniye)
+    MODEL_TIMEOUTS = {
+        "gpt-4o": 90.0,
+        "gpt-4o-mini": 45.0,
+        "text-embedding-ada-002": 20.0,
+    }
+    DEFAULT_TIMEOUT = 60.0
+
+    MAX_CONNECTIONS = 64
+    MAX_KEEPALIVE = 32
+    MAX_RETRIES = 2
+
+    def __init__(self):
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._stats = {"calls": 0, "errors": 0, "timeouts": 0, "waiting": 0, "total_ms": 0.0}
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Paylaşılan AsyncOpenAI client (ilk erişimde oluşturulur)."""
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                max_retries=self.MAX_RETRIES,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.MAX_CONNECTIONS,
+                        max_keepalive_connections=self.MAX_KEEPALIVE,
+                    ),
+                    timeout=httpx.Timeout(self.DEFAULT_TIMEOUT, connect=10.0),
+                ),
+            )
+        return self._client
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.MODEL_CONCURRENCY.get(model, self.DEFAULT_CONCURRENCY))
+            self._semaphores[model] = semaphore
+        return semaphore
+
+    async def _call(self, model: str, factory, timeout: Optional[float]) -> Any:
+        timeout = timeout or self.MODEL_TIMEOUTS.get(model, self.DEFAULT_TIMEOUT)
+        semaphore = self._semaphore(model)
+        self._stats["waiting"] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._stats["waiting"] -= 1
+
+        started = time.perf_counter()
+        self._stats["calls"] += 1
+        try:
+            return await asyncio.wait_for(factory(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            logger.warning(f"⏱️ LLM çağrısı zaman aşımı: {model} ({timeout:.0f}s)")
+            raise
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            semaphore.release()
+            self._stats["total_ms"] += (time.perf_counter() - started) * 1000
+
+    # ===============================
+    # PUBLIC API
+    # ===============================
+
+    async def chat(
+        self,
+        messages: list[dict],
+        model: str = "gpt-4o-mini",
+        max_tokens: int = 500,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ):
+        """chat.completions.create — ham response döndürür (tool_calls vs. için)."""
+        return await self._call(
+            model,
+            lambda: self.client.chat.completions.create(
+                model=model, messages=messages, max_tokens=max_tokens, **kwargs
+            ),
+            timeout,
+        )
+
+    async def chat_text(
+        self,
+        messages: list[dict],
+        model: str = "gpt-4o-mini",
+        max_tokens: int = 500,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> str:
+        """chat çağrısı yapıp ilk yanıtın metnini döndür."""
+        response = await self.chat(messages, model=model, max_tokens=max_tokens, timeout=timeout, **kwargs)
+        return (response.choices[0].message.content or "").strip()
+
+    async def vision(
+        self,
+        prompt: str,
+        image_urls: list[str],
+        model: str = "gpt-4o",
+        system: Optional[str] = None,
+        detail: str = "low",
+        max_tokens: int = 500,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Bir veya daha fazla görsel (URL veya data URL) ile soru sor."""
+        content: list[dict] = [{"type": "text", "text": prompt}]
+        for url in image_urls:
+            content.append({"type": "image_url", "image_url": {"url": url, "detail": detail}})
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": content})
+        return await self.chat_text(messages, model=model, max_tokens=max_tokens, timeout=timeout)
+
+    async def embed(
+        self,
+        text: str,
+        model: str = "text-embedding-ada-002",
+        timeout: Optional[float] = None,
+    ) -> list[float]:
+        """Tek metin için embedding vektörü."""
+        response = await self._call(
+            model,
+            lambda: self.client.embeddings.create(model=model, input=text),
+            timeout,
+        )
+        return response.data[0].embedding
+
+    def get_stats(self) -> dict:
+        calls = self._stats["calls"]
+        return {
+            **self._stats,
+            "total_ms": round(self._stats["total_ms"], 1),
+            "avg_ms": round(self._stats["total_ms"] / calls, 1) if calls else 0.0,
+            "in_use": {
+                model: self.MODEL_CONCURRENCY.get(model, self.DEFAULT_CONCURRENCY) - sem._value
+                for model, sem in self._semaphores.items()
+            },
+        }
+
+    async def close(self):
+        """HTTP havuzunu kapat (lifespan shutdown)."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# Singleton instance
+llm_gateway = LLMGateway()
@@ -4,17 +4,25 @@ Long Video Service - 3+ Dakikalık Video Üretimi.
 Video segment'leri oluşturur ve birleştirir:
 1. Kullanıcı prompt'unu akıllı segment'lere böl
 2. Her segment için 5-10 saniyelik video üret (FalPluginV2)
-3. Segment'leri FFmpeg API ile birleştir (stitch)
-4. Final video'yu döndür
+3. Biten her segment hemen indirilip normalize edilir, geçişler hazırlanır
+4. Final video kısa bir remux (concat -c copy) ile birleştirilir
 
 Celery gerektirmez — tamamen async çalışır.
 """
+import os
 import uuid
+import shutil
 import asyncio
-from typing import List, Optional
+import tempfile
+from typing import Any, Callable, List, Optional
 from dataclasses import dataclass, field
 from datetime import datetime
 
+from app.services.long_video_store import long_video_store
+from app.services.media_cache import media_cache
+from app.services.media_io import media_io
+from app.services.plugins.fal_job_engine import fal_job_engine
+
 
 @dataclass
 class VideoSegment:
@@ -28,6 +36,8 @@ class VideoSegment:
     reference_image_url: Optional[str] = None
     model: Optional[str] = "hailuo"  # Test branch'inde varsayılan model Hailuo (maliyet odaklı)
     error: Optional[str] = None
+    fal_endpoint: Optional[str] = None     # Restart sonrası yeniden poll için
+    fal_request_id: Optional[str] = None
 
 
 @dataclass
@@ -43,20 +53,177 @@ class LongVideoJob:
     progress: int = 0  # 0-100
     final_video_url: Optional[str] = None
     created_at: datetime = None
+    request: dict = field(default_factory=dict)  # Teslim için orijinal istek (prompt vb.)
     
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.utcnow()
 
 
+class SegmentStitchPipeline:
+    """
+    Segment'ler üretildikçe birleştirme işini önden yapan pipeline.
+
+    Her biten segment hemen (arka planda):
+    1. Media cache üzerinden indirilir
+    2. Tek ffmpeg geçişiyle ortak formata (çözünürlük/fps/codec) normalize edilip
+       head [0, F] / mid [F, D-F] / tail [D-F, D] parçalarına bölünür
+    3. Komşusu da hazırsa aradaki crossfade geçişi (tail_i ⨉ head_j, F saniye) üretilir
+
+    finalize() sadece eksik geçişleri tamamlar ve parçaları concat demuxer ile
+    yeniden encode etmeden (-c copy) birleştirir. Toplam süre, xfade zinciriyle
+    aynıdır: ΣD - (n-1)·F.
+    """
+
+    NORMALIZED_FPS = 24
+    RESOLUTIONS = {
+        "16:9": (1920, 1080),
+        "9:16": (1080, 1920),
+        "1:1": (1080, 1080),
+        "4:3": (1440, 1080),
+        "3:4": (1080, 1440),
+    }
+    FFMPEG_TIMEOUT = 180.0
+
+    def __init__(self, aspect_ratio: str, crossfade: float):
+        self.fade = crossfade
+        self.width, self.height = self.RESOLUTIONS.get(aspect_ratio, self.RESOLUTIONS["16:9"])
+        self.tmp_dir = tempfile.mkdtemp(prefix="longvideo-")
+        self._prepared: dict[int, dict] = {}                  # order → {"head", "mid", "tail"}
+        self._prepare_tasks: dict[int, asyncio.Task] = {}
+        self._transitions: dict[tuple[int, int], asyncio.Task] = {}
+        self._failed: set[int] = set()
+
+    def _encoder_args(self) -> list[str]:
+        # Tüm parçalar aynı ayarlarla encode edilir → concat -c copy güvenli
+        return [
+            "-c:v", "libx264", "-preset", "fast", "-crf", "23",
+            "-maxrate", "4M", "-bufsize", "8M", "-pix_fmt", "yuv420p",
+            "-r", str(self.NORMALIZED_FPS), "-video_track_timescale", "12288", "-an",
+        ]
+
+    # ===============================
+    # PRODUCER TARAFI
+    # ===============================
+
+    def add(self, segment: "VideoSegment"):
+        """Segment sonuçlandı (başarılı/başarısız) — hazırlığı hemen başlat."""
+        if segment.status == "completed" and segment.video_url:
+            if segment.order not in self._prepare_tasks:
+                self._prepare_tasks[segment.order] = asyncio.create_task(self._prepare(segment))
+        else:
+            self._failed.add(segment.order)
+            self._schedule_transitions()
+
+    async def _prepare(self, segment: "VideoSegment"):
+        order = segment.order
+        src = os.path.join(self.tmp_dir, f"src_{order}.mp4")
+        await media_cache.materialize(segment.video_url, dest=src)
+        duration = await media_io.probe_duration(src) or float(segment.duration)
+
+        f = self.fade
+        w, h = self.width, self.height
+        pieces = {name: os.path.join(self.tmp_dir, f"{name}_{order}.mp4") for name in ("head", "mid", "tail")}
+        filter_complex = (
+            f"[0:v]scale={w}:{h}:force_original_aspect_ratio=decrease,"
+            f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={self.NORMALIZED_FPS},format=yuv420p,"
+            f"split=3[a][b][c];"
+            f"[a]trim=0:{f},setpts=PTS-STARTPTS[head];"
+            f"[b]trim={f}:{duration - f:.3f},setpts=PTS-STARTPTS[mid];"
+            f"[c]trim={duration - f:.3f},setpts=PTS-STARTPTS[tail]"
+        )
+        cmd = ["ffmpeg", "-y", "-i", src, "-filter_complex", filter_complex]
+        for name in ("head", "mid", "tail"):
+            cmd += ["-map", f"[{name}]"] + self._encoder_args() + [pieces[name]]
+
+        code, _, stderr = await media_io.run_ffmpeg(cmd, timeout=self.FFMPEG_TIMEOUT)
+        if code != 0:
+            raise RuntimeError(f"Segment {order + 1} normalize edilemedi: {stderr.decode(errors='replace')[-300:]}")
+
+        self._prepared[order] = pieces
+        print(f"   🧩 Sahne {order + 1} normalize edildi ({duration:.1f}s)")
+        self._schedule_transitions()
+
+    def _schedule_transitions(self):
+        """Komşuluğu kesinleşmiş ve iki tarafı hazır çiftler için geçişi başlat."""
+        for order in sorted(self._prepared):
+            nxt = order + 1
+            while nxt in self._failed:
+                nxt += 1
+            if nxt in self._prepared and (order, nxt) not in self._transitions:
+                self._transitions[(order, nxt)] = asyncio.create_task(self._render_transition(order, nxt))
+
+    async def _render_transition(self, left: int, right: int) -> str:
+        out = os.path.join(self.tmp_dir, f"xfade_{left}_{right}.mp4")
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", self._prepared[left]["tail"],
+            "-i", self._prepared[right]["head"],
+            "-filter_complex", f"[0:v][1:v]xfade=transition=fade:duration={self.fade}:offset=0,format=yuv420p[v]",
+            "-map", "[v]",
+        ] + self._encoder_args() + [out]
+        code, _, stderr = await media_io.run_ffmpeg(cmd, timeout=self.FFMPEG_TIMEOUT)
+        if code != 0:
+            raise RuntimeError(f"Geçiş {left + 1}→{right + 1} üretilemedi: {stderr.decode(errors='replace')[-300:]}")
+        return out
+
+    # ===============================
+    # FİNAL
+    # ===============================
+
+    async def finalize(self, segments: List["VideoSegment"]) -> str:
+        """Tüm hazırlıklar bitince parçaları remux et, fal'a yükle, URL döndür."""
+        for segment in segments:
+            if segment.order not in self._prepare_tasks:
+                self._failed.add(segment.order)
+        await asyncio.gather(*self._prepare_tasks.values())
+        self._schedule_transitions()
+        await asyncio.gather(*self._transitions.values())
+
+        orders = sorted(self._prepared)
+        if len(orders) < 2:
+            raise RuntimeError("Birleştirilecek yeterli segment yok")
+
+        parts = [self._prepared[orders[0]]["head"], self._prepared[orders[0]]["mid"]]
+        for left, right in zip(orders, orders[1:]):
+            parts.append(self._transitions[(left, right)].result())
+            parts.append(self._prepared[right]["mid"])
+        parts.append(self._prepared[orders[-1]]["tail"])
+
+        concat_file = os.path.join(self.tmp_dir, "concat.txt")
+        with open(concat_file, "w") as f:
+            for path in parts:
+                f.write(f"file '{path}'\n")
+
+        output_path = os.path.join(self.tmp_dir, "output.mp4")
+        code, _, stderr = await media_io.run_ffmpeg(
+            ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", concat_file,
+             "-c", "copy", "-movflags", "+faststart", output_path],
+            timeout=self.FFMPEG_TIMEOUT,
+        )
+        if code != 0:
+            raise RuntimeError(f"Final remux başarısız: {stderr.decode(errors='replace')[-300:]}")
+
+        final_url = await media_io.upload_file(output_path)
+        await media_cache.store_file(final_url, output_path)
+        return final_url
+
+    async def close(self):
+        for task in [*self._prepare_tasks.values(), *self._transitions.values()]:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*self._prepare_tasks.values(), *self._transitions.values(), return_exceptions=True)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
 class LongVideoService:
     """
     Uzun video üretim servisi.
     
     3+ dakikalık videolar için:
     1. Prompt'u sinematik sahnelere böl
-    2. Her sahneyi paralel üret (FalPluginV2)
-    3. fal.ai FFmpeg API ile birleştir
+    2. Her sahneyi kayan pencereyle paralel üret (FalPluginV2)
+    3. Biten sahneleri SegmentStitchPipeline ile önden normalize et, sonda remux
     """
     
     MAX_SEGMENT_DURATION = 10  # Saniye (API max 10s)
@@ -176,7 +343,8 @@ class LongVideoService:
         total_duration: int = 60,
         aspect_ratio: str = "16:9",
         scene_descriptions: Optional[List[Any]] = None,
-        progress_callback=None
+        progress_callback=None,
+        request: Optional[dict] = None,
     ) -> dict:
         """
         Uzun video oluştur ve işle (async, Celery gerektirmez).
@@ -189,6 +357,7 @@ class LongVideoService:
             aspect_ratio: Video oranı
             scene_descriptions: Opsiyonel sahne açıklamaları
             progress_callback: İlerleme bildirimi (async callable)
+            request: Resume sonrası teslim için saklanacak istek bilgisi
         
         Returns:
             {"success": bool, "video_url": str, "duration": int, "segments": int}
@@ -206,79 +375,189 @@ class LongVideoService:
             total_duration=total_duration,
             aspect_ratio=aspect_ratio,
             segments=segments,
+            request=request or {"prompt": prompt},
         )
         self.jobs[job_id] = job
+        await long_video_store.save(job)
         
         print(f"🎬 Uzun video işi başlatıldı: {job_id} ({len(segments)} segment, {total_duration}s)")
         
-        try:
-            # 0. Roadmap göster (planı kullanıcıya bildir)
-            if progress_callback:
+        # 0. Roadmap göster (planı kullanıcıya bildir)
+        if progress_callback:
+            try:
                 roadmap_text = f"🗺️ Video Planı ({len(segments)} sahne, {total_duration}s):\n"
                 for s in segments:
                     model_icon = "🌟" if s.model == "veo" else "🎬"
                     roadmap_text += f"  {model_icon} Sahne {s.order + 1}: {s.prompt[:60]}... ({s.duration}s, {s.model})\n"
                 await progress_callback(5, roadmap_text)
+            except Exception as e:
+                print(f"⚠️ Roadmap bildirimi gönderilemedi: {e}")
+        
+        return await self.process(job, progress_callback)
+    
+    async def process(self, job: LongVideoJob, progress_callback=None) -> dict:
+        """
+        İşi (yeniden) yürüt: tamamlanmış segment'ler atlanır, fal'da bekleyenler
+        request_id ile yeniden poll edilir, kalanlar üretilir. Resume de bunu kullanır.
+        """
+        self.jobs[job.id] = job
+        lease = asyncio.create_task(self._keep_lease(job, asyncio.current_task()))
+        try:
+            # 1. Segment'leri üret (paralel veya sıralı) — bitenler hemen normalize edilir
+            await self._set_status(job, "processing")
+            pipeline = SegmentStitchPipeline(job.aspect_ratio, self.CROSSFADE_DURATION)
+            try:
+                await self._generate_segments(job, progress_callback, on_segment_done=pipeline.add)
+                return await self._finish_job(job, pipeline, progress_callback)
+            finally:
+                await pipeline.close()
             
-            # 1. Segment'leri üret (paralel veya sıralı)
-            job.status = "processing"
-            await self._generate_segments(job, progress_callback)
-            
-            # Kaç segment başarılı?
-            completed = [s for s in job.segments if s.status == "completed"]
-            if not completed:
-                job.status = "failed"
-                return {"success": False, "error": "Hiçbir video segmenti üretilemedi."}
-            
-            if len(completed) == 1:
-                # Tek segment — birleştirmeye gerek yok
-                job.status = "completed"
-                job.progress = 100
-                job.final_video_url = completed[0].video_url
-                return {
-                    "success": True,
-                    "video_url": completed[0].video_url,
-                    "duration": int(completed[0].duration),
-                    "segments": 1,
-                    "note": f"{len(job.segments) - 1} segment başarısız oldu." if len(job.segments) > 1 else None
-                }
-            
-            # 2. Segment'leri birleştir
-            job.status = "stitching"
-            job.progress = 85
-            if progress_callback:
-                await progress_callback(85, "Segment'ler birleştiriliyor...")
+        except Exception as e:
+            await self._set_status(job, "failed")
+            print(f"❌ Uzun video hatası: {e}")
+            return {"success": False, "error": str(e)}
+        except asyncio.CancelledError:
+            # Shutdown / lease kaybı: iş yarım kaldı, bir sonraki resume devralabilsin
+            await asyncio.shield(long_video_store.release(job.id))
+            raise
+        finally:
+            lease.cancel()
+    
+    async def _keep_lease(self, job: LongVideoJob, worker: asyncio.Task):
+        """İş sürdükçe lease'i yenile; başka process devraldıysa işi durdur (çift ücret olmasın)."""
+        while True:
+            await asyncio.sleep(long_video_store.LEASE_RENEW_INTERVAL)
+            try:
+                renewed = await long_video_store.renew(job.id)
+            except Exception as e:
+                print(f"⚠️ Uzun video lease yenilenemedi ({job.id}): {e}")
+                continue
+            if not renewed:
+                if job.status in ("completed", "failed"):
+                    return  # İş bitti, lease save() ile bırakıldı
+                print(f"⛔ Uzun video işi başka bir process'e geçti, durduruluyor: {job.id}")
+                worker.cancel()
+                return
+    
+    async def _set_status(self, job: LongVideoJob, status: str):
+        job.status = status
+        await long_video_store.save(job)
+    
+    async def resume_unfinished(self, on_result: Optional[Callable[[LongVideoJob, dict], Any]] = None) -> list[asyncio.Task]:
+        """
+        Restart sonrası yarım kalan işleri arka planda devam ettir (lifespan).
+        on_result(job, result) teslimatı (asset/mesaj/bildirim) yapar.
+        """
+        try:
+            jobs = await long_video_store.list_unfinished()
+        except Exception as e:
+            print(f"⚠️ Yarım kalan uzun video işleri okunamadı: {e}")
+            return []
+        
+        async def _resume(job: LongVideoJob):
+            done = sum(1 for s in job.segments if s.status == "completed")
+            print(f"♻️ Uzun video işi devam ettiriliyor: {job.id} ({done}/{len(job.segments)} segment hazır)")
             
-            final_url = await self._stitch_segments(job)
+            async def _progress(pct, msg):
+                from app.services.progress_service import progress_service
+                try:
+                    await progress_service.send_progress(job.session_id, "long_video", pct / 100.0, msg)
+                except Exception:
+                    pass
             
-            job.status = "completed"
+            result = await self.process(job, _progress)
+            if on_result:
+                await on_result(job, result)
+        
+        tasks = []
+        for job in jobs:
+            if job.id in self.jobs:
+                continue
+            # Aynı anda açılan replikalardan yalnızca biri devralır
+            try:
+                if not await long_video_store.claim(job.id):
+                    continue
+            except Exception as e:
+                print(f"⚠️ Uzun video işi sahiplenilemedi ({job.id}): {e}")
+                continue
+            tasks.append(asyncio.create_task(_resume(job)))
+        return tasks
+    
+    async def _finish_job(self, job: LongVideoJob, pipeline: SegmentStitchPipeline, progress_callback=None) -> dict:
+        """Üretim sonrası: tek segment → doğrudan, çok segment → pipeline remux."""
+        # Kaç segment başarılı?
+        completed = [s for s in job.segments if s.status == "completed"]
+        if not completed:
+            await self._set_status(job, "failed")
+            return {"success": False, "error": "Hiçbir video segmenti üretilemedi."}
+        
+        if len(completed) == 1:
+            # Tek segment — birleştirmeye gerek yok
             job.progress = 100
-            job.final_video_url = final_url
-            
+            job.final_video_url = completed[0].video_url
+            await self._set_status(job, "completed")
             return {
                 "success": True,
-                "video_url": final_url,
-                "duration": sum(int(s.duration) for s in completed),
-                "segments": len(completed),
-                "failed_segments": len(job.segments) - len(completed)
+                "video_url": completed[0].video_url,
+                "duration": int(completed[0].duration),
+                "segments": 1,
+                "note": f"{len(job.segments) - 1} segment başarısız oldu." if len(job.segments) > 1 else None
             }
-            
+        
+        # 2. Segment'leri birleştir (normalize + geçişler büyük ölçüde hazır)
+        job.progress = 85
+        await self._set_status(job, "stitching")
+        if progress_callback:
+            await progress_callback(85, "Segment'ler birleştiriliyor...")
+        
+        try:
+            final_url = await pipeline.finalize(job.segments)
         except Exception as e:
-            job.status = "failed"
-            print(f"❌ Uzun video hatası: {e}")
-            return {"success": False, "error": str(e)}
+            print(f"   ⚠️ Pipeline birleştirme başarısız, klasik stitch'e dönülüyor: {e}")
+            final_url = await self._stitch_segments(job)
+        
+        job.progress = 100
+        job.final_video_url = final_url
+        await self._set_status(job, "completed")
+        
+        return {
+            "success": True,
+            "video_url": final_url,
+            "duration": sum(int(s.duration) for s in completed),
+            "segments": len(completed),
+            "failed_segments": len(job.segments) - len(completed)
+        }
     
-    async def _generate_segments(self, job: LongVideoJob, progress_callback=None):
+    async def _generate_segments(
+        self,
+        job: LongVideoJob,
+        progress_callback=None,
+        on_segment_done: Optional[Callable[[VideoSegment], None]] = None,
+    ):
         """
         Segment üretimi — akıllı paralel/sıralı seçim:
         - Referans görseli olan segment'ler: SIRALI (karakter tutarlılığı, zincirleme i2v)
-        - Referans görseli olmayan segment'ler: PARALEL (3x hız)
+        - Referans görseli olmayan segment'ler: PARALEL, kayan pencere (MAX_PARALLEL)
+
+        on_segment_done her segment sonuçlandığında (başarılı/başarısız) çağrılır;
+        birleştirme hazırlığı üretim devam ederken başlar. Önceden tamamlanmış
+        segment'ler (resume) yeniden üretilmez.
         """
         from app.services.plugins.fal_plugin_v2 import FalPluginV2
         fal = FalPluginV2()
         
         total_segments = len(job.segments)
         
+        async def _report(suffix: str = ""):
+            completed = sum(1 for s in job.segments if s.status == "completed")
+            job.progress = int((completed / total_segments) * 80)
+            if progress_callback:
+                await progress_callback(
+                    job.progress,
+                    f"Sahne {completed}/{total_segments} tamamlandı{suffix}"
+                )
+            print(f"📊 Long Video Progress: {completed}/{total_segments} segment")
+        
         # Herhangi bir segment'te referans görsel var mı kontrol et
         has_reference = any(s.reference_image_url for s in job.segments)
         
@@ -286,118 +565,100 @@ class LongVideoService:
             # SIRALI üretim — karakter tutarlılığı için zincirleme i2v
             print(f"   🔗 Sıralı üretim (karakter referansı mevcut)")
             last_frame_url = None
+            previous_video_url = None  # Son karesi henüz çıkarılmamış son başarılı sahne
             
             for i, segment in enumerate(job.segments):
-                # Zincirleme i2v: önceki sahnenin son frame'ini referans olarak ver
-                if last_frame_url and not segment.reference_image_url:
-                    segment.reference_image_url = last_frame_url
-                    print(f"   🔗 Sahne {i+1}: Önceki sahnenin son karesi referans olarak verildi (i2v)")
-                
-                await self._generate_single_segment(fal, segment, job.aspect_ratio)
+                if segment.status != "completed":
+                    # Başarılı önceki sahnenin son frame'ını çıkar (sadece gerektiğinde)
+                    if previous_video_url and not segment.reference_image_url:
+                        try:
+                            extracted = await self._extract_last_frame(previous_video_url)
+                            if extracted:
+                                last_frame_url = extracted
+                                print(f"   📸 Sahne {i} son frame çıkarıldı: {extracted[:50]}...")
+                        except Exception as e:
+                            print(f"   ⚠️ Son frame çıkarılamadı: {e}")
+                        previous_video_url = None
+                    
+                    # Zincirleme i2v: önceki sahnenin son frame'ini referans olarak ver
+                    if last_frame_url and not segment.reference_image_url:
+                        segment.reference_image_url = last_frame_url
+                        print(f"   🔗 Sahne {i+1}: Önceki sahnenin son karesi referans olarak verildi (i2v)")
+                    
+                    await self._generate_single_segment(fal, segment, job)
+                    await _report()
                 
-                # Başarılıysa son frame'ı çıkar
+                if on_segment_done:
+                    on_segment_done(segment)  # normalize arka planda, sıradaki üretimle örtüşür
                 if segment.status == "completed" and segment.video_url:
-                    try:
-                        extracted = await self._extract_last_frame(segment.video_url)
-                        if extracted:
-                            last_frame_url = extracted
-                            print(f"   📸 Sahne {i+1} son frame çıkarıldı: {extracted[:50]}...")
-                    except Exception as e:
-                        print(f"   ⚠️ Son frame çıkarılamadı: {e}")
-                
-                # Progress güncelle
-                completed = sum(1 for s in job.segments if s.status == "completed")
-                job.progress = int((completed / total_segments) * 80)
-                
-                if progress_callback:
-                    await progress_callback(
-                        job.progress, 
-                        f"Sahne {completed}/{total_segments} tamamlandı"
-                    )
-                
-                print(f"📊 Long Video Progress: {completed}/{total_segments} segment")
+                    previous_video_url = segment.video_url
         else:
-            # PARALEL üretim — karakter yok, bağımsız sahneler
+            # PARALEL üretim — kayan pencere: biri biter bitmez sıradaki başlar
             print(f"   ⚡ Paralel üretim ({self.MAX_PARALLEL} eşzamanlı, {total_segments} segment)")
+            window = asyncio.Semaphore(self.MAX_PARALLEL)
             
-            # Batch'ler halinde paralel üret
-            for batch_start in range(0, total_segments, self.MAX_PARALLEL):
-                batch = job.segments[batch_start:batch_start + self.MAX_PARALLEL]
-                batch_num = batch_start // self.MAX_PARALLEL + 1
-                total_batches = (total_segments + self.MAX_PARALLEL - 1) // self.MAX_PARALLEL
-                
-                print(f"   🚀 Batch {batch_num}/{total_batches}: {len(batch)} segment paralel üretiliyor...")
-                
-                # Paralel üret
-                tasks = [
-                    self._generate_single_segment(fal, segment, job.aspect_ratio)
-                    for segment in batch
-                ]
-                await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Progress güncelle
-                completed = sum(1 for s in job.segments if s.status == "completed")
-                job.progress = int((completed / total_segments) * 80)
-                
-                if progress_callback:
-                    await progress_callback(
-                        job.progress, 
-                        f"Sahne {completed}/{total_segments} tamamlandı (paralel)"
-                    )
-                
-                print(f"📊 Long Video Progress: {completed}/{total_segments} segment")
+            async def _run(segment: VideoSegment):
+                if segment.status != "completed":
+                    async with window:
+                        try:
+                            await self._generate_single_segment(fal, segment, job)
+                        except Exception as e:
+                            segment.status = "failed"
+                            segment.error = str(e)
+                    await _report(" (paralel)")
+                if on_segment_done:
+                    on_segment_done(segment)
+            
+            await asyncio.gather(*(_run(segment) for segment in job.segments))
     
     async def _extract_last_frame(self, video_url: str) -> str:
-        """Video'nun son karesini çıkar, fal storage'a yükle, URL döndür."""
-        import httpx
+        """
+        Video'nun son karesini çıkar, fal storage'a yükle, URL döndür.
+
+        Önce ffmpeg URL'yi doğrudan okur (-sseof ile HTTP range isteği — sadece
+        moov atomu + son GOP iner); sunucu range desteklemiyorsa tüm dosya
+        media cache üzerinden indirilip tekrar denenir.
+        """
         import tempfile
         import os
-        import fal_client
         import asyncio
         
         with tempfile.TemporaryDirectory() as tmp_dir:
-            video_path = os.path.join(tmp_dir, "video.mp4")
             frame_path = os.path.join(tmp_dir, "last_frame.jpg")
             
-            # Video indir
-            async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
-                resp = await client.get(video_url)
-                if resp.status_code != 200:
-                    return None
-                with open(video_path, "wb") as f:
-                    f.write(resp.content)
-            
-            # Son kareyi çıkar - ASYNC olarak çalıştır
-            cmd = [
-                "ffmpeg", "-y",
-                "-sseof", "-0.1",  # Son 0.1 saniye
-                "-i", video_path,
-                "-frames:v", "1",
-                "-q:v", "2",
-                frame_path
-            ]
-            
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            try:
-                # 30 saniye maksimum bekle
-                await asyncio.wait_for(proc.communicate(), timeout=30.0)
-            except asyncio.TimeoutError:
-                proc.kill()
-                print("⚠️ ffmpeg zaman aşımı")
-                return None
+            async def _grab(source: str) -> bool:
+                cmd = [
+                    "ffmpeg", "-y",
+                    "-sseof", "-0.1",  # Son 0.1 saniye
+                    *media_io.ffmpeg_input(source),
+                    "-frames:v", "1",
+                    "-q:v", "2",
+                    frame_path
+                ]
+                try:
+                    # 30 saniye maksimum bekle
+                    returncode, _, _ = await media_io.run_ffmpeg(cmd, timeout=30.0)
+                except asyncio.TimeoutError:
+                    print("⚠️ ffmpeg zaman aşımı")
+                    return False
+                if returncode != 0 or not os.path.exists(frame_path):
+                    print(f"⚠️ ffmpeg başarısız oldu. Çıkış kodu: {returncode}")
+                    return False
+                return True
             
-            if proc.returncode != 0 or not os.path.exists(frame_path):
-                print(f"⚠️ ffmpeg başarısız oldu. Çıkış kodu: {proc.returncode}")
-                return None
+            if not await _grab(video_url):
+                # Range okuma olmadı — tam indir (media cache, stitch'te tekrar inmez)
+                video_path = os.path.join(tmp_dir, "video.mp4")
+                try:
+                    await media_cache.materialize(video_url, dest=video_path)
+                except Exception as e:
+                    print(f"⚠️ Segment indirilemedi: {e}")
+                    return None
+                if not await _grab(video_path):
+                    return None
             
-            # fal'a yükle - Senkron olan bu fonksiyonu da Thread içine atalım:
             try:
-                frame_url = await asyncio.to_thread(fal_client.upload_file, frame_path)
+                frame_url = await media_io.upload_file(frame_path)
                 return frame_url
             except Exception as e:
                 print(f"⚠️ Son kare fal'a yüklenemedi: {e}")
@@ -407,20 +668,34 @@ class LongVideoService:
         self, 
         fal: "FalPluginV2",
         segment: VideoSegment,
-        aspect_ratio: str
+        job: LongVideoJob
     ):
-        """Tek bir segment üret — fal plugin üzerinden (kısa video ile aynı yol)."""
+        """
+        Tek bir segment üret — fal plugin üzerinden (kısa video ile aynı yol).
+        Her durum geçişi (generating / submit / completed / failed) kalıcı yazılır.
+        """
+        if await self._resume_segment(segment, job):
+            return
+        
         for attempt in range(self.MAX_RETRIES + 1):
             try:
                 segment.status = "generating"
+                segment.fal_endpoint = segment.fal_request_id = None
+                await long_video_store.save(job)
                 
                 model_to_use = "kling"
                 
+                async def _on_submit(endpoint: str, request_id: str):
+                    segment.fal_endpoint = endpoint
+                    segment.fal_request_id = request_id
+                    await long_video_store.save(job)
+                
                 payload = {
                     "prompt": segment.prompt,
                     "duration": segment.duration,
-                    "aspect_ratio": aspect_ratio,
+                    "aspect_ratio": job.aspect_ratio,
                     "model": model_to_use,
+                    "on_submit": _on_submit,
                 }
                 if segment.reference_image_url:
                     payload["image_url"] = segment.reference_image_url
@@ -434,6 +709,7 @@ class LongVideoService:
                 if result.success and result.data:
                     segment.video_url = result.data.get("video_url")
                     segment.status = "completed"
+                    await long_video_store.save(job)
                     print(f"   ✅ Sahne {segment.order + 1} tamamlandı (Model: {model_to_use})")
                     return
                 else:
@@ -442,15 +718,41 @@ class LongVideoService:
                     if attempt >= self.MAX_RETRIES:
                         segment.status = "failed"
                         segment.error = error_msg
+                        await long_video_store.save(job)
                         
             except Exception as e:
                 print(f"   ❌ Sahne {segment.order + 1} hata (deneme {attempt+1}): {e}")
                 if attempt >= self.MAX_RETRIES:
                     segment.status = "failed"
                     segment.error = str(e)
+                    await long_video_store.save(job)
                 else:
                     await asyncio.sleep(2)
     
+    async def _resume_segment(self, segment: VideoSegment, job: LongVideoJob) -> bool:
+        """
+        Restart öncesi fal'a gönderilmiş segment'i request_id ile yeniden poll et
+        (tekrar ücret ödemeden). Başarılıysa True; değilse normal üretime düşülür.
+        """
+        if segment.status != "generating" or not (segment.fal_endpoint and segment.fal_request_id):
+            return False
+        print(f"   ♻️ Sahne {segment.order + 1} fal isteği yeniden izleniyor ({segment.fal_request_id})")
+        try:
+            result = await fal_job_engine.wait(segment.fal_endpoint, segment.fal_request_id, timeout=1200)
+            video_url = (result or {}).get("video", {}).get("url")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"   ⚠️ Sahne {segment.order + 1} fal isteği devam ettirilemedi: {e}")
+            video_url = None
+        if not video_url:
+            return False
+        segment.video_url = video_url
+        segment.status = "completed"
+        await long_video_store.save(job)
+        print(f"   ✅ Sahne {segment.order + 1} restart sonrası kurtarıldı")
+        return True
+    
     async def _stitch_segments(self, job: LongVideoJob) -> str:
         """
         Segment'leri LOKAL FFmpeg ile birleştir + crossfade geçiş ekle.
@@ -459,8 +761,6 @@ class LongVideoService:
         2. Crossfade (xfade) geçişle birleştir
         3. fal.ai storage'a yükle
         """
-        import fal_client
-        import httpx
         import tempfile
         import os
         import asyncio
@@ -479,19 +779,17 @@ class LongVideoService:
             print(f"🔧 FFmpeg stitching: {n} segment birleştiriliyor (lokal + crossfade)...")
             
             with tempfile.TemporaryDirectory() as tmp_dir:
-                # 1. Tüm segment'leri indir
+                # 1. Tüm segment'leri diske stream et (bellekte tam video tutulmaz)
                 segment_paths = []
-                async with httpx.AsyncClient(timeout=120.0, follow_redirects=True) as client:
-                    for i, seg in enumerate(completed):
-                        seg_path = os.path.join(tmp_dir, f"segment_{i}.mp4")
-                        print(f"   ⬇️ Segment {i+1}/{n} indiriliyor...")
-                        resp = await client.get(seg.video_url)
-                        if resp.status_code != 200:
-                            print(f"   ⚠️ Segment {i+1} indirilemedi, atlanıyor")
-                            continue
-                        with open(seg_path, "wb") as f:
-                            f.write(resp.content)
-                        segment_paths.append(seg_path)
+                for i, seg in enumerate(completed):
+                    seg_path = os.path.join(tmp_dir, f"segment_{i}.mp4")
+                    print(f"   ⬇️ Segment {i+1}/{n} indiriliyor...")
+                    try:
+                        await media_cache.materialize(seg.video_url, dest=seg_path)
+                    except Exception as e:
+                        print(f"   ⚠️ Segment {i+1} indirilemedi, atlanıyor: {e}")
+                        continue
+                    segment_paths.append(seg_path)
                 
                 if len(segment_paths) < 2:
                     print("⚠️ Yeterli segment indirilemedi")
@@ -526,22 +824,9 @@ class LongVideoService:
                     # Get durations with ffprobe asnyc
                     durations = []
                     for p in segment_paths:
-                        probe_cmd = [
-                            "ffprobe", "-v", "error",
-                            "-show_entries", "format=duration",
-                            "-of", "csv=p=0", p
-                        ]
-                        probe_proc = await asyncio.create_subprocess_exec(
-                            *probe_cmd,
-                            stdout=asyncio.subprocess.PIPE,
-                            stderr=asyncio.subprocess.PIPE
-                        )
-                        try:
-                            stdout, stderr = await asyncio.wait_for(probe_proc.communicate(), timeout=10.0)
-                            dur_str = stdout.decode().strip()
-                            dur = float(dur_str)
-                        except Exception as probe_err:
-                            print(f"   ⚠️ ffprobe hatası: {probe_err}")
+                        dur = await media_io.probe_duration(p, timeout=10.0)
+                        if dur is None:
+                            print(f"   ⚠️ ffprobe süre okuyamadı: {os.path.basename(p)}")
                             dur = 5.0
                         durations.append(dur)
                     
@@ -577,19 +862,13 @@ class LongVideoService:
                 
                 print(f"   🔧 FFmpeg crossfade birleştirme (ASYNC) çalıştırılıyor...")
                 
-                proc = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                
                 try:
-                    await asyncio.wait_for(proc.communicate(), timeout=300.0)
+                    returncode, _, _ = await media_io.run_ffmpeg(cmd, timeout=300.0)
                 except asyncio.TimeoutError:
-                    proc.kill()
+                    returncode = -1
                     print("   ❌ FFmpeg crossfade timeout (300s)")
                 
-                if proc.returncode != 0:
+                if returncode != 0:
                     # Crossfade başarısız — basit concat dene
                     print(f"   ⚠️ Crossfade başarısız, basit concat deneniyor...")
                     
@@ -609,18 +888,12 @@ class LongVideoService:
                         output_path
                     ]
                     
-                    proc_fb = await asyncio.create_subprocess_exec(
-                        *cmd_fallback,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-                    
                     try:
-                        await asyncio.wait_for(proc_fb.communicate(), timeout=300.0)
+                        fallback_code, _, _ = await media_io.run_ffmpeg(cmd_fallback, timeout=300.0)
                     except asyncio.TimeoutError:
-                        proc_fb.kill()
+                        fallback_code = -1
                         
-                    if proc_fb.returncode != 0:
+                    if fallback_code != 0:
                         print(f"   ❌ Concat de başarısız")
                         return completed[0].video_url
                 
@@ -630,9 +903,10 @@ class LongVideoService:
                 
                 print(f"   ✅ Birleştirme tamamlandı: {os.path.getsize(output_path)} bytes")
                 
-                # 3. fal storage'a yükle (ASYNC thread pool kullanarak)
+                # 3. fal storage'a yükle (büyük dosyalar diskten multipart)
                 print("   ⬆️ fal.ai storage'a yükleniyor (ASYNC)...")
-                final_url = await asyncio.to_thread(fal_client.upload_file, output_path)
+                final_url = await media_io.upload_file(output_path)
+                await media_cache.store_file(final_url, output_path)
                 print(f"   ✅ Yüklendi: {final_url[:60]}...")
                 
                 return final_url
@@ -644,9 +918,9 @@ class LongVideoService:
             print("⚠️ Fallback: İlk segment döndürülüyor")
             return completed[0].video_url
     
-    def get_job_status(self, job_id: str) -> Optional[dict]:
-        """Job durumunu al."""
-        job = self.jobs.get(job_id)
+    async def get_job_status(self, job_id: str) -> Optional[dict]:
+        """Job durumunu al (kalıcı store'dan — işi hangi replika yürütürse yürütsün)."""
+        job = await long_video_store.load(job_id) or self.jobs.get(job_id)
         if not job:
             return None
         
@@ -0,0 +1,216 @@
+"""
+Long Video Store - Uzun video işlerinin kalıcı durumu (tasks tablosu).
+
+LongVideoService.jobs sadece process belleğindeydi; deploy/crash tamamlanmış
+(ve ücreti ödenmiş) tüm segmentleri kaybettiriyordu. Bu modül:
+1. LongVideoJob + VideoSegment durumunu her segment geçişinde `tasks`
+   tablosuna (task_type="long_video") yazar
+2. Segment'lerin fal request_id'lerini saklar → restart sonrası yeniden poll
+3. Yarım kalan işleri listeler (lifespan resume)
+4. Durum sorgusunu DB'den cevaplar → her replika aynı yanıtı verir
+5. Lease: işi yürüten process satırı (owner, lease_until) ile sahiplenir ve
+   periyodik yeniler; resume yalnızca sahipsiz / lease'i dolmuş işi atomik
+   UPDATE ile devralır → aynı anda açılan replikalar aynı işi (ve ücretli
+   segment'leri) iki kez çalıştırmaz. Celery worker'da başlayan işler web
+   process'lerince resume edilmez.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import func, or_, select, update
+
+from app.core.database import async_session_maker
+from app.models.models import Task
+
+if TYPE_CHECKING:
+    from app.services.long_video_service import LongVideoJob
+
+logger = logging.getLogger(__name__)
+
+
+class LongVideoJobStore:
+    """LongVideoJob ↔ tasks satırı."""
+
+    TASK_TYPE = "long_video"
+    ACTIVE_STATUSES = ("pending", "processing", "stitching")
+    LEASE_TTL = 90              # saniye — sahibi bu sürede yenilemezse iş devralınabilir
+    LEASE_RENEW_INTERVAL = 30   # saniye
+
+    def __init__(self):
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.runner = "web"     # Celery worker process'lerinde "celery" (tasks/runtime.py)
+
+    # ===============================
+    # SERİLEŞTİRME
+    # ===============================
+
+    @staticmethod
+    def to_record(job: "LongVideoJob") -> dict:
+        return {
+            "user_id": job.user_id,
+            "total_duration": job.total_duration,
+            "aspect_ratio": job.aspect_ratio,
+            "request": dict(job.request),
+            "progress": job.progress,
+            "final_video_url": job.final_video_url,
+            "created_at": job.created_at.isoformat(),
+            "segments": [asdict(s) for s in job.segments],
+        }
+
+    @staticmethod
+    def from_record(job_id: str, session_id: str, status: str, record: dict) -> "LongVideoJob":
+        from app.services.long_video_service import LongVideoJob, VideoSegment
+
+        return LongVideoJob(
+            id=job_id,
+            user_id=record.get("user_id", ""),
+            session_id=session_id,
+            total_duration=record.get("total_duration", 0),
+            aspect_ratio=record.get("aspect_ratio", "16:9"),
+            segments=[VideoSegment(**s) for s in record.get("segments", [])],
+            status=status,
+            progress=record.get("progress", 0),
+            final_video_url=record.get("final_video_url"),
+            created_at=datetime.fromisoformat(record["created_at"]) if record.get("created_at") else None,
+            request=record.get("request") or {},
+        )
+
+    # ===============================
+    # DB
+    # ===============================
+
+    async def save(self, job: "LongVideoJob"):
+        """
+        İşin güncel durumunu upsert et. Aynı işin yazımları sıraya alınır;
+        snapshot kilit içinde alındığı için eski durum yeniyi ezemez.
+        Hata fırlatmaz — kalıcılık üretimi durdurmamalı.
+        """
+        lock = self._locks.setdefault(job.id, asyncio.Lock())
+        async with lock:
+            record = self.to_record(job)
+            try:
+                async with async_session_maker() as db:
+                    task = await db.get(Task, uuid.UUID(job.id))
+                    if task is None:
+                        task = Task(
+                            id=uuid.UUID(job.id),
+                            session_id=uuid.UUID(job.session_id),
+                            task_type=self.TASK_TYPE,
+                            input_data={"user_id": job.user_id, **job.request, "runner": self.runner},
+                            started_at=datetime.now(timezone.utc),
+                            # Oluşturan process işin ilk sahibi
+                            owner=self.instance_id,
+                            lease_until=datetime.now(timezone.utc) + timedelta(seconds=self.LEASE_TTL),
+                        )
+                        db.add(task)
+                    task.status = job.status
+                    task.output_data = record
+                    if job.status == "failed":
+                        task.error_message = next((s.error for s in job.segments if s.error), None)
+                    if job.status in ("completed", "failed"):
+                        task.completed_at = datetime.now(timezone.utc)
+                        task.owner = None
+                        task.lease_until = None
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"⚠️ Long video job kaydedilemedi ({job.id}): {e}")
+        if job.status in ("completed", "failed"):
+            self._locks.pop(job.id, None)
+
+    async def load(self, job_id: str) -> Optional["LongVideoJob"]:
+        try:
+            async with async_session_maker() as db:
+                task = await db.get(Task, uuid.UUID(job_id))
+        except Exception as e:
+            logger.warning(f"⚠️ Long video job okunamadı ({job_id}): {e}")
+            return None
+        if task is None or task.task_type != self.TASK_TYPE or not task.output_data:
+            return None
+        return self.from_record(str(task.id), str(task.session_id), task.status, task.output_data)
+
+    async def list_unfinished(self) -> list["LongVideoJob"]:
+        """
+        Restart'ta devam ettirilebilecek işler: sahipsiz / lease'i dolmuş ve
+        bu process'in türünde (web / celery) başlamış olanlar. Kesin karar claim()'de.
+        """
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(Task).where(
+                    Task.task_type == self.TASK_TYPE,
+                    Task.status.in_(self.ACTIVE_STATUSES),
+                    or_(Task.lease_until.is_(None), Task.lease_until < func.now()),
+                    func.coalesce(Task.input_data["runner"].astext, "web") == self.runner,
+                )
+            )
+            tasks = result.scalars().all()
+        return [
+            self.from_record(str(t.id), str(t.session_id), t.status, t.output_data)
+            for t in tasks if t.output_data
+        ]
+
+
+    # ===============================
+    # LEASE
+    # ===============================
+
+    async def claim(self, job_id: str) -> bool:
+        """
+        İşi atomik olarak sahiplen: yalnızca hâlâ aktifse ve sahipsiz / lease'i
+        dolmuş / zaten bizimse. Aynı anda resume eden replikalardan yalnızca biri kazanır.
+        """
+        async with async_session_maker() as db:
+            result = await db.execute(
+                update(Task)
+                .where(
+                    Task.id == uuid.UUID(job_id),
+                    Task.status.in_(self.ACTIVE_STATUSES),
+                    or_(
+                        Task.owner.is_(None),
+                        Task.owner == self.instance_id,
+                        Task.lease_until.is_(None),
+                        Task.lease_until < func.now(),
+                    ),
+                )
+                .values(owner=self.instance_id, lease_until=func.now() + timedelta(seconds=self.LEASE_TTL))
+                .returning(Task.id)
+            )
+            claimed = result.scalar_one_or_none() is not None
+            await db.commit()
+        return claimed
+
+    async def renew(self, job_id: str) -> bool:
+        """Lease'i uzat. False → iş artık bizim değil (başka process devraldı)."""
+        async with async_session_maker() as db:
+            result = await db.execute(
+                update(Task)
+                .where(Task.id == uuid.UUID(job_id), Task.owner == self.instance_id)
+                .values(lease_until=func.now() + timedelta(seconds=self.LEASE_TTL))
+                .returning(Task.id)
+            )
+            renewed = result.scalar_one_or_none() is not None
+            await db.commit()
+        return renewed
+
+    async def release(self, job_id: str):
+        """Yarım bırakılan (ör. shutdown'da iptal edilen) işi hemen devralınabilir yap."""
+        try:
+            async with async_session_maker() as db:
+                await db.execute(
+                    update(Task)
+                    .where(Task.id == uuid.UUID(job_id), Task.owner == self.instance_id)
+                    .values(owner=None, lease_until=None)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Long video lease bırakılamadı ({job_id}): {e}")
+
+
+# Singleton instance
+long_video_store = LongVideoJobStore()
@@ -0,0 +1,246 @@
+"""
+Media Cache - URL + içerik hash'i ile adreslenen lokal disk cache'i.
+
+Aynı kaynak URL tekrar tekrar indiriliyordu: _extract_last_frame her segmenti
+çeker, _stitch_segments aynı segmenti tekrar çeker; VideoEditor'da zincirleme
+düzenlemeler (trim → fade → yazı) ve AudioSync (beat cut → detect_beats) her
+adımda yeniden indirir.
+
+- Blob'lar içerik hash'i (sha256) ile saklanır; farklı URL'ler aynı blob'u paylaşır
+- URL → hash indeksi process içinde tutulur
+- Toplam boyut sınırlı, LRU ile tahliye
+- Aynı URL için eşzamanlı istekler tek indirmeyi paylaşır (single-flight)
+- Kendi yüklediğimiz çıktılar (upload) cache'e eklenir → zincirleme
+  düzenlemelerde ağ maliyeti bir kez ödenir
+
+Çağıranlar blob'un kendisini değil, hardlink (olmazsa kopya) alır; böylece
+kendi geçici dosyalarını silmeye devam edebilirler ve tahliye onları etkilemez.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+from app.core.single_flight import SingleFlight
+from app.services.media_io import media_io
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedBlob:
+    """Diskteki tek bir içerik-adresli dosya."""
+    digest: str
+    path: str
+    size: int
+
+
+class MediaCache:
+    """Boyut sınırlı, single-flight'lı, content-addressed medya cache'i."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        base = root or settings.MEDIA_CACHE_DIR or os.path.join(tempfile.gettempdir(), "pepper_media_cache")
+        # Her worker process kendi dizinini kullanır (indeks process içinde);
+        # ölü process'lerden kalan dizinler ilk kullanımda süpürülür
+        self.base = base
+        self.root = os.path.join(base, str(os.getpid()))
+        self._swept = False
+        self.max_bytes = max_bytes or settings.MEDIA_CACHE_MAX_MB * 1024 * 1024
+        self._blobs: OrderedDict[str, CachedBlob] = OrderedDict()  # digest → blob (LRU sırası)
+        self._urls: dict[str, str] = {}                             # url → digest
+        self._flights = SingleFlight()
+        self._total_bytes = 0
+        self._stats = {
+            "hits": 0, "misses": 0, "shared": 0, "stored": 0,
+            "evictions": 0, "bytes_downloaded": 0, "bytes_served": 0,
+        }
+
+    # ===============================
+    # PUBLIC API
+    # ===============================
+
+    async def materialize(
+        self,
+        url: str,
+        dest: Optional[str] = None,
+        suffix: str = ".mp4",
+        max_bytes: Optional[int] = None,
+    ) -> str:
+        """
+        URL'nin içeriğini çağırana ait bir yola koy (cache'ten veya indirerek).
+        dest verilmezse geçici dosya oluşturulur; silmek çağırana aittir.
+        """
+        blob = await self._fetch(url, suffix, max_bytes)
+        if dest is None:
+            fd, dest = tempfile.mkstemp(suffix=suffix)
+            os.close(fd)
+        self._link(blob.path, dest)
+        self._stats["bytes_served"] += blob.size
+        return dest
+
+    async def store_file(self, url: str, path: str):
+        """Lokal bir dosyayı (ör. az önce yüklenen çıktı) URL'si ile cache'e ekle."""
+        if url in self._urls or not os.path.exists(path):
+            return
+        try:
+            digest = await asyncio.to_thread(self._hash_file, path)
+            self._ensure_dir()
+            tmp_path = os.path.join(self.root, f".store-{digest}")
+            self._link(path, tmp_path)
+            blob = self._adopt(tmp_path, digest, os.path.getsize(tmp_path), os.path.splitext(path)[1])
+            self._urls[url] = blob.digest
+            self._stats["stored"] += 1
+            self._evict()
+        except Exception as e:
+            logger.warning(f"⚠️ Media cache store hatası: {e}")
+
+    def get_stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["shared"]
+        return {
+            **self._stats,
+            "entries": len(self._blobs),
+            "urls": len(self._urls),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round((self._stats["hits"] + self._stats["shared"]) / lookups, 3) if lookups else 0.0,
+        }
+
+    def clear(self):
+        """Tüm cache'i sil (lifespan shutdown)."""
+        shutil.rmtree(self.root, ignore_errors=True)
+        self._blobs.clear()
+        self._urls.clear()
+        self._total_bytes = 0
+
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    async def _fetch(self, url: str, suffix: str, max_bytes: Optional[int]) -> CachedBlob:
+        digest = self._urls.get(url)
+        blob = self._blobs.get(digest) if digest else None
+        if blob is not None and os.path.exists(blob.path):
+            self._blobs.move_to_end(digest)
+            self._stats["hits"] += 1
+            return blob
+
+        async def _load() -> CachedBlob:
+            self._stats["misses"] += 1
+            blob = await self._download(url, suffix, max_bytes)
+            self._urls[url] = blob.digest
+            self._evict(keep=blob.digest)
+            return blob
+
+        return await self._flights.do(url, _load, on_shared=self._count_shared)
+
+    def _count_shared(self):
+        self._stats["shared"] += 1
+
+    async def _download(self, url: str, suffix: str, max_bytes: Optional[int]) -> CachedBlob:
+        self._ensure_dir()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".dl-", suffix=suffix)
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in media_io.iter_chunks(url, max_bytes=max_bytes):
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._stats["bytes_downloaded"] += size
+        return self._adopt(tmp_path, hasher.hexdigest(), size, suffix)
+
+    def _adopt(self, tmp_path: str, digest: str, size: int, suffix: str) -> CachedBlob:
+        """Geçici dosyayı hash adıyla blob yap (aynı içerik varsa onu kullan)."""
+        existing = self._blobs.get(digest)
+        if existing is not None and os.path.exists(existing.path):
+            os.unlink(tmp_path)
+            self._blobs.move_to_end(digest)
+            return existing
+        path = os.path.join(self.root, f"{digest}{suffix or ''}")
+        os.replace(tmp_path, path)
+        blob = CachedBlob(digest=digest, path=path, size=size)
+        self._blobs[digest] = blob
+        self._total_bytes += size
+        return blob
+
+    def _evict(self, keep: Optional[str] = None):
+        for digest in list(self._blobs):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            blob = self._blobs.pop(digest)
+            self._total_bytes -= blob.size
+            self._stats["evictions"] += 1
+            for url in [u for u, d in self._urls.items() if d == digest]:
+                self._urls.pop(url, None)
+            try:
+                os.unlink(blob.path)
+            except OSError:
+                pass
+
+    def _ensure_dir(self):
+        if not self._swept:
+            self._swept = True
+            self._sweep_stale_roots()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _sweep_stale_roots(self):
+        """Çıkmış (restart/crash) worker'ların <pid> dizinlerini sil."""
+        try:
+            entries = os.listdir(self.base)
+        except OSError:
+            return
+        own = str(os.getpid())
+        for name in entries:
+            if not name.isdigit() or name == own or self._pid_alive(int(name)):
+                continue
+            shutil.rmtree(os.path.join(self.base, name), ignore_errors=True)
+            logger.info(f"🧹 Media cache: eski process dizini silindi ({name})")
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True  # Başka kullanıcının process'i — dokunma
+        except OSError:
+            return True
+        return True
+
+    @staticmethod
+    def _link(src: str, dest: str):
+        """Hardlink (aynı dosya sistemi) — olmazsa kopya."""
+        if os.path.exists(dest):
+            os.unlink(dest)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+
+# Singleton instance
+media_cache = MediaCache()
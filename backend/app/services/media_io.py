@@ -0,0 +1,202 @@
+"""
+Media I/O - Paylaşılan, streaming medya indirme/yükleme katmanı.
+
+Servisler (VideoEditor, AudioSync, LongVideo, video analiz) her indirmede yeni
+bir httpx.AsyncClient açıp tüm videoyu `resp.content` ile belleğe alıyordu.
+Bu modül:
+1. Tek, bağlantı havuzlu bir httpx.AsyncClient kullanır
+2. Dosyaları parça parça (chunk) diske yazar — bellek kullanımı chunk boyutu kadar
+3. Boyut limitini aşan dosyaları indirme sırasında reddeder
+4. FFmpeg'i URL'den veya stdin pipe'ından besleme seçeneği sunar
+5. fal storage'a async yükler (büyük dosyalar diskten multipart)
+"""
+import asyncio
+import logging
+import os
+import tempfile
+from typing import AsyncIterator, Optional
+
+import fal_client
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class MediaTooLargeError(ValueError):
+    """İndirilen medya izin verilen boyutu aşıyor."""
+
+
+class MediaIO:
+    """Havuzlu HTTP client + chunk'lı indirme + async ffmpeg/yükleme yardımcıları."""
+
+    CHUNK_SIZE = 1024 * 1024                 # 1 MB
+    MAX_DOWNLOAD_BYTES = 512 * 1024 * 1024   # Video/ses varsayılan limiti
+    MAX_IMAGE_BYTES = 32 * 1024 * 1024       # Görsel limiti
+    MAX_CONNECTIONS = 32
+    FFMPEG_TIMEOUT = 300.0
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(120.0, connect=15.0),
+                limits=httpx.Limits(
+                    max_connections=self.MAX_CONNECTIONS,
+                    max_keepalive_connections=self.MAX_CONNECTIONS // 2,
+                ),
+            )
+        return self._client
+
+    # ===============================
+    # DOWNLOAD
+    # ===============================
+
+    async def iter_chunks(self, url: str, max_bytes: Optional[int] = None) -> AsyncIterator[bytes]:
+        """URL içeriğini chunk chunk üret; limit aşılırsa MediaTooLargeError."""
+        limit = max_bytes or self.MAX_DOWNLOAD_BYTES
+        async with self.client.stream("GET", url) as resp:
+            resp.raise_for_status()
+            declared = resp.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > limit:
+                raise MediaTooLargeError(f"Medya çok büyük: {int(declared)} byte (limit {limit})")
+            received = 0
+            async for chunk in resp.aiter_bytes(self.CHUNK_SIZE):
+                received += len(chunk)
+                if received > limit:
+                    raise MediaTooLargeError(f"Medya limiti aşıldı: >{limit} byte ({url[:80]})")
+                yield chunk
+
+    async def download_to_file(
+        self,
+        url: str,
+        path: Optional[str] = None,
+        suffix: str = ".mp4",
+        max_bytes: Optional[int] = None,
+    ) -> str:
+        """
+        URL'yi diske stream et, dosya yolunu döndür.
+        path verilmezse geçici dosya oluşturulur (silmek çağırana aittir).
+        Hata durumunda yarım dosya silinir.
+        """
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix=suffix)
+            os.close(fd)
+        try:
+            with open(path, "wb") as f:
+                async for chunk in self.iter_chunks(url, max_bytes=max_bytes):
+                    f.write(chunk)
+        except BaseException:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            raise
+        return path
+
+    async def download_bytes(self, url: str, max_bytes: Optional[int] = None) -> bytes:
+        """Küçük medya (görsel vb.) için limitli bellek içi indirme."""
+        buffer = bytearray()
+        async for chunk in self.iter_chunks(url, max_bytes=max_bytes or self.MAX_IMAGE_BYTES):
+            buffer.extend(chunk)
+        return bytes(buffer)
+
+    # ===============================
+    # FFMPEG
+    # ===============================
+
+    @staticmethod
+    def ffmpeg_input(source: str) -> list[str]:
+        """
+        FFmpeg -i argümanları. HTTP kaynakları indirilmeden doğrudan okunur
+        (bağlantı koparsa yeniden bağlanır); lokal yollar olduğu gibi geçer.
+        """
+        if source.startswith(("http://", "https://")):
+            return ["-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5", "-i", source]
+        return ["-i", source]
+
+    async def run_ffmpeg(
+        self,
+        args: list[str],
+        timeout: Optional[float] = None,
+        stdin_url: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+    ) -> tuple[int, bytes, bytes]:
+        """
+        FFmpeg/ffprobe'u async çalıştır → (returncode, stdout, stderr).
+        stdin_url verilirse içerik indirilirken "pipe:0" girişine yazılır (diske inmez).
+        Timeout'ta süreç öldürülür ve asyncio.TimeoutError fırlatılır.
+        """
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.PIPE if stdin_url else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+        async def _feed():
+            try:
+                async for chunk in self.iter_chunks(stdin_url, max_bytes=max_bytes):
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # ffmpeg ihtiyacı olanı okudu ve stdin'i kapattı
+            finally:
+                try:
+                    proc.stdin.close()
+                except Exception:
+                    pass
+
+        try:
+            if stdin_url:
+                # communicate() stdin'i hemen kapatır; besleme ile okumayı birlikte yürüt
+                _, stdout, stderr = await asyncio.wait_for(
+                    asyncio.gather(_feed(), proc.stdout.read(), proc.stderr.read()),
+                    timeout=timeout or self.FFMPEG_TIMEOUT,
+                )
+                await proc.wait()
+            else:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout or self.FFMPEG_TIMEOUT)
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+        return proc.returncode, stdout or b"", stderr or b""
+
+    async def probe_duration(self, source: str, timeout: float = 15.0) -> Optional[float]:
+        """ffprobe ile süre (saniye); lokal yol veya URL."""
+        try:
+            code, stdout, _ = await self.run_ffmpeg(
+                ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", source],
+                timeout=timeout,
+            )
+            return float(stdout.decode().strip()) if code == 0 else None
+        except (ValueError, asyncio.TimeoutError, OSError):
+            return None
+
+    # ===============================
+    # UPLOAD
+    # ===============================
+
+    @staticmethod
+    async def upload_file(path: str) -> str:
+        """Dosyayı fal storage'a async yükle (100MB üstü diskten multipart)."""
+        return await fal_client.upload_file_async(path)
+
+    @staticmethod
+    async def upload_bytes(data: bytes, content_type: str, file_name: Optional[str] = None) -> str:
+        """Bellekteki küçük medyayı geçici dosya açmadan yükle."""
+        return await fal_client.upload_async(data, content_type, file_name=file_name)
+
+    async def close(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+# Singleton instance
+media_io = MediaIO()
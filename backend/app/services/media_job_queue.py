@@ -0,0 +1,128 @@
+"""
+Media Job Queue - Ağır medya işlerini (video, uzun video, video düzenleme) Celery'ye devret.
+
+MEDIA_JOB_BACKEND=celery iken orchestrator işi web process'inde asyncio.Task
+olarak başlatmak yerine "video" kuyruğuna aynı payload ile gönderir:
+1. Worker, orchestrator'ın aynı _run_*_bg metodunu kendi kalıcı loop'unda çalıştırır
+   (FalPluginV2 / LongVideoService / VideoEditorService aynen kullanılır)
+2. İlerleme, progress_service'in Redis pub/sub kanalı üzerinden web replikalarına döner
+3. İptal: web tarafı media_job:cancel:{session_id} bayrağını koyar, worker bayrağı
+   periyodik kontrol edip işi asyncio seviyesinde iptal eder (process öldürülmez)
+4. Tek çalıştırma: worker job id'yi SET NX ile sahiplenir; aynı mesaj yeniden
+   teslim edilse de ücretli iş ikinci kez başlamaz
+"""
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# İş tipi → (Celery task adı, orchestrator'daki çalıştırıcı metot)
+MEDIA_JOBS: Dict[str, tuple] = {
+    "video": ("app.tasks.video_tasks.generate_video", "_run_video_bg"),
+    "long_video": ("app.tasks.video_tasks.generate_long_video", "_run_long_video_bg"),
+    "edit_video": ("app.tasks.video_tasks.edit_video", "_run_edit_video_bg"),
+}
+
+
+class MediaJobQueue:
+    """Celery offload modu için enqueue / iptal / worker tarafı yürütme."""
+
+    ACTIVE_PREFIX = "media_job:active:"
+    CANCEL_PREFIX = "media_job:cancel:"
+    CLAIM_PREFIX = "media_job:claim:"
+    ACTIVE_TTL = 7500            # video_tasks'taki en uzun time_limit ile aynı
+    CANCEL_POLL_SECONDS = 2.0
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any]) -> Optional[str]:
+        """İşi video kuyruğuna gönder. Broker'a ulaşılamazsa None (çağıran inline çalıştırır)."""
+        task_name, _ = MEDIA_JOBS[kind]
+        job_id = str(uuid.uuid4())
+        session_id = payload["session_id"]
+        try:
+            from app.core.celery_app import celery_app
+
+            # Önceki işin iptal bayrağı yeni işi öldürmesin
+            if cache.is_connected:
+                await cache.client.delete(f"{self.CANCEL_PREFIX}{session_id}")
+            # Broker'a gönderim senkron ağ I/O'su — loop'u bloklamasın
+            await asyncio.to_thread(
+                celery_app.send_task, task_name, args=[payload], task_id=job_id, queue="video",
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Medya işi kuyruğa alınamadı ({kind}): {e}")
+            return None
+
+        # İş kuyrukta — buradan sonraki hata None döndürmemeli, yoksa çağıran
+        # işi inline da çalıştırır (aynı video iki kez üretilip faturalanır)
+        print(f"📤 Medya işi kuyruğa alındı: {kind} job={job_id[:8]} session={session_id[:8]}")
+        if cache.is_connected:
+            try:
+                await cache.client.set(f"{self.ACTIVE_PREFIX}{session_id}", job_id, ex=self.ACTIVE_TTL)
+            except Exception as e:
+                logger.warning(f"⚠️ Medya işi aktif işareti yazılamadı ({kind}, iptal edilemeyebilir): {e}")
+        return job_id
+
+    async def request_cancel(self, session_id: str) -> bool:
+        """Session'da worker'da çalışan iş varsa iptal bayrağını koy."""
+        if not cache.is_connected:
+            return False
+        if not await cache.client.get(f"{self.ACTIVE_PREFIX}{session_id}"):
+            return False
+        await cache.client.set(f"{self.CANCEL_PREFIX}{session_id}", "1", ex=self.ACTIVE_TTL)
+        return True
+
+    async def run(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None):
+        """Worker tarafı: orchestrator çalıştırıcısını iptal bayrağını izleyerek yürüt."""
+        if not cache.is_connected:
+            await cache.connect()
+
+        # Aynı mesaj ikinci kez teslim edilirse (broker redelivery) ücretli işi tekrar çalıştırma
+        if job_id and cache.is_connected:
+            claimed = await cache.client.set(f"{self.CLAIM_PREFIX}{job_id}", "1", ex=self.ACTIVE_TTL, nx=True)
+            if not claimed:
+                print(f"⏭️ Medya işi zaten çalıştırıldı, atlanıyor: {kind} job={job_id[:8]}")
+                return
+
+        from app.services.agent.orchestrator import agent
+
+        _, runner_name = MEDIA_JOBS[kind]
+        session_id = payload["session_id"]
+        job = asyncio.create_task(getattr(agent, runner_name)(**payload))
+        watcher = asyncio.create_task(self._watch_cancel(session_id, job))
+        try:
+            await job
+        except asyncio.CancelledError:
+            print(f"🛑 Medya işi iptal edildi: {kind} session={session_id[:8]}")
+        finally:
+            watcher.cancel()
+            await self._clear(session_id, job_id)
+
+    async def _watch_cancel(self, session_id: str, job: asyncio.Task):
+        key = f"{self.CANCEL_PREFIX}{session_id}"
+        while not job.done():
+            await asyncio.sleep(self.CANCEL_POLL_SECONDS)
+            try:
+                if cache.is_connected and await cache.client.get(key):
+                    job.cancel()
+                    return
+            except Exception as e:
+                logger.debug(f"İptal bayrağı okunamadı: {e}")
+
+    async def _clear(self, session_id: str, job_id: Optional[str]):
+        if not cache.is_connected:
+            return
+        try:
+            active_key = f"{self.ACTIVE_PREFIX}{session_id}"
+            # Aynı session'da sonradan başlatılan işin kaydını silme
+            if job_id is None or await cache.client.get(active_key) == job_id:
+                await cache.client.delete(active_key, f"{self.CANCEL_PREFIX}{session_id}")
+        except Exception as e:
+            logger.debug(f"Medya işi kaydı temizlenemedi: {e}")
+
+
+# Singleton instance
+media_job_queue = MediaJobQueue()
@@ -172,9 +172,14 @@ def extract_request_constraints(text: str) -> dict:
 
 def has_conflicting_request_constraints(current_request: str, historical_prompt: str) -> bool:
     """Gecmis prompt, mevcut istegin acik parametreleriyle cakisiyor mu?"""
-    current = extract_request_constraints(current_request)
-    historical = extract_request_constraints(historical_prompt)
+    return constraints_conflict(
+        extract_request_constraints(current_request),
+        extract_request_constraints(historical_prompt),
+    )
 
+
+def constraints_conflict(current: dict, historical: dict) -> bool:
+    """Onceden cikarilmis iki kisit izi (extract_request_constraints) cakisiyor mu?"""
     if (
         current["duration"] is not None
         and historical["duration"] is not None
@@ -190,7 +195,7 @@ def has_conflicting_request_constraints(current_request: str, historical_prompt:
     ):
         return True
 
-    if current["models"] and historical["models"] and current["models"].isdisjoint(historical["models"]):
+    if current["models"] and historical["models"] and set(current["models"]).isdisjoint(historical["models"]):
         return True
 
     return False
@@ -0,0 +1,221 @@
+"""
+Mesaj Geçmişi — keyset sayfalama + sınırlı agent bağlamı.
+
+Eskiden her chat turunda session'ın TÜM mesajları (büyük JSONB metadata'larıyla)
+ASC sırada çekiliyor, hata mesajları Python'da string taramasıyla atılıyor ve
+sonra son 20'si alınıyordu; /sessions/{id}/messages da tüm geçmişi dönüyordu.
+Bu modül:
+1. Agent bağlamı: ORDER BY created_at DESC, id DESC LIMIT n → ters çevrilir
+   (ix_messages_session_created_id ile indeksten okunur, satır sayısı sabit)
+2. Hata filtresi yazarken hesaplanır (Message.is_error), okurken SQL'de elenir
+3. Sayfalama: (created_at, id) üzerinde before/after cursor'ları — OFFSET yok,
+   derin sayfalar da ilk sayfa kadar ucuz
+4. Son kullanıcı referans görseli önce bağlam penceresinde aranır; yoksa
+   tek satırlık ek sorgu
+"""
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Message
+
+# Bu kalıpları içeren asistan mesajları agent bağlamına alınmaz (kredi/hata yanıtları)
+ERROR_PATTERNS = (
+    "kredi", "credit", "yetersiz", "insufficient",
+    "hata", "error", "başarısız", "failed",
+    "oluşturulamadı", "üretilemedi", "yapılamadı",
+)
+
+
+def is_error_message(role: Optional[str], content: Optional[str]) -> bool:
+    """Asistan mesajı bir hata/kredi yanıtı mı? (yazma anında çağrılır)"""
+    if role != "assistant" or not content:
+        return False
+    lowered = content.lower()
+    return any(pattern in lowered for pattern in ERROR_PATTERNS)
+
+
+@event.listens_for(Message, "before_insert")
+@event.listens_for(Message, "before_update")
+def _flag_error_message(mapper, connection, target: Message):
+    """ORM üzerinden yazılan her mesajda is_error'ı içerikten türet."""
+    target.is_error = is_error_message(target.role, target.content)
+
+
+Cursor = Tuple[datetime, UUID]
+
+
+def encode_cursor(created_at: datetime, message_id: UUID) -> str:
+    """(created_at, id) → opak, URL-güvenli cursor."""
+    raw = f"{created_at.isoformat()}|{message_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Opak cursor → (created_at, id). Bozuksa ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(message_id)
+    except Exception as e:
+        raise ValueError(f"Geçersiz cursor: {cursor}") from e
+
+
+@dataclass
+class MessagePage:
+    """Kronolojik (ASC) sıralı sayfa + komşu sayfaların cursor'ları."""
+    messages: List[Message] = field(default_factory=list)
+    next_before: Optional[str] = None   # Daha eski mesajlar varsa
+    next_after: Optional[str] = None    # Daha yeni mesajlar varsa
+
+
+class MessageHistory:
+    """Session mesaj geçmişine tek erişim noktası."""
+
+    CONTEXT_LIMIT = 20
+    PAGE_SIZE = 100
+    PAGE_MAX = 500
+    REFERENCE_SCAN = 5      # Referans fallback sorgusunda bakılan aday sayısı
+
+    # ===============================
+    # SAYFALAMA
+    # ===============================
+
+    async def page(
+        self,
+        db: AsyncSession,
+        session_id: UUID,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> MessagePage:
+        """
+        Keyset sayfalama. Cursor yoksa en yeni `limit` mesaj; `before` ile daha
+        eskiler, `after` ile daha yeniler. Sonuç her zaman kronolojik sıradadır.
+        """
+        limit = max(1, min(limit or self.PAGE_SIZE, self.PAGE_MAX))
+        key = tuple_(Message.created_at, Message.id)
+        query = select(Message).where(Message.session_id == session_id)
+
+        if after:
+            query = query.where(key > tuple_(*decode_cursor(after)))
+            query = query.order_by(Message.created_at.asc(), Message.id.asc())
+        else:
+            if before:
+                query = query.where(key < tuple_(*decode_cursor(before)))
+            query = query.order_by(Message.created_at.desc(), Message.id.desc())
+
+        # Bir fazlası: sonraki sayfa var mı?
+        rows = list((await db.execute(query.limit(limit + 1))).scalars().all())
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not after:
+            rows.reverse()
+
+        result = MessagePage(messages=rows)
+        if rows:
+            # Tarama yönünde devamı has_more'dan; ters yönde cursor'ın kendisi bir mesaj gösterir
+            has_older = True if after else has_more
+            has_newer = has_more if after else bool(before)
+            if has_older:
+                result.next_before = encode_cursor(rows[0].created_at, rows[0].id)
+            if has_newer:
+                result.next_after = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return result
+
+    # ===============================
+    # AGENT BAĞLAMI
+    # ===============================
+
+    async def recent_for_context(
+        self,
+        db: AsyncSession,
+        session_id: UUID,
+        limit: Optional[int] = None,
+        exclude_id: Optional[UUID] = None,
+    ) -> List[Message]:
+        """Hata olmayan son `limit` mesaj, kronolojik sırada (DESC LIMIT hızlı yolu)."""
+        query = (
+            select(Message)
+            .where(Message.session_id == session_id)
+            .where(Message.is_error.is_(False))
+        )
+        if exclude_id is not None:
+            query = query.where(Message.id != exclude_id)
+        query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit or self.CONTEXT_LIMIT)
+        rows = list((await db.execute(query)).scalars().all())
+        rows.reverse()
+        return rows
+
+    @staticmethod
+    def _reference_urls(msg: Message) -> Optional[List[str]]:
+        """Kullanıcı mesajının yüklediği referans görsel URL'leri (yoksa None)."""
+        if msg.role != "user" or not isinstance(msg.metadata_, dict):
+            return None
+        meta = msg.metadata_
+        # Eski tekil yapı
+        if meta.get("has_reference_image") and meta.get("reference_url"):
+            return [meta["reference_url"]]
+        # Yeni çoklu yapı
+        if meta.get("reference_urls") and isinstance(meta.get("reference_urls"), list):
+            return meta["reference_urls"]
+        return None
+
+    async def last_reference_urls(
+        self, db: AsyncSession, session_id: UUID, exclude_id: Optional[UUID] = None,
+    ) -> List[str]:
+        """Session'da kullanıcının en son yüklediği referans görseller."""
+        query = (
+            select(Message)
+            .where(Message.session_id == session_id, Message.role == "user")
+            .where(or_(Message.metadata_.has_key("reference_urls"), Message.metadata_.has_key("reference_url")))
+        )
+        if exclude_id is not None:
+            query = query.where(Message.id != exclude_id)
+        query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(self.REFERENCE_SCAN)
+        for msg in (await db.execute(query)).scalars().all():
+            urls = self._reference_urls(msg)
+            if urls:
+                return urls
+        return []
+
+    @staticmethod
+    def to_openai(msg: Message) -> Dict[str, str]:
+        """
+        Mesajı OpenAI formatına çevir. Asistan mesajlarında üretilen görsel/video
+        URL'leri metadata'dan eklenir (content'te yoklar ama modelin bilmesi gerekiyor).
+        """
+        content = msg.content or ""
+        if msg.role == "assistant" and isinstance(msg.metadata_, dict):
+            for key, label in (("images", "görseller"), ("videos", "videolar")):
+                urls = [item.get("url") for item in msg.metadata_.get(key) or [] if isinstance(item, dict) and item.get("url")]
+                if urls:
+                    content += f"\n\n[Bu mesajda üretilen {label}: " + ", ".join(urls) + "]"
+        return {"role": msg.role, "content": content}
+
+    async def build_context(
+        self,
+        db: AsyncSession,
+        session_id: UUID,
+        exclude_id: Optional[UUID] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, str]], List[str]]:
+        """Agent için (conversation_history, last_reference_urls)."""
+        messages = await self.recent_for_context(db, session_id, limit=limit, exclude_id=exclude_id)
+        history = [self.to_openai(msg) for msg in messages]
+
+        # Pencerede kullanıcı mesajları hiç elenmez → buradaki en yeni referans genelde de en yenisi
+        for msg in reversed(messages):
+            urls = self._reference_urls(msg)
+            if urls:
+                return history, urls
+        return history, await self.last_reference_urls(db, session_id, exclude_id=exclude_id)
+
+
+# Singleton instance
+message_history = MessageHistory()
@@ -0,0 +1,137 @@
+"""
+Model Names — ham model adlarını kanonik model id'sine çeviren tek kaynak.
+
+Eskiden /admin/stats/model-distribution her istekte tüm ham model adlarını
+büyük bir Python haritası + "contains" zinciriyle normalize ediyordu. Artık:
+1. canonical_model_name() ham adı kanonik id'ye çevirir ("nano_banana_2" → "nano-banana-2")
+2. GeneratedAsset yazılırken model_canonical bu id ile doldurulur (ORM listener)
+3. Görünen ad / renk yalnızca okurken, kanonik id üzerinden bulunur
+"""
+import re
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.models.models import GeneratedAsset
+
+# Kanonik id → (görünen ad, renk)
+CANONICAL_MODELS = {
+    "nano-banana-pro": ("Nano Banana Pro", "#22c55e"),
+    "nano-banana-2": ("Nano Banana 2", "#16a34a"),
+    "flux": ("Flux", "#f59e0b"),
+    "flux-kontext": ("Flux Kontext", "#d97706"),
+    "gpt-image": ("GPT Image", "#8b5cf6"),
+    "gpt-image-edit": ("GPT Image Edit", "#7c3aed"),
+    "reve": ("Reve", "#06b6d4"),
+    "seedream": ("Seedream", "#14b8a6"),
+    "recraft": ("Recraft", "#ec4899"),
+    "nano-edit": ("Nano Edit", "#10b981"),
+    "gemini-edit": ("Gemini Edit", "#a855f7"),
+    "omnigen": ("OmniGen", "#6366f1"),
+    "object-removal": ("Object Removal", "#64748b"),
+    "kling-video": ("Kling Video", "#3b82f6"),
+    "sora-2": ("Sora 2", "#2563eb"),
+    "veo-3.1": ("Veo 3.1", "#1d4ed8"),
+    "seedance": ("Seedance", "#0ea5e9"),
+    "hailuo": ("Hailuo", "#0284c7"),
+    "ltx-video": ("LTX Video", "#0369a1"),
+    "face-swap": ("Face Swap", "#e11d48"),
+    "topaz-upscale": ("Topaz Upscale", "#be185d"),
+    "background-removal": ("Arka Plan Kaldırma", "#64748b"),
+    "ffmpeg": ("FFmpeg", "#475569"),
+    "elevenlabs": ("ElevenLabs", "#f97316"),
+    "stable-audio": ("Stable Audio", "#ea580c"),
+    "whisper": ("Whisper", "#c2410c"),
+    "mmaudio": ("MMAudio", "#9a3412"),
+    "style-transfer": ("Stil Aktarımı", "#db2777"),
+    "grok-imagine": ("Grok Imagine", "#4a4a4a"),
+    "grok-imagine-video": ("Grok Imagine Video", "#2d2d2d"),
+}
+
+DEFAULT_COLOR = "#6b7280"
+
+# Ham ad (küçük harf) → kanonik id
+MODEL_ALIASES = {
+    **dict.fromkeys(["nano-banana-pro", "nano_banana_pro", "nano-banana", "nano_banana_with_face_swap"], "nano-banana-pro"),
+    **dict.fromkeys(["nano-banana-2", "nano_banana_2"], "nano-banana-2"),
+    **dict.fromkeys(["flux-dev", "flux-dev-img2img", "flux", "flux2"], "flux"),
+    **dict.fromkeys(["flux-kontext", "flux_kontext", "flux_kontext_pro"], "flux-kontext"),
+    **dict.fromkeys(["gpt-image-1-mini", "gpt_image"], "gpt-image"),
+    **dict.fromkeys(["gpt_image_1_edit"], "gpt-image-edit"),
+    **dict.fromkeys(["nano_banana_pro_edit", "nano-banana-2-edit", "nano_banana_2_edit"], "nano-edit"),
+    **dict.fromkeys(["gemini-inpainting", "gemini-2.5-flash"], "gemini-edit"),
+    **dict.fromkeys(["kling-3.0-pro", "kling-2.5-turbo", "kling"], "kling-video"),
+    **dict.fromkeys(["veo", "veo-3.1", "veo_fast", "veo_quality"], "veo-3.1"),
+    **dict.fromkeys(["face-swap", "face_swap"], "face-swap"),
+    **dict.fromkeys(["birefnet-v2", "rembg"], "background-removal"),
+    "reve": "reve", "seedream": "seedream", "recraft": "recraft",
+    "omnigen": "omnigen", "object-removal": "object-removal",
+    "sora2": "sora-2", "seedance": "seedance", "hailuo": "hailuo",
+    "ltx-video": "ltx-video", "topaz": "topaz-upscale",
+    "elevenlabs": "elevenlabs", "stable_audio": "stable-audio",
+    "whisper": "whisper", "mmaudio": "mmaudio", "ffmpeg-local": "ffmpeg",
+    "style_transfer": "style-transfer",
+    # Edge case model adları
+    **dict.fromkeys([
+        "nano_banana_faceswap", "nano banana faceswap", "nano_banana_regen",
+        "nano banana regen", "nano_banana+face_swap", "nano banana+face swap",
+    ], "nano-banana-pro"),
+    **dict.fromkeys(["veo_fallback_kling", "veo fallback kling"], "kling-video"),
+    **dict.fromkeys(["flux_kontext_native", "flux kontext native"], "flux-kontext"),
+    **dict.fromkeys(["grok_imagine", "grok-imagine-image"], "grok-imagine"),
+    **dict.fromkeys(["grok_imagine_video", "grok-imagine-video"], "grok-imagine-video"),
+}
+
+# Dağılımda gösterilmeyen iç model adları
+HIDDEN_MODELS = {"user_upload", "unknown", ""}
+
+# Haritada olmayan adlar için "contains" kuralları (tam endpoint path'leri için) — sıra önemli
+CONTAINS_RULES = (
+    (("nano", "banana"), "nano-banana-pro"),
+    (("kling",), "kling-video"),
+    (("veo",), "veo-3.1"),
+    (("sora",), "sora-2"),
+    (("flux", "kontext"), "flux-kontext"),
+    (("flux",), "flux"),
+    (("seedance",), "seedance"),
+    (("hailuo",), "hailuo"),
+    (("gemini",), "gemini-edit"),
+    (("face", "swap"), "face-swap"),
+    (("topaz",), "topaz-upscale"),
+)
+
+MAX_CANONICAL_LENGTH = 100
+
+
+@lru_cache(maxsize=1024)
+def canonical_model_name(model_name: Optional[str]) -> Optional[str]:
+    """Ham model adı → kanonik id (gizli/boş adlar için None)."""
+    if not model_name:
+        return None
+    lowered = model_name.strip().lower()
+    if lowered in HIDDEN_MODELS:
+        return None
+    canonical = MODEL_ALIASES.get(lowered)
+    if canonical:
+        return canonical
+    for parts, canonical in CONTAINS_RULES:
+        if all(part in lowered for part in parts):
+            return canonical
+    # Bilinmeyen model: ayraçları sadeleştirilmiş slug
+    return re.sub(r"[\s_\-]+", "-", lowered).strip("-")[:MAX_CANONICAL_LENGTH] or None
+
+
+def model_display(canonical: str) -> tuple:
+    """Kanonik id → (görünen ad, renk)."""
+    known = CANONICAL_MODELS.get(canonical)
+    if known:
+        return known
+    return canonical.replace("-", " ").title(), DEFAULT_COLOR
+
+
+@event.listens_for(GeneratedAsset, "before_insert")
+@event.listens_for(GeneratedAsset, "before_update")
+def _set_model_canonical(mapper, connection, target: GeneratedAsset):
+    """ORM üzerinden yazılan her asset'te model_canonical'ı model_name'den türet."""
+    target.model_canonical = canonical_model_name(target.model_name)
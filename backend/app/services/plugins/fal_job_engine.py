@@ -0,0 +1,278 @@
+"""
+fal.ai Job Engine - Process içi, tek poller'lı async kuyruk yöneticisi.
+
+Her video için ayrı Python subprocess açmak yerine:
+1. İstek fal queue API'sine submit edilir (submit_async)
+2. Tüm uçuştaki request_id'ler TEK bir poller coroutine'i tarafından izlenir
+3. Poll aralığı iş başına adaptif olarak artar (2s → 15s)
+4. İş tamamlanınca sonucu per-job Future üzerinden döner
+
+Uçuştaki her video artık bir interpreter değil, küçük bir FalJob kaydıdır.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import fal_client
+
+logger = logging.getLogger(__name__)
+
+
+class FalJobTimeoutError(asyncio.TimeoutError):
+    """fal.ai işi belirlenen sürede tamamlanmadı."""
+
+
+@dataclass
+class FalJob:
+    """Uçuştaki tek bir fal.ai isteği."""
+    endpoint: str
+    request_id: str
+    future: asyncio.Future
+    deadline: float
+    submitted_at: float = field(default_factory=time.monotonic)
+    next_poll_at: float = 0.0
+    poll_interval: float = 0.0
+    polls: int = 0
+    last_status: str = "submitted"
+    waiters: int = 0           # wait() ile sonucu bekleyen çağrı sayısı
+
+    def to_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "request_id": self.request_id,
+            "status": self.last_status,
+            "polls": self.polls,
+            "age_s": round(time.monotonic() - self.submitted_at, 1),
+        }
+
+
+class FalJobEngine:
+    """
+    Paylaşılan fal.ai iş motoru.
+
+    FalPluginV2._generate_video (ve dolayısıyla _run_video_bg, LongVideoService
+    ve video edit hattı) bu motoru kullanır.
+    """
+
+    MIN_POLL_INTERVAL = 2.0    # İlk poll aralığı (saniye)
+    MAX_POLL_INTERVAL = 15.0   # Uzun işlerde tavan
+    BACKOFF_FACTOR = 1.5       # Her "hâlâ bekliyor" yanıtında çarpan
+    DEFAULT_TIMEOUT = 1200     # 20 dakika
+    MAX_CONCURRENT_POLLS = 16  # Tek turda aynı anda yapılan status çağrısı
+
+    def __init__(self):
+        self._jobs: dict[str, FalJob] = {}
+        self._poller_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "polls": 0}
+
+    # ===============================
+    # PUBLIC API
+    # ===============================
+
+    async def submit(self, endpoint: str, arguments: dict) -> str:
+        """İsteği fal queue'ya gönder, request_id döndür."""
+        handler = await fal_client.submit_async(endpoint, arguments=arguments)
+        self._stats["submitted"] += 1
+        logger.info(f"📨 fal job submit edildi: {endpoint} ({handler.request_id})")
+        return handler.request_id
+
+    def track(self, endpoint: str, request_id: str, timeout: float = None) -> asyncio.Future:
+        """
+        Mevcut bir request_id'yi poller'a ekle.
+        Restart sonrası yarım kalan işleri yeniden izlemek için de kullanılır.
+        """
+        self._ensure_poller()
+        existing = self._jobs.get(request_id)
+        if existing and not existing.future.done():
+            return existing.future
+
+        now = time.monotonic()
+        job = FalJob(
+            endpoint=endpoint,
+            request_id=request_id,
+            future=self._loop.create_future(),
+            deadline=now + (timeout or self.DEFAULT_TIMEOUT),
+            next_poll_at=now + self.MIN_POLL_INTERVAL,
+            poll_interval=self.MIN_POLL_INTERVAL,
+        )
+        self._jobs[request_id] = job
+        self._wakeup.set()
+        return job.future
+
+    async def run(
+        self,
+        endpoint: str,
+        arguments: dict,
+        timeout: float = None,
+        on_submit: Optional[Callable[[str], Any]] = None,
+    ) -> Any:
+        """
+        Submit + izle + sonucu bekle.
+
+        Args:
+            endpoint: fal.ai model endpoint'i
+            arguments: Model argümanları
+            timeout: Maksimum bekleme (saniye)
+            on_submit: request_id alındığında çağrılır (sync veya async)
+        """
+        request_id = await self.submit(endpoint, arguments)
+        if on_submit:
+            maybe = on_submit(request_id)
+            if asyncio.iscoroutine(maybe):
+                await maybe
+        return await self.wait(endpoint, request_id, timeout=timeout)
+
+    async def wait(self, endpoint: str, request_id: str, timeout: float = None) -> Any:
+        """
+        İzlenen bir işin sonucunu bekle. Future aynı request_id'nin tüm
+        bekleyenlerince paylaşılır: bir bekleyenin iptali (ör. client kopması)
+        yalnızca onu etkiler; fal tarafındaki iş son bekleyen de iptal
+        edildiğinde iptal edilir.
+        """
+        future = self.track(endpoint, request_id, timeout=timeout)
+        job = self._jobs[request_id]
+        job.waiters += 1
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.done() or job.waiters > 1:
+                raise
+            # Son bekleyen de gitti → izlemeyi bırak, fal'da da iptal et
+            self._discard(request_id)
+            future.cancel()
+            try:
+                await fal_client.cancel_async(endpoint, request_id)
+            except Exception:
+                pass
+            raise
+        finally:
+            job.waiters -= 1
+
+    def in_flight(self) -> list[dict]:
+        """Uçuştaki işlerin özet listesi."""
+        return [job.to_dict() for job in self._jobs.values()]
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "in_flight": len(self._jobs)}
+
+    async def shutdown(self):
+        """Poller'ı durdur. Bekleyen future'lar iptal edilir."""
+        if self._poller_task and not self._poller_task.done():
+            self._poller_task.cancel()
+            try:
+                await self._poller_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        for job in list(self._jobs.values()):
+            if not job.future.done():
+                job.future.cancel()
+        self._jobs.clear()
+        self._poller_task = None
+        self._wakeup = None
+        self._loop = None
+
+    # ===============================
+    # POLLER
+    # ===============================
+
+    def _ensure_poller(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._poller_task is None or self._poller_task.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._poller_task = loop.create_task(self._poll_loop())
+
+    def _discard(self, request_id: str):
+        self._jobs.pop(request_id, None)
+
+    async def _poll_loop(self):
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_POLLS)
+
+        async def _guarded(job: FalJob):
+            async with semaphore:
+                await self._poll_one(job)
+
+        while True:
+            if not self._jobs:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            due = [job for job in self._jobs.values() if job.next_poll_at <= now]
+            if due:
+                await asyncio.gather(*(_guarded(job) for job in due), return_exceptions=True)
+                continue
+
+            sleep_for = min(job.next_poll_at for job in self._jobs.values()) - now
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.05, sleep_for))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll_one(self, job: FalJob):
+        if job.future.done():
+            self._discard(job.request_id)
+            return
+
+        now = time.monotonic()
+        if now >= job.deadline:
+            self._stats["timeouts"] += 1
+            self._finish(job, error=FalJobTimeoutError(
+                f"fal.ai işi zaman aşımına uğradı: {job.endpoint} ({job.request_id})"
+            ))
+            return
+
+        job.polls += 1
+        self._stats["polls"] += 1
+        try:
+            status = await fal_client.status_async(job.endpoint, job.request_id)
+        except Exception as e:
+            # Geçici ağ hatası — bir sonraki turda tekrar dene
+            logger.warning(f"⚠️ fal status hatası ({job.request_id}): {e}")
+            self._schedule_next(job)
+            return
+
+        if isinstance(status, fal_client.Completed):
+            job.last_status = "completed"
+            if status.error:
+                self._finish(job, error=RuntimeError(f"{status.error_type or 'fal error'}: {status.error}"))
+                return
+            try:
+                result = await fal_client.result_async(job.endpoint, job.request_id)
+            except Exception as e:
+                self._finish(job, error=e)
+                return
+            self._finish(job, result=result)
+            return
+
+        job.last_status = "queued" if isinstance(status, fal_client.Queued) else "in_progress"
+        self._schedule_next(job)
+
+    def _schedule_next(self, job: FalJob):
+        job.poll_interval = min(self.MAX_POLL_INTERVAL, job.poll_interval * self.BACKOFF_FACTOR)
+        job.next_poll_at = time.monotonic() + job.poll_interval
+
+    def _finish(self, job: FalJob, result: Any = None, error: Optional[BaseException] = None):
+        self._discard(job.request_id)
+        if job.future.done():
+            return
+        if error is not None:
+            self._stats["failed"] += 1
+            job.future.set_exception(error)
+        else:
+            self._stats["completed"] += 1
+            job.future.set_result(result)
+        logger.info(
+            f"{'❌' if error else '✅'} fal job bitti: {job.endpoint} "
+            f"({job.request_id}, {job.polls} poll, {time.monotonic() - job.submitted_at:.0f}s)"
+        )
+
+
+# Singleton instance
+fal_job_engine = FalJobEngine()
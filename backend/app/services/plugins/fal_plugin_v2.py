@@ -24,6 +24,10 @@ from app.services.plugins.plugin_base import (
     PluginBase, PluginInfo, PluginResult, PluginCategory
 )
 from app.services.plugins.fal_models import ALL_MODELS, ModelCategory as FalModelCategory
+from app.services.plugins.fal_job_engine import fal_job_engine
+from app.services.plugins.model_hedger import Candidate, model_hedger, subscribe_cancellable
+from app.services.media_io import media_io
+from app.services.derived_asset_cache import derived_asset_cache
 
 logger = logging.getLogger(__name__)
 
@@ -585,68 +589,68 @@ class FalPluginV2(PluginBase):
             if m not in models_to_try and await self.is_model_enabled(m):
                 models_to_try.append(m)
         
-        last_error = None
-        for model_id in models_to_try:
-            try:
-                logger.info(f"🖼️ Görsel üretim deneniyor: {model_id}")
-                
-                # Nano Banana 2 (Gemini tabanlı) — farklı parametre yapısı
-                if "nano-banana-2" in model_id:
-                    arguments = {
-                        "prompt": prompt,
-                        "aspect_ratio": aspect_ratio,
-                        "resolution": resolution or "1K",
-                        "num_images": 1,
-                        "output_format": "png",
-                    }
-                    logger.info(f"   📋 NB2 Arguments: {arguments}")
-                # FLUX 2 Flex farklı parametre yapısı kullanır
-                elif "flux-2" in model_id:
-                    arguments = {
-                        "prompt": prompt,
-                        "image_size": image_size,
-                        "num_images": 1,
-                        "num_inference_steps": 30,
-                        "guidance_scale": 5.0,
-                        "output_format": "png",
-                        "enable_safety_checker": False,
-                    }
-                else:
-                    arguments = {
-                        "prompt": prompt,
-                        "image_size": image_size,
-                        "num_images": 1,
-                        "output_format": "png",
-                        "enable_safety_checker": False,
-                    }
-                
-                result = await fal_client.subscribe_async(
-                    model_id,
-                    arguments=arguments,
-                    with_logs=True,
-                )
-                
-                logger.info(f"   📦 Sonuç keys: {list(result.keys()) if result else 'None'}")
-                
-                if result and "images" in result and len(result["images"]) > 0:
-                    logger.info(f"✅ Görsel üretildi: {model_id}")
-                    response = {
-                        "success": True,
-                        "image_url": result["images"][0]["url"],
-                        "model": model_id.split("/")[-1],
-                        "model_id": model_id,
-                    }
-                    if disabled_warning:
-                        response["disabled_model_warning"] = disabled_warning
-                    return response
-                else:
-                    logger.warning(f"⚠️ {model_id} sonuç döndü ama images yok: {str(result)[:200]}")
-                    
-            except Exception as e:
-                last_error = str(e)
-                logger.warning(f"⚠️ {model_id} başarısız: {type(e).__name__}: {e}. Sonraki model deneniyor...")
-                continue
+        async def _attempt(model_id: str) -> Optional[dict]:
+            logger.info(f"🖼️ Görsel üretim deneniyor: {model_id}")
+            
+            # Nano Banana 2 (Gemini tabanlı) — farklı parametre yapısı
+            if "nano-banana-2" in model_id:
+                arguments = {
+                    "prompt": prompt,
+                    "aspect_ratio": aspect_ratio,
+                    "resolution": resolution or "1K",
+                    "num_images": 1,
+                    "output_format": "png",
+                }
+                logger.info(f"   📋 NB2 Arguments: {arguments}")
+            # FLUX 2 Flex farklı parametre yapısı kullanır
+            elif "flux-2" in model_id:
+                arguments = {
+                    "prompt": prompt,
+                    "image_size": image_size,
+                    "num_images": 1,
+                    "num_inference_steps": 30,
+                    "guidance_scale": 5.0,
+                    "output_format": "png",
+                    "enable_safety_checker": False,
+                }
+            else:
+                arguments = {
+                    "prompt": prompt,
+                    "image_size": image_size,
+                    "num_images": 1,
+                    "output_format": "png",
+                    "enable_safety_checker": False,
+                }
+            
+            result = await subscribe_cancellable(model_id, arguments, with_logs=True)
+            
+            logger.info(f"   📦 Sonuç keys: {list(result.keys()) if result else 'None'}")
+            
+            if result and "images" in result and len(result["images"]) > 0:
+                return result
+            logger.warning(f"⚠️ {model_id} sonuç döndü ama images yok: {str(result)[:200]}")
+            return None
+        
+        # Hedge'li zincir: birincil model p90'ını aşarsa yedek paralel başlar, ilk başarılı kazanır
+        outcome = await model_hedger.race("generate_image", [
+            Candidate(name=model_id, run=lambda model_id=model_id: _attempt(model_id))
+            for model_id in models_to_try
+        ])
+        
+        if outcome.success:
+            model_id = outcome.winner
+            logger.info(f"✅ Görsel üretildi: {model_id}")
+            response = {
+                "success": True,
+                "image_url": outcome.result["images"][0]["url"],
+                "model": model_id.split("/")[-1],
+                "model_id": model_id,
+            }
+            if disabled_warning:
+                response["disabled_model_warning"] = disabled_warning
+            return response
         
+        last_error = outcome.errors[-1][1] if outcome.errors else None
         return {"success": False, "error": f"Tüm modeller başarısız. Son hata: {last_error}"}
     
     async def _generate_video(self, params: dict) -> dict:
@@ -699,55 +703,9 @@ class FalPluginV2(PluginBase):
 
             if has_image:
                 # Video API'leri (özellik Kling) için çözünürlük limitleri var. (örn: max 1280x720 civarı bir şeye sığmalı)
+                # Küçültülmüş kopya (source URL başına bir kez) türetilmiş varlık cache'inden gelir
                 try:
-                    import httpx
-                    import tempfile
-                    import os as os_module
-                    from PIL import Image
-                    import base64
-                    
-                    max_dim = 1280
-                    async with httpx.AsyncClient(timeout=30) as client:
-                        resp = await client.get(image_url)
-                        resp.raise_for_status()
-                    
-                    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
-                        tmp.write(resp.content)
-                        tmp_path = tmp.name
-                        
-                    with Image.open(tmp_path) as img:
-                        orig_w, orig_h = img.size
-                        if orig_w > max_dim or orig_h > max_dim:
-                            logger.info(f"Yüksek çözünürlüklü görsel saptandı ({orig_w}x{orig_h}). Video modeli için küçültülüyor...")
-                            if orig_w > orig_h:
-                                new_w = max_dim
-                                new_h = int(orig_h * (max_dim / orig_w))
-                            else:
-                                new_h = max_dim
-                                new_w = int(orig_w * (max_dim / orig_h))
-                            
-                            # Encode dimensions to multiples of 8
-                            new_w = new_w - (new_w % 8)
-                            new_h = new_h - (new_h % 8)
-                            
-                            if img.mode != 'RGB':
-                                img = img.convert('RGB')
-                                
-                            img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                            img.save(tmp_path, format="JPEG", quality=95)
-                            
-                            # Yeniden yükle
-                            with open(tmp_path, "rb") as f:
-                                b64_data = base64.b64encode(f.read()).decode("utf-8")
-                            
-                            # Data URI oluşturup upload metodunu çağırıyoruz
-                            upload_res = await self.upload_base64_image(f"data:image/jpeg;base64,{b64_data}")
-                            if upload_res.get("success"):
-                                image_url = upload_res.get("url")
-                                logger.info(f"Optimize edilmiş görsel yüklendi: {image_url}")
-                    
-                    if os_module.path.exists(tmp_path):
-                        os_module.remove(tmp_path)
+                    image_url = await derived_asset_cache.downscale(image_url, max_dim=1280)
                 except Exception as resize_err:
                     logger.warning(f"Görsel boyutlandırma hatası, orijinali ile devam ediliyor: {resize_err}")
 
@@ -758,126 +716,19 @@ class FalPluginV2(PluginBase):
             
             logger.info(f"⏳ fal.ai video üretim başlatılıyor: {selected_endpoint}")
             
-            # subprocess ile çağır — fal_client.subscribe_async uvicorn event loop'unda takılıyor
-            import asyncio as _asyncio
-            import sys as _sys
-            import json as _json
-            import tempfile as _tmpf
-            import os as _os2
-            import base64 as _b64
-            from app.core.config import settings as _settings
-            
-            _fal_key = _settings.FAL_KEY or ""
-            _args_b64 = _b64.b64encode(_json.dumps(arguments).encode()).decode()
-            
-            # Geçici Python dosyası oluştur (Base64 ile güvenli argüman aktarımı)
-            _script_content = f"""import asyncio, os, json, sys, base64, time
-os.environ["FAL_KEY"] = "{_fal_key}"
-
-def log(msg):
-    with open("/tmp/fal_subprocess_debug.log", "a") as f:
-        f.write(f"{{time.strftime('%H:%M:%S')}} - {{msg}}\\n")
-
-log("Subprocess started for endpoint: {selected_endpoint}")
-
-try:
-    import fal_client
-    log("fal_client imported successfully")
-except Exception as e:
-    log(f"Failed to import fal_client: {{e}}")
-    sys.exit(1)
-
-async def run():
-    args = json.loads(base64.b64decode("{_args_b64}").decode())
-    try:
-        log("Calling fal_client.submit_async...")
-        handler = await fal_client.submit_async("{selected_endpoint}", arguments=args)
-        request_id = handler.request_id
-        log(f"Submitted. Request ID: {{request_id}}")
-        
-        loop_count = 0
-        while True:
-            loop_count += 1
-            status = await fal_client.status_async("{selected_endpoint}", request_id, with_logs=True)
-            
-            # fal_client returns Queued(), InProgress(), Completed() objects.
-            # Best way to check is stringifying and checking for Not-Completed states
-            status_str = str(status).lower()
-            
-            if loop_count % 6 == 0:
-                log(f"Polling status... Current: {{status_str[:50]}}")
-            
-            # Wait if it's queued, in progress, or waiting
-            if "queue" in status_str or "progress" in status_str or "pend" in status_str or "run" in status_str:
-                await asyncio.sleep(5)
-                continue
-                
-            log(f"Final status reached: {{status_str[:50]}}")
-            result = await fal_client.result_async("{selected_endpoint}", request_id)
-            log("Result fetched successfully.")
-            json.dump(result, sys.stdout)
-            sys.stdout.flush()
-            break
-            
-    except Exception as e:
-        log(f"Error in submit-poll loop: {{e}}")
-        raise e
-
-log("Starting asyncio.run(run())")
-try:
-    asyncio.run(run())
-    log("asyncio.run(run()) finished successfully")
-    sys.stdout.flush()
-    sys.stderr.flush()
-    os._exit(0)
-except Exception as e:
-    log(f"asyncio.run() crashed: {{e}}")
-    sys.stderr.flush()
-    os._exit(1)
-"""
-            _tmp_script = _tmpf.NamedTemporaryFile(mode='w', suffix='.py', delete=False, dir='/tmp')
-            _tmp_script.write(_script_content)
-            _tmp_script.close()
-            _script_path = _tmp_script.name
-            
+            # Paylaşılan job engine — submit + tek poller + per-job future
+            # on_submit(endpoint, request_id): çağıran request_id'yi kalıcı kaydedebilir (resume)
+            on_submit = params.get("on_submit")
             try:
-                proc = await _asyncio.create_subprocess_exec(
-                    _sys.executable, _script_path,
-                    stdout=_asyncio.subprocess.PIPE,
-                    stderr=_asyncio.subprocess.PIPE,
+                result = await fal_job_engine.run(
+                    selected_endpoint,
+                    arguments,
+                    timeout=1200,  # 20 dakika (uzun videolar ekstra uzun sürebilir)
+                    on_submit=(lambda request_id: on_submit(selected_endpoint, request_id)) if on_submit else None,
                 )
-                
-                try:
-                    stdout, stderr = await _asyncio.wait_for(
-                        proc.communicate(),
-                        timeout=1200  # 20 dakika (uzun videolar ekstra uzun sürebilir)
-                    )
-                except _asyncio.TimeoutError:
-                    proc.kill()
-                    logger.error(f"⏱️ fal.ai video 20dk timeout! ({selected_endpoint})")
-                    return {"success": False, "error": f"Video üretimi zaman aşımına uğradı (20dk). Model: {model_family}"}
-                
-                _stderr_text = stderr.decode().strip()
-                if _stderr_text:
-                    logger.warning(f"fal subprocess stderr:\\n{_stderr_text}")  # Truncate kaldırıldı
-                
-                _stdout_text = stdout.decode().strip()
-                if not _stdout_text:
-                    # Subprocess boş çıktı verdi — stderr'den hata detayını al
-                    _stderr_short = _stderr_text[:300] if _stderr_text else "stderr de boş"
-                    logger.error(f"fal subprocess boş çıktı. Exit: {proc.returncode}. Stderr:\n{_stderr_text}")
-                    return {"success": False, "error": f"Video subprocess hatası (Exit {proc.returncode}): {_stderr_short}"}
-                
-                try:
-                    result = _json.loads(_stdout_text)
-                except _json.JSONDecodeError:
-                    logger.error(f"fal subprocess JSON parse hatası: {_stdout_text[:500]}")
-                    return {"success": False, "error": f"Video subprocess geçersiz yanıt"}
-            finally:
-                try:
-                    _os2.unlink(_script_path)
-                except:
-                    pass
+            except asyncio.TimeoutError:
+                logger.error(f"⏱️ fal.ai video 20dk timeout! ({selected_endpoint})")
+                return {"success": False, "error": f"Video üretimi zaman aşımına uğradı (20dk). Model: {model_family}"}
             
             logger.info(f"✅ fal.ai video yanıt alındı: {selected_endpoint}")
             
@@ -1373,25 +1224,14 @@ except Exception as e:
         # ═══════════════════════════════════════════════════════════════
         # Referans fotoğraftaki arka planı (kırmızı EMRE yazısı vs.) temizle.
         # Bu Gemini/ChatGPT'nin dahili olarak yaptığı işlemin aynısı.
+        # Entity referansı nadiren değişir → sonuç türetilmiş varlık cache'inden gelir
         clean_face_url = face_image_url
         logger.info(f"🧹 Arka plan kaldırılıyor (BiRefNet)...")
         try:
-            bg_result = await asyncio.wait_for(
-                fal_client.subscribe_async(
-                    "fal-ai/birefnet",
-                    arguments={
-                        "image_url": face_image_url,
-                        "model": "General Use (Heavy)",
-                        "operating_resolution": "1024x1024",
-                        "output_format": "png",
-                    },
-                    with_logs=True,
-                ),
-                timeout=15  # 15 saniye limit
-            )
+            bg_url = await derived_asset_cache.remove_background(face_image_url, timeout=15)
             
-            if bg_result and "image" in bg_result:
-                clean_face_url = bg_result["image"]["url"]
+            if bg_url:
+                clean_face_url = bg_url
                 logger.info(f"✅ Arka plan kaldırıldı! Temiz referans görseli hazır.")
             else:
                 logger.warning(f"⚠️ Arka plan kaldırma sonuç döndürmedi, orijinal görsel kullanılacak.")
@@ -1399,47 +1239,11 @@ except Exception as e:
             logger.warning(f"⚠️ Arka plan kaldırma hatası: {e}. Orijinal görsel kullanılacak.")
         
         # ═══════════════════════════════════════════════════════════════
-        # AŞAMA 1: Nano Banana Pro Edit — Grid Eklentisinin Modeli
-        # ═══════════════════════════════════════════════════════════════
-        # Grid eklentisinde mükemmel sonuç veren aynı endpoint.
-        # Temiz referans görseli + prompt gönderip fotorealistik sonuç alır.
-        logger.info(f"🎯 Aşama 1: Nano Banana Pro Edit — Grid modeli ile üretim...")
-        try:
-            result = await asyncio.wait_for(
-                fal_client.subscribe_async(
-                    "fal-ai/nano-banana-pro/edit",
-                    arguments={
-                        "prompt": prompt,
-                        "image_urls": [clean_face_url],
-                        "num_images": 1,
-                        "aspect_ratio": aspect_ratio,
-                        "output_format": "png",
-                        "resolution": resolution or "1K",
-                    },
-                    with_logs=True,
-                ),
-                timeout=45
-            )
-            
-            if result and "images" in result and len(result["images"]) > 0:
-                image_url = result["images"][0]["url"]
-                logger.info(f"✅ Nano Banana Pro Edit başarılı!")
-                return {
-                    "success": True,
-                    "image_url": image_url,
-                    "base_image_url": image_url,
-                    "method_used": "nano_banana_pro_edit",
-                    "quality_notes": "Nano Banana Pro Edit ile fotorealistik görsel üretildi.",
-                    "model_display_name": "Nano Banana Pro",
-                    "attempts": ["nano_banana_pro_edit (başarılı)"],
-                }
-        except Exception as e:
-            logger.warning(f"⚠️ Nano Banana Pro Edit hatası: {e}")
-            attempts.append(f"nano_banana_pro_edit ({str(e)[:80]})")
-        
-        # ═══════════════════════════════════════════════════════════════
-        # AŞAMA 2: GPT Image 1 Edit — ChatGPT Modeli (Fallback)
+        # AŞAMA 1-2: Yüz korumalı edit modelleri — hedge'li yarış
         # ═══════════════════════════════════════════════════════════════
+        # Eskiden seri deneniyordu (en kötü 45 + 60 + 45 sn). Artık birincil model
+        # gözlenen p90'ını aşınca sıradaki paralel başlar, ilk başarılı kazanır,
+        # kaybeden fal tarafında da iptal edilir.
         gpt_size_map = {
             "1:1": "1024x1024",
             "16:9": "1536x1024",
@@ -1448,81 +1252,81 @@ except Exception as e:
             "3:4": "1024x1536",
         }
         gpt_image_size = gpt_size_map.get(aspect_ratio, "1024x1024")
+        edit_prompt = f"Create a photorealistic photograph: {prompt}. The person in this photo must look exactly like the person in the reference image — same face, skin tone, hair, and features. IMPORTANT: Do NOT copy the framing, pose, or composition from the reference photo. Instead, create a completely new scene with natural composition matching the described scenario. Show the full body or environment as the scene requires, not just a close-up headshot. Discard the original background entirely."
+        kontext_prompt = f"Place this exact person in the following scene, keeping their face, identity, clothing and appearance exactly the same: {prompt}"
+        
+        # endpoint -> (method_used, model_display_name, quality_notes, arguments, timeout)
+        face_stages = {
+            # Grid eklentisinde mükemmel sonuç veren aynı endpoint
+            "fal-ai/nano-banana-pro/edit": (
+                "nano_banana_pro_edit", "Nano Banana Pro",
+                "Nano Banana Pro Edit ile fotorealistik görsel üretildi.",
+                {
+                    "prompt": prompt,
+                    "image_urls": [clean_face_url],
+                    "num_images": 1,
+                    "aspect_ratio": aspect_ratio,
+                    "output_format": "png",
+                    "resolution": resolution or "1K",
+                },
+                45,
+            ),
+            # ChatGPT modeli (güçlü fallback)
+            "fal-ai/gpt-image-1/edit-image": (
+                "gpt_image_1_edit", "GPT Image 1",
+                "GPT Image 1 (ChatGPT modeli) ile yüz kimliği korunarak fotorealistik görsel üretildi.",
+                {
+                    "prompt": edit_prompt,
+                    "image_urls": [clean_face_url],
+                    "image_size": gpt_image_size,
+                    "quality": "high",
+                    "input_fidelity": "low",
+                    "num_images": 1,
+                    "output_format": "png",
+                },
+                60,
+            ),
+            # Yüz kimliği korumalı dönüşüm (son alternatif)
+            "fal-ai/flux-pro/kontext": (
+                "flux_kontext_pro", "FLUX Kontext Pro",
+                "FLUX Kontext Pro ile yüz kimliği korunarak görsel üretildi.",
+                {
+                    "prompt": kontext_prompt,
+                    "image_url": clean_face_url,
+                    "guidance_scale": 4.0,
+                    "output_format": "png",
+                },
+                45,
+            ),
+        }
         
-        logger.info(f"🖌️ Aşama 2: GPT Image 1 Edit — ChatGPT modeli ile üretim...")
-        try:
-            edit_prompt = f"Create a photorealistic photograph: {prompt}. The person in this photo must look exactly like the person in the reference image — same face, skin tone, hair, and features. IMPORTANT: Do NOT copy the framing, pose, or composition from the reference photo. Instead, create a completely new scene with natural composition matching the described scenario. Show the full body or environment as the scene requires, not just a close-up headshot. Discard the original background entirely."
-            
-            result = await asyncio.wait_for(
-                fal_client.subscribe_async(
-                    "fal-ai/gpt-image-1/edit-image",
-                    arguments={
-                        "prompt": edit_prompt,
-                        "image_urls": [clean_face_url],
-                        "image_size": gpt_image_size,
-                        "quality": "high",
-                        "input_fidelity": "low",
-                        "num_images": 1,
-                        "output_format": "png",
-                    },
-                    with_logs=True,
-                ),
-                timeout=60  # 60 saniye limit
-            )
-            
-            if result and "images" in result and len(result["images"]) > 0:
-                image_url = result["images"][0]["url"]
-                logger.info(f"✅ GPT Image 1 Edit başarılı!")
-                return {
-                    "success": True,
-                    "image_url": image_url,
-                    "base_image_url": image_url,
-                    "method_used": "gpt_image_1_edit",
-                    "quality_notes": "GPT Image 1 (ChatGPT modeli) ile yüz kimliği korunarak fotorealistik görsel üretildi.",
-                    "model_display_name": "GPT Image 1",
-                    "attempts": attempts + ["gpt_image_1_edit (başarılı)"],
-                }
-        except Exception as e:
-            logger.warning(f"⚠️ GPT Image 1 Edit hatası: {e}")
-            attempts.append(f"gpt_image_1_edit (hata: {str(e)[:80]})")
-        
-        # ═══════════════════════════════════════════════════════════════
-        # AŞAMA 2: FLUX Kontext Pro — Yüz Kimliği Korumalı Dönüşüm
-        # ═══════════════════════════════════════════════════════════════
-        logger.info(f"🖌️ Aşama 2: FLUX Kontext Pro ile yüz korumalı üretim...")
-        try:
-            kontext_prompt = f"Place this exact person in the following scene, keeping their face, identity, clothing and appearance exactly the same: {prompt}"
-            
-            result = await asyncio.wait_for(
-                fal_client.subscribe_async(
-                    "fal-ai/flux-pro/kontext",
-                    arguments={
-                        "prompt": kontext_prompt,
-                        "image_url": clean_face_url,
-                        "guidance_scale": 4.0,
-                        "output_format": "png",
-                    },
-                    with_logs=True,
-                ),
-                timeout=45  # 45 saniye limit
-            )
-            
+        async def _attempt_face(endpoint: str) -> Optional[dict]:
+            logger.info(f"🎯 Yüz korumalı üretim deneniyor: {endpoint}")
+            result = await subscribe_cancellable(endpoint, face_stages[endpoint][3], with_logs=True)
             if result and "images" in result and len(result["images"]) > 0:
-                image_url = result["images"][0]["url"]
-                logger.info(f"✅ FLUX Kontext Pro başarılı!")
-                attempts.append("flux_kontext_pro (başarılı)")
-                return {
-                    "success": True,
-                    "image_url": image_url,
-                    "base_image_url": image_url,
-                    "method_used": "flux_kontext_pro",
-                    "quality_notes": "FLUX Kontext Pro ile yüz kimliği korunarak görsel üretildi.",
-                    "model_display_name": "FLUX Kontext Pro",
-                    "attempts": attempts + ["flux_kontext_pro (başarılı)"],
-                }
-        except Exception as e:
-            logger.warning(f"⚠️ FLUX Kontext Pro hatası: {e}")
-            attempts.append(f"flux_kontext_pro (hata: {str(e)[:80]})")
+                return result
+            return None
+        
+        outcome = await model_hedger.race("smart_generate_with_face", [
+            Candidate(name=endpoint, run=lambda endpoint=endpoint: _attempt_face(endpoint), timeout=stage[4])
+            for endpoint, stage in face_stages.items()
+        ])
+        for endpoint, message in outcome.errors:
+            attempts.append(f"{face_stages[endpoint][0]} (hata: {message[:80]})")
+        
+        if outcome.success:
+            method_used, display_name, quality_notes, _, _ = face_stages[outcome.winner]
+            image_url = outcome.result["images"][0]["url"]
+            logger.info(f"✅ {display_name} başarılı!")
+            return {
+                "success": True,
+                "image_url": image_url,
+                "base_image_url": image_url,
+                "method_used": method_used,
+                "quality_notes": quality_notes,
+                "model_display_name": display_name,
+                "attempts": attempts + [f"{method_used} (başarılı)"],
+            }
         
         # ═══════════════════════════════════════════════════════════════
         # AŞAMA 3: Nano Banana Pro — Son Çare (Yüz kimliği korunmaz)
@@ -1560,20 +1364,12 @@ except Exception as e:
     async def _extract_frame(self, video_url: str) -> dict:
         """Video'dan ilk kareyi çıkar (FFmpeg)."""
         try:
-            # fal-ai/ffmpeg-api kullanarak kare çıkar
-            # -ss 00:00:01 : 1. saniyeden al (başlangıç bazen siyah olabilir)
-            command = f"ffmpeg -i {video_url} -ss 00:00:01 -vframes 1 output.png"
-            
-            result = await fal_client.subscribe_async(
-                "fal-ai/ffmpeg-api",
-                arguments={"command": command},
-                with_logs=True,
-            )
-            
-            if result and "outputs" in result and len(result["outputs"]) > 0:
+            # fal-ai/ffmpeg-api ile kare çıkar (aynı video için sonuç cache'li)
+            frame_url = await derived_asset_cache.extract_frame(video_url)
+            if frame_url:
                 return {
                     "success": True,
-                    "image_url": result["outputs"][0]["url"],
+                    "image_url": frame_url,
                     "model": "ffmpeg-api"
                 }
             return {"success": False, "error": "Kare çıkarılamadı"}
@@ -1799,8 +1595,6 @@ except Exception as e:
         AgentOrchestrator tarafından direkt çağrılır.
         """
         import base64
-        import tempfile
-        import os as os_module
         
         try:
             # Data URI prefix'ini temizle
@@ -1810,24 +1604,15 @@ except Exception as e:
             # Base64 decode
             image_bytes = base64.b64decode(base64_data)
             
-            # Extension belirle
-            if base64_data.startswith("iVBORw"): extension = ".png"
-            elif base64_data.startswith("/9j/"): extension = ".jpg"
-            elif base64_data.startswith("UklGR"): extension = ".webp"
-            else: extension = ".png"
+            # Content type belirle
+            if base64_data.startswith("iVBORw"): content_type = "image/png"
+            elif base64_data.startswith("/9j/"): content_type = "image/jpeg"
+            elif base64_data.startswith("UklGR"): content_type = "image/webp"
+            else: content_type = "image/png"
             
-            # Temp dosyaya yaz
-            with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as tmp_file:
-                tmp_file.write(image_bytes)
-                tmp_path = tmp_file.name
-            
-            try:
-                # fal.ai storage'a yükle
-                url = fal_client.upload_file(tmp_path)
-                return {"success": True, "url": url}
-            finally:
-                if os_module.path.exists(tmp_path):
-                    os_module.remove(tmp_path)
+            # fal.ai storage'a doğrudan yükle (temp dosya yok, loop bloklanmaz)
+            url = await media_io.upload_bytes(image_bytes, content_type)
+            return {"success": True, "url": url}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
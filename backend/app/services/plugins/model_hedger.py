@@ -0,0 +1,254 @@
+"""
+Model Hedger - Fallback zincirleri için hedge'li (yarışan) çalıştırma.
+
+Eskiden zincirler seri yürüyordu: _smart_generate_with_face en kötü durumda
+45 + 60 + 45 saniye + düz üretim bekliyordu. Bu modül:
+1. Model başına gecikme / hata oranını EWMA ile izler (ModelLatencyTracker)
+2. Zinciri beklenen başarı süresine göre sıralar (hatalı modeller geriye)
+3. İlk adayı başlatır; adayın gözlenen p90 süresi dolunca yedeği başlatır
+4. İlk başarılı sonucu alır, kaybedenleri (fal tarafında da) iptal eder
+
+Normal durumda (birincil aday p90 içinde biter) ek istek ve ek maliyet yoktur.
+"""
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+import fal_client
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HedgePolicy:
+    """Bir action için hedge ayarları."""
+    enabled: bool = True
+    max_in_flight: int = 2            # Aynı anda yarışan en fazla aday
+    default_delay: float = 20.0       # Gözlem yokken yedeği başlatma gecikmesi (s)
+    min_delay: float = 3.0
+    max_delay: float = 60.0
+    reorder: bool = True              # Zinciri EWMA skoruna göre sırala
+    keep_first: bool = True           # Router'ın seçtiği ilk aday sağlıklıysa başta kalır
+
+
+# Action başına politika — gerekirse buradan ayarlanır
+HEDGE_POLICIES: dict[str, HedgePolicy] = {
+    "generate_image": HedgePolicy(default_delay=25.0, min_delay=5.0, max_delay=60.0),
+    "smart_generate_with_face": HedgePolicy(default_delay=30.0, min_delay=8.0, max_delay=60.0),
+}
+
+
+@dataclass
+class Candidate:
+    """Zincirdeki tek bir deneme."""
+    name: str                                   # İzleme anahtarı (genelde endpoint)
+    run: Callable[[], Awaitable[Any]]           # Başarısızlıkta exception fırlatır / falsy döner
+    timeout: Optional[float] = None
+
+
+@dataclass
+class _ModelStats:
+    latency: Optional[float] = None   # EWMA (s)
+    variance: float = 0.0             # EW varyans
+    error_rate: float = 0.0           # EWMA (0-1)
+    samples: int = 0
+    last_error: Optional[str] = None
+
+
+@dataclass
+class HedgeOutcome:
+    """race() sonucu."""
+    result: Any = None
+    winner: Optional[str] = None
+    errors: list[tuple[str, str]] = field(default_factory=list)
+    launched: list[str] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return self.winner is not None
+
+
+class ModelLatencyTracker:
+    """Model başına EWMA gecikme + hata oranı; hedge gecikmesi ve zincir sırası bunu kullanır."""
+
+    ALPHA = 0.2                # EWMA ağırlığı
+    P90_Z = 1.2816             # Normal yaklaşımda p90 = μ + 1.28σ
+    UNHEALTHY_ERROR_RATE = 0.5
+    MIN_SAMPLES = 3
+
+    def __init__(self):
+        self._models: dict[str, _ModelStats] = {}
+
+    def record(self, model: str, latency: Optional[float], ok: bool, error: Optional[str] = None):
+        stats = self._models.setdefault(model, _ModelStats())
+        stats.samples += 1
+        stats.error_rate += self.ALPHA * ((0.0 if ok else 1.0) - stats.error_rate)
+        if ok and latency is not None:
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                delta = latency - stats.latency
+                stats.latency += self.ALPHA * delta
+                stats.variance = (1 - self.ALPHA) * (stats.variance + self.ALPHA * delta * delta)
+        if not ok:
+            stats.last_error = (error or "")[:200]
+
+    def p90(self, model: str) -> Optional[float]:
+        stats = self._models.get(model)
+        if stats is None or stats.latency is None or stats.samples < self.MIN_SAMPLES:
+            return None
+        return stats.latency + self.P90_Z * math.sqrt(stats.variance)
+
+    def hedge_delay(self, model: str, policy: HedgePolicy) -> float:
+        observed = self.p90(model)
+        delay = policy.default_delay if observed is None else observed
+        return max(policy.min_delay, min(policy.max_delay, delay))
+
+    def is_unhealthy(self, model: str) -> bool:
+        stats = self._models.get(model)
+        return bool(stats and stats.samples >= self.MIN_SAMPLES and stats.error_rate >= self.UNHEALTHY_ERROR_RATE)
+
+    def expected_cost(self, model: str, default: float) -> float:
+        """Başarıya kadar beklenen süre ≈ gecikme / (1 - hata oranı)."""
+        stats = self._models.get(model)
+        if stats is None or stats.latency is None:
+            return default
+        return stats.latency / max(0.05, 1.0 - stats.error_rate)
+
+    def order(self, candidates: list[Candidate], policy: HedgePolicy) -> list[Candidate]:
+        if not policy.reorder or len(candidates) < 2:
+            return list(candidates)
+        head: list[Candidate] = []
+        rest = list(candidates)
+        if policy.keep_first and not self.is_unhealthy(rest[0].name):
+            head = [rest.pop(0)]
+        rest.sort(key=lambda c: (self.is_unhealthy(c.name), self.expected_cost(c.name, policy.default_delay)))
+        return head + rest
+
+    def get_stats(self) -> dict:
+        return {
+            model: {
+                "latency_s": round(s.latency, 2) if s.latency is not None else None,
+                "p90_s": round(self.p90(model), 2) if self.p90(model) is not None else None,
+                "error_rate": round(s.error_rate, 3),
+                "samples": s.samples,
+                "last_error": s.last_error,
+            }
+            for model, s in self._models.items()
+        }
+
+
+class ModelHedger:
+    """Hedge'li zincir yürütücüsü."""
+
+    def __init__(self, tracker: Optional[ModelLatencyTracker] = None):
+        self.tracker = tracker or ModelLatencyTracker()
+        self._stats = {"races": 0, "hedges": 0, "hedge_wins": 0, "exhausted": 0}
+
+    def policy_for(self, action: str) -> HedgePolicy:
+        policy = HEDGE_POLICIES.get(action, HedgePolicy())
+        if not settings.MODEL_HEDGING_ENABLED:
+            return HedgePolicy(enabled=False, reorder=policy.reorder, keep_first=policy.keep_first)
+        return policy
+
+    async def race(self, action: str, candidates: list[Candidate]) -> HedgeOutcome:
+        """
+        Adayları politikaya göre yarıştır. Hedge kapalıysa seri fallback gibi davranır
+        (yine de istatistik tutulur ve zincir sıralanır).
+        """
+        outcome = HedgeOutcome()
+        if not candidates:
+            return outcome
+        policy = self.policy_for(action)
+        queue = self.tracker.order(candidates, policy)
+        max_in_flight = policy.max_in_flight if policy.enabled else 1
+        running: dict[asyncio.Task, tuple[Candidate, float]] = {}
+        self._stats["races"] += 1
+
+        def _launch():
+            candidate = queue.pop(0)
+            outcome.launched.append(candidate.name)
+            coro = candidate.run()
+            if candidate.timeout:
+                coro = asyncio.wait_for(coro, timeout=candidate.timeout)
+            running[asyncio.create_task(coro)] = (candidate, time.monotonic())
+            logger.info(f"🏁 [{action}] aday başlatıldı: {candidate.name}")
+
+        try:
+            _launch()
+            while running:
+                # En yeni adayın p90'ı dolunca (ve yer varsa) yedeği başlat
+                hedge_timeout = None
+                if policy.enabled and queue and len(running) < max_in_flight:
+                    newest, started = max(running.values(), key=lambda item: item[1])
+                    hedge_timeout = max(0.0, self.tracker.hedge_delay(newest.name, policy) - (time.monotonic() - started))
+
+                done, _ = await asyncio.wait(running, timeout=hedge_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._stats["hedges"] += 1
+                    logger.info(f"⏱️ [{action}] p90 aşıldı, yedek aday başlatılıyor")
+                    _launch()
+                    continue
+
+                failed = 0
+                for task in done:
+                    candidate, started = running.pop(task)
+                    latency = time.monotonic() - started
+                    error = task.exception()
+                    result = None if error else task.result()
+                    if error is None and result:
+                        self.tracker.record(candidate.name, latency, ok=True)
+                        outcome.result, outcome.winner = result, candidate.name
+                        if outcome.launched[0] != candidate.name:
+                            self._stats["hedge_wins"] += 1
+                        logger.info(f"✅ [{action}] kazanan: {candidate.name} ({latency:.1f}s)")
+                        return outcome
+                    message = f"{type(error).__name__}: {error}" if error else "boş sonuç"
+                    self.tracker.record(candidate.name, latency, ok=False, error=message)
+                    outcome.errors.append((candidate.name, message))
+                    failed += 1
+                    logger.warning(f"⚠️ [{action}] {candidate.name} başarısız: {message[:120]}")
+
+                # Başarısız olanların yerine sıradakileri hemen başlat (hedge beklemeden)
+                while failed and queue and len(running) < max_in_flight:
+                    _launch()
+                    failed -= 1
+
+            self._stats["exhausted"] += 1
+            return outcome
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "models": self.tracker.get_stats()}
+
+
+async def subscribe_cancellable(endpoint: str, arguments: dict, **kwargs) -> Any:
+    """
+    fal_client.subscribe_async + iptal edilirse (hedge kaybedeni / timeout)
+    fal tarafındaki isteği de iptal et — boşuna GPU süresi harcanmasın.
+    """
+    request_ids: list[str] = []
+    try:
+        return await fal_client.subscribe_async(
+            endpoint, arguments=arguments, on_enqueue=request_ids.append, **kwargs
+        )
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        for request_id in request_ids:
+            try:
+                await fal_client.cancel_async(endpoint, request_id)
+            except Exception:
+                pass
+        raise
+
+
+# Singleton instance
+model_hedger = ModelHedger()
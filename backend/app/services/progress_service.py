@@ -1,37 +1,131 @@
 """
 Real-Time Progress Service — WebSocket + Redis Pub/Sub.
 
-Uzun süren işlemler (long video, batch campaign) için 
+Uzun süren işlemler (long video, batch campaign) için
 gerçek zamanlı ilerleme bildirimi.
+
+Çoklu worker/replika: arka plan işi A worker'ında çalışırken WebSocket B
+worker'ına bağlı olabilir. Bu yüzden:
+1. Her olay yerel soketlere doğrudan, diğer process'lere Redis PUBLISH ile gider
+   (oturum başına kanal: progress:ch:{session_id})
+2. Her process TEK bir subscriber task'ı çalıştırır; sadece yerelde soketi olan
+   oturumların kanallarına abone olur
+3. Her soketin sınırlı bir gönderim kuyruğu ve yazıcı task'ı vardır — yavaş bir
+   istemci yayını bloklamaz; eski progress mesajları birleştirilir/atılır,
+   complete/error asla atılmaz, kuyruğu tıkanan istemci koparılır
 """
 import json
 import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import deque
 from typing import Optional, Dict, Any
 from datetime import datetime
 from app.services.user_error_formatter import format_user_error_message
 
+logger = logging.getLogger(__name__)
+
+# Kuyruk dolunca atılabilecek mesaj tipleri (önce atılacak olan başta):
+# reassurance geçici bir not, progress ise birleştirilmiş son durumu taşır
+DROPPABLE_TYPES = ("reassurance", "progress")
+
+
+class _SocketChannel:
+    """Tek WebSocket için sınırlı gönderim kuyruğu + yazıcı task."""
+
+    def __init__(self, websocket, max_queue: int):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.queue: deque = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def offer(self, payload: Dict[str, Any], stats: Dict[str, int]) -> bool:
+        """Mesajı kuyruğa koy. False → istemci tıkanmış, koparılmalı."""
+        if payload.get("type") == "progress":
+            # Aynı işin henüz gönderilmemiş progress'i varsa yenisiyle değiştir
+            for index, queued in enumerate(self.queue):
+                if queued.get("type") == "progress" and queued.get("task_type") == payload.get("task_type"):
+                    self.queue[index] = payload
+                    stats["coalesced"] += 1
+                    self.wakeup.set()
+                    return True
+
+        if len(self.queue) >= self.max_queue:
+            victim = next(
+                (m for kind in DROPPABLE_TYPES for m in self.queue if m.get("type") == kind),
+                None,
+            )
+            if victim is None:
+                return False
+            self.queue.remove(victim)
+            stats["dropped"] += 1
+
+        self.queue.append(payload)
+        self.wakeup.set()
+        return True
+
+    async def run(self, send_timeout: float, stats: Dict[str, int]):
+        """Her uyanışta kuyruğu toptan boşalt."""
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.queue:
+                payload = self.queue.popleft()
+                await asyncio.wait_for(self.websocket.send_json(payload), timeout=send_timeout)
+                stats["delivered"] += 1
+
 
 class ProgressService:
     """Gerçek zamanlı ilerleme takip servisi."""
-    
+
+    CHANNEL_PREFIX = "progress:ch:"
+    MAX_QUEUE = 64          # Soket başına bekleyen mesaj
+    SEND_TIMEOUT = 5.0      # Tek send_json için üst sınır (saniye)
+
     _instance: Optional["ProgressService"] = None
     _connections: Dict[str, list] = {}  # session_id → [websocket connections]
     _latest_payloads: Dict[str, Dict[str, Any]] = {}  # session_id → son payload
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._connections = {}
             cls._latest_payloads = {}
+            cls._instance._init_fanout()
         return cls._instance
-    
+
+    def _init_fanout(self):
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._channels: Dict[int, _SocketChannel] = {}   # id(websocket) → kanal
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed: set = set()
+        self._reconcile_lock: Optional[asyncio.Lock] = None
+        self._background: set = set()
+        self._stats = {
+            "published": 0, "publish_errors": 0, "remote_received": 0,
+            "delivered": 0, "coalesced": 0, "dropped": 0, "slow_disconnects": 0,
+        }
+
+    # ===============================
+    # BAĞLANTILAR
+    # ===============================
+
     def register(self, session_id: str, websocket):
         """WebSocket bağlantısı kaydet."""
         if session_id not in self._connections:
             self._connections[session_id] = []
         self._connections[session_id].append(websocket)
+
+        channel = _SocketChannel(websocket, self.MAX_QUEUE)
+        channel.task = asyncio.create_task(self._run_channel(session_id, channel))
+        self._channels[id(websocket)] = channel
+        self._schedule_reconcile()
         print(f"🔌 WebSocket bağlandı: session={session_id[:8]}... (toplam: {len(self._connections[session_id])})")
-    
+
     def unregister(self, session_id: str, websocket):
         """WebSocket bağlantısı kaldır."""
         if session_id in self._connections:
@@ -40,8 +134,181 @@ class ProgressService:
             ]
             if not self._connections[session_id]:
                 del self._connections[session_id]
+
+        channel = self._channels.pop(id(websocket), None)
+        if channel and channel.task and channel.task is not asyncio.current_task():
+            channel.task.cancel()
+        self._schedule_reconcile()
         print(f"🔌 WebSocket ayrıldı: session={session_id[:8]}...")
-    
+
+    async def _run_channel(self, session_id: str, channel: _SocketChannel):
+        try:
+            await channel.run(self.SEND_TIMEOUT, self._stats)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Gönderim hatası / zaman aşımı → ölü veya yavaş istemci
+            self._drop_socket(session_id, channel.websocket)
+
+    def _drop_socket(self, session_id: str, websocket):
+        if id(websocket) not in self._channels:
+            return
+        self.unregister(session_id, websocket)
+        self._spawn(self._close_quietly(websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket):
+        try:
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def replay_latest(self, session_id: str, websocket):
+        """Yeni bağlanan sokete son bilinen ilerlemeyi (varsa) kuyruk üzerinden gönder."""
+        payload = await self.get_cached_progress(session_id)
+        channel = self._channels.get(id(websocket))
+        if payload and channel and not channel.offer(payload, self._stats):
+            self._drop_socket(session_id, websocket)
+
+    # ===============================
+    # YAYIN
+    # ===============================
+
+    async def _broadcast(self, session_id: str, payload: Dict[str, Any]):
+        """Yerel soketlere ilet + diğer process'ler için Redis'e publish et."""
+        self._deliver_local(session_id, payload)
+
+        try:
+            from app.core.cache import cache
+            if cache.is_connected:
+                message = json.dumps({"o": self.origin, "p": payload}, ensure_ascii=False)
+                await cache.client.publish(f"{self.CHANNEL_PREFIX}{session_id}", message)
+                self._stats["published"] += 1
+        except Exception as e:
+            self._stats["publish_errors"] += 1
+            logger.debug(f"Progress publish hatası: {e}")
+
+    def _deliver_local(self, session_id: str, payload: Dict[str, Any]) -> int:
+        sockets = list(self._connections.get(session_id, []))
+        for websocket in sockets:
+            channel = self._channels.get(id(websocket))
+            if channel is None:
+                continue
+            if not channel.offer(payload, self._stats):
+                self._stats["slow_disconnects"] += 1
+                logger.warning(f"🐢 Yavaş WebSocket istemcisi koparıldı: session={session_id[:8]}...")
+                self._drop_socket(session_id, websocket)
+        return len(sockets)
+
+    def _on_remote_message(self, channel_name: str, data: str):
+        """Subscriber'dan gelen mesajı ilgili oturumun yerel soketlerine dağıt."""
+        try:
+            envelope = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if envelope.get("o") == self.origin:
+            return  # Kendi yayınımız — yerelde zaten teslim edildi
+        session_id = channel_name[len(self.CHANNEL_PREFIX):]
+        payload = envelope.get("p") or {}
+        self._stats["remote_received"] += 1
+        if payload.get("type") == "progress":
+            self._latest_payloads[session_id] = payload
+        elif payload.get("type") in ("complete", "error"):
+            self._latest_payloads.pop(session_id, None)
+        self._deliver_local(session_id, payload)
+
+    # ===============================
+    # SUBSCRIBER (process başına tek task)
+    # ===============================
+
+    async def start(self):
+        """Redis bağlıysa pub/sub dinleyicisini başlat (lifespan)."""
+        from app.core.cache import cache
+        if not cache.is_connected or (self._listener and not self._listener.done()):
+            return
+        self._pubsub = cache.client.pubsub(ignore_subscribe_messages=True)
+        self._subscribed = set()
+        self._reconcile_lock = asyncio.Lock()
+        self._listener = asyncio.create_task(self._listen(), name="progress-pubsub")
+        await self._reconcile()
+
+    async def stop(self):
+        if self._listener and not self._listener.done():
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+        self._pubsub = None
+        self._subscribed = set()
+        for channel in list(self._channels.values()):
+            if channel.task:
+                channel.task.cancel()
+
+    def _schedule_reconcile(self):
+        if self._pubsub is not None:
+            self._spawn(self._reconcile())
+
+    async def _reconcile(self):
+        """Abonelikleri yerel oturumlarla eşitle (sıralı — yarış yok)."""
+        if self._pubsub is None or self._reconcile_lock is None:
+            return
+        async with self._reconcile_lock:
+            wanted = {f"{self.CHANNEL_PREFIX}{sid}" for sid in self._connections}
+            to_add = wanted - self._subscribed
+            to_remove = self._subscribed - wanted
+            try:
+                if to_add:
+                    await self._pubsub.subscribe(*to_add)
+                if to_remove:
+                    await self._pubsub.unsubscribe(*to_remove)
+                self._subscribed = wanted
+            except Exception as e:
+                logger.warning(f"⚠️ Progress abonelik güncellemesi başarısız: {e}")
+
+    async def _listen(self):
+        while True:
+            if not self._subscribed:
+                await asyncio.sleep(0.2)
+                continue
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Progress pub/sub okuma hatası, yeniden abone olunuyor: {e}")
+                self._subscribed = set()
+                await asyncio.sleep(1.0)
+                await self._reconcile()
+                continue
+            if message and message.get("type") == "message":
+                self._on_remote_message(message["channel"], message["data"])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "sessions": len(self._connections),
+            "sockets": len(self._channels),
+            "subscribed_channels": len(self._subscribed),
+            "pubsub": self._listener is not None and not self._listener.done(),
+        }
+
+    # ===============================
+    # BİLDİRİMLER
+    # ===============================
+
     async def send_progress(
         self,
         session_id: str,
@@ -52,7 +319,7 @@ class ProgressService:
     ):
         """
         İlerleme bildirimi gönder.
-        
+
         Args:
             session_id: Session ID
             task_type: İşlem tipi (long_video, campaign, quality_check)
@@ -69,8 +336,8 @@ class ProgressService:
             "timestamp": datetime.utcnow().isoformat()
         }
         self._latest_payloads[session_id] = payload
-        
-        # Redis pub/sub ile yayınla
+
+        # Yeniden bağlanan istemciler için son durumu sakla
         try:
             from app.core.cache import cache
             if cache.is_connected:
@@ -81,19 +348,8 @@ class ProgressService:
                 )
         except Exception:
             pass
-        
-        # Doğrudan WebSocket'lere gönder
-        if session_id in self._connections:
-            dead_connections = []
-            for ws in self._connections[session_id]:
-                try:
-                    await ws.send_json(payload)
-                except Exception:
-                    dead_connections.append(ws)
-            
-            # Ölü bağlantıları temizle
-            for ws in dead_connections:
-                self._connections[session_id].remove(ws)
+
+        await self._broadcast(session_id, payload)
 
     async def get_cached_progress(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Son bilinen ilerleme bilgisini cache'den al."""
@@ -108,7 +364,7 @@ class ProgressService:
             return payload if isinstance(payload, dict) else None
         except Exception:
             return None
-    
+
     async def send_complete(
         self,
         session_id: str,
@@ -125,14 +381,9 @@ class ProgressService:
             "timestamp": datetime.utcnow().isoformat()
         }
         self._latest_payloads.pop(session_id, None)
-        
-        if session_id in self._connections:
-            for ws in self._connections[session_id]:
-                try:
-                    await ws.send_json(payload)
-                except Exception:
-                    pass
-        
+
+        await self._broadcast(session_id, payload)
+
         # Cache temizle
         try:
             from app.core.cache import cache
@@ -140,7 +391,7 @@ class ProgressService:
                 await cache.delete(f"progress:{session_id}")
         except Exception:
             pass
-    
+
     async def send_reassurance(
         self,
         session_id: str,
@@ -151,40 +402,23 @@ class ProgressService:
     ):
         """
         Production card bilgilendirme mesajı — geçici, DB'ye yazılmaz.
-        
+
         Mesaj frontend'de production card içinde mini-log'da gösterilir.
         Card kaybolunca mesajlar da kaybolur.
         """
-        import uuid as _uuid
-
         payload = {
             "type": "reassurance",
             "task_type": task_type,
             "message": message,
-            "message_id": str(_uuid.uuid4()),
+            "message_id": str(uuid.uuid4()),
             "completed_scenes": completed_scenes,
             "total_scenes": total_scenes,
             "timestamp": datetime.utcnow().isoformat()
         }
 
-        # WebSocket'lere gönder
         conn_count = len(self._connections.get(session_id, []))
-        print(f"💬 [Reassurance] session={session_id[:8]}... | connections={conn_count} | msg={message[:60]}...")
-        
-        if session_id in self._connections:
-            dead_connections = []
-            for ws in self._connections[session_id]:
-                try:
-                    await ws.send_json(payload)
-                    print(f"✅ [Reassurance] WebSocket gönderildi: {session_id[:8]}...")
-                except Exception as ws_err:
-                    print(f"❌ [Reassurance] WebSocket gönderim hatası: {ws_err}")
-                    dead_connections.append(ws)
-            for ws in dead_connections:
-                self._connections[session_id].remove(ws)
-        else:
-            print(f"⚠️ [Reassurance] session_id={session_id[:8]}... için aktif WebSocket bağlantısı YOK!")
-            print(f"   Mevcut bağlantılar: {[k[:8] for k in self._connections.keys()]}")
+        print(f"💬 [Reassurance] session={session_id[:8]}... | yerel bağlantı={conn_count} | msg={message[:60]}...")
+        await self._broadcast(session_id, payload)
 
     async def send_error(
         self,
@@ -201,13 +435,8 @@ class ProgressService:
             "timestamp": datetime.utcnow().isoformat()
         }
         self._latest_payloads.pop(session_id, None)
-        
-        if session_id in self._connections:
-            for ws in self._connections[session_id]:
-                try:
-                    await ws.send_json(payload)
-                except Exception:
-                    pass
+
+        await self._broadcast(session_id, payload)
 
 
 # Singleton
@@ -0,0 +1,116 @@
+"""
+Prompt Cache - Çeviri ve zenginleştirme sonuçları için iki katmanlı cache.
+
+Tek bir generate_image, fal.ai'ye gitmeden önce iki seri LLM çağrısı yapar
+(translate_to_english + _enrich_prompt). Retry'lar, "tekrar dene" istekleri ve
+kampanya varyasyonları aynı promptları tekrar tekrar kullanır.
+
+- Anahtar: normalize edilmiş prompt + işlem türü + medya tipi → sha256
+- Katman 1: process içi LRU (TTL'li)
+- Katman 2: Redis (RedisCache.cache_ai_response, uzun TTL)
+- Aynı anda gelen özdeş istekler tek LLM çağrısını paylaşır
+"""
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from app.core.cache import cache
+from app.core.single_flight import SingleFlight
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """Anlamı değiştirmeyen farkları (boşluk, unicode formu) sil."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+class PromptCache:
+    """LRU + Redis prompt dönüşüm cache'i."""
+
+    MAX_LOCAL_ENTRIES = 1024
+    LOCAL_TTL = 3600          # 1 saat
+    REDIS_TTL = 7 * 86400     # 7 gün
+
+    def __init__(self):
+        self._local: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._flights = SingleFlight()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "shared": 0}
+
+    @staticmethod
+    def make_key(kind: str, prompt: str, media_type: str = "", extra: str = "") -> str:
+        raw = "\x1f".join([kind, media_type, normalize_prompt(prompt), normalize_prompt(extra)])
+        return f"prompt:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    async def get_or_compute(
+        self,
+        kind: str,
+        prompt: str,
+        compute: Callable[[], Awaitable[str]],
+        media_type: str = "",
+        extra: str = "",
+    ) -> str:
+        """
+        Cache'ten döndür, yoksa compute() çalıştır ve sakla.
+        compute() hata fırlatırsa sonuç cache'lenmez (hata çağırana geçer).
+        """
+        key = self.make_key(kind, prompt, media_type, extra)
+
+        local = self._get_local(key)
+        if local is not None:
+            self._stats["local_hits"] += 1
+            return local
+
+        async def _load() -> str:
+            value = await cache.get_cached_ai_response(key) if cache.is_connected else None
+            if value is not None:
+                self._stats["redis_hits"] += 1
+            else:
+                self._stats["misses"] += 1
+                value = await compute()
+                if value and cache.is_connected:
+                    await cache.cache_ai_response(key, value, ttl=self.REDIS_TTL)
+            if value:
+                self._set_local(key, value)
+            return value
+
+        return await self._flights.do(key, _load, on_shared=self._count_shared)
+
+    def _count_shared(self):
+        self._stats["shared"] += 1
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            self._local.pop(key, None)
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: str):
+        self._local[key] = (time.monotonic() + self.LOCAL_TTL, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.MAX_LOCAL_ENTRIES:
+            self._local.popitem(last=False)
+
+    def clear(self):
+        self._local.clear()
+
+    def get_stats(self) -> dict:
+        hits = self._stats["local_hits"] + self._stats["redis_hits"] + self._stats["shared"]
+        total = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "local_entries": len(self._local),
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+# Singleton instance
+prompt_cache = PromptCache()
@@ -0,0 +1,159 @@
+"""
+Prompt Index - Kullanıcı başına başarılı prompt'lar için ters indeks.
+
+find_similar_prompts her sohbet turunda tüm hafızayı okuyup her prompt'u
+yeniden tokenize ediyor, her biri için kısıt regex'lerini çalıştırıyordu
+(O(prompt sayısı × regex)). Bu modül:
+1. Token seti ve kısıt izini (süre/adet/model) kayıt anında bir kez hesaplar
+2. token → prompt id ters indeksi tutar; sorgu yalnızca ortak token'ı olan
+   kayıtlara dokunur
+3. Opsiyonel "hashed" modu: harf trigram'larının hash'lenmiş vektörleri ile
+   kosinüs benzerliği (Türkçe ekleri — "kedi"/"kedisi" — yakalar, dış bağımlılık yok)
+4. Kayıt sırası korunur; max_entries aşılınca en eski kayıt indeksten çıkar
+"""
+import heapq
+import math
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.services.memory_hygiene import (
+    _PUNCT_PATTERN,
+    constraints_conflict,
+    extract_request_constraints,
+    sanitize_memory_text,
+    tokenize_memory_text,
+)
+
+
+def prompt_fingerprint(prompt: str) -> Dict[str, Any]:
+    """Kayıt anında saklanan önceden hesaplanmış alanlar (JSON uyumlu)."""
+    memory_prompt = sanitize_memory_text(prompt)
+    constraints = extract_request_constraints(prompt)
+    return {
+        "memory_prompt": memory_prompt,
+        "tokens": sorted(tokenize_memory_text(memory_prompt)),
+        "constraints": {**constraints, "models": sorted(constraints["models"])},
+    }
+
+
+def hashed_trigram_vector(text: str, dims: int = 1 << 18) -> Dict[int, float]:
+    """Kelime sınırlı harf trigram'larından L2-normalize seyrek vektör."""
+    counts: Counter = Counter()
+    for word in _PUNCT_PATTERN.sub(" ", (text or "").lower()).split():
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            counts[zlib.crc32(padded[i:i + 3].encode("utf-8")) % dims] += 1
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    return {k: v / norm for k, v in counts.items()} if norm else {}
+
+
+@dataclass
+class PromptEntry:
+    entry_id: int
+    record: Dict[str, Any]
+    tokens: frozenset
+    constraints: Dict[str, Any]
+    vector: Optional[Dict[int, float]] = None
+
+
+@dataclass
+class PromptIndex:
+    """Tek kullanıcının prompt indeksi."""
+    HASHED_MIN_DF = 64              # Küçük indekslerde hiçbir trigram "yaygın" sayılmaz
+    max_entries: int = 10000
+    mode: str = "tokens"            # "tokens" | "hashed"
+    seq: int = 0                    # Redis'teki ekleme sayacıyla senkron nokta
+    entries: "OrderedDict[int, PromptEntry]" = field(default_factory=OrderedDict)
+    postings: Dict[Any, set] = field(default_factory=dict)
+    _next_id: int = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, record: Dict[str, Any]):
+        """Kaydı indeksle. Eski kayıtlarda önceden hesaplanmış alan yoksa burada bir kez hesaplanır."""
+        if "tokens" not in record or "constraints" not in record:
+            record = {**prompt_fingerprint(record.get("prompt", "")), **record}
+            if not record.get("memory_prompt"):
+                record["memory_prompt"] = sanitize_memory_text(record.get("prompt", ""))
+        memory_prompt = record.get("memory_prompt") or ""
+        if not memory_prompt:
+            return
+
+        entry = PromptEntry(
+            entry_id=self._next_id,
+            record=record,
+            tokens=frozenset(record["tokens"]),
+            constraints=record["constraints"],
+        )
+        self._next_id += 1
+        if self.mode == "hashed":
+            entry.vector = hashed_trigram_vector(memory_prompt)
+            keys = entry.vector.keys()
+        else:
+            keys = entry.tokens
+        for key in keys:
+            self.postings.setdefault(key, set()).add(entry.entry_id)
+        self.entries[entry.entry_id] = entry
+
+        while len(self.entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        _, old = self.entries.popitem(last=False)
+        keys = old.vector.keys() if old.vector is not None else old.tokens
+        for key in keys:
+            ids = self.postings.get(key)
+            if ids is not None:
+                ids.discard(old.entry_id)
+                if not ids:
+                    del self.postings[key]
+
+    def search(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Ortak token (veya trigram) taşıyan kayıtlar arasından top-k; kısıtı çakışanlar atlanır."""
+        if self.mode == "hashed":
+            query_vector = hashed_trigram_vector(sanitize_memory_text(query))
+            if not query_vector or not tokenize_memory_text(query):
+                return []
+            # Kayıtların yarısından fazlasında geçen trigram'lar ayırt edici değil, atlanır
+            # (sorgu maliyeti ortak ekler yerine nadir trigram'ların posting'leriyle sınırlı kalır)
+            common = max(self.HASHED_MIN_DF, len(self.entries) // 2)
+            scores: Dict[int, float] = {}
+            for key, weight in query_vector.items():
+                ids = self.postings.get(key, ())
+                if len(ids) > common:
+                    continue
+                for entry_id in ids:
+                    scores[entry_id] = scores.get(entry_id, 0.0) + weight * self.entries[entry_id].vector[key]
+        else:
+            query_tokens = tokenize_memory_text(query)
+            if not query_tokens:
+                return []
+            scores = Counter()
+            for token in query_tokens:
+                for entry_id in self.postings.get(token, ()):
+                    scores[entry_id] += 1
+
+        if not scores:
+            return []
+
+        current = extract_request_constraints(query)
+        # (benzerlik, skor) azalan; eşitlikte eski kayıt önce (seri taramayla aynı sıra).
+        # heapify O(n) + çekilen her kayıt için O(log n) — tam sıralama yok.
+        heap = [
+            (-similarity, -self.entries[entry_id].record.get("score", 0), entry_id)
+            for entry_id, similarity in scores.items()
+        ]
+        heapq.heapify(heap)
+
+        results = []
+        while heap and len(results) < limit:
+            entry = self.entries[heapq.heappop(heap)[2]]
+            if constraints_conflict(current, entry.constraints):
+                continue
+            results.append({
+                key: value for key, value in entry.record.items() if key not in ("tokens", "constraints")
+            })
+        return results
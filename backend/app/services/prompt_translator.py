@@ -4,11 +4,12 @@ Türkçe promptları görsel üretim için optimize edilmiş İngilizce'ye çevi
 Her görsel üretimde prompt'u ChatGPT/Gemini seviyesine yaklaştırır.
 
 GPT-4o kullanır (OpenAI) - Claude'dan geçiş yapıldı.
+Sonuçlar prompt_cache'te tutulur; zaten İngilizce olan metin çevrilmez.
 """
-from openai import OpenAI
-from app.core.config import settings
+import re
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+from app.services.llm.llm_gateway import llm_gateway
+from app.services.prompt_cache import prompt_cache
 
 # Tüm görsel üretimlerde kullanılacak standart negatif prompt
 STANDARD_NEGATIVE_PROMPT = (
@@ -60,16 +61,18 @@ Examples of enhancement:
 
 {f"Additional context: {context}" if context else ""}"""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",  # Hızlı ve ucuz model - sadece çeviri için
-        max_tokens=500,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ]
-    )
+    async def _translate() -> str:
+        response = await llm_gateway.chat(
+            model="gpt-4o-mini",  # Hızlı ve ucuz model - sadece çeviri için
+            max_tokens=500,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ]
+        )
+        return response.choices[0].message.content.strip()
     
-    return response.choices[0].message.content.strip()
+    return await prompt_cache.get_or_compute("translate", turkish_prompt, _translate, extra=context)
 
 
 async def enhance_character_prompt(
@@ -147,7 +150,7 @@ Physical attributes: {attributes_str if attributes_str else "Not specified - use
 
 Create a detailed, photorealistic character portrait prompt."""
 
-    response = client.chat.completions.create(
+    response = await llm_gateway.chat(
         model="gpt-4o-mini",  # Hızlı ve ucuz model
         max_tokens=600,
         messages=[
@@ -180,8 +183,8 @@ Add ONLY what's missing:
 
 Do NOT change the subject. Output ONLY the enhanced prompt. Max 120 words."""
     
-    try:
-        response = client.chat.completions.create(
+    async def _enrich() -> str:
+        response = await llm_gateway.chat(
             model="gpt-4o-mini",
             max_tokens=400,
             messages=[
@@ -190,6 +193,9 @@ Do NOT change the subject. Output ONLY the enhanced prompt. Max 120 words."""
             ]
         )
         return response.choices[0].message.content.strip()
+    
+    try:
+        return await prompt_cache.get_or_compute("enrich", prompt, _enrich)
     except Exception:
         return prompt  # Hata durumunda orijinal prompt'u döndür
 
@@ -207,6 +213,42 @@ async def translate_to_english(text: str) -> tuple[str, bool]:
     if len(text.strip()) < 5:
         return text, False
     
-    # Her zaman çevir (optimized English prompt için)
+    # Zaten İngilizce ise LLM round trip'ine gerek yok
+    if looks_english(text):
+        return text, False
+    
     translated = await translate_prompt_to_english(text)
     return translated, True
+
+
+# Türkçe'ye özgü harfler — biri bile varsa metin İngilizce değildir
+_TURKISH_CHARS = set("çğıöşüÇĞİÖŞÜ")
+_WORD = re.compile(r"[a-zA-Z']+")
+_ENGLISH_WORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "with", "and", "or", "for", "to",
+    "is", "are", "by", "from", "into", "over", "under", "while", "his", "her",
+    "their", "its", "this", "that", "wearing", "holding", "standing", "sitting",
+}
+_TURKISH_WORDS = {
+    "ve", "bir", "bu", "ile", "icin", "gibi", "olan", "olarak", "yap", "olustur",
+    "ciz", "gorsel", "resim", "resmi", "fotograf", "video", "videosu", "sahne",
+    "kedi", "kopek", "adam", "kadin", "araba", "deniz", "sahil", "da", "de", "ki",
+    "mi", "ne", "icinde", "uzerinde", "yaninda", "tane", "cok", "daha", "en",
+}
+
+
+def looks_english(text: str) -> bool:
+    """
+    LLM çağırmadan hızlı dil tahmini.
+    Emin değilsek False döner (çeviri yapılır) — yanlış pozitif çevirisiz
+    Türkçe prompt demektir, yanlış negatif sadece bir LLM çağrısı.
+    """
+    if any(ch in _TURKISH_CHARS for ch in text):
+        return False
+    letters = [ch for ch in text if ch.isalpha()]
+    if not letters or any(not ch.isascii() for ch in letters):
+        return False
+    words = [w.lower() for w in _WORD.findall(text)]
+    english_hits = sum(1 for w in words if w in _ENGLISH_WORDS)
+    turkish_hits = sum(1 for w in words if w in _TURKISH_WORDS)
+    return english_hits >= 1 and english_hits > turkish_hits
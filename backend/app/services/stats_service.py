@@ -2,6 +2,8 @@
 Kullanım İstatistikleri Tracking Servisi.
 
 Görsel, video ve API çağrılarını günlük olarak takip eder.
+Sayaç artışları usage_counters üzerinden toplanıp atomik upsert ile yazılır
+(günlük aggregate satırı: model_name NULL).
 """
 from datetime import datetime, date
 from typing import Optional
@@ -11,6 +13,7 @@ from sqlalchemy import select, func, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.models import UsageStats
+from app.services.usage_counters import usage_counters
 
 
 class StatsService:
@@ -70,10 +73,7 @@ class StatsService:
         tokens: int = 0
     ):
         """API çağrısı sayacını artır."""
-        stats = await StatsService.get_or_create_today_stats(db, user_id)
-        stats.api_calls += 1
-        stats.tokens_used += tokens
-        await db.commit()
+        usage_counters.incr(user_id, api_calls=1, tokens_used=tokens)
     
     @staticmethod
     async def track_image_generation(
@@ -81,13 +81,8 @@ class StatsService:
         user_id: Optional[uuid.UUID] = None,
         model_name: Optional[str] = None
     ):
-        """Görsel üretim sayacını artır."""
-        stats = await StatsService.get_or_create_today_stats(db, user_id)
-        stats.images_generated += 1
-        stats.api_calls += 1
-        if model_name:
-            stats.model_name = model_name
-        await db.commit()
+        """Görsel üretim sayacını artır (model kırılımı usage_tracker'da tutulur)."""
+        usage_counters.incr(user_id, images_generated=1, api_calls=1)
     
     @staticmethod
     async def track_video_generation(
@@ -95,13 +90,8 @@ class StatsService:
         user_id: Optional[uuid.UUID] = None,
         model_name: Optional[str] = None
     ):
-        """Video üretim sayacını artır."""
-        stats = await StatsService.get_or_create_today_stats(db, user_id)
-        stats.videos_generated += 1
-        stats.api_calls += 1
-        if model_name:
-            stats.model_name = model_name
-        await db.commit()
+        """Video üretim sayacını artır (model kırılımı usage_tracker'da tutulur)."""
+        usage_counters.incr(user_id, videos_generated=1, api_calls=1)
 
 
 # Singleton instance
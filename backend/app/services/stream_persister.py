@@ -0,0 +1,263 @@
+"""
+Stream Persister — SSE asistan mesajları için process içi write-behind tamponu.
+
+Eskiden /chat/stream her ~80 karakterde yeni bir AsyncSession açıp büyüyen
+content'in TAMAMINI UPDATE ediyordu: uzun bir yanıt onlarca transaction,
+eşzamanlı stream sayısıyla çarpılıyordu. Bu modül:
+1. Token'lar yalnızca bellekteki son durumu günceller (IO yok)
+2. Tek flusher coroutine'i FLUSH_INTERVAL'da bir (ya da tampon FLUSH_CHARS'ı
+   aşınca hemen) TÜM aktif stream'leri tek toplu UPDATE ile yazar
+3. finalize(): son durum beklenmeden hemen ve shield'lı yazılır — client
+   kopması/iptal flush'ı yarıda kesemez; await edilemeyen yerlerde close()
+   son durumu flusher'a bırakır
+4. Kurtarma işareti: aktif mesajlar Redis'te sahibi (process) ile tutulur,
+   sahip process heartbeat yazar. Restart sonrası sahibi ölü mesajlar
+   finalize edilir (pending kalkar, "interrupted" işaretlenir; boşsa silinir)
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import bindparam, delete, select, update
+
+from app.core.cache import cache
+from app.core.database import async_session_maker
+from app.models.models import Message
+
+
+class StreamPersister:
+    """Aktif stream mesajlarının son durumunu toplayıp periyodik olarak yazar."""
+
+    FLUSH_INTERVAL = 1.0        # saniye
+    FLUSH_CHARS = 8000          # Son flush'tan beri birikmiş karakter → beklemeden flush
+    ACTIVE_KEY = "stream_persist:active"        # HASH message_id → sahip process
+    ALIVE_PREFIX = "stream_persist:alive:"      # Sahip heartbeat'i (TTL'li)
+    ALIVE_TTL = 30
+
+    _UPDATE = update(Message.__table__).where(Message.__table__.c.id == bindparam("b_id"))
+
+    def __init__(self):
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._pending: Dict[UUID, dict] = {}
+        self._active: Set[UUID] = set()
+        self._buffered_chars = 0
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle = True
+        self._flush_lock = asyncio.Lock()   # Eski batch yeni (final) durumu ezmesin
+        self._last_heartbeat = 0.0
+        self._stats = {"updates": 0, "flushes": 0, "rows_written": 0, "flush_errors": 0, "recovered": 0}
+
+    # ===============================
+    # PUBLIC API
+    # ===============================
+
+    async def begin(self, message_id: UUID):
+        """Stream başladı: kurtarma işaretini bırak."""
+        self._active.add(message_id)
+        self._ensure_flusher()
+        self._wakeup.set()   # Heartbeat döngüsünü başlat
+        client = cache.client
+        if client is not None:
+            try:
+                await client.hset(self.ACTIVE_KEY, str(message_id), self.instance_id)
+                await self._heartbeat(force=True)
+            except Exception as e:
+                print(f"⚠️ Stream kurtarma işareti yazılamadı: {e}")
+
+    def update(self, message_id: UUID, content: str, metadata: dict, is_error: bool = False, final: bool = False):
+        """Mesajın son durumunu tampona yaz (IO yok). Bir sonraki flush'ta DB'ye gider."""
+        previous = self._pending.get(message_id)
+        self._buffered_chars += max(0, len(content) - (len(previous["content"]) if previous else 0))
+        self._pending[message_id] = {
+            "id": message_id, "content": content, "metadata_": metadata, "is_error": is_error,
+            "final": final or bool(previous and previous["final"]),
+        }
+        self._stats["updates"] += 1
+        self._ensure_flusher()
+        # Boştaki flusher'ın ilk yazımı hemen olur; sonrası FLUSH_INTERVAL'da bir
+        if final or self._idle or self._buffered_chars >= self.FLUSH_CHARS:
+            self._wakeup.set()
+
+    def close(self, message_id: UUID, content: str, metadata: dict, is_error: bool = False):
+        """Son durum — await edilemeyen yerler için (finally/GeneratorExit): flusher hemen yazar."""
+        self.update(message_id, content, metadata, is_error, final=True)
+
+    async def finalize(self, message_id: UUID, content: str, metadata: dict, is_error: bool = False):
+        """Son durumu yaz ve flush'ı bekle. Çağıran iptal edilse de flush tamamlanır."""
+        self.update(message_id, content, metadata, is_error, final=True)
+        await asyncio.shield(self.flush())
+
+    def forget(self, message_id: UUID):
+        """Mesajı bellekten bırak (IO yok). Kurtarma işareti kalır → restart sonrası temizlenir."""
+        self._pending.pop(message_id, None)
+        self._active.discard(message_id)
+
+    async def discard(self, message_id: UUID):
+        """
+        Mesaj silinecek: tampondaki durumu ve kurtarma işaretini bırak.
+        Devam eden flush beklenir → silme, yazılmakta olan eski batch'in ardından gelir.
+        """
+        async with self._flush_lock:
+            self.forget(message_id)
+        await self._clear_markers([message_id])
+
+    async def flush(self) -> int:
+        """Tampondaki tüm mesajları tek toplu UPDATE ile yaz → yazılan satır sayısı."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._buffered_chars = 0
+            rows = [
+                {"b_id": row["id"], "content": row["content"], "metadata": row["metadata_"], "is_error": row["is_error"]}
+                for row in batch.values()
+            ]
+            try:
+                async with async_session_maker() as db:
+                    # Core UPDATE ... WHERE id = :b_id → tek executemany. ORM bulk UPDATE'ten
+                    # farkı: arada silinmiş satır (kurtarma / iptal DELETE'i) tüm batch'i
+                    # StaleDataError ile düşürmez, o satır sessizce atlanır
+                    await db.execute(self._UPDATE, rows)
+                    await db.commit()
+            except BaseException as e:
+                # Yazılamayanları geri koy (bu arada gelen daha yeni durum öncelikli)
+                for message_id, row in batch.items():
+                    self._pending.setdefault(message_id, row)
+                if not isinstance(e, Exception):
+                    raise
+                self._stats["flush_errors"] += 1
+                print(f"⚠️ Stream mesajları yazılamadı ({len(rows)} mesaj): {e}")
+                return 0
+
+        self._stats["flushes"] += 1
+        self._stats["rows_written"] += len(rows)
+        finished = [message_id for message_id, row in batch.items() if row["final"]]
+        if finished:
+            self._active.difference_update(finished)
+            await self._clear_markers(finished)
+        return len(rows)
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "active": len(self._active), "pending": len(self._pending)}
+
+    async def shutdown(self):
+        """Flusher'ı durdur ve tamponda kalanı yaz."""
+        if self._flusher_task and not self._flusher_task.done():
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._flusher_task = None
+        self._wakeup = None
+        self._loop = None
+        await self.flush()
+
+    # ===============================
+    # KURTARMA
+    # ===============================
+
+    async def recover_interrupted(self) -> int:
+        """
+        Sahibi ölmüş (heartbeat'i düşmüş) stream mesajlarını finalize et.
+        İçeriği/medyası olan mesaj "interrupted" olarak kalır, boş placeholder silinir.
+        """
+        client = cache.client
+        if client is None:
+            return 0
+        try:
+            markers = await client.hgetall(self.ACTIVE_KEY)
+            owners = {owner for owner in markers.values() if owner != self.instance_id}
+            alive = {owner for owner in owners if await client.exists(f"{self.ALIVE_PREFIX}{owner}")}
+            orphaned = [
+                UUID(message_id) for message_id, owner in markers.items()
+                if owner != self.instance_id and owner not in alive
+            ]
+        except Exception as e:
+            print(f"⚠️ Stream kurtarma işaretleri okunamadı: {e}")
+            return 0
+        if not orphaned:
+            return 0
+
+        recovered = 0
+        async with async_session_maker() as db:
+            result = await db.execute(select(Message).where(Message.id.in_(orphaned)))
+            for msg in result.scalars().all():
+                meta = dict(msg.metadata_) if isinstance(msg.metadata_, dict) else {}
+                if not meta.get("pending"):
+                    continue
+                has_media = bool(meta.get("images") or meta.get("videos"))
+                if not (msg.content or "").strip() and not has_media:
+                    await db.execute(delete(Message).where(Message.id == msg.id))
+                else:
+                    meta["pending"] = False
+                    meta["interrupted"] = True
+                    msg.metadata_ = meta
+                recovered += 1
+            await db.commit()
+
+        await self._clear_markers(orphaned)
+        self._stats["recovered"] += recovered
+        return recovered
+
+    async def _clear_markers(self, message_ids):
+        client = cache.client
+        if client is None or not message_ids:
+            return
+        try:
+            await client.hdel(self.ACTIVE_KEY, *[str(message_id) for message_id in message_ids])
+        except Exception as e:
+            print(f"⚠️ Stream kurtarma işareti silinemedi: {e}")
+
+    async def _heartbeat(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_heartbeat < self.ALIVE_TTL / 3:
+            return
+        client = cache.client
+        if client is None:
+            return
+        self._last_heartbeat = now
+        await client.set(f"{self.ALIVE_PREFIX}{self.instance_id}", "1", ex=self.ALIVE_TTL)
+
+    # ===============================
+    # FLUSHER
+    # ===============================
+
+    def _ensure_flusher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._flusher_task is None or self._flusher_task.done():
+            if self._loop is not loop:
+                self._flush_lock = asyncio.Lock()
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._flusher_task = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            if not self._pending and not self._active:
+                self._idle = True
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self._idle = False
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self._active:
+                try:
+                    await self._heartbeat()
+                except Exception as e:
+                    print(f"⚠️ Stream heartbeat yazılamadı: {e}")
+
+
+# Singleton instance
+stream_persister = StreamPersister()
@@ -0,0 +1,161 @@
+"""
+Usage Counters — kullanım sayaçları için process içi write-behind toplama.
+
+Eskiden StatsService.track_* ve usage_tracker.log_model_usage her üretimde
+bugünün satırını select-or-create edip sayacı Python'da artırıyor ve commit
+ediyordu: eşzamanlı arka plan görevleri birbirinin artışını eziyor (lost
+update), her görsel/video sıcak yolda ek bir transaction ödüyordu. Burada:
+1. incr() yalnızca bellekte (kullanıcı, gün, model) → metrik sayaçlarını toplar (IO yok)
+2. Flusher FLUSH_INTERVAL'da bir TÜM bekleyen anahtarları tek
+   INSERT ... ON CONFLICT DO UPDATE SET x = usage_stats.x + EXCLUDED.x ile yazar
+   → toplama DB'de atomik; process'ler/replikalar birbirini ezmez
+3. Yazılamayan deltalar kaybolmaz, bir sonraki flush'a geri eklenir
+4. Gün, artış anında (UTC) belirlenir — gece yarısından sonraki flush doğru güne yazar
+5. Kullanıcı toplamları aynı transaction'da daily_rollups'a ("usage") eklenir
+"""
+import asyncio
+import uuid
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.database import async_session_maker
+from app.models.models import UsageStats, usage_stats_day_key
+from app.services.daily_rollups import DailyRollups
+
+METRICS = ("api_calls", "images_generated", "videos_generated", "tokens_used")
+
+CounterKey = Tuple[Optional[uuid.UUID], date, Optional[str]]   # (user_id, gün, model)
+
+
+class UsageCounters:
+    """(kullanıcı, gün, model, metrik) sayaçlarını toplayıp periyodik olarak yazar."""
+
+    FLUSH_INTERVAL = 5.0        # saniye
+    MAX_PENDING_KEYS = 500      # Bu kadar farklı anahtar birikince beklemeden flush
+
+    def __init__(self):
+        self._pending: Dict[CounterKey, Counter] = {}
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle = True
+        self._stats = {"increments": 0, "flushes": 0, "rows_written": 0, "flush_errors": 0}
+
+    # ===============================
+    # PUBLIC API
+    # ===============================
+
+    def incr(self, user_id: Optional[uuid.UUID], model_name: Optional[str] = None, **deltas: int):
+        """Sayaçları artır (örn. incr(uid, "flux", api_calls=1, images_generated=1))."""
+        unknown = set(deltas) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Bilinmeyen sayaç: {', '.join(sorted(unknown))}")
+        key = (user_id, datetime.now(timezone.utc).date(), model_name or None)
+        counter = self._pending.setdefault(key, Counter())
+        for metric, value in deltas.items():
+            if value:
+                counter[metric] += int(value)
+        self._stats["increments"] += 1
+        self._ensure_flusher()
+        # Boştaki flusher uyanıp FLUSH_INTERVAL sayar; çok anahtar birikince hemen yazar
+        if self._idle or len(self._pending) >= self.MAX_PENDING_KEYS:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Bekleyen deltaları tek upsert ile yaz → yazılan satır sayısı."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        rows = [
+            {
+                "id": uuid.uuid4(), "user_id": user_id, "day": day, "model_name": model_name,
+                **{metric: counter.get(metric, 0) for metric in METRICS},
+            }
+            for (user_id, day, model_name), counter in batch.items()
+        ]
+        # Kullanıcı toplamı satırları (model_name NULL) admin günlük özetine de aynı transaction'da eklenir
+        usage_rollups = Counter()
+        for (user_id, day, model_name), counter in batch.items():
+            if model_name is None:
+                for metric, value in counter.items():
+                    usage_rollups[(day, "usage", metric)] += value
+        try:
+            async with async_session_maker() as db:
+                await db.execute(self.build_upsert(rows))
+                if +usage_rollups:
+                    await db.execute(DailyRollups.build_upsert([
+                        {"day": day, "metric": metric, "key": key, "value": value}
+                        for (day, metric, key), value in (+usage_rollups).items()
+                    ]))
+                await db.commit()
+        except BaseException as e:
+            # Deltalar kaybolmasın: bu arada gelen artışlarla birleştir
+            for key, counter in batch.items():
+                self._pending.setdefault(key, Counter()).update(counter)
+            if not isinstance(e, Exception):
+                raise
+            self._stats["flush_errors"] += 1
+            print(f"⚠️ Kullanım sayaçları yazılamadı ({len(rows)} satır): {e}")
+            return 0
+        self._stats["flushes"] += 1
+        self._stats["rows_written"] += len(rows)
+        return len(rows)
+
+    @staticmethod
+    def build_upsert(rows: list):
+        """Çok satırlı INSERT ... ON CONFLICT (user, gün, model) DO UPDATE SET x = x + EXCLUDED.x"""
+        statement = insert(UsageStats).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=list(usage_stats_day_key.expressions),
+            set_={metric: getattr(UsageStats, metric) + getattr(statement.excluded, metric) for metric in METRICS},
+        )
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "pending_keys": len(self._pending)}
+
+    async def shutdown(self):
+        """Flusher'ı durdur ve bekleyenleri yaz."""
+        if self._flusher_task and not self._flusher_task.done():
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._flusher_task = None
+        self._wakeup = None
+        self._loop = None
+        await self.flush()
+
+    # ===============================
+    # FLUSHER
+    # ===============================
+
+    def _ensure_flusher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._flusher_task is None or self._flusher_task.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._flusher_task = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            if not self._pending:
+                self._idle = True
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                self._idle = False
+                if len(self._pending) < self.MAX_PENDING_KEYS:
+                    self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+# Singleton instance
+usage_counters = UsageCounters()
@@ -3,12 +3,12 @@ Model Kullanım Geçmişi Tracking Servisi.
 Her AI model çağrısını UsageStats tablosuna kaydeder.
 """
 import uuid
-from datetime import datetime, timezone
 
 from sqlalchemy import select, func as sa_func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.models import UsageStats
+from app.services.usage_counters import usage_counters
 
 
 async def log_model_usage(
@@ -19,45 +19,20 @@ async def log_model_usage(
 ) -> None:
     """
     Bir model kullanımını logla.
-    Bugünün kaydı varsa güncelle, yoksa yeni oluştur.
+    Artış bellekte toplanır; usage_counters (kullanıcı, gün, model) satırına
+    atomik upsert ile yazar — eşzamanlı çağrılar birbirini ezmez.
     """
     try:
-        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-
-        # Bugünkü kayıt var mı?
-        result = await db.execute(
-            select(UsageStats).where(
-                UsageStats.user_id == user_id,
-                UsageStats.model_name == model_name,
-                UsageStats.date >= today_start,
-            )
+        usage_counters.incr(
+            user_id,
+            model_name,
+            api_calls=1,
+            images_generated=1 if usage_type == "image" else 0,
+            videos_generated=1 if usage_type == "video" else 0,
         )
-        stats = result.scalar_one_or_none()
-
-        if stats:
-            # Güncelle
-            stats.api_calls += 1
-            if usage_type == "image":
-                stats.images_generated += 1
-            elif usage_type == "video":
-                stats.videos_generated += 1
-        else:
-            # Yeni kayıt
-            stats = UsageStats(
-                user_id=user_id,
-                model_name=model_name,
-                api_calls=1,
-                images_generated=1 if usage_type == "image" else 0,
-                videos_generated=1 if usage_type == "video" else 0,
-                tokens_used=0,
-            )
-            db.add(stats)
-
-        await db.commit()
     except Exception as e:
         # Loglama hatası ana işlemi bozmamalı
         print(f"⚠️ Kullanım logu yazılamadı: {e}")
-        await db.rollback()
 
 
 async def get_usage_summary(db: AsyncSession, user_id: uuid.UUID | None) -> dict:
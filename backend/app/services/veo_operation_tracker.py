@@ -0,0 +1,189 @@
+"""
+Veo Operation Tracker - Google video operasyonları için tek poller'lı async izleyici.
+
+Eskiden her Veo isteği varsayılan executor'da bir thread'i `time.sleep(10)`
+döngüsüyle 10 dakikaya kadar işgal ediyordu; birkaç eşzamanlı Veo işi havuzu
+doldurunca diğer tüm `asyncio.to_thread` kullanıcıları sıraya giriyordu.
+Bu modül:
+1. Operasyonu SDK ile başlatır (kısa bloklayan çağrı)
+2. Tüm uçuştaki operasyonları TEK bir poller coroutine'i izler (async sleep)
+3. SDK'nın bloklayan çağrılarını (generate_videos, operations.get) sadece
+   küçük, ayrılmış bir thread havuzunda çalıştırır — varsayılan executor'a dokunmaz
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class VeoOperationTimeoutError(asyncio.TimeoutError):
+    """Veo operasyonu belirlenen sürede tamamlanmadı."""
+
+
+@dataclass
+class VeoOperation:
+    """Uçuştaki tek bir Google video operasyonu."""
+    client: Any
+    operation: Any
+    future: asyncio.Future
+    deadline: float
+    submitted_at: float = field(default_factory=time.monotonic)
+    next_poll_at: float = 0.0
+    polls: int = 0
+
+    @property
+    def name(self) -> str:
+        return getattr(self.operation, "name", "") or ""
+
+
+class VeoOperationTracker:
+    """Paylaşılan Veo operasyon izleyicisi."""
+
+    POLL_INTERVAL = 10.0      # Veo üretimi dakikalar sürer; 10s yeterli çözünürlük
+    DEFAULT_TIMEOUT = 600     # 10 dakika
+    SDK_WORKERS = 4           # Bloklayan SDK çağrıları için ayrılmış thread sayısı
+
+    def __init__(self):
+        self._operations: dict[str, VeoOperation] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._poller_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "polls": 0}
+
+    # ===============================
+    # PUBLIC API
+    # ===============================
+
+    async def call_sdk(self, func: Callable, *args, **kwargs) -> Any:
+        """Kısa bloklayan bir SDK çağrısını ayrılmış havuzda çalıştır."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.SDK_WORKERS, thread_name_prefix="veo-sdk")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def run(self, client: Any, timeout: float = None, **generate_kwargs) -> Any:
+        """
+        generate_videos ile operasyonu başlat, tamamlanana kadar bekle,
+        bitmiş operasyonun `result` nesnesini döndür.
+        """
+        operation = await self.call_sdk(client.models.generate_videos, **generate_kwargs)
+        self._stats["submitted"] += 1
+        logger.info(f"⏳ Veo işlemi izleniyor... (op name: {getattr(operation, 'name', '?')})")
+        return await self.wait(client, operation, timeout=timeout)
+
+    async def wait(self, client: Any, operation: Any, timeout: float = None) -> Any:
+        """Başlatılmış bir operasyonu poller'a ekle ve sonucunu bekle."""
+        self._ensure_poller()
+        now = time.monotonic()
+        tracked = VeoOperation(
+            client=client,
+            operation=operation,
+            future=self._loop.create_future(),
+            deadline=now + (timeout or self.DEFAULT_TIMEOUT),
+            next_poll_at=now + self.POLL_INTERVAL,
+        )
+        key = tracked.name or str(id(tracked))
+        self._operations[key] = tracked
+        self._wakeup.set()
+        try:
+            return await tracked.future
+        finally:
+            self._operations.pop(key, None)
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "in_flight": len(self._operations)}
+
+    async def shutdown(self):
+        if self._poller_task and not self._poller_task.done():
+            self._poller_task.cancel()
+            try:
+                await self._poller_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        for tracked in list(self._operations.values()):
+            if not tracked.future.done():
+                tracked.future.cancel()
+        self._operations.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._poller_task = None
+        self._wakeup = None
+        self._loop = None
+
+    # ===============================
+    # POLLER
+    # ===============================
+
+    def _ensure_poller(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._poller_task is None or self._poller_task.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._poller_task = loop.create_task(self._poll_loop(), name="veo-operation-poller")
+
+    async def _poll_loop(self):
+        while True:
+            if not self._operations:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            due = [op for op in self._operations.values() if op.next_poll_at <= now and not op.future.done()]
+            if due:
+                await asyncio.gather(*(self._poll_one(op) for op in due), return_exceptions=True)
+                continue
+
+            pending = [op.next_poll_at for op in self._operations.values() if not op.future.done()]
+            sleep_for = (min(pending) - now) if pending else self.POLL_INTERVAL
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.05, sleep_for))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll_one(self, tracked: VeoOperation):
+        if time.monotonic() >= tracked.deadline:
+            self._stats["timeouts"] += 1
+            self._finish(tracked, error=VeoOperationTimeoutError("Veo zaman aşımı (10 dakika)"))
+            return
+
+        tracked.polls += 1
+        self._stats["polls"] += 1
+        try:
+            tracked.operation = await self.call_sdk(tracked.client.operations.get, tracked.operation)
+        except Exception as e:
+            # Geçici hata — bir sonraki turda tekrar dene
+            logger.warning(f"⚠️ Veo poll hatası ({tracked.name}): {e}")
+            tracked.next_poll_at = time.monotonic() + self.POLL_INTERVAL
+            return
+
+        logger.info(f"   ... Veo poll #{tracked.polls}: done={tracked.operation.done}")
+        if not tracked.operation.done:
+            tracked.next_poll_at = time.monotonic() + self.POLL_INTERVAL
+            return
+
+        if tracked.operation.error:
+            self._finish(tracked, error=RuntimeError(f"Veo API Hatası: {tracked.operation.error}"))
+        else:
+            self._finish(tracked, result=tracked.operation.result)
+
+    def _finish(self, tracked: VeoOperation, result: Any = None, error: Optional[BaseException] = None):
+        if tracked.future.done():
+            return
+        if error is not None:
+            self._stats["failed"] += 1
+            tracked.future.set_exception(error)
+        else:
+            self._stats["completed"] += 1
+            tracked.future.set_result(result)
+
+
+# Singleton instance
+veo_operation_tracker = VeoOperationTracker()
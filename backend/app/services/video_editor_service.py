@@ -19,9 +19,12 @@ import os
 import uuid
 import tempfile
 import asyncio
-import httpx
 from typing import Optional, Dict, Any, List
 
+from app.services.media_cache import media_cache
+from app.services.media_io import media_io
+from app.services.derived_asset_cache import derived_asset_cache
+
 
 class VideoEditorService:
     """FFmpeg tabanlı video düzenleme servisi."""
@@ -29,20 +32,14 @@ class VideoEditorService:
     # ── helpers ──────────────────────────────────────────────
     @staticmethod
     async def _download_file(url: str, suffix: str = ".mp4") -> str:
-        """URL'den dosya indir, geçici dosya yolu döndür."""
-        async with httpx.AsyncClient(timeout=120) as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-            tmp.write(resp.content)
-            tmp.close()
-            return tmp.name
+        """URL içeriğini (media cache üzerinden) geçici dosyaya koy, yolu döndür."""
+        return await media_cache.materialize(url, suffix=suffix)
 
     @staticmethod
     async def _upload_to_fal(path: str) -> str:
-        """Dosyayı fal.ai storage'a yükle, URL döndür."""
-        import fal_client
-        url = await fal_client.upload_file_async(path)
+        """Dosyayı fal.ai storage'a yükle, URL döndür (zincirleme düzenleme için cache'le)."""
+        url = await media_io.upload_file(path)
+        await media_cache.store_file(url, path)
         return url
 
     @staticmethod
@@ -433,8 +430,8 @@ class VideoEditorService:
         video_url: str,
         timestamp: float = 0,
     ) -> Dict[str, Any]:
-        """Videodan belirli bir karede görsel çıkar."""
-        try:
+        """Videodan belirli bir karede görsel çıkar (aynı video + an için sonuç cache'li)."""
+        async def _compute() -> str:
             src = await self._download_file(video_url)
             out = tempfile.NamedTemporaryFile(suffix=".png", delete=False).name
 
@@ -442,12 +439,18 @@ class VideoEditorService:
                 "ffmpeg", "-y", "-ss", str(timestamp),
                 "-i", src, "-vframes", "1", "-q:v", "2", out,
             ]
-            await self._run_ffmpeg(cmd, "extract_frame")
-            url = await self._upload_to_fal(out)
+            try:
+                await self._run_ffmpeg(cmd, "extract_frame")
+                return await self._upload_to_fal(out)
+            finally:
+                for f in (src, out):
+                    try: os.unlink(f)
+                    except: pass
 
-            for f in (src, out):
-                try: os.unlink(f)
-                except: pass
+        try:
+            url = await derived_asset_cache.get_or_create(
+                video_url, "ffmpeg_frame", _compute, {"timestamp": timestamp}
+            )
 
             return {
                 "success": True, "image_url": url, "operation": "extract_frame",
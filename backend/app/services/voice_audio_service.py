@@ -8,15 +8,16 @@ Voice & Audio Service — Sesli komut ve video'ya ses ekleme.
 import tempfile
 import httpx
 from typing import Optional, Dict, Any
-from openai import AsyncOpenAI
-from app.core.config import settings
+from app.services.llm.llm_gateway import llm_gateway
 
 
 class VoiceAudioService:
     """Ses işleme servisi."""
     
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    @property
+    def client(self):
+        """Whisper/TTS çağrıları için gateway client'ı (her erişimde güncel)."""
+        return llm_gateway.client
     
     # ===============================
     # SPEECH-TO-TEXT (Whisper)
@@ -5,11 +5,13 @@ Celery tasks for:
 - Expired trash cleanup
 - Old task result cleanup
 - Pinecone reindexing
+- Admin daily rollup refresh
 - Cache cleanup
 """
 from celery import shared_task
-from datetime import datetime, timedelta
-import asyncio
+from datetime import datetime
+
+from app.tasks.runtime import run_async
 
 
 @shared_task(
@@ -21,38 +23,31 @@ def cleanup_expired_trash(self) -> dict:
     Clean up trash items that have expired (after 3 days).
     Runs hourly via Celery Beat.
     """
-    from app.core.database import async_sessionmaker
+    from app.core.database import async_session_maker
     from app.models.models import TrashItem
     from sqlalchemy import delete
     
+    async def _cleanup():
+        async with async_session_maker() as db:
+            now = datetime.utcnow()
+            result = await db.execute(
+                delete(TrashItem).where(TrashItem.expires_at < now)
+            )
+            deleted_count = result.rowcount
+            await db.commit()
+            return deleted_count
+    
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        deleted = run_async(_cleanup())
         
-        async def _cleanup():
-            async with async_sessionmaker() as db:
-                now = datetime.utcnow()
-                result = await db.execute(
-                    delete(TrashItem).where(TrashItem.expires_at < now)
-                )
-                deleted_count = result.rowcount
-                await db.commit()
-                return deleted_count
+        if deleted > 0:
+            print(f"🗑️ {deleted} expired trash items deleted")
         
-        try:
-            deleted = loop.run_until_complete(_cleanup())
-            
-            if deleted > 0:
-                print(f"🗑️ {deleted} expired trash items deleted")
-            
-            return {
-                "success": True,
-                "deleted_count": deleted,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            
-        finally:
-            loop.close()
+        return {
+            "success": True,
+            "deleted_count": deleted,
+            "timestamp": datetime.utcnow().isoformat()
+        }
             
     except Exception as e:
         print(f"❌ Trash cleanup failed: {e}")
@@ -71,23 +66,16 @@ def cleanup_old_results(self) -> dict:
     from app.core.cache import cache
     
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Clean up old working memory
+        cleaned = (
+            run_async(cache.cleanup_old_tasks()) if hasattr(cache, 'cleanup_old_tasks') else 0
+        ) or 0
         
-        try:
-            # Clean up old working memory
-            cleaned = loop.run_until_complete(
-                cache.cleanup_old_tasks() if hasattr(cache, 'cleanup_old_tasks') else None
-            ) or 0
-            
-            return {
-                "success": True,
-                "cleaned_count": cleaned,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            
-        finally:
-            loop.close()
+        return {
+            "success": True,
+            "cleaned_count": cleaned,
+            "timestamp": datetime.utcnow().isoformat()
+        }
             
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -109,16 +97,13 @@ def reindex_pinecone(self) -> dict:
     
     try:
         from app.services.embeddings.pinecone_service import pinecone_service
-        from app.core.database import async_sessionmaker
+        from app.core.database import async_session_maker
         from app.models.models import Entity
         from sqlalchemy import select
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
         async def _reindex():
             reindexed = 0
-            async with async_sessionmaker() as db:
+            async with async_session_maker() as db:
                 result = await db.execute(select(Entity))
                 entities = result.scalars().all()
                 
@@ -141,20 +126,43 @@ def reindex_pinecone(self) -> dict:
             
             return reindexed
         
-        try:
-            count = loop.run_until_complete(_reindex())
-            print(f"🔄 Reindexed {count} entities in Pinecone")
-            
-            return {
-                "success": True,
-                "reindexed_count": count,
-                "timestamp": datetime.utcnow().isoformat()
-            }
+        count = run_async(_reindex())
+        print(f"🔄 Reindexed {count} entities in Pinecone")
+        
+        return {
+            "success": True,
+            "reindexed_count": count,
+            "timestamp": datetime.utcnow().isoformat()
+        }
             
-        finally:
-            loop.close()
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@shared_task(
+    bind=True,
+    name="app.tasks.cleanup_tasks.refresh_daily_rollups",
+)
+def refresh_daily_rollups(self, full: bool = False) -> dict:
+    """
+    Recompute admin daily rollups from source tables.
+    Runs every 10 minutes for the recent window, and daily (full=True) for all history.
+    """
+    from app.services.daily_rollups import daily_rollups
+    
+    try:
+        rows = run_async(daily_rollups.refresh(days=None if full else daily_rollups.REFRESH_DAYS))
+        print(f"📊 Daily rollups refreshed ({'full' if full else 'recent'}): {rows} rows")
+        
+        return {
+            "success": True,
+            "rows": rows,
+            "full": full,
+            "timestamp": datetime.utcnow().isoformat()
+        }
             
     except Exception as e:
+        print(f"❌ Daily rollup refresh failed: {e}")
         return {"success": False, "error": str(e)}
 
 
@@ -8,8 +8,19 @@ Celery tasks for:
 - Batch image processing
 """
 from celery import shared_task
-from typing import Optional, List
-import asyncio
+from typing import List
+
+from app.tasks.runtime import run_async
+
+
+def _execute(action: str, params: dict) -> dict:
+    """FalPluginV2 action'ını worker loop'unda çalıştır; başarısızsa retry için hata fırlat."""
+    from app.services.plugins.fal_plugin_v2 import fal_plugin_v2
+
+    result = run_async(fal_plugin_v2.execute(action, params))
+    if not result.success:
+        raise RuntimeError(result.error or f"{action} başarısız")
+    return result.data or {}
 
 
 @shared_task(
@@ -24,41 +35,28 @@ def generate_image(
     session_id: str,
     prompt: str,
     aspect_ratio: str = "16:9",
-    model: str = "fal-ai/flux-pro/v1.1-ultra",
+    model: str = "auto",
     num_images: int = 1
 ) -> dict:
     """
     Generate image using Fal.ai.
     """
-    from app.services.fal_plugin import FalPlugin
-    
     try:
         self.update_state(state="GENERATING", meta={"progress": 10})
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            fal_plugin = FalPlugin()
-            
-            result = loop.run_until_complete(
-                fal_plugin.generate_image(
-                    prompt=prompt,
-                    aspect_ratio=aspect_ratio,
-                    model=model
-                )
-            )
-            
-            return {
-                "success": True,
-                "image_url": result.get("image_url"),
-                "user_id": user_id,
-                "session_id": session_id
-            }
-            
-        finally:
-            loop.close()
-            
+
+        data = _execute("generate_image", {
+            "prompt": prompt,
+            "aspect_ratio": aspect_ratio,
+            "model": model,
+        })
+
+        return {
+            "success": True,
+            "image_url": data.get("image_url"),
+            "user_id": user_id,
+            "session_id": session_id
+        }
+
     except Exception as e:
         raise self.retry(exc=e)
 
@@ -72,36 +70,19 @@ def generate_image(
 def upscale_image(
     self,
     image_url: str,
-    scale: int = 2,
-    model: str = "fal-ai/aura-sr"
+    scale: int = 2
 ) -> dict:
     """
     Upscale image using Fal.ai.
     """
-    from app.services.fal_plugin import FalPlugin
-    
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            fal_plugin = FalPlugin()
-            
-            result = loop.run_until_complete(
-                fal_plugin.upscale_image(
-                    image_url=image_url,
-                    model=model
-                )
-            )
-            
-            return {
-                "success": True,
-                "upscaled_url": result.get("image_url")
-            }
-            
-        finally:
-            loop.close()
-            
+        data = _execute("upscale_image", {"image_url": image_url, "scale": scale})
+
+        return {
+            "success": True,
+            "upscaled_url": data.get("image_url")
+        }
+
     except Exception as e:
         raise self.retry(exc=e)
 
@@ -120,30 +101,17 @@ def face_swap(
     """
     Swap face in target image with face from reference.
     """
-    from app.services.fal_plugin import FalPlugin
-    
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            fal_plugin = FalPlugin()
-            
-            result = loop.run_until_complete(
-                fal_plugin.face_swap(
-                    target_url=target_image_url,
-                    swap_url=face_image_url
-                )
-            )
-            
-            return {
-                "success": True,
-                "result_url": result.get("image_url")
-            }
-            
-        finally:
-            loop.close()
-            
+        data = _execute("face_swap", {
+            "base_image_url": target_image_url,
+            "swap_image_url": face_image_url,
+        })
+
+        return {
+            "success": True,
+            "result_url": data.get("image_url")
+        }
+
     except Exception as e:
         raise self.retry(exc=e)
 
@@ -160,57 +128,44 @@ def batch_generate(
     session_id: str,
     prompts: List[str],
     aspect_ratio: str = "16:9",
-    model: str = "fal-ai/flux-pro/v1.1-ultra"
+    model: str = "auto"
 ) -> dict:
     """
     Generate multiple images in batch.
     """
-    from app.services.fal_plugin import FalPlugin
-    
     try:
         results = []
         total = len(prompts)
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            fal_plugin = FalPlugin()
-            
-            for i, prompt in enumerate(prompts):
-                self.update_state(
-                    state="GENERATING", 
-                    meta={
-                        "progress": int((i / total) * 100),
-                        "current": i + 1,
-                        "total": total
-                    }
-                )
-                
-                result = loop.run_until_complete(
-                    fal_plugin.generate_image(
-                        prompt=prompt,
-                        aspect_ratio=aspect_ratio,
-                        model=model
-                    )
-                )
-                
-                results.append({
-                    "prompt": prompt,
-                    "image_url": result.get("image_url"),
-                    "success": True
-                })
-            
-            return {
-                "success": True,
-                "images": results,
-                "total": total,
-                "user_id": user_id,
-                "session_id": session_id
-            }
-            
-        finally:
-            loop.close()
-            
+
+        for i, prompt in enumerate(prompts):
+            self.update_state(
+                state="GENERATING",
+                meta={
+                    "progress": int((i / total) * 100),
+                    "current": i + 1,
+                    "total": total
+                }
+            )
+
+            data = _execute("generate_image", {
+                "prompt": prompt,
+                "aspect_ratio": aspect_ratio,
+                "model": model,
+            })
+
+            results.append({
+                "prompt": prompt,
+                "image_url": data.get("image_url"),
+                "success": True
+            })
+
+        return {
+            "success": True,
+            "images": results,
+            "total": total,
+            "user_id": user_id,
+            "session_id": session_id
+        }
+
     except Exception as e:
         raise self.retry(exc=e)
@@ -9,7 +9,8 @@ Celery tasks for:
 """
 from celery import shared_task
 from typing import Optional
-import asyncio
+
+from app.tasks.runtime import run_async
 
 
 @shared_task(
@@ -57,16 +58,19 @@ def send_webhook(
     """
     Send webhook notification to external service.
     """
-    import httpx
+    from app.services.media_io import media_io
     
     try:
-        with httpx.Client(timeout=10) as client:
-            response = client.post(
+        # Worker'ın havuzlu httpx client'ı — her webhook'ta yeni TCP/TLS kurulumu yok
+        response = run_async(
+            media_io.client.post(
                 webhook_url,
                 json=payload,
-                headers=headers or {}
+                headers=headers or {},
+                timeout=10
             )
-            response.raise_for_status()
+        )
+        response.raise_for_status()
         
         return {
             "success": True,
@@ -0,0 +1,99 @@
+"""
+Worker Runtime - Celery worker process'i başına kalıcı event loop ve paylaşılan client'lar.
+
+Task başına new_event_loop + close, loop'a bağlı her şeyi (Redis bağlantısı,
+httpx havuzu, DB bağlantı havuzu, yarım kalan arka plan task'ları) task sonunda
+çöpe atar; her task bağlantı kurulumunu baştan öder. Burada:
+1. worker_process_init ile process başına TEK loop açılır
+2. Redis (cache), DB engine havuzu ve media_io'nun httpx client'ı bu loop'a
+   bağlı olarak bir kez hazırlanır ve task'lar arasında yeniden kullanılır
+3. Task'lar coroutine'lerini run_async ile bu loop üzerinde çalıştırır
+4. worker_process_shutdown'da client'lar kapatılır
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Optional
+
+from celery.signals import worker_process_init, worker_process_shutdown
+
+logger = logging.getLogger(__name__)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Bu process'in loop'u (fork sonrası çocuk process kendi loop'unu açar)."""
+    global _loop, _loop_pid
+    if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+        _loop = asyncio.new_event_loop()
+        _loop_pid = os.getpid()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_async(coro: Awaitable[Any]) -> Any:
+    """Coroutine'i worker loop'unda sonuna kadar çalıştır (senkron Celery task'larından)."""
+    return get_worker_loop().run_until_complete(coro)
+
+
+async def open_shared_clients():
+    """Loop'a bağlı paylaşılan client'ları hazırla (process başına bir kez)."""
+    from app.core.cache import cache
+    from app.core.config import settings
+    from app.core.database import engine
+    from app.services.long_video_store import long_video_store
+    from app.services.media_io import media_io
+    import app.services.daily_rollups  # noqa: F401 — commit'lerdeki rollup deltası hook'ları
+
+    # Worker'da başlayan uzun video işleri web process'lerinin resume'una girmesin
+    long_video_store.runner = "celery"
+
+    # Ana process'ten fork ile gelen havuz bağlantıları bu process'e ait değil
+    await engine.dispose(close=False)
+    if settings.redis_enabled and not cache.is_connected:
+        await cache.connect()
+    media_io.client  # Havuzlu httpx client'ı bu loop'ta oluştur
+
+
+async def close_shared_clients():
+    from app.core.cache import cache
+    from app.core.database import engine
+    from app.services.media_io import media_io
+    from app.services.daily_rollups import daily_rollups
+    from app.services.usage_counters import usage_counters
+
+    # Bekleyen kullanım sayaçları ve günlük özet deltaları DB kapanmadan yazılsın
+    await usage_counters.shutdown()
+    await daily_rollups.shutdown()
+    await media_io.close()
+    if cache.is_connected:
+        await cache.disconnect()
+    await engine.dispose()
+
+
+@worker_process_init.connect
+def bootstrap_worker_process(**kwargs):
+    """Her worker çocuk process'i başlarken loop + client'ları kur."""
+    try:
+        run_async(open_shared_clients())
+        print(f"🧵 Worker process hazır (pid={os.getpid()})")
+    except Exception as e:
+        # Client'lar ilk kullanımda tembel olarak yeniden denenir
+        logger.warning(f"⚠️ Worker bootstrap hatası: {e}")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Client'ları kapat, loop'u serbest bırak."""
+    global _loop
+    if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+        return
+    try:
+        run_async(close_shared_clients())
+    except Exception as e:
+        logger.warning(f"⚠️ Worker kapanış hatası: {e}")
+    finally:
+        _loop.close()
+        _loop = None
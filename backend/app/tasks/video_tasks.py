@@ -2,80 +2,64 @@
 Video Tasks - Long-running video processing jobs.
 
 Celery tasks for:
-- Video generation
+- Video generation / editing (orchestrator payload ile)
 - Video stitching
 - Video transcoding
 - Thumbnail generation
 """
 from celery import shared_task
-from typing import Optional
-import asyncio
 
+from app.tasks.runtime import run_async
 
+
+def _run_media_job(task, kind: str, payload: dict) -> dict:
+    """Orchestrator'ın arka plan çalıştırıcısını worker loop'unda yürüt."""
+    from app.services.media_job_queue import media_job_queue
+
+    task.update_state(state="PROCESSING", meta={"session_id": payload.get("session_id"), "kind": kind})
+    run_async(media_job_queue.run(kind, payload, job_id=task.request.id))
+    return {"success": True, "kind": kind, "session_id": payload.get("session_id")}
+
+
+# Medya işleri ücretli API çağrıları yapar ve hataları kullanıcıya kendisi bildirir;
+# otomatik retry ya da yeniden teslim aynı videoyu ikinci kez üretir (ve faturalar).
+# Bu yüzden mesaj alınır alınmaz ack'lenir (acks_late=False): worker ölürse iş
+# yeniden kuyruğa girmez. Web process'inde başlayan uzun videolar restart sonrası
+# LongVideoService resume'u ile (lease'li) devam eder; worker'da başlayanlar web
+# tarafınca resume edilmez. media_job_queue.run ayrıca job id başına tek
+# çalıştırma garantisi verir.
 @shared_task(
     bind=True,
     name="app.tasks.video_tasks.generate_video",
-    max_retries=3,
+    autoretry_for=(),
+    max_retries=0,
+    acks_late=False,
+    reject_on_worker_lost=False,
     soft_time_limit=1800,  # 30 minutes
     time_limit=2000,
 )
-def generate_video(
-    self,
-    user_id: str,
-    session_id: str,
-    prompt: str,
-    duration: int = 5,
-    aspect_ratio: str = "16:9",
-    model: str = "fal-ai/kling-video/v1.5/pro/text-to-video",
-    reference_image_url: Optional[str] = None
-) -> dict:
+def generate_video(self, payload: dict) -> dict:
     """
-    Generate video using Fal.ai.
+    Kısa video üret (orchestrator._run_video_bg ile aynı payload).
     
     This is a long-running task that should be processed by video workers.
     """
-    from app.services.fal_plugin import FalPlugin
-    
-    try:
-        # Update task state
-        self.update_state(state="GENERATING", meta={"progress": 10, "message": "Video üretimi başladı..."})
-        
-        # Create event loop for async operations
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            fal_plugin = FalPlugin()
-            
-            self.update_state(state="GENERATING", meta={"progress": 30, "message": "Model yükleniyor..."})
-            
-            # Generate video
-            result = loop.run_until_complete(
-                fal_plugin.generate_video(
-                    prompt=prompt,
-                    duration=duration,
-                    aspect_ratio=aspect_ratio,
-                    model=model,
-                    image_url=reference_image_url
-                )
-            )
-            
-            self.update_state(state="GENERATING", meta={"progress": 90, "message": "Video tamamlandı"})
-            
-            return {
-                "success": True,
-                "video_url": result.get("video_url"),
-                "user_id": user_id,
-                "session_id": session_id,
-                "duration": duration
-            }
-            
-        finally:
-            loop.close()
-            
-    except Exception as e:
-        self.update_state(state="FAILED", meta={"error": str(e)})
-        raise self.retry(exc=e)
+    return _run_media_job(self, "video", payload)
+
+
+@shared_task(
+    bind=True,
+    name="app.tasks.video_tasks.edit_video",
+    autoretry_for=(),
+    max_retries=0,
+    acks_late=False,
+    reject_on_worker_lost=False,
+    soft_time_limit=1800,
+    time_limit=2000,
+)
+def edit_video(self, payload: dict) -> dict:
+    """Video düzenle (orchestrator._run_edit_video_bg ile aynı payload)."""
+    return _run_media_job(self, "edit_video", payload)
 
 
 @shared_task(
@@ -155,40 +139,33 @@ def image_to_video(
     image_url: str,
     prompt: str = "",
     duration: int = 5,
-    motion_amount: int = 127
+    model: str = "kling"
 ) -> dict:
     """
     Convert image to video using Fal.ai image-to-video models.
     """
-    from app.services.fal_plugin import FalPlugin
+    from app.services.plugins.fal_plugin_v2 import fal_plugin_v2
     
     try:
         self.update_state(state="GENERATING", meta={"progress": 10, "message": "Görsel videoya dönüştürülüyor..."})
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        result = run_async(
+            fal_plugin_v2.execute("generate_video", {
+                "prompt": prompt,
+                "duration": str(duration),
+                "image_url": image_url,
+                "model": model,
+            })
+        )
+        if not result.success:
+            raise RuntimeError(result.error or "Video üretilemedi")
         
-        try:
-            fal_plugin = FalPlugin()
-            
-            result = loop.run_until_complete(
-                fal_plugin.generate_video(
-                    prompt=prompt,
-                    duration=duration,
-                    image_url=image_url,
-                    model="fal-ai/kling-video/v1.5/pro/image-to-video"
-                )
-            )
-            
-            return {
-                "success": True,
-                "video_url": result.get("video_url"),
-                "user_id": user_id,
-                "session_id": session_id
-            }
-            
-        finally:
-            loop.close()
+        return {
+            "success": True,
+            "video_url": result.data.get("video_url"),
+            "user_id": user_id,
+            "session_id": session_id
+        }
             
     except Exception as e:
         self.update_state(state="FAILED", meta={"error": str(e)})
@@ -198,48 +175,18 @@ def image_to_video(
 @shared_task(
     bind=True,
     name="app.tasks.video_tasks.generate_long_video",
-    max_retries=2,
+    autoretry_for=(),
+    max_retries=0,
+    acks_late=False,
+    reject_on_worker_lost=False,
     soft_time_limit=7200,  # 2 saat (uzun videolar için)
     time_limit=7500,
 )
-def generate_long_video(self, job_id: str) -> dict:
+def generate_long_video(self, payload: dict) -> dict:
     """
     Uzun video üret (3+ dakika).
     
-    LongVideoService'i kullanarak segment-based generation yapar.
+    orchestrator._run_long_video_bg ile aynı payload; LongVideoService segment-based
+    generation yapar, sonuç asset + mesaj olarak kaydedilip WS ile bildirilir.
     """
-    from app.services.long_video_service import long_video_service
-    
-    try:
-        self.update_state(state="PROCESSING", meta={"progress": 5, "message": "Uzun video işleniyor..."})
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(
-                long_video_service.process_job(job_id)
-            )
-            
-            if result.get("success"):
-                # Bildirim gönder
-                from app.tasks.notification_tasks import notify_generation_complete
-                job = long_video_service.jobs.get(job_id)
-                if job:
-                    notify_generation_complete.delay(
-                        user_id=job.user_id,
-                        session_id=job.session_id,
-                        asset_type="long_video",
-                        asset_url=result.get("video_url"),
-                        prompt=f"Long video ({job.total_duration}s)"
-                    )
-            
-            return result
-            
-        finally:
-            loop.close()
-            
-    except Exception as e:
-        self.update_state(state="FAILED", meta={"error": str(e)})
-        raise self.retry(exc=e)
-
+    return _run_media_job(self, "long_video", payload)
@@ -0,0 +1,137 @@
+"""
+Admin dashboard okuma maliyeti: eski tam tablo count()'ları vs. günlük özet tablosu.
+
+Postgres gerektirmemek için aynı şema ve sorgu şekilleri stdlib sqlite3 üzerinde
+çalıştırılır. Karşılaştırılanlar (artan generated_assets boyutu, 90 günlük geçmiş):
+- legacy  : overview için 6 ayrı count() + model_name GROUP BY + ham adların Python'da
+            normalize edilmesi (eski get_overview_stats + get_model_distribution)
+- rollups : daily_rollups üzerinde metrik/anahtar başına SUM — tek sorgu, O(gün) satır
+
+Kullanım (backend dizininden):
+    python -m benchmarks.admin_rollups
+    python -m benchmarks.admin_rollups --sizes 10000 100000 1000000 --repeat 5
+"""
+import argparse
+import random
+import sqlite3
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+
+from app.services.model_names import canonical_model_name
+
+SCHEMA = """
+CREATE TABLE sessions (id TEXT PRIMARY KEY, created_at TEXT);
+CREATE TABLE messages (id TEXT PRIMARY KEY, created_at TEXT);
+CREATE TABLE ai_models (id INTEGER PRIMARY KEY, is_enabled INTEGER);
+CREATE TABLE generated_assets (
+    id TEXT PRIMARY KEY, asset_type TEXT, model_name TEXT, model_canonical TEXT, created_at TEXT
+);
+CREATE TABLE daily_rollups (day TEXT, metric TEXT, key TEXT, value INTEGER, PRIMARY KEY (day, metric, key));
+"""
+
+RAW_MODELS = [
+    "nano-banana-pro", "nano_banana_2", "flux-dev", "flux_kontext_pro", "gpt_image", "kling-3.0-pro",
+    "veo_fast", "fal-ai/kling-video/v3/pro", "seedance", "face_swap", "user_upload", "topaz", "grok_imagine",
+]
+DAYS = 90
+
+
+def seed(conn: sqlite3.Connection, assets: int, rng: random.Random):
+    start = date(2026, 1, 1)
+    days = [(start + timedelta(days=rng.randrange(DAYS))).isoformat() for _ in range(assets)]
+    rows = []
+    for day in days:
+        raw = rng.choice(RAW_MODELS)
+        asset_type = "video" if "kling" in raw or "veo" in raw or "seedance" in raw else "image"
+        rows.append((uuid.uuid4().hex, asset_type, raw, canonical_model_name(raw), day))
+    conn.executemany("INSERT INTO generated_assets VALUES (?, ?, ?, ?, ?)", rows)
+    conn.executemany("INSERT INTO sessions VALUES (?, ?)", [(uuid.uuid4().hex, d) for d in days[: assets // 20]])
+    conn.executemany("INSERT INTO messages VALUES (?, ?)", [(uuid.uuid4().hex, d) for d in days])
+    conn.executemany("INSERT INTO ai_models VALUES (?, ?)", [(i, i % 3 != 0) for i in range(40)])
+
+    # Yazma anı + zamanlanmış yenilemenin ürettiği özet satırları
+    rollup = Counter()
+    for _, asset_type, _, canonical, day in rows:
+        rollup[(day, "assets", asset_type)] += 1
+        if canonical:
+            rollup[(day, "models", canonical)] += 1
+    for table, metric in (("sessions", "sessions"), ("messages", "messages")):
+        for day, count in conn.execute(f"SELECT created_at, count(*) FROM {table} GROUP BY created_at"):
+            rollup[(day, metric, "")] += count
+    conn.executemany("INSERT INTO daily_rollups VALUES (?, ?, ?, ?)", [(*k, v) for k, v in rollup.items()])
+    conn.commit()
+
+
+def legacy(conn):
+    overview = [
+        conn.execute(sql).fetchone()[0] for sql in (
+            "SELECT count(id) FROM sessions",
+            "SELECT count(id) FROM generated_assets",
+            "SELECT count(id) FROM messages",
+            "SELECT count(id) FROM ai_models WHERE is_enabled = 1",
+            "SELECT count(id) FROM generated_assets WHERE asset_type = 'image'",
+            "SELECT count(id) FROM generated_assets WHERE asset_type = 'video'",
+        )
+    ]
+    distribution = Counter()
+    for raw, count in conn.execute(
+        "SELECT model_name, count(id) FROM generated_assets WHERE model_name IS NOT NULL GROUP BY model_name"
+    ):
+        canonical = canonical_model_name.__wrapped__(raw)   # Her istekte yeniden normalize
+        if canonical:
+            distribution[canonical] += count
+    return overview, dict(distribution)
+
+
+def rollups(conn):
+    counts = {
+        (metric, key): value for metric, key, value in conn.execute(
+            "SELECT metric, key, sum(value) FROM daily_rollups "
+            "WHERE metric IN ('sessions', 'messages', 'assets') GROUP BY metric, key "
+            "UNION ALL SELECT 'active_models', '', count(id) FROM ai_models WHERE is_enabled = 1"
+        )
+    }
+    overview = [
+        counts.get(("sessions", ""), 0),
+        sum(v for (m, _), v in counts.items() if m == "assets"),
+        counts.get(("messages", ""), 0),
+        counts.get(("active_models", ""), 0),
+        counts.get(("assets", "image"), 0),
+        counts.get(("assets", "video"), 0),
+    ]
+    distribution = dict(conn.execute("SELECT key, sum(value) FROM daily_rollups WHERE metric = 'models' GROUP BY key"))
+    return overview, distribution
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    print(f"📦 {DAYS} günlük geçmiş, {args.repeat} tekrar")
+    print(f"  {'assets':>9} {'legacy ms':>10} {'rollups ms':>11} {'rollup satırı':>14}")
+    for size in args.sizes:
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(SCHEMA)
+        seed(conn, size, rng)
+        assert legacy(conn) == rollups(conn)
+        slow = timed(lambda: legacy(conn), args.repeat)
+        fast = timed(lambda: rollups(conn), args.repeat)
+        rows = conn.execute("SELECT count(*) FROM daily_rollups").fetchone()[0]
+        print(f"  {size:>9} {slow:>10.2f} {fast:>11.3f} {rows:>14}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Entity isim eşleştirme maliyeti: eski entity başına regex döngüsü vs. derlenmiş trie-regex.
+
+Karşılaştırılanlar (aynı mesaj, artan entity sayısı; DB turları hariç, yalnızca CPU):
+- legacy  : her entity için `name in text` + escape + re.search (eski resolve_by_name)
+- matcher : kullanıcı başına bir kez derlenmiş EntityNameMatcher.match
+- compile : isim listesi değiştiğinde matcher'ı yeniden derleme (invalidation sonrası tek sefer)
+
+Kullanım (backend dizininden):
+    python -m benchmarks.entity_resolution
+    python -m benchmarks.entity_resolution --sizes 10 100 1000 --repeat 500
+"""
+import argparse
+import random
+import re
+import time
+
+from app.services.entity_matcher import EntityNameMatcher
+
+SYLLABLES = ["ka", "ra", "me", "ti", "so", "lu", "nur", "dag", "ay", "el", "fe", "zo", "ber", "can", "ye"]
+
+MESSAGE = (
+    "Emreyi gün batımında ormanda yürürken çiz, yanında Ayşe'nin köpeği olsun. "
+    "Arka planda Nike tabelası ve İstanbul silueti, sinematik ışık, 35mm."
+)
+
+
+def make_names(count: int, rng: random.Random) -> list:
+    names = {"Emre", "Orman", "Nike", "Ayşe", "İstanbul"}
+    while len(names) < count:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title())
+    return [(str(i), name) for i, name in enumerate(sorted(names))]
+
+
+def legacy_match(entries, text):
+    text_lower = text.lower()
+    found = []
+    for entity_id, name in entries:
+        name_lower = name.lower()
+        if len(name_lower) >= 2 and name_lower in text_lower:
+            pattern = r'(?<!\w)' + re.escape(name_lower) + r'(?!\w)'
+            if re.search(pattern, text_lower):
+                found.append(entity_id)
+    return found
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"📦 Mesaj: {len(MESSAGE)} karakter, {args.repeat} tekrar")
+    print(f"  {'entity':>7} {'legacy µs':>10} {'matcher µs':>11} {'compile ms':>11}")
+    for size in args.sizes:
+        entries = make_names(size, rng)
+        matcher = EntityNameMatcher(entries)
+        legacy = timed(lambda: legacy_match(entries, MESSAGE), args.repeat)
+        fast = timed(lambda: matcher.match(MESSAGE), args.repeat)
+        compile_ms = timed(lambda: EntityNameMatcher(entries), max(1, args.repeat // 30)) / 1000
+        print(f"  {size:>7} {legacy:>10.1f} {fast:>11.1f} {compile_ms:>11.2f}")
+        # Ekli yazımlar ("Emreyi", "ormanda") yalnızca yeni matcher'da bulunur
+        assert set(legacy_match(entries, MESSAGE)) <= set(matcher.match(MESSAGE))
+
+
+if __name__ == "__main__":
+    main()
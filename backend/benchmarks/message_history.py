@@ -0,0 +1,130 @@
+"""
+Mesaj geçmişi okuma maliyeti: eski tam tarama vs. keyset/DESC LIMIT.
+
+Postgres gerektirmemek için aynı şema ve sorgu şekilleri stdlib sqlite3 üzerinde
+çalıştırılır; (session_id, created_at, id) indeksi ve metadata JSON'u dahil.
+Karşılaştırılanlar (session başına --messages mesaj):
+- legacy-context : tüm mesajlar ASC + metadata parse + Python'da hata kalıbı + son 20
+- context        : is_error = 0 ... ORDER BY created_at DESC, id DESC LIMIT 20
+- offset-page    : derin sayfa, ORDER BY ... LIMIT 100 OFFSET n (eski tarz sayfalama)
+- keyset-page    : aynı sayfa, (created_at, id) < cursor LIMIT 100
+
+Kullanım (backend dizininden):
+    python -m benchmarks.message_history
+    python -m benchmarks.message_history --messages 10000 --sessions 5
+"""
+import argparse
+import json
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+from app.services.message_history import is_error_message
+
+SCHEMA = """
+CREATE TABLE messages (
+    id TEXT PRIMARY KEY, session_id TEXT, role TEXT, content TEXT,
+    metadata TEXT, is_error INTEGER NOT NULL DEFAULT 0, created_at TEXT
+);
+CREATE INDEX ix_messages_session_created_id ON messages (session_id, created_at, id);
+"""
+
+ERROR_PATTERNS = ("kredi", "credit", "yetersiz", "insufficient", "hata", "error", "başarısız", "failed")
+
+
+def seed(conn: sqlite3.Connection, sessions: int, messages: int) -> list:
+    base = datetime(2026, 1, 1, tzinfo=UTC)
+    session_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    for sid in session_ids:
+        rows = []
+        for i in range(messages):
+            role = "user" if i % 2 == 0 else "assistant"
+            content = f"Sahne {i}: sinematik ışık, 35mm, karakter @emre yürüyor " * 4
+            if role == "assistant" and i % 37 == 1:
+                content = "Görsel üretilemedi: kredi yetersiz"
+            meta = {"images": [{"url": f"https://cdn.example/{sid}/{i}.png", "prompt": content}] * 3} if role == "assistant" else {}
+            rows.append((
+                str(uuid.uuid4()), sid, role, content, json.dumps(meta),
+                int(is_error_message(role, content)), (base + timedelta(seconds=i)).isoformat(),
+            ))
+        conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    return session_ids
+
+
+def legacy_context(conn, sid):
+    history = []
+    for role, content, metadata in conn.execute(
+        "SELECT role, content, metadata FROM messages WHERE session_id = ? ORDER BY created_at ASC", (sid,)
+    ):
+        meta = json.loads(metadata)   # asyncpg JSONB'yi de her satırda decode eder
+        if role == "assistant" and any(p in content.lower() for p in ERROR_PATTERNS):
+            continue
+        history.append((role, content, meta))
+    return history[-20:]
+
+
+def context(conn, sid):
+    rows = conn.execute(
+        "SELECT role, content, metadata FROM messages WHERE session_id = ? AND is_error = 0 "
+        "ORDER BY created_at DESC, id DESC LIMIT 20", (sid,)
+    ).fetchall()
+    return [(role, content, json.loads(metadata)) for role, content, metadata in reversed(rows)]
+
+
+def offset_page(conn, sid, offset):
+    return conn.execute(
+        "SELECT id, content, metadata FROM messages WHERE session_id = ? "
+        "ORDER BY created_at DESC, id DESC LIMIT 100 OFFSET ?", (sid, offset)
+    ).fetchall()
+
+
+def keyset_page(conn, sid, cursor):
+    return conn.execute(
+        "SELECT id, content, metadata FROM messages WHERE session_id = ? AND (created_at, id) < (?, ?) "
+        "ORDER BY created_at DESC, id DESC LIMIT 100", (sid, *cursor)
+    ).fetchall()
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=10000, help="Session başına mesaj")
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    session_ids = seed(conn, args.sessions, args.messages)
+    sid = session_ids[len(session_ids) // 2]
+    print(f"📦 {args.sessions} session × {args.messages} mesaj")
+
+    assert [r[:2] for r in legacy_context(conn, sid)] == [r[:2] for r in context(conn, sid)]
+    legacy = timed(lambda: legacy_context(conn, sid), args.repeat)
+    fast = timed(lambda: context(conn, sid), args.repeat)
+    print(f"  {'legacy-context':<15} {legacy:9.2f} ms/tur")
+    print(f"  {'context':<15} {fast:9.3f} ms/tur  ({legacy / fast:.0f}x)")
+
+    # Geçmişin ortasındaki bir sayfa — OFFSET atlanan satırları yine okur
+    offset = args.messages // 2
+    anchor = conn.execute(
+        "SELECT created_at, id FROM messages WHERE session_id = ? ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?",
+        (sid, offset - 1),
+    ).fetchone()
+    assert offset_page(conn, sid, offset) == keyset_page(conn, sid, anchor)
+    deep_offset = timed(lambda: offset_page(conn, sid, offset), args.repeat)
+    deep_keyset = timed(lambda: keyset_page(conn, sid, anchor), args.repeat)
+    print(f"  {'offset-page':<15} {deep_offset:9.3f} ms/sayfa (offset {offset})")
+    print(f"  {'keyset-page':<15} {deep_keyset:9.3f} ms/sayfa ({deep_offset / deep_keyset:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
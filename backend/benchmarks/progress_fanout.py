@@ -0,0 +1,158 @@
+"""
+ProgressService fan-out benchmark'ı.
+
+Worker A (soketsiz, arka plan işini çalıştıran) yayın yapar; Worker B'ye bağlı
+1000 WebSocket bu olayları pub/sub üzerinden alır. Teslim edilen mesaj/saniye
+ve yayın → soket gecikmesi (p50/p95/p99) ölçülür.
+
+Kullanım (backend dizininden):
+    python -m benchmarks.progress_fanout                    # bellek içi broker
+    REDIS_URL=redis://localhost:6379 python -m benchmarks.progress_fanout
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from app.core import cache as cache_module
+from app.services.progress_service import ProgressService
+
+
+class MemoryBroker:
+    """Redis yoksa: aynı process içinde PUBLISH/SUBSCRIBE taklidi."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    async def publish(self, channel, message):
+        for pubsub in self.subscribers:
+            if channel in pubsub.channels:
+                pubsub.inbox.put_nowait({"type": "message", "channel": channel, "data": message})
+        return 1
+
+    def pubsub(self, ignore_subscribe_messages=True):
+        pubsub = MemoryPubSub()
+        self.subscribers.append(pubsub)
+        return pubsub
+
+    async def set(self, *args, **kwargs):
+        return True
+
+    async def delete(self, *args, **kwargs):
+        return 1
+
+
+class MemoryPubSub:
+    def __init__(self):
+        self.channels = set()
+        self.inbox = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=1.0):
+        try:
+            return await asyncio.wait_for(self.inbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        pass
+
+
+class BenchSocket:
+    def __init__(self, latencies: list, delay: float = 0.0):
+        self.latencies = latencies
+        self.delay = delay
+
+    async def send_json(self, payload):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        sent_at = payload.get("details", {}).get("sent_at")
+        if sent_at is not None:
+            self.latencies.append(time.perf_counter() - sent_at)
+
+    async def close(self, code=1000):
+        pass
+
+
+def _worker() -> ProgressService:
+    service = object.__new__(ProgressService)
+    service._connections = {}
+    service._latest_payloads = {}
+    service._init_fanout()
+    return service
+
+
+async def _connect_backend():
+    url = os.getenv("REDIS_URL")
+    if url:
+        import redis.asyncio as redis
+        client = redis.from_url(url, encoding="utf-8", decode_responses=True)
+        await client.ping()
+        return client, f"redis ({url})"
+    return MemoryBroker(), "bellek içi broker"
+
+
+async def run(sockets: int, sessions: int, rounds: int, slow_ratio: float):
+    backend, label = await _connect_backend()
+    cache_module.cache._client = backend
+    publisher, receiver = _worker(), _worker()
+    await publisher.start()
+    await receiver.start()
+
+    latencies: list = []
+    session_ids = [f"bench-{i}" for i in range(sessions)]
+    slow_every = int(1 / slow_ratio) if slow_ratio else 0
+    for i in range(sockets):
+        delay = 0.02 if slow_every and i % slow_every == 0 else 0.0
+        receiver.register(session_ids[i % sessions], BenchSocket(latencies, delay))
+    await asyncio.sleep(0.2)  # abonelikler
+
+    started = time.perf_counter()
+    for step in range(rounds):
+        await asyncio.gather(*(
+            publisher.send_progress(sid, "long_video", step / rounds, f"adım {step}",
+                                    details={"sent_at": time.perf_counter()})
+            for sid in session_ids
+        ))
+    expected = sockets * rounds
+    deadline = time.perf_counter() + 10
+    while receiver.get_stats()["delivered"] + receiver.get_stats()["coalesced"] < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    stats = receiver.get_stats()
+    latencies.sort()
+    quantile = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"Backend            : {label}")
+    print(f"Soket / oturum     : {sockets} / {sessions} (yavaş soket oranı {slow_ratio:.0%})")
+    print(f"Yayınlanan olay    : {sessions * rounds}")
+    print(f"Teslim edilen      : {stats['delivered']} ({stats['delivered'] / elapsed:,.0f} mesaj/s)")
+    print(f"Birleştirilen/atılan: {stats['coalesced']} / {stats['dropped']}")
+    if latencies:
+        print(f"Gecikme ms         : p50={quantile(0.5):.2f} p95={quantile(0.95):.2f} "
+              f"p99={quantile(0.99):.2f} ort={statistics.fmean(latencies) * 1000:.2f}")
+
+    await publisher.stop()
+    await receiver.stop()
+    if hasattr(backend, "aclose"):
+        await backend.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--sessions", type=int, default=250)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--slow-ratio", type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(run(args.sockets, args.sessions, args.rounds, args.slow_ratio))
+
+
+if __name__ == "__main__":
+    main()
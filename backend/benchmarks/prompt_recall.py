@@ -0,0 +1,103 @@
+"""
+Başarılı prompt hatırlama benchmark'ı (kullanıcı başına N prompt).
+
+Üç yöntemin sorgu gecikmesi karşılaştırılır:
+- serial : eski find_similar_prompts — her turda her prompt için tokenize + kısıt regex'leri
+- tokens : PromptIndex ters indeksi (önceden hesaplanmış token/kısıt izi)
+- hashed : PromptIndex trigram vektör modu (PROMPT_RECALL_MODE=hashed)
+
+Kullanım (backend dizininden):
+    python -m benchmarks.prompt_recall
+    python -m benchmarks.prompt_recall --prompts 10000 --queries 200
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.services.memory_hygiene import (
+    has_conflicting_request_constraints,
+    sanitize_memory_text,
+    tokenize_memory_text,
+)
+from app.services.prompt_index import PromptIndex, prompt_fingerprint
+
+SUBJECTS = ["kedi", "kopek", "kadin", "adam", "araba", "parfum sisesi", "ayakkabi", "kahve fincani", "robot", "at"]
+SCENES = ["plajda", "neon sehirde", "ormanda", "studyoda", "cati katinda", "yagmurlu sokakta", "cölde", "mutfakta"]
+STYLES = ["sinematik", "minimalist", "retro", "fotogercekci", "anime", "yagli boya", "moda cekimi", "urun fotografi"]
+LIGHTS = ["altin saat isigi", "yumusak isik", "sert golgeler", "mavi saat", "neon isiklar", "dogal gun isigi"]
+EXTRAS = ["", "", "", "5 saniyelik ", "10 saniyelik ", "4 gorsel ", "kling ile ", "veo ile "]
+
+
+def make_prompt(rng: random.Random) -> str:
+    return (
+        f"{rng.choice(EXTRAS)}{rng.choice(STYLES)} {rng.choice(SUBJECTS)} {rng.choice(SCENES)}, "
+        f"{rng.choice(LIGHTS)}, {rng.choice(STYLES)} kompozisyon"
+    )
+
+
+def serial_scan(prompts, query, limit=3):
+    query_words = tokenize_memory_text(query)
+    if not query_words:
+        return []
+    scored = []
+    for p in prompts:
+        raw_prompt = p.get("prompt", "")
+        if has_conflicting_request_constraints(query, raw_prompt):
+            continue
+        memory_prompt = p.get("memory_prompt") or sanitize_memory_text(raw_prompt)
+        if not memory_prompt:
+            continue
+        overlap = len(query_words & tokenize_memory_text(memory_prompt))
+        if overlap > 0:
+            scored.append((overlap, p.get("score", 0), p))
+    scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
+    return [item[2] for item in scored[:limit]]
+
+
+def measure(label, fn, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"  {label:<8} p50={statistics.median(latencies):8.2f} ms   p99={p99:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--serial-queries", type=int, default=10, help="Eski tarama yavaş; daha az sorgu")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    records = []
+    started = time.perf_counter()
+    for _ in range(args.prompts):
+        prompt = make_prompt(rng)
+        records.append({"prompt": prompt, **prompt_fingerprint(prompt), "score": rng.randint(1, 5)})
+    fingerprint_ms = (time.perf_counter() - started) * 1000
+    legacy_records = [{"prompt": r["prompt"], "score": r["score"]} for r in records]
+    queries = [make_prompt(rng) for _ in range(args.queries)]
+
+    indexes = {}
+    print(f"📦 {args.prompts} prompt / kullanıcı  (kayıt anı parmak izi: {fingerprint_ms / args.prompts * 1000:.1f} µs/prompt)")
+    for mode in ("tokens", "hashed"):
+        started = time.perf_counter()
+        index = PromptIndex(max_entries=args.prompts, mode=mode)
+        for record in records:
+            index.add(record)
+        indexes[mode] = index
+        print(f"  indeks[{mode}] kurulum: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    print(f"🔎 Sorgu gecikmesi (limit=3)")
+    measure("serial", lambda q: serial_scan(legacy_records, q), queries[:args.serial_queries])
+    measure("tokens", lambda q: indexes["tokens"].search(q), queries)
+    measure("hashed", lambda q: indexes["hashed"].search(q), queries)
+
+
+if __name__ == "__main__":
+    main()
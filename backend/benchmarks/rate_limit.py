@@ -0,0 +1,124 @@
+"""
+Rate limit middleware'inin istek başına ek maliyeti.
+
+Karşılaştırılanlar (aynı sahte ASGI uygulaması önünde):
+- none    : middleware yok (taban çizgisi)
+- legacy  : eski BaseHTTPMiddleware + IP başına liste (her istekte liste yeniden kurulur)
+- local   : yeni saf ASGI middleware, Redis yok (process içi GCRA)
+- redis   : yeni middleware, Redis GCRA script'i (simüle gidiş-dönüş gecikmesiyle), yerel kira açık
+- no-lease: aynısı, kira kapalı (her istek bir Redis turu)
+
+Kullanım (backend dizininden):
+    python -m benchmarks.rate_limit
+    python -m benchmarks.rate_limit --requests 20000 --rtt-ms 0.5
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from app.core import cache as cache_module
+from app.core.rate_limit import RateLimiter, RateLimitMiddleware, gcra_take
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """Eski uygulama: defaultdict(list), her istekte pencere dışını filtreleyip listeyi yeniden kurar."""
+
+    def __init__(self, app, limit: int, window: int = 60):
+        super().__init__(app)
+        self.limit, self.window = limit, window
+        self._requests = defaultdict(list)
+
+    async def dispatch(self, request, call_next):
+        ip = request.client.host if request.client else "unknown"
+        now = time.time()
+        key = f"{ip}:general"
+        self._requests[key] = [t for t in self._requests[key] if t > now - self.window]
+        if len(self._requests[key]) >= self.limit:
+            return JSONResponse(status_code=429, content={"detail": "limit"})
+        self._requests[key].append(now)
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(self.limit)
+        return response
+
+
+class SimulatedRedis:
+    """GCRA script'ini Python karşılığıyla çalıştırır; her çağrı bir ağ turu kadar bekler."""
+
+    def __init__(self, rtt_ms: float):
+        self.rtt = rtt_ms / 1000.0
+        self.data = {}
+        self.calls = 0
+
+    def register_script(self, source):
+        async def script(keys, args):
+            self.calls += 1
+            await asyncio.sleep(self.rtt)
+            period, limit, requested, min_grant = args
+            grant, remaining, retry_after, new_tat = gcra_take(
+                self.data.get(keys[0], 0.0), time.time() * 1000.0, period, limit, requested, min_grant,
+            )
+            if grant:
+                self.data[keys[0]] = new_tat
+            return [grant, remaining, retry_after]
+        return script
+
+
+async def drive(asgi, requests: int, users: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/v1/sessions", "raw_path": b"/api/v1/sessions",
+            "query_string": b"", "root_path": "", "server": ("test", 80),
+            "client": (f"10.0.{(i % users) // 256}.{(i % users) % 256}", 1234), "headers": [],
+        }
+        await asgi(scope, receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=50, help="Farklı istemci sayısı")
+    parser.add_argument("--limit", type=int, default=600, help="Dakika başına istek (reddi ölçmeye karışmasın)")
+    parser.add_argument("--rtt-ms", type=float, default=0.3, help="Simüle Redis gidiş-dönüş süresi")
+    args = parser.parse_args()
+
+    print(f"📦 {args.requests} istek, {args.users} istemci, limit {args.limit}/dk, Redis RTT {args.rtt_ms} ms")
+    base = await drive(app, args.requests, args.users)
+    print(f"  {'none':<9} {base:8.1f} µs/istek")
+
+    legacy = await drive(LegacyRateLimitMiddleware(app, args.limit), args.requests, args.users)
+    print(f"  {'legacy':<9} {legacy:8.1f} µs/istek  (+{legacy - base:.1f})")
+
+    cache_module.cache._client = None
+    local = await drive(RateLimitMiddleware(app, general_limit=args.limit, limiter=RateLimiter()), args.requests, args.users)
+    print(f"  {'local':<9} {local:8.1f} µs/istek  (+{local - base:.1f})")
+
+    for label, divisor in (("redis", RateLimiter.LEASE_DIVISOR), ("no-lease", args.limit + 1)):
+        redis = SimulatedRedis(args.rtt_ms)
+        cache_module.cache._client = redis
+        limiter = RateLimiter()
+        limiter.LEASE_DIVISOR = divisor
+        took = await drive(RateLimitMiddleware(app, general_limit=args.limit, limiter=limiter), args.requests, args.users)
+        print(f"  {label:<9} {took:8.1f} µs/istek  (+{took - base:.1f})  Redis turu/istek: {redis.calls / args.requests:.2f}")
+    cache_module.cache._client = None
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
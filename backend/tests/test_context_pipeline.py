@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.agent import context_pipeline
+from app.services.agent.context_pipeline import ContextCache, assemble_sections, context_db_session
+
+
+@pytest.mark.asyncio
+async def test_assemble_sections_runs_concurrently_and_keeps_order():
+    async def slow(text: str):
+        await asyncio.sleep(0.1)
+        return text
+
+    async def broken():
+        raise RuntimeError("redis down")
+
+    started = time.perf_counter()
+    assembly = await assemble_sections([
+        ("user", lambda: slow("A")),
+        ("project", lambda: slow("B")),
+        ("memory", broken),
+        ("presets", lambda: slow("C")),
+    ])
+    elapsed = time.perf_counter() - started
+
+    assert assembly.text == "ABC"
+    assert elapsed < 0.25
+    assert set(assembly.timings_ms) == {"user", "project", "memory", "presets"}
+    assert assembly.errors == {"memory": "redis down"}
+
+
+@pytest.mark.asyncio
+async def test_context_cache_serves_hits_until_invalidated():
+    context_cache = ContextCache()
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return [{"tag": "@emre", "name": "Emre"}]
+
+    key = context_cache.entities_key("user-1")
+    first = await context_cache.get_or_load(key, load)
+    second = await context_cache.get_or_load(key, load)
+    assert first == second
+    assert len(loads) == 1
+
+    await context_cache.invalidate_entities("user-1")
+    await context_cache.get_or_load(key, load)
+    assert len(loads) == 2
+    assert context_cache.get_stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_db_slots_limit_each_turn_not_the_whole_process(monkeypatch):
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(context_pipeline, "async_session_maker", FakeSession)
+    active = peak = 0
+
+    async def section():
+        nonlocal active, peak
+        async with context_db_session():
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+        return ""
+
+    turn = [(f"s{i}", section) for i in range(8)]
+    await asyncio.gather(assemble_sections(turn), assemble_sections(turn), assemble_sections(turn))
+
+    limit = context_pipeline.CONTEXT_DB_CONCURRENCY
+    assert limit < peak <= 3 * limit      # Turlar birbirinin slotunu beklemez
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import os
+import uuid
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from app.core import cache as cache_module
+from app.services.conversation_memory_service import ConversationMemoryService
+
+
+class FakeRedis:
+    """Liste/hash komutlarının küçük bellek içi karşılığı; pipeline execute() atomiktir."""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+        self.commands = []
+        self.fail_scripts = False
+
+    # --- komutlar (senkron uygulanır) ---
+    def _get(self, key):
+        return self.data.get(key)
+
+    def _getdel(self, key):
+        return self.data.pop(key, None)
+
+    def _rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+
+    def _lpush(self, key, *values):
+        lst = self.data.setdefault(key, [])
+        for value in values:
+            lst.insert(0, value)
+
+    def _lrange(self, key, start, end):
+        lst = self.data.get(key, [])
+        start = max(0, len(lst) + start) if start < 0 else start
+        end = len(lst) + end if end < 0 else end
+        return list(lst[start:end + 1])
+
+    def _ltrim(self, key, start, end):
+        self.data[key] = self._lrange(key, start, end)
+
+    def _lrem(self, key, count, value):
+        self.data[key] = [v for v in self.data.get(key, []) if v != value]
+
+    def _hset(self, key, field=None, value=None, mapping=None):
+        self.data.setdefault(key, {}).update(mapping or {field: value})
+
+    def _lpop(self, key):
+        lst = self.data.get(key, [])
+        return lst.pop(0) if lst else None
+
+    def _hsetnx(self, key, field, value):
+        self.data.setdefault(key, {}).setdefault(field, value)
+
+    def _hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def _incrby(self, key, amount):
+        self.data[key] = str(int(self.data.get(key, 0)) + amount)
+        return int(self.data[key])
+
+    def _incr(self, key):
+        return self._incrby(key, 1)
+
+    def _expire(self, key, ttl):
+        return key in self.data
+
+    def _delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def _migrate_legacy(self, keys, args):
+        """MIGRATE_LEGACY_SCRIPT'in Python karşılığı (script atomik çalışır)."""
+        if self.data.get(keys[0]) != args[0]:
+            return 0
+        i = 2
+        for list_index in (1, 2, 3):
+            n = int(args[i])
+            items = args[i + 1:i + 1 + n]
+            i += 1 + n
+            self._lpush(keys[list_index], *reversed(items))
+            if list_index == 2 and n:
+                self._incrby(keys[6], n)
+        for hash_index in (4, 5):
+            n = int(args[i])
+            i += 1
+            for j in range(n):
+                self._hsetnx(keys[hash_index], args[i + 2 * j], args[i + 2 * j + 1])
+            i += 2 * n
+        self.data.pop(keys[0])
+        return 1
+
+    def register_script(self, source):
+        async def script(keys, args):
+            self.round_trips += 1
+            await asyncio.sleep(0)
+            if self.fail_scripts:
+                raise ConnectionError("redis down")
+            return self._migrate_legacy(keys, args)
+        return script
+
+    def __getattr__(self, name):
+        impl = object.__getattribute__(self, f"_{name}")
+
+        async def call(*args, **kwargs):
+            self.round_trips += 1
+            await asyncio.sleep(0)
+            return impl(*args, **kwargs)
+        return call
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        impl = getattr(self.redis, f"_{name}")
+        return lambda *args, **kwargs: self.queued.append((name, impl, args, kwargs))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        await asyncio.sleep(0)
+        self.redis.commands.extend((name, args[0]) for name, _, args, _ in self.queued)
+        return [impl(*args, **kwargs) for _, impl, args, kwargs in self.queued]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(cache_module.cache, "_client", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_are_not_lost_and_lists_are_trimmed(redis):
+    service = ConversationMemoryService()
+    service.MAX_PROMPTS = 50
+    user_id = uuid.uuid4()
+
+    await asyncio.gather(
+        *[service.save_successful_prompt(user_id, f"sinematik kedi {i}", f"https://cdn/{i}.png", 1) for i in range(60)],
+        service.update_style_preference(user_id, "active_style", "cinematic"),
+        service.save_core_memory(user_id, "workflow", "Once plani yaz, sonra uretime gec"),
+    )
+
+    # Yazmalar hiç okuma yapmaz (eski blob modelinde her yazma GET + SET idi)
+    assert {name for name, _ in redis.commands} == {"rpush", "ltrim", "incr", "hset", "expire"}
+
+    memory = await service.get_user_memory(user_id)
+    assert [p["prompt"] for p in memory["successful_prompts"]] == [f"sinematik kedi {i}" for i in range(10, 60)]
+    assert memory["style_preferences"] == {"active_style": "cinematic"}
+    assert [m["fact"] for m in memory["core_memories"]] == ["Once plani yaz, sonra uretime gec"]
+
+
+@pytest.mark.asyncio
+async def test_memory_context_reads_only_needed_slices_in_one_round_trip(redis):
+    service = ConversationMemoryService()
+    user_id = uuid.uuid4()
+    for i in range(8):
+        await service.save_conversation_summary(None, user_id, uuid.uuid4(), f"Proje {i}: marka kampanyasi hazirlandi")
+        await service.save_successful_prompt(user_id, f"prompt {i}", "https://cdn/x.png", 1)
+
+    redis.round_trips, redis.commands = 0, []
+    context = await service.build_memory_context(user_id)
+
+    assert redis.round_trips == 1
+    assert "Proje 7" in context and "Proje 3" in context and "Proje 2" not in context
+    assert ("lrange", f"user_memory:{user_id}:prompts") not in redis.commands
+
+
+@pytest.mark.asyncio
+async def test_legacy_blob_is_migrated_on_first_read(redis):
+    service = ConversationMemoryService()
+    user_id = uuid.uuid4()
+    redis.data[f"user_memory:{user_id}"] = json.dumps({
+        "summaries": [{"summary": "eski ozet"}],
+        "preferences": {"language": "tr"},
+        "successful_prompts": [{"prompt": "eski prompt", "score": 1}],
+        "style_preferences": {},
+        "core_memories": [{"category": "workflow", "fact": "Kisa yanit ver"}],
+    })
+
+    await service.save_core_memory(user_id, "workflow", "Once plani yaz")
+    memory = await service.get_user_memory(user_id)
+
+    assert f"user_memory:{user_id}" not in redis.data
+    assert [m["fact"] for m in memory["core_memories"]] == ["Kisa yanit ver", "Once plani yaz"]
+    assert memory["preferences"] == {"language": "tr"}
+    assert memory["successful_prompts"][0]["prompt"] == "eski prompt"
+
+    assert await service.delete_core_memory(user_id, "kisa yanit") is True
+    assert [m["fact"] for m in (await service.get_user_memory(user_id))["core_memories"]] == ["Once plani yaz"]
+
+
+@pytest.mark.asyncio
+async def test_failed_legacy_migration_keeps_blob_and_concurrent_reads_migrate_once(redis):
+    service = ConversationMemoryService()
+    user_id = uuid.uuid4()
+    legacy_key = f"user_memory:{user_id}"
+    redis.data[legacy_key] = json.dumps({
+        "summaries": [{"summary": "eski ozet"}],
+        "core_memories": [{"category": "workflow", "fact": "Kisa yanit ver"}],
+        "preferences": {"language": "tr"},
+    })
+
+    redis.fail_scripts = True
+    context = await service.build_memory_context(user_id)      # Hata sohbet turuna sızmaz
+    assert isinstance(context, str) and legacy_key in redis.data
+
+    redis.fail_scripts = False
+    results = await asyncio.gather(*[service.get_user_memory(user_id) for _ in range(3)])
+
+    assert legacy_key not in redis.data
+    for memory in results:
+        assert [m["fact"] for m in memory["core_memories"]] == ["Kisa yanit ver"]   # Çift kayıt yok
+        assert memory["preferences"] == {"language": "tr"}
+
+
+@pytest.mark.asyncio
+async def test_session_actions_and_context_use_atomic_structures(redis):
+    cache = cache_module.cache
+    await asyncio.gather(*[cache.push_action("s", {"n": i}, max_actions=5) for i in range(8)])
+    await asyncio.gather(cache.update_context("s", {"brand": "pepper"}), cache.update_context("s", {"step": 2}))
+
+    assert [a["n"] for a in await cache.get_recent_actions("s", count=5)] == [7, 6, 5, 4, 3]
+    assert (await cache.pop_last_action("s"))["n"] == 7
+    assert len(await cache.get_recent_actions("s", count=10)) == 4
+    assert await cache.get_context("s") == {"brand": "pepper", "step": 2}
+
+
+@pytest.mark.asyncio
+async def test_prompt_index_syncs_only_new_records_from_other_workers(redis):
+    worker_a, worker_b = ConversationMemoryService(), ConversationMemoryService()
+    user_id = uuid.uuid4()
+    for i in range(5):
+        await worker_a.save_successful_prompt(user_id, f"neon sehir gecesi {i}", "https://cdn/x.png", i)
+
+    assert (await worker_b.find_similar_prompts(user_id, "neon sehir", limit=1))[0]["score"] == 4
+
+    await worker_a.save_successful_prompt(user_id, "neon sehir gecesi yagmurlu", "https://cdn/y.png", 9)
+    redis.commands = []
+    similar = await worker_b.find_similar_prompts(user_id, "neon sehir", limit=1)
+
+    assert similar[0]["prompt"] == "neon sehir gecesi yagmurlu"
+    assert "tokens" not in similar[0] and similar[0]["memory_prompt"]
+    # Diğer worker yalnızca yeni kuyruğu okudu; tekrar sorguda liste hiç okunmaz
+    assert [args for name, args in redis.commands if name == "lrange"] == [f"user_memory:{user_id}:prompts"]
+    assert len(worker_b._prompt_indexes[str(user_id)]) == 6
@@ -0,0 +1,145 @@
+import uuid
+from collections import Counter
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.api.routes import admin
+from app.models.models import GeneratedAsset, Message, Session, User
+from app.services import daily_rollups as rollups_module
+from app.services.daily_rollups import DailyRollups, utc_today
+from app.services.model_names import canonical_model_name, model_display
+
+
+def test_model_names_are_canonicalized_once():
+    assert canonical_model_name("nano_banana_2") == "nano-banana-2"
+    assert canonical_model_name("Nano Banana Regen") == "nano-banana-pro"
+    assert canonical_model_name("fal-ai/kling-video/v3/pro") == "kling-video"   # contains kuralı
+    assert canonical_model_name("fal-ai/flux-kontext/max") == "flux-kontext"
+    assert canonical_model_name("My_New  Model") == "my-new-model"
+    assert canonical_model_name("user_upload") is None and canonical_model_name(None) is None
+    assert model_display("veo-3.1") == ("Veo 3.1", "#1d4ed8")
+    assert model_display("my-new-model") == ("My New Model", "#6b7280")
+
+
+class FakeSessionMaker:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        self.statements.append((str(compiled), compiled.params))
+        return SimpleNamespace(scalar=lambda: 1_700_000_000_000, rowcount=4)
+
+    async def commit(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_committed_writes_become_rollup_deltas_and_rollbacks_are_dropped(monkeypatch):
+    rollups = DailyRollups()
+    db = FakeSessionMaker()
+    monkeypatch.setattr(rollups_module, "daily_rollups", rollups)
+    monkeypatch.setattr(rollups_module, "async_session_maker", db)
+    today = utc_today()
+    old_message = Message(role="user", content="x", created_at=datetime(2026, 1, 5, 23, 30, tzinfo=timezone.utc))
+
+    committed = SimpleNamespace(info={}, deleted=[old_message], new=[
+        User(email="a@b.c"),
+        Session(title="Yeni Sohbet"),
+        GeneratedAsset(asset_type="image", model_name="flux-dev", model_canonical="flux"),
+        GeneratedAsset(asset_type="video", model_name="user_upload"),
+    ])
+    rollups_module._collect_rollup_deltas(committed, None)
+    rollups_module._publish_rollup_deltas(committed)
+
+    rolled_back = SimpleNamespace(info={}, deleted=[], new=[Session(title="Yarım")])
+    rollups_module._collect_rollup_deltas(rolled_back, None)
+    rollups_module._drop_rollup_deltas(rolled_back)
+    rollups_module._publish_rollup_deltas(rolled_back)
+
+    totals = Counter()
+    for (day, metric, key, _committed_second), value in rollups._pending.items():
+        totals[(day, metric, key)] += value
+    assert totals == {
+        (today, "users", ""): 1,
+        (today, "sessions", ""): 1,
+        (today, "assets", "image"): 1,
+        (today, "assets", "video"): 1,
+        (today, "models", "flux"): 1,
+        (date(2026, 1, 5), "messages", ""): -1,
+    }
+
+    await rollups.shutdown()
+    (lock_sql, _), (sql, params) = db.statements[-2:]
+    assert "pg_advisory_xact_lock_shared" in lock_sql              # Devam eden yenilemeyi bekler
+    assert "ON CONFLICT (day, metric, key) DO UPDATE SET value = (daily_rollups.value + excluded.value)" in sql
+    # Günün yenileme işaretinden önce commit edilmiş deltalar yazılmaz
+    assert "LEFT OUTER JOIN daily_rollups AS marker" in sql and "deltas.committed_at *" in sql
+    assert sorted(value for value in params.values() if value in ("users", "sessions", "assets", "models", "messages")) == [
+        "assets", "assets", "messages", "models", "sessions", "users",
+    ]
+    assert rollups.get_stats()["pending_keys"] == 0
+
+
+@pytest.mark.asyncio
+async def test_refresh_marks_days_so_older_buffered_deltas_are_not_recounted(monkeypatch):
+    rollups = DailyRollups()
+    db = FakeSessionMaker()
+    monkeypatch.setattr(rollups_module, "async_session_maker", db)
+
+    assert await rollups.refresh() == 4
+    sql = [statement for statement, _ in db.statements]
+    assert "pg_try_advisory_xact_lock" in sql[0] and "pg_advisory_xact_lock(" in sql[1]
+    assert "clock_timestamp()" in sql[2]
+    assert sql[3].startswith("DELETE FROM daily_rollups") and "SELECT" in sql[4]
+    # İşaret, kaynak okunmadan önce alınan saatle, yenilenen her güne yazılır
+    marker_sql, marker_params = db.statements[5]
+    assert "INSERT INTO daily_rollups" in marker_sql and "UNION" in marker_sql
+    assert rollups_module.REFRESH_MARKER in marker_params.values()
+    assert 1_700_000_000_000 in marker_params.values()
+    assert utc_today() in marker_params.values()
+
+
+class FakeAdminDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return SimpleNamespace(all=lambda: self.rows)
+
+
+@pytest.mark.asyncio
+async def test_admin_overview_and_distribution_read_only_rollups():
+    db = FakeAdminDB([
+        ("sessions", "", 40), ("messages", "", 900), ("users", "", 7),
+        ("assets", "image", 120), ("assets", "video", 30), ("assets", "audio", 5),
+        ("active_models", "", 12),
+    ])
+    overview = await admin.get_overview_stats(db)
+
+    assert (overview.total_assets, overview.total_images, overview.total_videos) == (155, 120, 30)
+    assert (overview.total_sessions, overview.total_messages, overview.total_users, overview.active_models) == (40, 900, 7, 12)
+    assert len(db.statements) == 1                               # Tek sorgu
+    assert "generated_assets" not in db.statements[0] and "UNION ALL" in db.statements[0]
+
+    db = FakeAdminDB([("kling-video", 8), ("flux", 20), ("my-new-model", 3), ("veo-3.1", 0)])
+    distribution = await admin.get_model_distribution(db)
+
+    assert [(item.name, item.value, item.color) for item in distribution] == [
+        ("Flux", 20, "#f59e0b"), ("Kling Video", 8, "#3b82f6"), ("My New Model", 3, "#6b7280"),
+    ]
+    assert "FROM daily_rollups" in db.statements[0]
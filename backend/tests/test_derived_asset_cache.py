@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.core import cache as cache_module
+from app.services import derived_asset_cache as dac_module
+from app.services.derived_asset_cache import DerivedAssetCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.store[key] = value
+
+
+@pytest.mark.asyncio
+async def test_background_removal_runs_once_per_reference_across_workers(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(cache_module.cache, "_client", redis)
+    calls = []
+
+    async def fake_subscribe(endpoint, arguments, with_logs=False):
+        calls.append((endpoint, arguments["image_url"]))
+        await asyncio.sleep(0.01)
+        return {"image": {"url": f"https://fal.example/clean/{len(calls)}.png"}}
+
+    monkeypatch.setattr(dac_module.fal_client, "subscribe_async", fake_subscribe)
+    worker_a, worker_b = DerivedAssetCache(), DerivedAssetCache()
+
+    # Aynı anda gelen istekler tek fal çağrısını paylaşır
+    first = await asyncio.gather(*[worker_a.remove_background("https://cdn.example/emre.jpg") for _ in range(3)])
+    # Başka worker Redis'ten okur, fal'a gitmez
+    second = await worker_b.remove_background("https://cdn.example/emre.jpg")
+    # Farklı referans ayrı anahtar
+    other = await worker_b.remove_background("https://cdn.example/ayse.jpg")
+
+    assert first == ["https://fal.example/clean/1.png"] * 3
+    assert second == "https://fal.example/clean/1.png"
+    assert other == "https://fal.example/clean/2.png"
+    assert len(calls) == 2
+    assert worker_a.get_stats()["shared"] == 2 and worker_b.get_stats()["redis_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_or_empty_results_are_not_cached(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    results = [RuntimeError("fal down"), {}, {"outputs": [{"url": "https://fal.example/frame.png"}]}]
+
+    async def fake_subscribe(endpoint, arguments, with_logs=False):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(dac_module.fal_client, "subscribe_async", fake_subscribe)
+    service = DerivedAssetCache()
+
+    with pytest.raises(RuntimeError):
+        await service.extract_frame("https://cdn.example/v.mp4")
+    assert await service.extract_frame("https://cdn.example/v.mp4") is None
+    assert await service.extract_frame("https://cdn.example/v.mp4") == "https://fal.example/frame.png"
+    assert await service.extract_frame("https://cdn.example/v.mp4") == "https://fal.example/frame.png"
+    assert service.get_stats()["misses"] == 3 and service.get_stats()["local_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_entity_reference_is_warmed_in_background(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    service = DerivedAssetCache()
+    warmed = []
+
+    async def fake_remove_background(url, timeout=15):
+        warmed.append(("birefnet", url))
+
+    async def fake_downscale(url, max_dim=1280):
+        warmed.append(("downscale", url))
+
+    monkeypatch.setattr(service, "remove_background", fake_remove_background)
+    monkeypatch.setattr(service, "downscale", fake_downscale)
+
+    service.warm_reference("https://cdn.example/emre.jpg")
+    service.warm_reference(None)
+    await asyncio.sleep(0.01)
+
+    assert sorted(warmed) == [("birefnet", "https://cdn.example/emre.jpg"), ("downscale", "https://cdn.example/emre.jpg")]
+    assert service.get_stats()["warmed"] == 1
+    await service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_owner_does_not_fail_waiters(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    derived = DerivedAssetCache()
+    started = asyncio.Event()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.02)
+        return f"https://fal.example/small/{len(calls)}.jpg"
+
+    owner = asyncio.create_task(derived.get_or_create("https://cdn.example/emre.jpg", "downscale", compute))
+    await started.wait()
+    waiters = [
+        asyncio.create_task(derived.get_or_create("https://cdn.example/emre.jpg", "downscale", compute))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+    owner.cancel()
+
+    assert await asyncio.gather(*waiters) == ["https://fal.example/small/2.jpg"] * 2
+    assert owner.cancelled() and len(calls) == 2
@@ -0,0 +1,63 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core import cache as cache_module
+from app.models.models import Entity
+from app.services.agent.context_pipeline import context_cache
+from app.services.entity_matcher import EntityNameMatcher, get_name_matcher
+from app.services.entity_service import EntityService
+
+
+def test_matcher_handles_turkish_suffixes_and_word_boundaries():
+    matcher = EntityNameMatcher([("1", "Emre"), ("2", "Orman"), ("3", "Gem"), ("4", "Emre Yılmaz"), ("5", "X")])
+
+    assert matcher.match("emreyi ormanda çiz") == ["1", "2"]
+    assert matcher.match("Emre'nin yanına gemini koy") == ["1"]        # "gem" → "gemini" içinde değil
+    assert matcher.match("Emre Yılmaz ile emre") == ["4", "1"]          # Aynı konumda en uzun isim
+    assert matcher.match("x ve y") == [] and len(matcher) == 4           # Tek harfli isim alınmaz
+
+
+def test_compiled_matcher_is_reused_for_same_names():
+    entries = [[str(uuid.uuid4()), f"karakter{i}"] for i in range(300)]
+    first = get_name_matcher(entries)
+    assert get_name_matcher(list(reversed(entries))) is first
+    assert first.match("karakter299 ile karakter42dan sahne") == [entries[299][0], entries[42][0]]
+
+
+class FakeDB:
+    def __init__(self, names, entities):
+        self.names, self.entities = names, entities
+        self.statements = []
+
+    async def execute(self, statement):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.statements.append(sql)
+        if "entities.name" in sql and "entities.tag" not in sql:
+            return SimpleNamespace(all=lambda: self.names)
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: self.entities))
+
+
+@pytest.mark.asyncio
+async def test_tags_and_names_resolve_in_one_query(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    user_id = uuid.uuid4()
+    emre = Entity(id=uuid.uuid4(), user_id=user_id, name="Emre", tag="@emre", entity_type="character")
+    nike = Entity(id=uuid.uuid4(), user_id=user_id, name="Nike", tag="@nike", entity_type="brand")
+    db = FakeDB([(emre.id, emre.name), (nike.id, nike.name)], [nike, emre])
+    service = EntityService()
+
+    found = await service.resolve_tags(db, user_id, "@nike reklamı, emreyi @nike ayakkabısıyla çiz")
+    assert found == [nike, emre]
+    assert len(db.statements) == 2                      # İsim listesi + tek çözümleme sorgusu
+    assert "entities.tag = ANY (%(tags)s::VARCHAR[])" in db.statements[1]
+    assert "entities.id = ANY (%(ids)s::UUID[])" in db.statements[1]
+
+    await service.resolve_tags(db, user_id, "emre")
+    assert len(db.statements) == 3                      # İsim listesi cache'ten
+
+    await context_cache.invalidate_entities(user_id)
+    await service.resolve_tags(db, user_id, "emre")
+    assert len(db.statements) == 5
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from app.core import cache as cache_module
+from app.services.episodic_memory_service import EpisodicMemoryService
+
+
+class FakeRedis:
+    """Sorted set / set / hash komutlarının bellek içi karşılığı."""
+
+    def __init__(self):
+        self.data = {}
+
+    # --- komutlar ---
+    def _zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def _sorted(self, key):
+        return sorted(self.data.get(key, {}).items(), key=lambda item: item[1])
+
+    def _zremrangebyrank(self, key, start, end):
+        items = self._sorted(key)
+        end = len(items) + end if end < 0 else end
+        for member, _ in (items[start:end + 1] if end >= 0 else []):
+            del self.data[key][member]
+
+    def _zrange(self, key, start, end):
+        items = [m for m, _ in self._sorted(key)]
+        return items[start:(None if end == -1 else end + 1)]
+
+    def _zrevrange(self, key, start, end):
+        items = [m for m, _ in reversed(self._sorted(key))]
+        return items[start:(None if end == -1 else end + 1)]
+
+    def _zrem(self, key, member):
+        self.data.get(key, {}).pop(member, None)
+
+    def _zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    def _sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def _smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def _hincrby(self, key, field, amount):
+        bucket = self.data.setdefault(key, {})
+        bucket[field] = str(int(bucket.get(field, 0)) + amount)
+
+    def _hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def _expire(self, key, ttl):
+        return True
+
+    def _delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def __getattr__(self, name):
+        impl = object.__getattribute__(self, f"_{name}")
+
+        async def call(*args):
+            return impl(*args)
+        return call
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        impl = getattr(self.redis, f"_{name}")
+        return lambda *args: self.queued.append((impl, args))
+
+    async def execute(self):
+        return [impl(*args) for impl, args in self.queued]
+
+
+async def _fill(service, user_id):
+    events = [("interaction", "eski etkilesim", None)]
+    events += [("feedback", f"geri bildirim {i}", None) for i in range(5)]
+    events += [("preference", "Kullanici 16:9 tercih ediyor", None)]
+    events += [("model_success", f"{m} basarili", {"model": m}) for m in ["kling", "veo", "kling", "unknown"]]
+    for event_type, content, metadata in events:
+        await service.remember(user_id, event_type, content, metadata=metadata)
+        await asyncio.sleep(0.002)  # Aynı milisaniyede eşit skor olmasın
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_redis", [True, False])
+async def test_rings_are_bounded_per_type_and_recalled_by_importance_then_time(monkeypatch, use_redis):
+    monkeypatch.setattr(cache_module.cache, "_client", FakeRedis() if use_redis else None)
+    service = EpisodicMemoryService()
+    service.MAX_PER_EVENT_TYPE = 3
+    await _fill(service, "u1")
+
+    recalled = await service.recall("u1", limit=6)
+    assert [m.content for m in recalled] == [
+        "geri bildirim 4", "geri bildirim 3", "geri bildirim 2",
+        "Kullanici 16:9 tercih ediyor", "unknown basarili", "kling basarili",
+    ]
+    assert (await service.recall("u1", limit=20))[-1].content == "eski etkilesim"
+    # feedback halkası 3'e sınırlandı, en eskiler düştü
+    assert len(await service.recall("u1", event_type="feedback", limit=10)) == 3
+    assert [m.content for m in await service.recall("u1", query="16:9")] == ["Kullanici 16:9 tercih ediyor"]
+    # Halkadan düşen model_success kayıtları sayaçta kalır; "unknown" sayılmaz
+    assert await service.get_model_success_counts("u1") == [("kling", 2), ("veo", 1)]
+
+
+@pytest.mark.asyncio
+async def test_memories_are_shared_between_workers_and_survive_restart(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", FakeRedis())
+    worker_a, worker_b = EpisodicMemoryService(), EpisodicMemoryService()
+    await worker_a.remember("u1", "feedback", "Yanlis stil kullanildi")
+    await worker_a.remember("u1", "model_success", "veo basarili", metadata={"model": "veo"})
+
+    restarted = EpisodicMemoryService()
+    assert "Yanlis stil kullanildi" in await worker_b.get_context_for_prompt("u1")
+    assert await restarted.get_model_success_counts("u1") == [("veo", 1)]
+
+    memory_id = (await restarted.recall("u1", event_type="feedback"))[0].id
+    await worker_b.forget("u1", memory_id)
+    assert await worker_a.recall("u1", event_type="feedback") == []
+    assert await worker_a.clear_user_memories("u1") == 1
+    assert await worker_a.get_model_success_counts("u1") == []
@@ -0,0 +1,124 @@
+import asyncio
+from types import SimpleNamespace
+
+import fal_client
+import pytest
+
+from app.services.plugins import fal_job_engine as engine_module
+from app.services.plugins.fal_job_engine import FalJobEngine
+
+
+@pytest.mark.asyncio
+async def test_engine_resolves_concurrent_jobs_with_single_poller(monkeypatch):
+    engine = FalJobEngine()
+    engine.MIN_POLL_INTERVAL = 0.01
+    engine.MAX_POLL_INTERVAL = 0.02
+
+    submitted = []
+    status_calls = {}
+
+    async def fake_submit_async(endpoint, arguments):
+        request_id = f"req-{len(submitted)}"
+        submitted.append(request_id)
+        return SimpleNamespace(request_id=request_id)
+
+    async def fake_status_async(endpoint, request_id, with_logs=False):
+        status_calls[request_id] = status_calls.get(request_id, 0) + 1
+        if status_calls[request_id] < 3:
+            return fal_client.InProgress(logs=None)
+        return fal_client.Completed(logs=None, metrics={})
+
+    async def fake_result_async(endpoint, request_id):
+        return {"video": {"url": f"https://fal.example/{request_id}.mp4"}}
+
+    monkeypatch.setattr(engine_module.fal_client, "submit_async", fake_submit_async)
+    monkeypatch.setattr(engine_module.fal_client, "status_async", fake_status_async)
+    monkeypatch.setattr(engine_module.fal_client, "result_async", fake_result_async)
+
+    results = await asyncio.gather(*[
+        engine.run("fal-ai/kling-video/v3/pro/text-to-video", {"prompt": f"scene {i}"})
+        for i in range(5)
+    ])
+
+    assert sorted(r["video"]["url"] for r in results) == sorted(
+        f"https://fal.example/req-{i}.mp4" for i in range(5)
+    )
+    assert engine.get_stats()["completed"] == 5
+    assert engine.get_stats()["in_flight"] == 0
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_engine_times_out_and_reports_failed_status(monkeypatch):
+    engine = FalJobEngine()
+    engine.MIN_POLL_INTERVAL = 0.01
+    engine.MAX_POLL_INTERVAL = 0.01
+
+    async def fake_submit_async(endpoint, arguments):
+        return SimpleNamespace(request_id="stuck" if arguments.get("stuck") else "broken")
+
+    async def fake_status_async(endpoint, request_id, with_logs=False):
+        if request_id == "stuck":
+            return fal_client.Queued(position=3)
+        return fal_client.Completed(logs=None, metrics={}, error="NSFW", error_type="content_policy")
+
+    monkeypatch.setattr(engine_module.fal_client, "submit_async", fake_submit_async)
+    monkeypatch.setattr(engine_module.fal_client, "status_async", fake_status_async)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await engine.run("fal-ai/veo3.1", {"stuck": True}, timeout=0.05)
+
+    with pytest.raises(RuntimeError, match="content_policy"):
+        await engine.run("fal-ai/veo3.1", {})
+
+    assert engine.get_stats()["timeouts"] == 1
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_shared_job_alive(monkeypatch):
+    engine = FalJobEngine()
+    engine.MIN_POLL_INTERVAL = 0.01
+    engine.MAX_POLL_INTERVAL = 0.01
+
+    done = asyncio.Event()
+    cancelled = []
+
+    async def fake_status_async(endpoint, request_id, with_logs=False):
+        if done.is_set():
+            return fal_client.Completed(logs=None, metrics={})
+        return fal_client.InProgress(logs=None)
+
+    async def fake_result_async(endpoint, request_id):
+        return {"video": {"url": f"https://fal.example/{request_id}.mp4"}}
+
+    async def fake_cancel_async(endpoint, request_id):
+        cancelled.append(request_id)
+
+    monkeypatch.setattr(engine_module.fal_client, "status_async", fake_status_async)
+    monkeypatch.setattr(engine_module.fal_client, "result_async", fake_result_async)
+    monkeypatch.setattr(engine_module.fal_client, "cancel_async", fake_cancel_async, raising=False)
+
+    endpoint = "fal-ai/veo3.1"
+    first = asyncio.create_task(engine.wait(endpoint, "shared"))
+    second = asyncio.create_task(engine.wait(endpoint, "shared"))
+    await asyncio.sleep(0.03)
+
+    # Bir bekleyenin kopması diğerini ve fal işini etkilememeli
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    done.set()
+    assert (await second)["video"]["url"] == "https://fal.example/shared.mp4"
+    assert cancelled == []
+
+    # Son bekleyen iptal edilince fal'daki iş de iptal edilir
+    done.clear()
+    lonely = asyncio.create_task(engine.wait(endpoint, "lonely"))
+    await asyncio.sleep(0.03)
+    lonely.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await lonely
+    assert cancelled == ["lonely"]
+    assert engine.get_stats()["in_flight"] == 0
+    await engine.shutdown()
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from app.services import prompt_translator
+from app.services.agent.orchestrator import AgentOrchestrator
+from app.services.embeddings.pinecone_service import PineconeService
+from app.services.llm.llm_gateway import LLMGateway, llm_gateway
+
+# Stub model çağrısı 50ms sürer; loop bundan çok daha kısa sürede dönmeli
+MODEL_LATENCY_S = 0.05
+MAX_LOOP_BLOCK_MS = 25
+
+
+def _stub_openai_client(calls: list):
+    async def create_completion(**kwargs):
+        calls.append(kwargs["model"])
+        await asyncio.sleep(MODEL_LATENCY_S)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="  a cinematic enriched prompt, golden hour  "))]
+        )
+
+    async def create_embedding(**kwargs):
+        calls.append(kwargs["model"])
+        await asyncio.sleep(MODEL_LATENCY_S)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[0.1] * 1536)])
+
+    return SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create_completion)),
+        embeddings=SimpleNamespace(create=create_embedding),
+    )
+
+
+async def _max_loop_lag_ms(work) -> float:
+    """work çalışırken event loop'un en uzun kaç ms bloklandığını ölç."""
+    lags = []
+    stop = asyncio.Event()
+
+    async def heartbeat():
+        interval = 0.005
+        while not stop.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - before - interval) * 1000)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0)
+    try:
+        await work
+    finally:
+        stop.set()
+        await beat
+    return max(lags)
+
+
+@pytest.mark.asyncio
+async def test_llm_call_sites_never_block_the_event_loop(monkeypatch):
+    calls = []
+    monkeypatch.setattr(llm_gateway, "_client", _stub_openai_client(calls))
+
+    orchestrator = AgentOrchestrator.__new__(AgentOrchestrator)
+    pinecone = PineconeService()
+    pinecone._embeddings_ready = True
+    history = [{"role": "user", "content": f"mesaj {i}"} for i in range(20)]
+
+    work = asyncio.gather(
+        prompt_translator.translate_prompt_to_english("gün batımında sahil"),
+        prompt_translator.enrich_prompt("uçan araba"),
+        pinecone.create_embedding("Emre, karakter"),
+        orchestrator._summarize_conversation(history),
+        orchestrator._auto_quality_check("https://assets.example/a.png", "kırmızı araba"),
+        orchestrator._enrich_prompt("kedi", "image"),
+    )
+    lag_ms = await _max_loop_lag_ms(work)
+
+    assert lag_ms < MAX_LOOP_BLOCK_MS, f"event loop {lag_ms:.0f}ms bloklandı"
+    assert len(calls) == 6
+    assert calls.count("text-embedding-ada-002") == 1
+
+
+@pytest.mark.asyncio
+async def test_gateway_enforces_per_model_concurrency_and_timeout(monkeypatch):
+    gateway = LLMGateway()
+    gateway.MODEL_CONCURRENCY = {"gpt-4o-mini": 2}
+    active = 0
+    peak = 0
+
+    async def create_completion(**kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            await asyncio.sleep(10 if kwargs["messages"][0]["content"] == "slow" else 0.02)
+        finally:
+            active -= 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="OK"))])
+
+    gateway._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create_completion)))
+
+    results = await asyncio.gather(*[
+        gateway.chat_text([{"role": "user", "content": f"q{i}"}]) for i in range(6)
+    ])
+    assert results == ["OK"] * 6
+    assert peak == 2
+
+    with pytest.raises(asyncio.TimeoutError):
+        await gateway.chat([{"role": "user", "content": "slow"}], timeout=0.05)
+    assert gateway.get_stats()["timeouts"] == 1
+    assert gateway.get_stats()["in_use"]["gpt-4o-mini"] == 0
+
+
+@pytest.mark.asyncio
+async def test_services_pick_up_rebuilt_gateway_client(monkeypatch):
+    from app.services.conversation_memory_service import ConversationMemoryService
+    from app.services.voice_audio_service import VoiceAudioService
+
+    closed = []
+
+    async def close():
+        closed.append(True)
+
+    monkeypatch.setattr(llm_gateway, "_client", SimpleNamespace(close=close))
+    services = [AgentOrchestrator.__new__(AgentOrchestrator), ConversationMemoryService(), VoiceAudioService()]
+    old = llm_gateway.client
+    assert all(service.client is old for service in services)
+
+    # Shutdown/yeniden kurulum sonrası servisler kapanmış client'ı tutmaz
+    await llm_gateway.close()
+    rebuilt = _stub_openai_client([])
+    monkeypatch.setattr(llm_gateway, "_client", rebuilt)
+    assert closed == [True]
+    assert all(service.client is rebuilt for service in services)
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.services import long_video_service as lvs
+from app.services.long_video_service import LongVideoJob, LongVideoService, SegmentStitchPipeline, VideoSegment
+
+
+def _job(count: int) -> LongVideoJob:
+    segments = [
+        VideoSegment(id=str(i), order=i, prompt=f"scene {i}", duration="5", status="pending")
+        for i in range(count)
+    ]
+    return LongVideoJob(id="job", user_id="u", session_id="s", total_duration=5 * count,
+                        aspect_ratio="16:9", segments=segments)
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """ffmpeg yok: çıktı dosyalarını oluştur, komutları kaydet."""
+    commands = []
+
+    async def fake_run(args, timeout=None, stdin_url=None, max_bytes=None):
+        commands.append(args)
+        for arg in args:
+            if isinstance(arg, str) and arg.endswith(".mp4") and arg != args[args.index("-i") + 1]:
+                open(arg, "wb").close()
+        return 0, b"", b""
+
+    async def fake_materialize(url, dest=None, suffix=".mp4", max_bytes=None):
+        open(dest, "wb").close()
+        return dest
+
+    async def fake_probe(source, timeout=15.0):
+        return 5.0
+
+    async def fake_upload(path):
+        return "https://fal.example/final.mp4"
+
+    async def fake_store(url, path):
+        return None
+
+    monkeypatch.setattr(lvs.media_io, "run_ffmpeg", fake_run)
+    monkeypatch.setattr(lvs.media_io, "probe_duration", fake_probe)
+    monkeypatch.setattr(lvs.media_io, "upload_file", fake_upload)
+    monkeypatch.setattr(lvs.media_cache, "materialize", fake_materialize)
+    monkeypatch.setattr(lvs.media_cache, "store_file", fake_store)
+    return commands
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_starts_next_segment_as_soon_as_one_finishes(monkeypatch):
+    service = LongVideoService()
+    job = _job(6)
+    delays = [0.4, 0.1, 0.1, 0.1, 0.1, 0.1]
+    events = []
+
+    async def fake_generate(fal, segment, job):
+        events.append(("start", segment.order))
+        await asyncio.sleep(delays[segment.order])
+        events.append(("end", segment.order))
+        segment.status = "completed"
+        segment.video_url = f"https://cdn.example/{segment.order}.mp4"
+
+    # Gerçek plugin modülünün import maliyeti ölçüme girmesin
+    monkeypatch.setattr("app.services.plugins.fal_plugin_v2.FalPluginV2", lambda: object())
+    monkeypatch.setattr(service, "_generate_single_segment", fake_generate)
+    finished = []
+
+    await service._generate_segments(job, on_segment_done=lambda s: finished.append(s.order))
+
+    # Batch'lerde 4. ve 5. segment yavaş 0. segmenti beklerdi; kayan pencerede
+    # hızlılar biter bitmez sıradakiler başlar ve hepsi 0'dan önce tamamlanır
+    assert events.index(("start", 5)) < events.index(("end", 0))
+    assert finished[-1] == 0 and sorted(finished) == list(range(6))
+    assert job.progress == 80
+
+
+@pytest.mark.asyncio
+async def test_finalize_remuxes_prepared_pieces_around_failed_segment(fake_ffmpeg):
+    job = _job(3)
+    pipeline = SegmentStitchPipeline("16:9", crossfade=0.5)
+    try:
+        for order in (2, 1, 0):
+            segment = job.segments[order]
+            if order == 1:
+                segment.status = "failed"
+            else:
+                segment.status = "completed"
+                segment.video_url = f"https://cdn.example/{order}.mp4"
+            pipeline.add(segment)
+
+        url = await pipeline.finalize(job.segments)
+
+        assert url == "https://fal.example/final.mp4"
+        with open(f"{pipeline.tmp_dir}/concat.txt") as f:
+            pieces = [line.split("/")[-1].rstrip("'\n") for line in f]
+        assert pieces == ["head_0.mp4", "mid_0.mp4", "xfade_0_2.mp4", "mid_2.mp4", "tail_2.mp4"]
+        # Son adım yeniden encode etmeyen remux
+        assert fake_ffmpeg[-1][fake_ffmpeg[-1].index("-c") + 1] == "copy"
+    finally:
+        await pipeline.close()
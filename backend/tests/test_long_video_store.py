@@ -0,0 +1,168 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import long_video_service as lvs
+from app.services.long_video_service import LongVideoJob, LongVideoService, VideoSegment
+from app.services.long_video_store import LongVideoJobStore
+
+
+def _job() -> LongVideoJob:
+    return LongVideoJob(
+        id="4f1c1d2e-0000-4000-8000-000000000001",
+        user_id="u1",
+        session_id="4f1c1d2e-0000-4000-8000-000000000002",
+        total_duration=15,
+        aspect_ratio="9:16",
+        request={"prompt": "sahilde gün batımı"},
+        segments=[
+            VideoSegment(id="a", order=0, prompt="p0", duration="5", status="completed",
+                         video_url="https://cdn.example/0.mp4"),
+            VideoSegment(id="b", order=1, prompt="p1", duration="5", status="generating",
+                         fal_endpoint="fal-ai/kling-video", fal_request_id="req-1"),
+            VideoSegment(id="c", order=2, prompt="p2", duration="5", status="pending"),
+        ],
+    )
+
+
+def test_record_round_trip_keeps_segment_state_and_request_ids():
+    job = _job()
+    record = LongVideoJobStore.to_record(job)
+    restored = LongVideoJobStore.from_record(job.id, job.session_id, "processing", record)
+
+    assert restored.segments == job.segments
+    assert restored.request == {"prompt": "sahilde gün batımı"}
+    assert restored.created_at == job.created_at and restored.status == "processing"
+
+
+@pytest.mark.asyncio
+async def test_resume_repolls_submitted_segment_and_skips_completed(monkeypatch):
+    job = _job()
+    saved = []
+    waited = []
+    submitted = []
+
+    async def fake_save(j):
+        saved.append([(s.order, s.status, s.fal_request_id) for s in j.segments])
+
+    async def fake_wait(endpoint, request_id, timeout=None):
+        waited.append((endpoint, request_id))
+        return {"video": {"url": "https://cdn.example/1.mp4"}}
+
+    class FakeFal:
+        async def execute(self, action, params):
+            submitted.append(params["prompt"])
+            await params["on_submit"]("fal-ai/kling-video", "req-2")
+            return SimpleNamespace(success=True, data={"video_url": "https://cdn.example/2.mp4"}, error=None)
+
+    monkeypatch.setattr(lvs.long_video_store, "save", fake_save)
+    monkeypatch.setattr(lvs.fal_job_engine, "wait", fake_wait)
+    monkeypatch.setattr("app.services.plugins.fal_plugin_v2.FalPluginV2", FakeFal)
+
+    await LongVideoService()._generate_segments(job)
+
+    assert waited == [("fal-ai/kling-video", "req-1")]
+    assert submitted == ["p2"]  # sadece bekleyen segment yeniden üretildi
+    assert [s.video_url for s in job.segments] == [f"https://cdn.example/{i}.mp4" for i in range(3)]
+    # request_id, fal sonucu gelmeden önce kalıcı yazıldı
+    assert (2, "generating", "req-2") in [seg for snapshot in saved for seg in snapshot]
+
+
+class FakeLeaseDB:
+    """Tek bir tasks satırının owner / lease_until'ını tutan sahte session."""
+
+    def __init__(self):
+        self.owner = None
+        self.statements = []
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        from sqlalchemy.dialects import postgresql
+
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.statements.append(sql)
+        params = statement.compile().params
+        owner = params.get("owner") or params.get("owner_1")
+        won = self.owner is None or self.owner == owner
+        if won and "owner" in params:
+            self.owner = params["owner"]
+        return SimpleNamespace(scalar_one_or_none=lambda: "row" if won else None)
+
+    async def commit(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_only_one_replica_claims_an_unfinished_job(monkeypatch):
+    db = FakeLeaseDB()
+    monkeypatch.setattr("app.services.long_video_store.async_session_maker", db)
+    first, second = LongVideoJobStore(), LongVideoJobStore()
+
+    assert await first.claim(_job().id) is True
+    assert await second.claim(_job().id) is False
+    assert await first.renew(_job().id) is True
+    assert await second.renew(_job().id) is False
+    # Atomik koşullu UPDATE: sahipsiz / lease'i dolmuş / zaten bizim
+    assert "UPDATE tasks SET owner=" in db.statements[0] and "tasks.lease_until < now()" in db.statements[0]
+    assert "RETURNING tasks.id" in db.statements[0]
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_jobs_claimed_elsewhere(monkeypatch):
+    service = LongVideoService()
+    started = []
+
+    async def fake_list():
+        return [_job()]
+
+    async def lost_claim(job_id):
+        return False
+
+    async def fake_process(job, progress_callback=None):
+        started.append(job.id)
+        return {"success": True}
+
+    monkeypatch.setattr(lvs.long_video_store, "list_unfinished", fake_list)
+    monkeypatch.setattr(lvs.long_video_store, "claim", lost_claim)
+    monkeypatch.setattr(service, "process", fake_process)
+
+    assert await service.resume_unfinished() == []
+    assert started == []
+
+
+@pytest.mark.asyncio
+async def test_job_stops_when_lease_is_taken_over(monkeypatch):
+    service = LongVideoService()
+    job = _job()
+    released = []
+
+    async def fake_save(j):
+        pass
+
+    async def lost_renew(job_id):
+        return False
+
+    async def fake_release(job_id):
+        released.append(job_id)
+
+    async def never_ending(job, progress_callback=None, on_segment_done=None):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(lvs.long_video_store, "LEASE_RENEW_INTERVAL", 0)
+    monkeypatch.setattr(lvs.long_video_store, "save", fake_save)
+    monkeypatch.setattr(lvs.long_video_store, "renew", lost_renew)
+    monkeypatch.setattr(lvs.long_video_store, "release", fake_release)
+    monkeypatch.setattr(service, "_generate_segments", never_ending)
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(service.process(job), timeout=5)
+    assert released == [job.id]
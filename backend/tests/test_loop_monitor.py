@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.loop_monitor import LoopStallMonitor
+
+
+@pytest.mark.asyncio
+async def test_monitor_records_stall_with_offending_coroutine_stack():
+    monitor = LoopStallMonitor(threshold_ms=40)
+    monitor.HEARTBEAT_INTERVAL = 0.01
+    monitor.start()
+
+    async def blocking_upload_handler():
+        time.sleep(0.2)  # senkron çağrı — loop'u dondurur
+
+    await asyncio.sleep(0.05)
+    await asyncio.create_task(blocking_upload_handler(), name="upload-task")
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    stats = monitor.get_stats()
+    assert stats["stalls"] >= 1
+    assert stats["max_lag_ms"] >= 150
+    stall = stats["recent_stalls"][-1]
+    assert "blocking_upload_handler" in "\n".join(stall["stack"])
+    assert stall["task"].startswith("upload-task")
+    assert sum(stats["histogram"].values()) == stats["samples"]
@@ -0,0 +1,100 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from app.services.media_cache import MediaCache
+from app.services.media_io import media_io
+
+
+@pytest.fixture
+def fake_cdn(monkeypatch):
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        await asyncio.sleep(0.02)
+        return httpx.Response(200, content=request.url.path.encode() * 1000)
+
+    monkeypatch.setattr(media_io, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return requests
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_share_one_download_and_copies_are_caller_owned(tmp_path, fake_cdn):
+    cache = MediaCache(root=str(tmp_path), max_bytes=10 * 1024 * 1024)
+
+    paths = await asyncio.gather(*[
+        cache.materialize("https://cdn.example/segment_0.mp4") for _ in range(4)
+    ])
+    again = await cache.materialize("https://cdn.example/segment_0.mp4", dest=str(tmp_path / "mine.mp4"))
+
+    assert fake_cdn == ["/segment_0.mp4"]
+    for path in paths:
+        os.unlink(path)  # çağıran kendi kopyasını siler, cache etkilenmez
+    with open(again, "rb") as f:
+        assert f.read() == b"/segment_0.mp4" * 1000
+    stats = cache.get_stats()
+    assert stats["misses"] == 1 and stats["hits"] + stats["shared"] == 4
+    cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_uploaded_outputs_are_reused_and_lru_evicts(tmp_path, fake_cdn):
+    cache = MediaCache(root=str(tmp_path), max_bytes=20_000)
+    output = tmp_path / "trimmed.mp4"
+    output.write_bytes(b"t" * 12_000)
+
+    await cache.store_file("https://fal.media/trimmed.mp4", str(output))
+    await cache.materialize("https://fal.media/trimmed.mp4")
+    assert fake_cdn == []  # zincirleme düzenleme: ağ yok
+
+    await cache.materialize("https://cdn.example/a.mp4")   # 6 KB
+    await cache.materialize("https://cdn.example/bb.mp4")  # 7 KB → toplam limiti aşar
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["total_bytes"] <= 20_000
+
+    await cache.materialize("https://fal.media/trimmed.mp4")
+    assert fake_cdn[-1] == "/trimmed.mp4"  # en eski blob tahliye edilmişti
+    cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_owner_does_not_fail_shared_downloads(tmp_path, fake_cdn):
+    cache = MediaCache(root=str(tmp_path), max_bytes=10 * 1024 * 1024)
+    url = "https://cdn.example/segment_1.mp4"
+
+    owner = asyncio.create_task(cache.materialize(url))
+    await asyncio.sleep(0.005)                      # İndirme başladı
+    waiters = [asyncio.create_task(cache.materialize(url)) for _ in range(2)]
+    await asyncio.sleep(0)
+    owner.cancel()
+
+    paths = await asyncio.gather(*waiters)
+    assert owner.cancelled()
+    assert fake_cdn == ["/segment_1.mp4", "/segment_1.mp4"]   # Bekleyenlerden biri yeniden indirdi
+    for path in paths:
+        with open(path, "rb") as f:
+            assert f.read() == b"/segment_1.mp4" * 1000
+        os.unlink(path)
+    cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_stale_process_dirs_are_swept_on_first_use(tmp_path, fake_cdn, monkeypatch):
+    dead, alive = tmp_path / "999999", tmp_path / "4242"
+    for d in (dead, alive, tmp_path / "shared"):
+        d.mkdir()
+        (d / "blob.mp4").write_bytes(b"x" * 1024)
+    monkeypatch.setattr(MediaCache, "_pid_alive", staticmethod(lambda pid: pid == 4242))
+
+    cache = MediaCache(root=str(tmp_path), max_bytes=10 * 1024 * 1024)
+    assert dead.exists()  # import/constructor diske dokunmaz
+    await cache.materialize("https://cdn.example/segment_0.mp4", dest=str(tmp_path / "mine.mp4"))
+
+    assert not dead.exists()
+    assert alive.exists() and (tmp_path / "shared").exists()
+    assert os.path.isdir(cache.root)
+    cache.clear()
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import httpx
+import pytest
+
+from app.services.media_io import MediaIO, MediaTooLargeError
+
+VIDEO_BYTES = os.urandom(3 * 1024 * 1024 + 17)
+
+
+def _media_io(handler) -> MediaIO:
+    media = MediaIO()
+    media.CHUNK_SIZE = 64 * 1024
+    media._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return media
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/huge.mp4":
+        return httpx.Response(200, headers={"content-length": str(10**10)}, content=b"")
+    if request.url.path == "/unsized.mp4":
+        async def body():
+            for _ in range(64):
+                yield b"x" * 65536
+        return httpx.Response(200, content=body())
+    return httpx.Response(200, content=VIDEO_BYTES)
+
+
+@pytest.mark.asyncio
+async def test_download_streams_to_disk_and_enforces_size_limit(tmp_path):
+    media = _media_io(_handler)
+
+    path = await media.download_to_file("https://cdn.example/clip.mp4", path=str(tmp_path / "clip.mp4"))
+    with open(path, "rb") as f:
+        assert f.read() == VIDEO_BYTES
+
+    with pytest.raises(MediaTooLargeError):
+        await media.download_to_file("https://cdn.example/huge.mp4", path=str(tmp_path / "huge.mp4"))
+
+    partial = tmp_path / "unsized.mp4"
+    with pytest.raises(MediaTooLargeError):
+        await media.download_to_file("https://cdn.example/unsized.mp4", path=str(partial), max_bytes=1024 * 1024)
+    assert not partial.exists()
+    await media.close()
+
+
+@pytest.mark.asyncio
+async def test_run_ffmpeg_can_feed_process_stdin_from_url():
+    media = _media_io(_handler)
+
+    code, stdout, _ = await media.run_ffmpeg(
+        [sys.executable, "-c", "import sys; print(len(sys.stdin.buffer.read()))"],
+        stdin_url="https://cdn.example/clip.mp4",
+        timeout=10,
+    )
+
+    assert code == 0
+    assert int(stdout.decode().strip()) == len(VIDEO_BYTES)
+    assert media.ffmpeg_input("https://cdn.example/a.mp4")[-2:] == ["-i", "https://cdn.example/a.mp4"]
+    assert media.ffmpeg_input("/tmp/a.mp4") == ["-i", "/tmp/a.mp4"]
+    await media.close()
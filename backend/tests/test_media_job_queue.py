@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from app.core import cache as cache_module
+from app.core.celery_app import celery_app
+from app.services.agent import orchestrator as orchestrator_module
+from app.services.media_job_queue import MediaJobQueue
+from app.tasks.runtime import run_async
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = orchestrator_module.agent
+    calls = []
+
+    async def fake_run_video_bg(**payload):
+        calls.append(payload)
+        await asyncio.sleep(payload.get("sleep", 0))
+
+    monkeypatch.setattr(agent, "_run_video_bg", fake_run_video_bg)
+    agent.calls = calls
+    yield agent
+    del agent.calls
+
+
+@pytest.mark.asyncio
+async def test_inline_backend_runs_in_process_and_registers_for_cancel(monkeypatch, agent):
+    monkeypatch.setattr(orchestrator_module.settings, "MEDIA_JOB_BACKEND", "inline")
+
+    await agent._start_media_job("video", {"user_id": "u", "session_id": "s-inline", "prompt": "p", "sleep": 10})
+    await asyncio.sleep(0)
+
+    assert "s-inline" in agent._active_bg_tasks
+    assert await agent.cancel_session_task("s-inline") is True
+    assert agent.calls[0]["prompt"] == "p"
+
+
+@pytest.mark.asyncio
+async def test_celery_backend_enqueues_same_payload_and_worker_honours_cancel(monkeypatch, agent):
+    redis = FakeRedis()
+    monkeypatch.setattr(cache_module.cache, "_client", redis)
+    monkeypatch.setattr(orchestrator_module.settings, "MEDIA_JOB_BACKEND", "celery")
+    sent = []
+    monkeypatch.setattr(celery_app, "send_task", lambda name, **kwargs: sent.append((name, kwargs)))
+
+    payload = {"user_id": "u", "session_id": "s-celery", "prompt": "p", "sleep": 10}
+    await agent._start_media_job("video", payload)
+
+    name, kwargs = sent[0]
+    assert name == "app.tasks.video_tasks.generate_video" and kwargs["queue"] == "video"
+    assert json.loads(json.dumps(kwargs["args"])) == [payload]
+    assert agent.calls == [] and "s-celery" not in agent._active_bg_tasks
+
+    # Worker tarafı: iptal bayrağı web process'inden gelir
+    queue = MediaJobQueue()
+    queue.CANCEL_POLL_SECONDS = 0.01
+    worker = asyncio.create_task(queue.run("video", kwargs["args"][0], job_id=kwargs["task_id"]))
+    await asyncio.sleep(0.02)
+    assert await agent.cancel_session_task("s-celery") is True
+    await asyncio.wait_for(worker, timeout=1)
+
+    assert agent.calls == [payload]
+    assert set(redis.data) == {f"media_job:claim:{kwargs['task_id']}"}   # Yalnızca tekrar-teslim kilidi kalır
+    assert await agent.cancel_session_task("s-celery") is False
+
+
+@pytest.mark.asyncio
+async def test_redelivered_job_is_not_run_twice(monkeypatch, agent):
+    monkeypatch.setattr(cache_module.cache, "_client", FakeRedis())
+    payload = {"user_id": "u", "session_id": "s-redeliver", "prompt": "p"}
+    queue = MediaJobQueue()
+
+    await queue.run("video", payload, job_id="job-1")
+    await queue.run("video", payload, job_id="job-1")     # Broker aynı mesajı yeniden teslim etti
+
+    assert agent.calls == [payload]
+
+
+def test_paid_media_tasks_are_never_redelivered():
+    from app.tasks import video_tasks  # noqa: F401 — shared_task'ları kaydeder
+
+    for name in ("generate_video", "edit_video", "generate_long_video"):
+        task = celery_app.tasks[f"app.tasks.video_tasks.{name}"]
+        assert task.acks_late is False and task.reject_on_worker_lost is False
+        assert celery_app.conf.broker_transport_options["visibility_timeout"] > (task.time_limit or 0)
+
+
+@pytest.mark.asyncio
+async def test_unreachable_broker_falls_back_to_inline(monkeypatch, agent):
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    monkeypatch.setattr(orchestrator_module.settings, "MEDIA_JOB_BACKEND", "celery")
+
+    def broker_down(*args, **kwargs):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(celery_app, "send_task", broker_down)
+    await agent._start_media_job("video", {"user_id": "u", "session_id": "s-fallback", "prompt": "p"})
+    await asyncio.sleep(0)
+
+    assert agent.calls[0]["session_id"] == "s-fallback"
+
+
+@pytest.mark.asyncio
+async def test_active_marker_failure_after_send_does_not_run_inline_too(monkeypatch, agent):
+    class FlakyRedis(FakeRedis):
+        async def set(self, key, value, ex=None, nx=False):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr(cache_module.cache, "_client", FlakyRedis())
+    monkeypatch.setattr(orchestrator_module.settings, "MEDIA_JOB_BACKEND", "celery")
+    sent = []
+    monkeypatch.setattr(celery_app, "send_task", lambda name, **kwargs: sent.append(kwargs["task_id"]))
+
+    await agent._start_media_job("video", {"user_id": "u", "session_id": "s-flaky", "prompt": "p"})
+    await asyncio.sleep(0)
+
+    assert len(sent) == 1 and agent.calls == []     # Kuyruktaki iş inline tekrar başlamadı
+
+
+def test_worker_tasks_share_one_event_loop():
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert run_async(current_loop()) is run_async(current_loop())
@@ -8,6 +8,7 @@ import pytest
 os.environ.setdefault("OPENAI_API_KEY", "test-key")
 
 from app.services.agent.orchestrator import AgentOrchestrator
+from app.services.llm.llm_gateway import llm_gateway
 
 
 def _fake_tool_call(name: str, arguments: dict, tool_id: str = "tool_1"):
@@ -36,11 +37,11 @@ async def test_non_stream_media_tool_uses_deterministic_message(monkeypatch):
 
     orchestrator._handle_tool_call = fake_handle_tool_call
     orchestrator._auto_quality_check = fake_auto_quality_check
-    orchestrator.client = SimpleNamespace(
+    monkeypatch.setattr(llm_gateway, "_client", SimpleNamespace(
         chat=SimpleNamespace(
             completions=SimpleNamespace(create=fail_if_called)
         )
-    )
+    ))
 
     response = SimpleNamespace(
         choices=[
@@ -88,7 +89,7 @@ async def test_non_stream_media_tool_uses_deterministic_message(monkeypatch):
 
 
 @pytest.mark.asyncio
-async def test_stream_media_tool_marks_final_text_without_second_llm_call():
+async def test_stream_media_tool_marks_final_text_without_second_llm_call(monkeypatch):
     orchestrator = AgentOrchestrator.__new__(AgentOrchestrator)
 
     async def fake_handle_tool_call(*args, **kwargs):
@@ -102,11 +103,11 @@ async def test_stream_media_tool_marks_final_text_without_second_llm_call():
         raise AssertionError("Final streamed LLM completion should be skipped for successful media outputs")
 
     orchestrator._handle_tool_call = fake_handle_tool_call
-    orchestrator.async_client = SimpleNamespace(
+    monkeypatch.setattr(llm_gateway, "_client", SimpleNamespace(
         chat=SimpleNamespace(
             completions=SimpleNamespace(create=fail_if_called)
         )
-    )
+    ))
 
     result = {
         "images": [],
@@ -193,7 +194,7 @@ async def test_stream_background_task_preserves_tool_message():
 
 
 @pytest.mark.asyncio
-async def test_stream_edit_video_failure_does_not_retry_with_alternative_tool():
+async def test_stream_edit_video_failure_does_not_retry_with_alternative_tool(monkeypatch):
     orchestrator = AgentOrchestrator.__new__(AgentOrchestrator)
 
     async def fake_handle_tool_call(*args, **kwargs):
@@ -206,11 +207,11 @@ async def test_stream_edit_video_failure_does_not_retry_with_alternative_tool():
         raise AssertionError("Failed edit_video should not trigger a second LLM retry")
 
     orchestrator._handle_tool_call = fake_handle_tool_call
-    orchestrator.async_client = SimpleNamespace(
+    monkeypatch.setattr(llm_gateway, "_client", SimpleNamespace(
         chat=SimpleNamespace(
             completions=SimpleNamespace(create=fail_if_called)
         )
-    )
+    ))
 
     result = {
         "images": [],
@@ -245,7 +246,7 @@ async def test_stream_edit_video_failure_does_not_retry_with_alternative_tool():
 
 
 @pytest.mark.asyncio
-async def test_non_stream_edit_video_failure_does_not_retry_with_alternative_tool():
+async def test_non_stream_edit_video_failure_does_not_retry_with_alternative_tool(monkeypatch):
     orchestrator = AgentOrchestrator.__new__(AgentOrchestrator)
 
     async def fake_handle_tool_call(*args, **kwargs):
@@ -259,11 +260,11 @@ async def test_non_stream_edit_video_failure_does_not_retry_with_alternative_too
 
     orchestrator._handle_tool_call = fake_handle_tool_call
     orchestrator._auto_quality_check = lambda *args, **kwargs: None
-    orchestrator.client = SimpleNamespace(
+    monkeypatch.setattr(llm_gateway, "_client", SimpleNamespace(
         chat=SimpleNamespace(
             completions=SimpleNamespace(create=fail_if_called)
         )
-    )
+    ))
 
     response = SimpleNamespace(
         choices=[
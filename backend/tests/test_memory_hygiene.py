@@ -8,6 +8,7 @@ os.environ.setdefault("OPENAI_API_KEY", "test-key")
 from app.services.conversation_memory_service import ConversationMemoryService
 from app.services.episodic_memory_service import EpisodicMemoryService
 from app.services.preferences_service import PreferencesService
+from app.services.prompt_index import PromptIndex
 
 
 @pytest.mark.asyncio
@@ -47,23 +48,24 @@ async def test_find_similar_prompts_ignores_conflicting_duration():
     service = ConversationMemoryService()
     user_id = uuid.uuid4()
 
-    async def fake_get_user_memory(_user_id):
-        return {
-            "successful_prompts": [
-                {
-                    "prompt": "5 saniyelik sinematik kedi videosu olustur",
-                    "score": 1,
-                    "asset_type": "video",
-                },
-                {
-                    "prompt": "Sinematik kedi videosu, altin saat isigi, yumusak kamera hareketi",
-                    "score": 1,
-                    "asset_type": "video",
-                },
-            ]
-        }
+    async def fake_prompt_index(_user_id):
+        index = PromptIndex()
+        for record in [
+            {
+                "prompt": "5 saniyelik sinematik kedi videosu olustur",
+                "score": 1,
+                "asset_type": "video",
+            },
+            {
+                "prompt": "Sinematik kedi videosu, altin saat isigi, yumusak kamera hareketi",
+                "score": 1,
+                "asset_type": "video",
+            },
+        ]:
+            index.add(record)
+        return index
 
-    service.get_user_memory = fake_get_user_memory
+    service._prompt_index = fake_prompt_index
 
     similar = await service.find_similar_prompts(user_id, "30 saniyelik kedi videosu olustur", limit=3)
 
@@ -76,7 +78,7 @@ async def test_find_similar_prompts_ignores_conflicting_duration():
 async def test_build_memory_context_filters_transient_prompt_like_memory():
     service = ConversationMemoryService()
 
-    async def fake_get_user_memory(_user_id):
+    async def fake_get_context_memory(_user_id):
         return {
             "summaries": [
                 {"summary": "Bu projede 5 saniyelik kedi videosu denendi, kullanici daha sinematik atmosfer istedi."}
@@ -92,7 +94,7 @@ async def test_build_memory_context_filters_transient_prompt_like_memory():
             ],
         }
 
-    service.get_user_memory = fake_get_user_memory
+    service.get_context_memory = fake_get_context_memory
 
     context = await service.build_memory_context(uuid.uuid4())
 
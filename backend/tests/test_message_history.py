@@ -0,0 +1,104 @@
+import uuid
+from datetime import datetime, timedelta, UTC
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.models import Message
+from app.services.message_history import (
+    MessageHistory,
+    _flag_error_message,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+class FakeDB:
+    """Her execute çağrısında sıradaki satır listesini döner, SQL'i kaydeder."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        rows = self.results.pop(0)
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+
+def _msg(i, role="user", content="", meta=None):
+    base = datetime(2026, 1, 1, tzinfo=UTC)
+    return Message(
+        id=uuid.UUID(int=i), session_id=uuid.UUID(int=0), role=role,
+        content=content or f"mesaj {i}", metadata_=meta or {}, created_at=base + timedelta(seconds=i),
+    )
+
+
+def test_error_flag_is_computed_on_write():
+    failed = Message(role="assistant", content="Kredi yetersiz, görsel üretilemedi")
+    question = Message(role="user", content="Bu hata neden oldu?")
+    _flag_error_message(None, None, failed)
+    _flag_error_message(None, None, question)
+    assert failed.is_error is True and question.is_error is False
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    created_at, message_id = datetime(2026, 3, 1, 12, 0, 5, 123456, tzinfo=UTC), uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, message_id)) == (created_at, message_id)
+    with pytest.raises(ValueError):
+        decode_cursor("bozuk-cursor")
+
+
+@pytest.mark.asyncio
+async def test_context_uses_desc_limit_and_skips_errors_in_sql():
+    newest_first = [
+        _msg(4, "assistant", "İşte görseliniz", {"images": [{"url": "https://cdn/x.png"}]}),
+        _msg(3, "user", "bir kedi çiz", {"has_reference_image": True, "reference_urls": ["https://ref/1.png"]}),
+    ]
+    db = FakeDB(newest_first)
+
+    history, references = await MessageHistory().build_context(db, uuid.UUID(int=0), exclude_id=uuid.UUID(int=9))
+
+    assert [m["role"] for m in history] == ["user", "assistant"]
+    assert history[1]["content"].endswith("[Bu mesajda üretilen görseller: https://cdn/x.png]")
+    assert references == ["https://ref/1.png"]
+    sql = db.statements[0]
+    assert "messages.is_error IS false" in sql
+    assert "ORDER BY messages.created_at DESC, messages.id DESC" in sql and "LIMIT" in sql
+    assert len(db.statements) == 1  # Referans pencerede bulundu, ek sorgu yok
+
+
+@pytest.mark.asyncio
+async def test_reference_falls_back_to_single_lookup_outside_window():
+    older_reference = _msg(1, "user", meta={"has_reference_image": True, "reference_url": "https://ref/eski.png"})
+    db = FakeDB([_msg(8, "assistant"), _msg(7)], [older_reference])
+
+    _, references = await MessageHistory().build_context(db, uuid.UUID(int=0))
+
+    assert references == ["https://ref/eski.png"]
+    assert "messages.metadata ? " in db.statements[1]
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_walk_backwards_without_offset():
+    history = MessageHistory()
+    # İlk sayfa: en yeni 2 (+1 fazlası) → daha eskisi var
+    db = FakeDB([_msg(10), _msg(9), _msg(8)])
+    page = await history.page(db, uuid.UUID(int=0), limit=2)
+    assert [m.id.int for m in page.messages] == [9, 10]
+    assert page.next_after is None and decode_cursor(page.next_before)[1].int == 9
+    assert "OFFSET" not in db.statements[0]
+
+    # before cursor ile son sayfa: daha eskisi yok, daha yenisi var
+    db = FakeDB([_msg(8), _msg(7)])
+    page = await history.page(db, uuid.UUID(int=0), before=page.next_before, limit=2)
+    assert [m.id.int for m in page.messages] == [7, 8]
+    assert page.next_before is None and decode_cursor(page.next_after)[1].int == 8
+    assert "(messages.created_at, messages.id) < (" in db.statements[0]
+
+    # after cursor: ASC tarama
+    db = FakeDB([_msg(9), _msg(10)])
+    page = await history.page(db, uuid.UUID(int=0), after=page.next_after, limit=5)
+    assert [m.id.int for m in page.messages] == [9, 10] and page.next_after is None
+    assert "ORDER BY messages.created_at ASC, messages.id ASC" in db.statements[0]
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.plugins import model_hedger as hedger_module
+from app.services.plugins.model_hedger import Candidate, HedgePolicy, ModelHedger
+
+
+@pytest.fixture
+def fast_policy(monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_HEDGING_ENABLED", True)
+    monkeypatch.setitem(
+        hedger_module.HEDGE_POLICIES,
+        "test",
+        HedgePolicy(default_delay=0.05, min_delay=0.01, max_delay=1.0),
+    )
+
+
+def _model(delay: float, result="ok", error: Exception = None, log: list = None):
+    async def run():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append("cancelled")
+            raise
+        if error:
+            raise error
+        return result
+    return run
+
+
+@pytest.mark.asyncio
+async def test_backup_starts_after_hedge_delay_and_slow_primary_is_cancelled(fast_policy):
+    hedger = ModelHedger()
+    log = []
+    outcome = await hedger.race("test", [
+        Candidate("primary", _model(5.0, log=log)),
+        Candidate("backup", _model(0.01, result="backup-image")),
+    ])
+
+    assert outcome.winner == "backup" and outcome.result == "backup-image"
+    assert outcome.launched == ["primary", "backup"]
+    assert log == ["cancelled"]
+    assert hedger.get_stats()["hedges"] == 1 and hedger.get_stats()["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_never_launches_backup(fast_policy):
+    hedger = ModelHedger()
+    outcome = await hedger.race("test", [
+        Candidate("primary", _model(0.0, result="img")),
+        Candidate("backup", _model(0.0)),
+    ])
+    assert outcome.winner == "primary"
+    assert outcome.launched == ["primary"]
+    assert hedger.get_stats()["hedges"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failure_launches_next_immediately_and_timeout_counts_as_failure(fast_policy):
+    hedger = ModelHedger()
+    outcome = await hedger.race("test", [
+        Candidate("broken", _model(0.0, error=RuntimeError("quota"))),
+        Candidate("empty", _model(0.0, result=None)),
+        Candidate("stuck", _model(5.0), timeout=0.02),
+    ])
+    assert not outcome.success
+    assert [name for name, _ in outcome.errors] == ["broken", "empty", "stuck"]
+    assert "quota" in outcome.errors[0][1]
+    assert hedger.get_stats()["exhausted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_model_is_demoted_and_serial_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_HEDGING_ENABLED", False)
+    hedger = ModelHedger()
+    for _ in range(4):
+        hedger.tracker.record("flaky", 1.0, ok=False, error="500")
+        hedger.tracker.record("steady", 2.0, ok=True)
+
+    outcome = await hedger.race("generate_image", [
+        Candidate("flaky", _model(0.0, result="never")),
+        Candidate("steady", _model(0.02, result="img")),
+    ])
+    assert outcome.launched == ["steady"] and outcome.winner == "steady"
+    assert hedger.tracker.get_stats()["flaky"]["error_rate"] >= 0.5
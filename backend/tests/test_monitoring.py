@@ -0,0 +1,67 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.core.monitoring import MonitoringMiddleware, RequestMetrics
+
+
+def _app(metrics: RequestMetrics) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MonitoringMiddleware, metrics=metrics)
+
+    @app.get("/api/sessions/{session_id}")
+    async def get_session(session_id: str):
+        return {"id": session_id}
+
+    @app.get("/api/chat/stream")
+    async def stream():
+        async def events():
+            yield "data: first\n\n"
+            await asyncio.sleep(0.05)
+            yield "data: done\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_paths_are_templated_and_streams_measured_separately():
+    metrics = RequestMetrics()
+    transport = httpx.ASGITransport(app=_app(metrics))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for _ in range(50):
+            assert (await client.get(f"/api/sessions/{uuid.uuid4()}")).status_code == 200
+        await client.get("/nope")
+        body = (await client.get("/api/chat/stream")).text
+
+    assert body == "data: first\n\ndata: done\n\n"
+    assert set(metrics.latency) == {("GET", "/api/sessions/{session_id}", "200"), ("GET", "<unmatched>", "404")}
+    assert metrics.latency[("GET", "/api/sessions/{session_id}", "200")].count == 50
+
+    key = ("GET", "/api/chat/stream", "200")
+    ttfb, total = metrics.stream_ttfb[key], metrics.stream_duration[key]
+    assert key not in metrics.latency
+    assert ttfb.total < 0.05 <= total.total
+
+    text = metrics.render_prometheus()
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/sessions/{session_id}",status="200"} 50' in text
+    assert 'http_stream_ttfb_seconds_bucket{method="GET",route="/api/chat/stream",status="200",le="+Inf"} 1' in text
+    assert metrics.in_flight == 0
+
+
+def test_series_are_bounded_and_quantiles_follow_buckets():
+    metrics = RequestMetrics()
+    metrics.MAX_SERIES = 10
+    for i in range(100):
+        metrics.observe(("GET", f"/route/{i}", "200"), 0.02)
+    assert len(metrics.latency) == 11 and metrics.dropped_series == 90
+
+    histogram = metrics.latency[("GET", "<other>", "200")]
+    for _ in range(10):
+        histogram.observe(3.0)
+    assert 0.01 < histogram.quantile(0.5) <= 0.025
+    assert 2.5 < histogram.quantile(0.99) <= 5.0
@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core import cache as cache_module
+from app.services.progress_service import ProgressService
+
+
+class FakeBroker:
+    """Process'ler arası Redis pub/sub yerine bellek içi yayıncı."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    async def publish(self, channel, message):
+        for pubsub in self.subscribers:
+            if channel in pubsub.channels:
+                pubsub.inbox.put_nowait({"type": "message", "channel": channel, "data": message})
+        return 1
+
+    def pubsub(self, ignore_subscribe_messages=True):
+        pubsub = FakePubSub()
+        self.subscribers.append(pubsub)
+        return pubsub
+
+    async def set(self, *args, **kwargs):
+        return True
+
+    async def delete(self, *args, **kwargs):
+        return 1
+
+
+class FakePubSub:
+    def __init__(self):
+        self.channels = set()
+        self.inbox = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=1.0):
+        try:
+            return await asyncio.wait_for(self.inbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        pass
+
+
+class FakeSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = []
+        self.closed = False
+
+    async def send_json(self, payload):
+        await asyncio.sleep(self.delay)
+        self.received.append(payload)
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+def _worker() -> ProgressService:
+    """Ayrı bir uvicorn worker'ını temsil eden bağımsız instance."""
+    service = object.__new__(ProgressService)
+    service._connections = {}
+    service._latest_payloads = {}
+    service._init_fanout()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_progress_reaches_socket_connected_to_another_worker(monkeypatch):
+    broker = FakeBroker()
+    monkeypatch.setattr(cache_module.cache, "_client", broker)
+    worker_a, worker_b = _worker(), _worker()
+    await worker_a.start()
+    await worker_b.start()
+    try:
+        socket_b = FakeSocket()
+        worker_b.register("session-1", socket_b)
+        await asyncio.sleep(0.01)  # abonelik uzlaştırması
+
+        await worker_a.send_progress("session-1", "long_video", 0.5, "Sahne 2/4 tamamlandı")
+        await worker_a.send_complete("session-1", "long_video", {"video_url": "https://cdn.example/v.mp4"})
+        for _ in range(50):
+            if len(socket_b.received) == 2:
+                break
+            await asyncio.sleep(0.01)
+
+        assert [p["type"] for p in socket_b.received] == ["progress", "complete"]
+        assert worker_b.get_stats()["remote_received"] == 2
+        # Yalnızca soketi olan worker abone olur
+        assert worker_a.get_stats()["subscribed_channels"] == 0
+    finally:
+        await worker_a.stop()
+        await worker_b.stop()
+
+
+@pytest.mark.asyncio
+async def test_slow_socket_gets_coalesced_progress_and_never_loses_terminal_messages(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    service = _worker()
+    service.MAX_QUEUE = 4
+    slow, fast = FakeSocket(delay=0.05), FakeSocket()
+    service.register("s", slow)
+    service.register("s", fast)
+    try:
+        for step in range(20):
+            await service.send_progress("s", "long_video", step / 20, f"adım {step}")
+        for i in range(6):
+            await service.send_reassurance("s", "long_video", f"not {i}")
+        await service.send_complete("s", "long_video", {"video_url": "u"})
+        await asyncio.sleep(0.5)
+
+        slow_types = [p["type"] for p in slow.received]
+        assert slow_types[-1] == "complete"
+        assert len(slow.received) <= service.MAX_QUEUE + 2  # tıkanan istemci her şeyi almaz
+        # Ara progress'ler birleştirildi, son durum kaybolmadı
+        assert [p["progress"] for p in slow.received if p["type"] == "progress"][-1] == 0.95
+        assert fast.received[-1]["type"] == "complete"
+        stats = service.get_stats()
+        assert stats["coalesced"] > 0 and stats["dropped"] > 0
+    finally:
+        service.unregister("s", slow)
+        service.unregister("s", fast)
+
+
+@pytest.mark.asyncio
+async def test_socket_whose_queue_is_full_of_terminal_messages_is_disconnected(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    service = _worker()
+    service.MAX_QUEUE = 2
+    stuck = FakeSocket(delay=10)
+    service.register("s", stuck)
+    for _ in range(4):
+        await service.send_error("s", "long_video", "boom")
+    await asyncio.sleep(0.01)
+
+    assert stuck.closed
+    assert service.get_stats()["slow_disconnects"] == 1
+    assert "s" not in service._connections
+    assert json.loads(json.dumps(service.get_stats()))  # admin endpoint'i için serileştirilebilir
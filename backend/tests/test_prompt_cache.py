@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import prompt_translator
+from app.services.prompt_cache import PromptCache
+from app.services.prompt_translator import looks_english
+
+
+def test_looks_english_skips_only_confident_english():
+    assert looks_english("A cinematic shot of a red car on the beach at sunset")
+    assert looks_english("woman wearing a black leather jacket")
+    assert not looks_english("gün batımında sahilde koşan kedi")
+    assert not looks_english("kedi resmi yap")
+    assert not looks_english("sunset")  # tek kelime: emin değiliz, çevir
+
+
+@pytest.mark.asyncio
+async def test_translation_is_cached_and_english_is_not_translated(monkeypatch):
+    cache = PromptCache()
+    monkeypatch.setattr(prompt_translator, "prompt_cache", cache)
+    calls = []
+
+    async def fake_chat(messages, **kwargs):
+        calls.append(messages[-1]["content"])
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=" running cat on the beach "))]
+        )
+
+    monkeypatch.setattr(prompt_translator.llm_gateway, "chat", fake_chat)
+
+    results = await asyncio.gather(*[
+        prompt_translator.translate_to_english("sahilde  koşan kedi") for _ in range(3)
+    ])
+    again, _ = await prompt_translator.translate_to_english("sahilde koşan kedi")
+    english, was_translated = await prompt_translator.translate_to_english("a cat running on the beach")
+
+    assert [r[0] for r in results] == ["running cat on the beach"] * 3
+    assert again == "running cat on the beach"
+    assert (english, was_translated) == ("a cat running on the beach", False)
+    assert len(calls) == 1
+    stats = cache.get_stats()
+    assert stats["misses"] == 1 and stats["hit_rate"] == 0.75
+
+
+@pytest.mark.asyncio
+async def test_failed_compute_is_not_cached():
+    cache = PromptCache()
+
+    async def broken():
+        raise RuntimeError("openai down")
+
+    async def working():
+        return "enriched prompt"
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute("enrich", "kedi", broken, media_type="image")
+    assert await cache.get_or_compute("enrich", "kedi", working, media_type="image") == "enriched prompt"
+    assert cache.make_key("enrich", "kedi", "image") != cache.make_key("enrich", "kedi", "video")
+
+
+@pytest.mark.asyncio
+async def test_owner_cancellation_does_not_fail_waiters():
+    cache = PromptCache()
+    started = asyncio.Event()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.05)
+        return f"enriched {len(calls)}"
+
+    owner = asyncio.create_task(cache.get_or_compute("enrich", "kedi", compute))
+    await started.wait()
+    waiters = [asyncio.create_task(cache.get_or_compute("enrich", "kedi", compute)) for _ in range(3)]
+    await asyncio.sleep(0)
+    owner.cancel()                                  # İstemci bağlantıyı kopardı
+
+    assert await asyncio.gather(*waiters) == ["enriched 2"] * 3   # Bir bekleyen yeniden hesapladı
+    assert owner.cancelled() and len(calls) == 2
@@ -0,0 +1,71 @@
+import random
+
+from app.services.memory_hygiene import (
+    has_conflicting_request_constraints,
+    sanitize_memory_text,
+    tokenize_memory_text,
+)
+from app.services.prompt_index import PromptIndex, prompt_fingerprint
+
+WORDS = ["sinematik", "kedi", "kopek", "plaj", "gece", "neon", "sehir", "urun", "parfum", "altin", "isik", "orman"]
+EXTRAS = ["", "5 saniyelik ", "10 saniyelik ", "3 gorsel ", "kling ile ", "veo ile "]
+
+
+def _serial_scan(prompts, query, limit):
+    """Eski find_similar_prompts: her prompt için tokenize + regex."""
+    query_words = tokenize_memory_text(query)
+    scored = []
+    for p in prompts:
+        if has_conflicting_request_constraints(query, p["prompt"]):
+            continue
+        memory_prompt = sanitize_memory_text(p["prompt"])
+        if not memory_prompt:
+            continue
+        overlap = len(query_words & tokenize_memory_text(memory_prompt))
+        if overlap > 0:
+            scored.append((overlap, p.get("score", 0), p["prompt"]))
+    scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
+    return [item[2] for item in scored[:limit]]
+
+
+def _corpus(rng, size):
+    return [
+        {
+            "prompt": rng.choice(EXTRAS) + " ".join(rng.sample(WORDS, rng.randint(2, 5))),
+            "score": rng.randint(1, 5),
+        }
+        for _ in range(size)
+    ]
+
+
+def test_index_matches_serial_scan_ranking():
+    rng = random.Random(7)
+    prompts = _corpus(rng, 150)
+    index = PromptIndex()
+    for p in prompts:
+        index.add({**p, **prompt_fingerprint(p["prompt"])})
+
+    for _ in range(20):
+        query = rng.choice(EXTRAS) + " ".join(rng.sample(WORDS, 3))
+        expected = _serial_scan(prompts, query, limit=3)
+        assert [r["prompt"] for r in index.search(query, limit=3)] == expected
+
+
+def test_oldest_entries_are_evicted_from_postings():
+    index = PromptIndex(max_entries=2)
+    for prompt in ["neon sehir gecesi", "altin plaj", "orman kedisi"]:
+        index.add({"prompt": prompt, "score": 1})
+
+    assert len(index) == 2
+    assert index.search("neon sehir") == []
+    assert "neon" not in index.postings
+    assert [r["prompt"] for r in index.search("orman plaj", limit=5)] == ["altin plaj", "orman kedisi"]
+
+
+def test_hashed_mode_matches_turkish_suffixes():
+    index = PromptIndex(mode="hashed")
+    index.add({"prompt": "Sahilde kosan kedisi, altin saat", "score": 1})
+    index.add({"prompt": "Neon sehir manzarasi", "score": 5})
+
+    assert PromptIndex().search("sahil kedi") == []
+    assert [r["prompt"] for r in index.search("sahil kedi")][0] == "Sahilde kosan kedisi, altin saat"
@@ -0,0 +1,194 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core import rate_limit as rate_limit_module
+from app.core.auth import create_access_token
+from app.core.rate_limit import GCRA_REFUND_SCRIPT, RateLimiter, RateLimitMiddleware, gcra_refund, gcra_take
+
+
+class FakeScriptRedis:
+    """GCRA script'lerini Python karşılıklarıyla (gcra_take / gcra_refund) çalıştıran Redis; TIME = gerçek saat."""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+        self.registered = 0
+
+    def register_script(self, source):
+        assert "redis.call('TIME')" in source
+        self.registered += 1
+
+        async def refund(keys, args):
+            period, units = args
+            self.data[keys[0]] = gcra_refund(self.data.get(keys[0], 0.0), time.time() * 1000.0, period, units)
+
+        if source == GCRA_REFUND_SCRIPT:
+            return refund
+
+        async def script(keys, args):
+            self.calls += 1
+            await asyncio.sleep(0)
+            period, limit, requested, min_grant = args
+            now = time.time() * 1000.0
+            grant, remaining, retry_after, new_tat = gcra_take(
+                self.data.get(keys[0], 0.0), now, period, limit, requested, min_grant,
+            )
+            if grant:
+                self.data[keys[0]] = new_tat
+            return [grant, remaining, retry_after]
+        return script
+
+
+def test_gcra_allows_burst_then_spaces_requests_by_period():
+    now, tat, period = 1_000_000.0, 0.0, 1000.0
+    for _ in range(5):
+        grant, _, _, tat = gcra_take(tat, now, period, 5, 1, 1)
+        assert grant == 1
+
+    grant, remaining, retry_after, _ = gcra_take(tat, now, period, 5, 1, 1)
+    assert (grant, remaining, retry_after) == (0, 0, 1000)
+    assert gcra_take(tat, now + 1000, period, 5, 3, 1)[0] == 1  # Bir period sonra tek token
+
+
+@pytest.mark.asyncio
+async def test_replicas_share_budget_and_most_checks_skip_redis(monkeypatch):
+    redis = FakeScriptRedis()
+    monkeypatch.setattr(cache_module.cache, "_client", redis)
+    replica_a, replica_b = RateLimiter(), RateLimiter()
+
+    results = [await (replica_a if i % 2 else replica_b).hit("general:u:1", 60, 60) for i in range(80)]
+
+    assert sum(r.allowed for r in results) == 60
+    assert not results[-1].allowed and results[-1].retry_after > 0
+    # 6'lık kiralar: 60 izin için ~10 Redis turu; ret sonrası istekler yerelde reddedilir
+    assert redis.calls <= 14
+    assert replica_a.get_stats()["local_blocks"] > 0
+
+
+@pytest.mark.asyncio
+async def test_local_fallback_is_bounded(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    limiter = RateLimiter()
+    limiter.MAX_LOCAL_KEYS = 100
+    for i in range(500):
+        assert (await limiter.hit(f"general:ip:{i}", 60, 60)).allowed
+    assert len(limiter._leases) == 100 and len(limiter._local_tat) == 100
+
+
+@pytest.mark.asyncio
+async def test_model_spend_quota(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", FakeScriptRedis())
+    monkeypatch.setattr(rate_limit_module.settings, "MODEL_SPEND_QUOTAS", {"veo": 20})
+    limiter = RateLimiter()
+
+    assert (await limiter.consume_quota("u1", "veo", 8)).allowed
+    assert (await limiter.consume_quota("u1", "veo", 10)).allowed
+    denied = await limiter.consume_quota("u1", "veo", 8)
+    assert not denied.allowed and denied.remaining == 2
+    assert (await limiter.consume_quota("u1", "kling", 500)).allowed  # Kota tanımsız
+
+    # Başarısız üretimin birimleri iade edilir → aynı istek tekrar sığar
+    await limiter.refund_quota("u1", "veo", 10)
+    assert (await limiter.consume_quota("u1", "veo", 8)).allowed
+
+
+@pytest.mark.asyncio
+async def test_spend_quota_uses_overridden_model_and_refunds_failed_generation(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from app.services.agent import orchestrator as orchestrator_module
+
+    redis = FakeScriptRedis()
+    monkeypatch.setattr(cache_module.cache, "_client", redis)
+    monkeypatch.setattr(rate_limit_module.settings, "MODEL_SPEND_QUOTAS", {"gpt_image": 1})
+    monkeypatch.setattr(rate_limit_module, "rate_limiter", RateLimiter())
+
+    async def fake_user_id(db, session_id):
+        return "u1"
+
+    outcomes = [False, True]
+    seen_models = []
+
+    async def fake_generate_image(db, session_id, params, resolved_entities, uploaded_reference_url=None):
+        seen_models.append(params["model"])
+        return {"success": outcomes.pop(0)}
+
+    agent = orchestrator_module.AgentOrchestrator.__new__(orchestrator_module.AgentOrchestrator)
+    monkeypatch.setattr(orchestrator_module, "get_user_id_from_session", fake_user_id)
+    monkeypatch.setattr(agent, "_generate_image", fake_generate_image)
+
+    async def call():
+        return await agent._handle_tool_call(
+            tool_name="generate_image", tool_input={"prompt": "kedi", "model": "auto"},
+            session_id=None, db=None, user_message="gpt image ile bir kedi çiz",
+        )
+
+    # LLM "auto" seçti, kullanıcı gpt image istedi → kota gpt_image'dan düşer
+    assert (await call())["success"] is False
+    assert list(redis.data) == ["rl:quota:gpt_image:u1"]
+    # Başarısız üretim iade edildi: tek birimlik kota yeniden kullanılabilir
+    assert (await call())["success"] is True
+    denied = await call()
+    assert denied["success"] is False and "GPT_IMAGE" in denied["error"]
+    assert seen_models == ["gpt_image", "gpt_image"]
+
+
+@pytest.mark.asyncio
+async def test_take_and_refund_scripts_are_registered_once(monkeypatch):
+    redis = FakeScriptRedis()
+    monkeypatch.setattr(cache_module.cache, "_client", redis)
+    limiter = RateLimiter()
+
+    await limiter._give_back("k", 10, 60, 1)
+    await limiter._take("k", 10, 60, 1, 1)
+    await limiter._give_back("k", 10, 60, 1)
+    await limiter._take("k", 10, 60, 1, 1)
+
+    assert redis.registered == 2
+
+
+async def _call(middleware, path, method="GET", headers=None, client=("10.0.0.1", 1234)):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": method, "path": path, "client": client,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    await middleware(scope, receive, send)
+    start = sent[0]
+    return start["status"], dict(start["headers"])
+
+
+async def _ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+@pytest.mark.asyncio
+async def test_middleware_buckets_by_user_and_category(monkeypatch):
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    middleware = RateLimitMiddleware(_ok_app, general_limit=5, ai_limit=2, auth_limit=3, limiter=RateLimiter())
+    token = create_access_token({"sub": "user-1"})
+
+    # Aynı kullanıcı farklı IP'lerden: tek kova
+    for ip in ("1.1.1.1", "2.2.2.2"):
+        status, headers = await _call(middleware, "/api/v1/chat/send", "POST",
+                                      {"Authorization": f"Bearer {token}", "X-Forwarded-For": ip})
+        assert status == 200 and headers[b"x-ratelimit-limit"] == b"2"
+    status, headers = await _call(middleware, "/api/v1/chat/send", "POST", {"Authorization": f"Bearer {token}"})
+    assert status == 429 and int(headers[b"retry-after"]) >= 1
+
+    # AI kotası dolu olsa da geçmişi okumak (GET) genel kategoride
+    status, headers = await _call(middleware, "/api/v1/chat/history", "GET", {"Authorization": f"Bearer {token}"})
+    assert status == 200 and headers[b"x-ratelimit-limit"] == b"5"
+    # Anonim istek IP kovasında; health hiç sayılmaz
+    assert (await _call(middleware, "/api/v1/chat/send", "POST"))[0] == 200
+    assert [(await _call(middleware, "/health"))[0] for _ in range(10)] == [200] * 10
@@ -0,0 +1,160 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.sql import Delete, Select
+
+from app.core import cache as cache_module
+from app.models.models import Message
+from app.services import stream_persister as persister_module
+from app.services.stream_persister import StreamPersister
+
+
+class FakeDB:
+    """async_session_maker yerine: yazılanları kaydeder, select'te verilen satırları döner."""
+
+    def __init__(self, rows=(), delay: float = 0.0):
+        self.rows = list(rows)
+        self.delay = delay
+        self.updates = []
+        self.update_sql = []
+        self.deleted = 0
+        self.commits = 0
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params=None):
+        await asyncio.sleep(self.delay)
+        if isinstance(statement, Select):
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: self.rows))
+        if isinstance(statement, Delete):
+            self.deleted += 1
+        else:
+            self.update_sql.append(str(statement))
+            self.updates.append([dict(row) for row in params])
+
+    async def commit(self):
+        self.commits += 1
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes, self.keys = {}, {}
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+    async def set(self, key, value, ex=None):
+        self.keys[key] = value
+
+    async def exists(self, key):
+        return int(key in self.keys)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_streams_are_flushed_in_one_batched_update(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(persister_module, "async_session_maker", db)
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    persister = StreamPersister()
+    persister.FLUSH_INTERVAL = 0.05
+    streams = [uuid.uuid4() for _ in range(3)]
+
+    text = ""
+    for token in range(200):
+        text += "kelime "
+        for message_id in streams:
+            persister.update(message_id, text, {"streamed": True, "pending": True})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.12)
+
+    # İlk güncelleme hemen, sonrası aralıklı: 600 update → birkaç toplu UPDATE
+    assert 1 <= len(db.updates) <= 4
+    assert {row["b_id"] for row in db.updates[-1]} == set(streams)
+    assert db.updates[-1][0]["content"] == text
+    await persister.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_finalize_completes_even_if_caller_is_cancelled(monkeypatch):
+    db = FakeDB(delay=0.05)
+    monkeypatch.setattr(persister_module, "async_session_maker", db)
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    persister = StreamPersister()
+    message_id = uuid.uuid4()
+
+    task = asyncio.create_task(persister.finalize(message_id, "son yanıt", {"streamed": True, "pending": False}))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0.1)
+
+    assert db.updates == [[{"b_id": message_id, "content": "son yanıt",
+                            "metadata": {"streamed": True, "pending": False}, "is_error": False}]]
+    assert persister.get_stats()["pending"] == 0
+    await persister.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_discard_waits_for_inflight_flush_and_is_not_requeued(monkeypatch):
+    db = FakeDB(delay=0.05)
+    monkeypatch.setattr(persister_module, "async_session_maker", db)
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    persister = StreamPersister()
+    deleted_id, kept_id = uuid.uuid4(), uuid.uuid4()
+    persister.update(deleted_id, "iptal edilen", {"pending": True})
+    persister.update(kept_id, "devam eden", {"pending": True})
+
+    await asyncio.sleep(0.01)                    # Flusher ilk batch'i yazmaya başladı
+    await persister.discard(deleted_id)          # Yazılmakta olan batch bitmeden dönmez
+    assert [len(batch) for batch in db.updates] == [2]
+    assert persister.get_stats()["pending"] == 0
+
+    persister.update(kept_id, "devam eden yanıt", {"pending": False}, final=True)
+    assert await persister.flush() == 1
+    assert [row["b_id"] for row in db.updates[-1]] == [kept_id]
+    # Core executemany: silinmiş satır batch'i düşürmez (ORM bulk UPDATE StaleDataError atardı)
+    assert db.update_sql[-1].endswith("WHERE messages.id = :b_id")
+    assert persister.get_stats()["flush_errors"] == 0
+    await persister.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_recovery_finalizes_only_messages_of_dead_owners(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(cache_module.cache, "_client", redis)
+    partial = Message(id=uuid.uuid4(), role="assistant", content="Yarım kalan",
+                      metadata_={"streamed": True, "pending": True})
+    blank = Message(id=uuid.uuid4(), role="assistant", content="", metadata_={"streamed": True, "pending": True})
+    db = FakeDB(rows=[partial, blank])
+    monkeypatch.setattr(persister_module, "async_session_maker", db)
+
+    alive_owner = StreamPersister()
+    live_id = uuid.uuid4()
+    await alive_owner.begin(live_id)
+    for message in (partial, blank):
+        await redis.hset(StreamPersister.ACTIVE_KEY, str(message.id), "eski-pod:1:abc")
+
+    recovered = await StreamPersister().recover_interrupted()
+
+    assert recovered == 2
+    assert partial.metadata_ == {"streamed": True, "pending": False, "interrupted": True}
+    assert db.deleted == 1 and db.commits == 1
+    assert list(redis.hashes[StreamPersister.ACTIVE_KEY]) == [str(live_id)]
+    await alive_owner.shutdown()
@@ -0,0 +1,111 @@
+import asyncio
+import re
+import uuid
+from collections import Counter
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import usage_counters as counters_module
+from app.services import usage_tracker
+from app.services.stats_service import StatsService
+from app.services.usage_counters import METRICS, UsageCounters
+
+
+class FakeUpsertDB:
+    """ON CONFLICT DO UPDATE SET x = x + EXCLUDED.x davranışını taklit eden tablo; ara sıra hata verir."""
+
+    def __init__(self, fail_every: int = 0):
+        self.table = {}
+        self.calls = 0
+        self.fail_every = fail_every
+        self.sql = None
+        self.rollup_sql = None
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        if str(compiled).startswith("INSERT INTO daily_rollups"):
+            self.rollup_sql = str(compiled)
+            return
+        self.calls += 1
+        self.sql = str(compiled)
+        await asyncio.sleep(0.001)   # Bu sırada yeni artışlar gelir
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise ConnectionError("bağlantı koptu")
+        rows = {}
+        for name, value in compiled.params.items():
+            column, index = re.fullmatch(r"(\w+?)_m(\d+)", name).groups()
+            rows.setdefault(index, {})[column] = value
+        for row in rows.values():
+            key = (row["user_id"], row["day"], row["model_name"])
+            stored = self.table.setdefault(key, Counter())
+            for metric in METRICS:
+                stored[metric] += row[metric]
+
+    async def commit(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_no_lost_increments_with_concurrent_writers_and_failing_flushes(monkeypatch):
+    db = FakeUpsertDB(fail_every=3)
+    monkeypatch.setattr(counters_module, "async_session_maker", db)
+    users = [uuid.uuid4() for _ in range(3)]
+    replicas = [UsageCounters(), UsageCounters()]   # İki process aynı satırlara yazıyor
+    for replica in replicas:
+        replica.FLUSH_INTERVAL = 0.002
+
+    async def writer(i: int):
+        counters = replicas[i % 2]
+        for n in range(100):
+            counters.incr(users[n % 3], "flux-pro" if n % 2 else None, api_calls=1, images_generated=1, tokens_used=2)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(writer(i) for i in range(20)))
+    for replica in replicas:
+        await replica.shutdown()
+    while any(replica.get_stats()["pending_keys"] for replica in replicas):
+        for replica in replicas:
+            await replica.flush()
+
+    totals = Counter()
+    for counter in db.table.values():
+        totals.update(counter)
+    assert totals == Counter(api_calls=2000, images_generated=2000, tokens_used=4000)
+    assert len(db.table) == 6                                      # 3 kullanıcı × (aggregate, flux-pro)
+    assert sum(r.get_stats()["flush_errors"] for r in replicas) > 0  # Hatalı flush'lar yeniden denendi
+    assert "ON CONFLICT (coalesce(user_id, '00000000-0000-0000-0000-000000000000'::uuid), day, " \
+           "coalesce(model_name, '')) DO UPDATE SET api_calls = (usage_stats.api_calls + excluded.api_calls)" in db.sql
+    assert "DO UPDATE SET value = (daily_rollups.value + excluded.value)" in db.rollup_sql   # Admin özeti de beslenir
+
+
+@pytest.mark.asyncio
+async def test_trackers_only_buffer_without_touching_the_session(monkeypatch):
+    counters = UsageCounters()
+    monkeypatch.setattr(counters_module, "usage_counters", counters)
+    monkeypatch.setattr(usage_tracker, "usage_counters", counters)
+    monkeypatch.setattr("app.services.stats_service.usage_counters", counters)
+    user_id = uuid.uuid4()
+
+    await StatsService.track_video_generation(object(), user_id, "kling")
+    await StatsService.track_api_call(object(), user_id, tokens=120)
+    await usage_tracker.log_model_usage(object(), user_id, "kling", "video")
+
+    pending = {(key[0], key[2]): dict(counter) for key, counter in counters._pending.items()}
+    assert pending == {
+        (user_id, None): {"videos_generated": 1, "api_calls": 2, "tokens_used": 120},
+        (user_id, "kling"): {"api_calls": 1, "videos_generated": 1},
+    }
+    with pytest.raises(ValueError):
+        counters.incr(user_id, bogus=1)
+    counters._pending.clear()
+    await counters.shutdown()
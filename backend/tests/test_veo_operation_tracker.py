@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.veo_operation_tracker import VeoOperationTimeoutError, VeoOperationTracker
+
+
+class FakeVeoClient:
+    """google.genai.Client benzeri: senkron (bloklayan) SDK metodları."""
+
+    def __init__(self, polls_until_done: int = 3, error=None):
+        self.polls_until_done = polls_until_done
+        self.error = error
+        self.poll_counts = {}
+        self.threads = set()
+        self.models = SimpleNamespace(generate_videos=self._generate_videos)
+        self.operations = SimpleNamespace(get=self._get)
+
+    def _generate_videos(self, model, prompt, config, image=None):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(0.01)
+        return SimpleNamespace(name=f"op-{prompt}", done=False, error=None, result=None)
+
+    def _get(self, operation):
+        self.threads.add(threading.current_thread().name)
+        count = self.poll_counts[operation.name] = self.poll_counts.get(operation.name, 0) + 1
+        done = count >= self.polls_until_done
+        video = SimpleNamespace(video=SimpleNamespace(uri=f"https://google.example/{operation.name}"))
+        return SimpleNamespace(
+            name=operation.name,
+            done=done,
+            error=self.error if done else None,
+            result=SimpleNamespace(generated_videos=[video]) if done else None,
+        )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_operations_share_one_poller_and_leave_default_executor_free():
+    tracker = VeoOperationTracker()
+    tracker.POLL_INTERVAL = 0.02
+    client = FakeVeoClient()
+
+    runs = asyncio.gather(*[
+        tracker.run(client, model="veo", prompt=f"scene-{i}", config=None) for i in range(12)
+    ])
+    await asyncio.sleep(0.02)
+    # 12 uçuştaki Veo işi varken varsayılan executor hâlâ anında cevap veriyor
+    started = time.perf_counter()
+    await asyncio.to_thread(lambda: None)
+    assert time.perf_counter() - started < 0.05
+
+    results = await runs
+    assert [r.generated_videos[0].video.uri for r in results] == [
+        f"https://google.example/op-scene-{i}" for i in range(12)
+    ]
+    assert all(name.startswith("veo-sdk") for name in client.threads)
+    assert tracker.get_stats()["completed"] == 12 and tracker.get_stats()["in_flight"] == 0
+    await tracker.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_operation_error_and_timeout_are_raised():
+    tracker = VeoOperationTracker()
+    tracker.POLL_INTERVAL = 0.01
+
+    with pytest.raises(RuntimeError, match="Veo API Hatası"):
+        await tracker.run(FakeVeoClient(polls_until_done=1, error="quota"), model="veo", prompt="x", config=None)
+
+    with pytest.raises(VeoOperationTimeoutError):
+        await tracker.run(FakeVeoClient(polls_until_done=10**6), timeout=0.05, model="veo", prompt="y", config=None)
+    await tracker.shutdown()
@@ -19,7 +19,7 @@ async def test_generate_video_does_not_use_stale_session_cache_without_explicit_
 
     captured = {}
 
-    async def fake_generate_video(db, current_session_id, params, resolved_entities):
+    async def fake_generate_video(db, current_session_id, params, resolved_entities, quota_charge=None):
         captured["params"] = dict(params)
         return {"success": True}
 
@@ -58,7 +58,7 @@ async def test_generate_video_resolves_first_matching_session_image(monkeypatch)
 
     captured = {}
 
-    async def fake_generate_video(db, current_session_id, params, resolved_entities):
+    async def fake_generate_video(db, current_session_id, params, resolved_entities, quota_charge=None):
         captured["params"] = dict(params)
         return {"success": True}
 
@@ -0,0 +1,43 @@
+import asyncio
+
+from app.core import cache as cache_module
+from app.core.config import settings
+from app.services.media_io import media_io
+from app.tasks import runtime
+
+
+class FakeRedis:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_worker_process_reuses_loop_and_clients_across_tasks(monkeypatch):
+    connects = []
+
+    async def fake_connect():
+        connects.append(asyncio.get_running_loop())
+        cache_module.cache._client = FakeRedis()
+        return True
+
+    monkeypatch.setattr(cache_module.cache, "_client", None)
+    monkeypatch.setattr(cache_module.cache, "connect", fake_connect)
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://test")
+
+    runtime.bootstrap_worker_process()
+
+    async def task_body():
+        return asyncio.get_running_loop(), cache_module.cache.client, media_io.client
+
+    first, second = runtime.run_async(task_body()), runtime.run_async(task_body())
+    redis = first[1]
+
+    assert first == second
+    assert connects == [first[0]]
+    assert not media_io.client.is_closed
+
+    runtime.shutdown_worker_process()
+    assert redis.closed and cache_module.cache._client is None
+    assert first[0].is_closed()
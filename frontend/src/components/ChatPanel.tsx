@@ -5,7 +5,7 @@ import ReactMarkdown from "react-markdown";
 
 import { Send, Paperclip, Loader2, MoreHorizontal, ChevronDown, AlertCircle, Sparkles, X, ZoomIn, Download, ThumbsUp, ThumbsDown } from "lucide-react";
 import { useToast } from "./ToastProvider";
-import { sendMessage, sendMessageStream, checkHealth, getSessionHistory, sendFeedback, type MessageResponse as ApiMessageResponse } from "@/lib/api";
+import { sendMessage, sendMessageStream, checkHealth, getSessionHistoryPage, sendFeedback, type MessageResponse as ApiMessageResponse } from "@/lib/api";
 import { GenerationProgressCard } from "./GenerationProgressCard";
 
 interface Message {
@@ -467,6 +467,9 @@ function stripInlineMediaContent(
 
 export function ChatPanel({ sessionId: initialSessionId, onNewAsset, onEntityChange, pendingPrompt, onPromptConsumed, pendingInputText, onInputTextConsumed, installedPlugins = [], pendingAssetUrl, onAssetUrlConsumed }: ChatPanelProps) {
     const [messages, setMessages] = useState<Message[]>([]);
+    // Geçmiş sayfa sayfa yüklenir: en yeni sayfa açılışta, eskiler yukarı kaydırınca
+    const [historyCursor, setHistoryCursor] = useState<string | null>(null);
+    const [isLoadingOlder, setIsLoadingOlder] = useState(false);
     const [input, setInput] = useState("");
     const [isLoading, setIsLoading] = useState(false);
     const [activeGenerations, setActiveGenerations] = useState<Array<{ type: string; prompt?: string; duration?: string | number }>>([]);
@@ -523,6 +526,7 @@ export function ChatPanel({ sessionId: initialSessionId, onNewAsset, onEntityCha
         // Yeni projeye geç
         setSessionId(initialSessionId || null);
         setMessages([]);
+        setHistoryCursor(null);
         hasInitialScrolled.current = false;
         setError(null);
         setIsLoading(false);
@@ -785,13 +789,15 @@ export function ChatPanel({ sessionId: initialSessionId, onNewAsset, onEntityCha
             setIsLoading(true);
 
             try {
-                // Backend'den mesaj geçmişini yükle
-                const history = await getSessionHistory(initialSessionId);
-                const formattedMessages: Message[] = history.map(mapApiMessageToChatMessage);
+                // Backend'den yalnızca en yeni sayfayı yükle (eskiler scroll ile gelir)
+                const page = await getSessionHistoryPage(initialSessionId);
+                const formattedMessages: Message[] = page.messages.map(mapApiMessageToChatMessage);
                 setMessages(formattedMessages);
+                setHistoryCursor(page.nextBefore);
             } catch (err) {
                 console.error('Mesaj geçmişi yüklenemedi:', err);
                 setMessages([]);
+                setHistoryCursor(null);
             } finally {
                 setIsLoading(false);
             }
@@ -1016,6 +1022,8 @@ export function ChatPanel({ sessionId: initialSessionId, onNewAsset, onEntityCha
 
     const scrollContainerRef = useRef<HTMLDivElement>(null);
     const hasInitialScrolled = useRef(false);
+    // Eski sayfa başa eklenirken kaydırma konumunu korumak için önceki scrollHeight
+    const prependScrollHeightRef = useRef<number | null>(null);
 
     const scrollToBottom = useCallback((instant?: boolean) => {
         if (scrollContainerRef.current) {
@@ -1029,6 +1037,13 @@ export function ChatPanel({ sessionId: initialSessionId, onNewAsset, onEntityCha
     // Scroll on messages change
     useEffect(() => {
         if (messages.length === 0) return;
+        const container = scrollContainerRef.current;
+        if (prependScrollHeightRef.current !== null && container) {
+            // Eski mesajlar başa eklendi — kullanıcının baktığı yer yerinde kalsın
+            container.scrollTop += container.scrollHeight - prependScrollHeightRef.current;
+            prependScrollHeightRef.current = null;
+            return;
+        }
         if (!hasInitialScrolled.current) {
             // First load — instant scroll + delayed re-scroll for lazy media
             hasInitialScrolled.current = true;
@@ -1041,6 +1056,29 @@ export function ChatPanel({ sessionId: initialSessionId, onNewAsset, onEntityCha
         }
     }, [messages, scrollToBottom]);
 
+    // Yukarı kaydırınca bir önceki geçmiş sayfasını yükle
+    const loadOlderHistory = useCallback(async () => {
+        if (!sessionId || !historyCursor || isLoadingOlder) return;
+        setIsLoadingOlder(true);
+        try {
+            const page = await getSessionHistoryPage(sessionId, historyCursor);
+            if (prevSessionRef.current !== sessionId) return;  // Bu arada proje değişti
+            prependScrollHeightRef.current = scrollContainerRef.current?.scrollHeight ?? null;
+            setMessages(prev => [...page.messages.map(mapApiMessageToChatMessage), ...prev]);
+            setHistoryCursor(page.nextBefore);
+        } catch (err) {
+            console.error('Eski mesajlar yüklenemedi:', err);
+        } finally {
+            setIsLoadingOlder(false);
+        }
+    }, [sessionId, historyCursor, isLoadingOlder]);
+
+    const handleMessagesScroll = useCallback((e: React.UIEvent<HTMLDivElement>) => {
+        if (e.currentTarget.scrollTop < 120) {
+            void loadOlderHistory();
+        }
+    }, [loadOlderHistory]);
+
     const handleSubmit = async (e: React.FormEvent) => {
         e.preventDefault();
         const hasContent = input.trim() || attachedFiles.length > 0 || attachedVideoUrl || attachedAudioUrl;
@@ -1502,10 +1540,16 @@ export function ChatPanel({ sessionId: initialSessionId, onNewAsset, onEntityCha
             {/* Messages */}
             <div
                 ref={scrollContainerRef}
+                onScroll={handleMessagesScroll}
                 className="flex-1 overflow-y-auto p-4 lg:p-6"
                 style={{ background: "var(--background)" }}
             >
                 <div className="max-w-3xl mx-auto space-y-4">
+                    {isLoadingOlder && (
+                        <div className="flex justify-center py-2">
+                            <Loader2 className="w-4 h-4 animate-spin" style={{ color: "var(--foreground-muted)" }} />
+                        </div>
+                    )}
                     {messages.length === 0 && !isLoading && (
                         <div className="flex flex-col items-center justify-center py-16">
                             {/* Logo & Title */}
@@ -311,8 +311,15 @@ export async function sendMessageStream(
     }
 }
 
-export async function getSessionHistory(sessionId: string): Promise<MessageResponse[]> {
-    const response = await fetch(`${API_BASE_URL}${API_PREFIX}/sessions/${sessionId}/messages`, {
+export interface SessionHistoryPage {
+    messages: MessageResponse[];
+    nextBefore: string | null;  // Daha eski mesajlar için cursor (yoksa null)
+}
+
+// Tek sayfa: cursor yoksa en yeni mesajlar, `before` ile daha eskiler (kronolojik sıra)
+export async function getSessionHistoryPage(sessionId: string, before?: string): Promise<SessionHistoryPage> {
+    const query = before ? `?before=${encodeURIComponent(before)}` : '';
+    const response = await fetch(`${API_BASE_URL}${API_PREFIX}/sessions/${sessionId}/messages${query}`, {
         headers: getAuthHeaders(),
     });
 
@@ -320,7 +327,7 @@ export async function getSessionHistory(sessionId: string): Promise<MessageRespo
         throw new Error('Failed to fetch session history');
     }
 
-    return response.json();
+    return { messages: await response.json(), nextBefore: response.headers.get('X-Next-Before') };
 }
 
 // Entity (Character, Location, Wardrobe) APIs